@@ -38,7 +38,8 @@ def handle_disconnect():
     
     for sala_id, jogadores in salas_ativas.items():
         # ADD LOG:
-        log_debug("disconnect", f"Verificando sala {sala_id}, {len(jogadores)} jogadores")
+        # Argumentos no estilo %s: o texto só é montado se o DEBUG estiver ligado.
+        log_debug("disconnect", "Verificando sala %s, %d jogadores", sala_id, len(jogadores))
         
         if request.sid in jogadores:
             sala_para_remover_de = str(sala_id)
@@ -69,7 +70,8 @@ def handle_join_room(data):
     log_evento_socket(
         evento="JOIN_ROOM",
         sala_id=sala_id,
-        payload_resumo=f"ficha_id={ficha_id}"
+        payload_resumo="ficha_id=%s",
+        resumo_args=(ficha_id,)
     )
     
     try:
@@ -163,10 +165,7 @@ def handle_batalha_player_iniciativa(data):
     sala_id = str(data.get('sala_id'))
     valor = data.get('valor')
     
-    log_debug(
-        modulo="batalha_iniciativa",
-        msg=f"Sala:{sala_id}, Rolagem: {valor}"
-    )
+    log_debug("batalha_iniciativa", "Sala:%s, Rolagem: %s", sala_id, valor)
     # ... resto do código ...
 
 
@@ -184,15 +183,13 @@ def handle_dar_xp(data):
     log_evento_socket(
         evento="MESTRE_DAR_XP",
         sala_id=sala_id,
-        payload_resumo=f"alvo={alvo_id_str}, xp={quantidade_str}"
+        payload_resumo="alvo=%s, xp=%s",
+        resumo_args=(alvo_id_str, quantidade_str)
     )
     
     try:
         # ... código ...
-        log_debug(
-            modulo="dar_xp",
-            msg=f"XP distribuído: {quantidade_str} para alvo {alvo_id_str}"
-        )
+        log_debug("dar_xp", "XP distribuído: %s para alvo %s", quantidade_str, alvo_id_str)
     except Exception as e:
         log_erro(
             modulo="dar_xp",
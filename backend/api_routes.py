@@ -234,7 +234,10 @@ def get_itens(token_data):
 @api_bp.route('/itens', methods=['POST'])
 @token_required
 def post_item(token_data):
-    sucesso = criar_novo_item(request.get_json())
+    try:
+        sucesso = criar_novo_item(request.get_json())
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'mensagem': f'Efeito inválido: {e}'}), 400
     if sucesso:
         return jsonify({'sucesso': True, 'mensagem': 'Item criado!'}), 201
     return jsonify({'sucesso': False, 'mensagem': 'Erro ao criar item.'}), 400
@@ -243,7 +246,10 @@ def post_item(token_data):
 @api_bp.route('/itens/<int:item_id>', methods=['PUT'])
 @token_required
 def put_item(token_data, item_id):
-    sucesso = atualizar_item_existente(item_id, request.get_json())
+    try:
+        sucesso = atualizar_item_existente(item_id, request.get_json())
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'mensagem': f'Efeito inválido: {e}'}), 400
     if sucesso:
         return jsonify({'sucesso': True, 'mensagem': 'Item atualizado!'})
     return jsonify({'sucesso': False, 'mensagem': 'Item não encontrado.'}), 404
@@ -268,7 +274,10 @@ def get_habilidades(token_data):
 @api_bp.route('/habilidades', methods=['POST'])
 @token_required
 def post_habilidade(token_data):
-    sucesso = criar_nova_habilidade(request.get_json())
+    try:
+        sucesso = criar_nova_habilidade(request.get_json())
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'mensagem': f'Efeito inválido: {e}'}), 400
     if sucesso:
         return jsonify({'sucesso': True, 'mensagem': 'Habilidade criada!'}), 201
     return jsonify({'sucesso': False, 'mensagem': 'Erro ao criar habilidade.'}), 400
@@ -277,7 +286,10 @@ def post_habilidade(token_data):
 @api_bp.route('/habilidades/<int:habilidade_id>', methods=['PUT'])
 @token_required
 def put_habilidade(token_data, habilidade_id):
-    sucesso = atualizar_habilidade_existente(habilidade_id, request.get_json())
+    try:
+        sucesso = atualizar_habilidade_existente(habilidade_id, request.get_json())
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'mensagem': f'Efeito inválido: {e}'}), 400
     if sucesso:
         return jsonify({'sucesso': True, 'mensagem': 'Habilidade atualizada!'})
     return jsonify({'sucesso': False, 'mensagem': 'Habilidade não encontrada.'}), 404
@@ -1,4 +1,8 @@
 import os
+# Modo de execução por RPG_ASYNC_MODE (threading/eventlet/gevent); o monkey patch vem antes do Flask.
+from servidor import execucao
+execucao.preparar()
+
 from flask import Flask
 from flask_socketio import SocketIO
 from flask_cors import CORS
@@ -10,10 +14,13 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'secret_de_cria_123!')
 
 # Puxa o CORS dinamicamente. Se não achar a variável, libera com '*' pra não quebrar nossos testes
 url_front = os.environ.get('FRONTEND_URL', '*')
-# Se estiver rodando no Render, usa 'eventlet' (que aguenta o tranco). Local, vai de 'threading'
-async_mode = 'threading'
+# No Render, RPG_ASYNC_MODE=eventlet (que aguenta o tranco). Local, fica no padrão 'threading'
+async_mode = execucao.modo()
 # Inicializa o SocketIO com as configurações de produção
 socketio = SocketIO(app, cors_allowed_origins=url_front, async_mode=async_mode)
+# eventlet/gevent: consultas ao SQLite num pool de threads (ver database/instrumentacao.py)
+from database import instrumentacao
+instrumentacao.delegar_bloqueantes(execucao.executor_bloqueante())
 
 # Inicializa o Flask-CORS para as rotas HTTP (API)
 CORS(app, resources={r"/*": {"origins": url_front}})
@@ -30,4 +37,4 @@ def index():
 
 if __name__ == '__main__':
     print("Iniciando o servidor Flask local na porta 5003...")
-    socketio.run(app, host='0.0.0.0', port=5003, debug=True, allow_unsafe_werkzeug=True)
+    execucao.rodar(socketio, app)
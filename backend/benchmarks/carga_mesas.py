@@ -0,0 +1,419 @@
+# benchmarks/carga_mesas.py
+"""
+Carga de mesas inteiras: N salas, cada uma com um mestre e M jogadores, jogando ao mesmo
+tempo contra um servidor local.
+
+Copia o banco para uma pasta temporária (RPG_DB_PATH), cria um mestre por sala e um usuário
+com ficha para cada jogador (usuários distintos, para o limitador por usuário contar como
+em produção) e sobe `python -m backend.servidor` numa porta livre. Cada sala roda o roteiro:
+  1. todos conectam e entram (join_room);
+  2. chat e dados: cada participante manda --mensagens send_message e --rolagens roll_dice,
+     com --pausa segundos entre ações (o padrão cabe nos orçamentos do limitador);
+  3. o mestre dá XP a cada jogador (mestre_dar_xp);
+  4. batalha completa: batalha_iniciar -> batalha_player_iniciativa de cada jogador ->
+     batalha_comecar_combate -> --ataques batalha_atacar (jogadores nos monstros e monstros
+     nos jogadores, pelo mestre) -> batalha_encerrar;
+  e repete os passos 2-4 --rodadas vezes.
+
+A latência de cada ação é o tempo entre o emit e a chegada, para quem mandou, do evento da
+sala que ela provoca (o eco da mensagem, ficha_atualizada, batalha_atualizada com a linha de
+log do ataque...). Ao final mostra, por evento, p50/p95/p99/máximo e os timeouts, os eventos
+de erro que o servidor mandou (rate_limited, batalha_erro, join_error...) e a memória e as
+threads do processo do servidor amostradas ao longo do teste (Linux, via /proc).
+
+Os clientes são socketio.AsyncClient (asyncio), que precisa do aiohttp ('pip install aiohttp').
+Com --codec msgpack o servidor sobe com RPG_CODECS=msgpack e os clientes pedem o codec
+(servidor/codec.py). RPG_LIMITES e as demais variáveis do ambiente passam para o servidor.
+
+Execute a partir da raiz do projeto:
+    python -m backend.benchmarks.carga_mesas
+    python -m backend.benchmarks.carga_mesas --salas 50 --jogadores 5 --rodadas 3 --modo eventlet
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import socketio
+
+try:
+    import aiohttp  # noqa: F401 (transporte do socketio.AsyncClient)
+except ImportError:
+    aiohttp = None
+
+from backend.servidor import codec
+from .carga_socketio import BACKEND, BANCO_ORIGINAL, _percentil, _porta_livre, _subir_servidor, _uso_do_processo
+
+# Eventos que o servidor manda só para quem errou (ou foi barrado)
+EVENTOS_DE_ERRO = ('join_error', 'chat_error', 'mestre_error', 'batalha_erro', 'acao_bloqueada', 'rate_limited')
+
+
+class Metricas:
+    """Latências e erros de todos os clientes (um só loop asyncio, então sem trava)."""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)  # { evento: [segundos] }
+        self.timeouts = Counter()           # { evento: n }
+        self.erros_servidor = Counter()     # { evento de erro: n }
+        self.exemplos = {}                  # { evento de erro: primeiro payload }
+
+    def latencia(self, evento, segundos):
+        self.latencias[evento].append(segundos)
+
+    def timeout(self, evento):
+        self.timeouts[evento] += 1
+
+    def erro(self, evento, dados):
+        self.erros_servidor[evento] += 1
+        self.exemplos.setdefault(evento, dados)
+
+    def tabela(self):
+        eventos = list(self.latencias) + [e for e in self.timeouts if e not in self.latencias]
+        return [{
+            'evento': evento,
+            'n': len(self.latencias[evento]),
+            'p50_ms': round(_percentil(self.latencias[evento], 50) * 1000, 1),
+            'p95_ms': round(_percentil(self.latencias[evento], 95) * 1000, 1),
+            'p99_ms': round(_percentil(self.latencias[evento], 99) * 1000, 1),
+            'max_ms': round(_percentil(self.latencias[evento], 100) * 1000, 1),
+            'timeouts': self.timeouts[evento],
+        } for evento in eventos]
+
+
+class Participante:
+    """Uma conexão do teste (mestre ou jogador) e as respostas que ela está esperando."""
+
+    def __init__(self, nome, token, ficha_id, metricas, timeout, codec_pedido=None):
+        self.nome = nome  # como aparece no chat/log da batalha
+        self.token = token
+        self.ficha_id = ficha_id
+        self.metricas = metricas
+        self.timeout = timeout
+        self.codec_pedido = codec_pedido
+        self.cliente = socketio.AsyncClient(reconnection=False)
+        self.cliente.on('*', self._recebido)
+        self._esperas = []  # [(condicao, futuro)]
+
+    @property
+    def remetente(self):
+        return f"[Mestre] {self.nome}" if self.ficha_id is None else self.nome
+
+    async def _recebido(self, evento, *args):
+        dados = args[0] if args else None
+        if isinstance(dados, bytes):
+            dados = codec.decodificar(dados)
+        if evento in EVENTOS_DE_ERRO:
+            self.metricas.erro(evento, dados)
+        for condicao, futuro in self._esperas:
+            if not futuro.done() and condicao(evento, dados):
+                futuro.set_result(dados)
+
+    async def pedir(self, evento, dados, condicao):
+        """Emite e espera o evento que satisfaz 'condicao'. Retorna o payload dele (None = timeout)."""
+        futuro = asyncio.get_running_loop().create_future()
+        espera = (condicao, futuro)
+        self._esperas.append(espera)  # antes do emit: a resposta pode chegar antes do await voltar
+        inicio = time.perf_counter()
+        try:
+            await self.cliente.emit(evento, dados)
+            resposta = await asyncio.wait_for(futuro, self.timeout)
+        except (asyncio.TimeoutError, socketio.exceptions.SocketIOError):
+            self.metricas.timeout(evento)
+            return None
+        finally:
+            self._esperas.remove(espera)
+        self.metricas.latencia(evento, time.perf_counter() - inicio)
+        return resposta
+
+    async def entrar(self, url, sala_id):
+        inicio = time.perf_counter()
+        try:
+            await self.cliente.connect(url, transports=['websocket'], wait_timeout=self.timeout)
+        except socketio.exceptions.ConnectionError as e:
+            self.metricas.timeout('connect')
+            self.metricas.exemplos.setdefault('connect', str(e))
+            return False
+        self.metricas.latencia('connect', time.perf_counter() - inicio)
+        pedido = {'token': self.token, 'sala_id': sala_id, 'ficha_id': self.ficha_id}
+        if self.codec_pedido:
+            pedido['codec'] = self.codec_pedido
+        resposta = await self.pedir('join_room', pedido, lambda e, d: e in ('status_mestre', 'join_error'))
+        return resposta is not None and 'mensagem' not in resposta
+
+    async def sair(self):
+        if self.cliente.connected:
+            await self.cliente.disconnect()
+
+
+def _log_da_batalha(dados):
+    """Log da batalha de um batalha_atualizada (o público basta para achar a ação)."""
+    return ((dados or {}).get('batalha') or {}).get('log') or []
+
+
+# --- Roteiro de uma sala ---
+
+async def _conversar(p, sala_id, mensagens, rolagens, pausa):
+    for k in range(max(mensagens, rolagens)):
+        if k < mensagens:
+            marca = f"carga {p.nome} #{k}"
+            await p.pedir('send_message', {'sala_id': sala_id, 'message': marca},
+                          lambda e, d: e == 'message' and isinstance(d, str) and d.endswith(': ' + marca))
+            await asyncio.sleep(pausa)
+        if k < rolagens:
+            prefixo = f"🎲 [{p.remetente}] rolou 1d20 "
+            await p.pedir('roll_dice', {'sala_id': sala_id, 'command': '1d20'},
+                          lambda e, d: e == 'message' and isinstance(d, str) and d.startswith(prefixo))
+            await asyncio.sleep(pausa)
+
+
+async def _dar_xp(mestre, jogadores, sala_id, pausa):
+    for j in jogadores:
+        await mestre.pedir('mestre_dar_xp',
+                           {'token': mestre.token, 'sala_id': sala_id, 'alvo_id': str(j.ficha_id), 'quantidade': 10},
+                           lambda e, d, ficha_id=j.ficha_id: e == 'ficha_atualizada' and d.get('id') == ficha_id)
+        await asyncio.sleep(pausa)
+
+
+async def _batalhar(mestre, jogadores, sala_id, monstros_ids, ataques, pausa, sorteio):
+    base = {'token': mestre.token, 'sala_id': sala_id}
+    iniciada = await mestre.pedir('batalha_iniciar', dict(base, monstros_ids=monstros_ids),
+                                  lambda e, d: e == 'batalha_iniciada')
+    if iniciada is None:
+        return
+    monstros = [m['id'] for m in iniciada['batalha']['monstros']]
+
+    async def iniciativa(j, valor):
+        linha = f"🎲 {j.nome} rolou {valor} de iniciativa!"
+        await j.pedir('batalha_player_iniciativa', {'token': j.token, 'sala_id': sala_id, 'valor': valor},
+                      lambda e, d: e == 'batalha_atualizada' and linha in _log_da_batalha(d))
+    await asyncio.gather(*(iniciativa(j, sorteio.randint(1, 20)) for j in jogadores))
+    await asyncio.sleep(pausa)
+
+    await mestre.pedir('batalha_comecar_combate', base,
+                       lambda e, d: e == 'batalha_atualizada' and d['batalha']['fase'] == 'combate')
+    await asyncio.sleep(pausa)
+
+    for n in range(ataques if monstros and jogadores else 0):
+        jogador = jogadores[n % len(jogadores)]
+        monstro = monstros[n % len(monstros)]
+        if n % 2 == 0:  # jogador ataca um monstro (HP só muda quando é o mestre)
+            quem, atacante, alvo = jogador, jogador.ficha_id, monstro
+        else:           # o mestre move o monstro contra um jogador
+            quem, atacante, alvo = mestre, monstro, jogador.ficha_id
+        marca = f"carga-{n}"
+        await quem.pedir('batalha_atacar', {'token': quem.token, 'sala_id': sala_id, 'atacante_id': str(atacante),
+                                            'alvo_id': str(alvo), 'dano': 1, 'rolagem': marca},
+                         lambda e, d: e == 'batalha_atualizada'
+                         and any(f": {marca} (" in linha for linha in _log_da_batalha(d)[-3:]))
+        await asyncio.sleep(pausa)
+
+    await mestre.pedir('batalha_encerrar', dict(base, motivo='vitoria'), lambda e, d: e == 'batalha_encerrada')
+
+
+async def _mesa(url, mesa, monstros_ids, args, metricas, atraso):
+    await asyncio.sleep(atraso)
+    sala_id = mesa['sala_id']
+    mestre, jogadores = mesa['mestre'], mesa['jogadores']
+    todos = [mestre] + jogadores
+    try:
+        entraram = await asyncio.gather(*(p.entrar(url, sala_id) for p in todos))
+        if not all(entraram):
+            return
+        sorteio = random.Random(sala_id)
+        for _ in range(args.rodadas):
+            await asyncio.gather(*(_conversar(p, sala_id, args.mensagens, args.rolagens, args.pausa) for p in todos))
+            await _dar_xp(mestre, jogadores, sala_id, args.pausa)
+            await _batalhar(mestre, jogadores, sala_id, monstros_ids, args.ataques, args.pausa, sorteio)
+    finally:
+        await asyncio.gather(*(p.sair() for p in todos), return_exceptions=True)
+
+
+async def _amostrar(pid, intervalo, amostras, parar):
+    inicio = time.monotonic()
+    while not parar.is_set():
+        memoria_mb, threads = _uso_do_processo(pid)
+        amostras.append((round(time.monotonic() - inicio, 1), memoria_mb, threads))
+        try:
+            await asyncio.wait_for(parar.wait(), intervalo)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _rodar(url, mesas, monstros_ids, args, metricas, pid):
+    amostras, parar = [], asyncio.Event()
+    amostrador = asyncio.create_task(_amostrar(pid, args.amostragem, amostras, parar))
+    inicio = time.perf_counter()
+    # Salas entram espalhadas ao longo de --rampa segundos (não todas no mesmo milissegundo)
+    await asyncio.gather(*(_mesa(url, mesa, monstros_ids, args, metricas, args.rampa * i / len(mesas))
+                           for i, mesa in enumerate(mesas)))
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await amostrador
+    amostras.append((round(duracao, 1),) + _uso_do_processo(pid))
+    return duracao, amostras
+
+
+# --- Preparação ---
+
+def _preparar_mesas(pasta, salas, jogadores, monstros):
+    """Copia o banco e cria mestre, sala, jogadores e fichas de cada mesa. Retorna (caminho, mesas, monstros_ids)."""
+    destino = os.path.join(pasta, 'campanhas.db')
+    shutil.copyfile(BANCO_ORIGINAL, destino)
+    conn = sqlite3.connect(destino)
+    cur = conn.cursor()
+    mesas = []
+    for s in range(salas):
+        cur.execute("INSERT INTO usuarios (nome_usuario, senha_hash, role) VALUES (?, 'x', 'mestre')",
+                    (f"carga_mestre_{s}",))
+        mestre = (cur.lastrowid, f"carga_mestre_{s}")
+        cur.execute("INSERT INTO salas (nome, mestre_id) VALUES (?, ?)", (f"carga_sala_{s}", mestre[0]))
+        mesa = {'sala_id': cur.lastrowid, 'mestre': mestre, 'jogadores': []}
+        for j in range(jogadores):
+            cur.execute("INSERT INTO usuarios (nome_usuario, senha_hash, role) VALUES (?, 'x', 'player')",
+                        (f"carga_jogador_{s}_{j}",))
+            usuario_id = cur.lastrowid
+            cur.execute(
+                "INSERT INTO fichas_personagem (usuario_id, nome_personagem, classe, atributos_json, pericias_json) "
+                "VALUES (?, ?, 'Guerreiro', '{}', '[]')", (usuario_id, f"Heroi {s}-{j}"))
+            mesa['jogadores'].append((usuario_id, f"carga_jogador_{s}_{j}", cur.lastrowid, f"Heroi {s}-{j}"))
+        mesas.append(mesa)
+    monstros_ids = [linha[0] for linha in cur.execute("SELECT id FROM monstros_base ORDER BY id LIMIT ?", (monstros,))]
+    conn.commit()
+    conn.close()
+    return destino, mesas, monstros_ids
+
+
+def _criar_participantes(mesas, metricas, args):
+    from backend.servidor.servidor_api import app  # só para assinar os tokens com a mesma chave
+    validade = datetime.now(timezone.utc) + timedelta(hours=2)
+
+    def token(usuario_id, nome, role):
+        return jwt.encode({'sub': str(usuario_id), 'name': nome, 'role': role, 'exp': validade},
+                          app.config['SECRET_KEY'], algorithm='HS256')
+
+    for mesa in mesas:
+        mestre_id, mestre_nome = mesa['mestre']
+        mesa['mestre'] = Participante(mestre_nome, token(mestre_id, mestre_nome, 'mestre'), None,
+                                      metricas, args.timeout, args.codec)
+        mesa['jogadores'] = [Participante(personagem, token(usuario_id, nome, 'player'), ficha_id,
+                                          metricas, args.timeout, args.codec)
+                             for usuario_id, nome, ficha_id, personagem in mesa['jogadores']]
+
+
+# --- Relatório ---
+
+def _linha_do_tempo(amostras, linhas=12):
+    """Até 'linhas' amostras espaçadas, sempre com a primeira, a de pico e a última."""
+    if len(amostras) <= linhas:
+        return amostras
+    passo = (len(amostras) - 1) / (linhas - 1)
+    escolhidas = {round(i * passo) for i in range(linhas)}
+    medidas = [a for a in amostras if a[1] is not None]
+    if medidas:
+        escolhidas.add(amostras.index(max(medidas, key=lambda a: a[1])))
+    return [amostras[i] for i in sorted(escolhidas)]
+
+
+def _imprimir(resultado):
+    print(f"\n{resultado['salas']} salas x (1 mestre + {resultado['jogadores_por_sala']} jogadores), "
+          f"modo {resultado['modo']}, codec {resultado['codec'] or 'json'}: {resultado['duracao_s']} s, "
+          f"{resultado['acoes']} ações ({resultado['acoes_por_s']}/s)\n")
+    print(f"{'evento':28}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'timeouts':>10}")
+    for linha in resultado['latencias']:
+        print(f"{linha['evento']:28}{linha['n']:>7}{linha['p50_ms']:>10}{linha['p95_ms']:>10}"
+              f"{linha['p99_ms']:>10}{linha['max_ms']:>10}{linha['timeouts']:>10}")
+
+    print("\nerros mandados pelo servidor:" if resultado['erros_servidor'] else "\nnenhum evento de erro do servidor")
+    for evento, n in resultado['erros_servidor'].items():
+        print(f"  {evento:26}{n:>7}  ex: {resultado['exemplos_erro'][evento]}")
+
+    print(f"\n{'t (s)':>8}{'memória (MB)':>15}{'threads':>9}   servidor ao longo do teste")
+    for t, memoria_mb, threads in _linha_do_tempo(resultado['memoria']):
+        print(f"{t:>8}{memoria_mb if memoria_mb is None else round(memoria_mb, 1):>15}{str(threads):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de Socket.IO com salas de mestre + jogadores jogando ao mesmo tempo.")
+    parser.add_argument('--salas', type=int, default=20)
+    parser.add_argument('--jogadores', type=int, default=4, help="jogadores por sala (além do mestre)")
+    parser.add_argument('--rodadas', type=int, default=2, help="repetições do roteiro chat/XP/batalha")
+    parser.add_argument('--mensagens', type=int, default=5, help="mensagens de chat por participante e rodada")
+    parser.add_argument('--rolagens', type=int, default=3, help="rolagens de dado por participante e rodada")
+    parser.add_argument('--ataques', type=int, default=8, help="ataques por batalha")
+    parser.add_argument('--monstros', type=int, default=3, help="monstros do bestiário em cada batalha")
+    parser.add_argument('--pausa', type=float, default=1.0, help="segundos entre ações do mesmo participante")
+    parser.add_argument('--rampa', type=float, default=2.0, help="segundos para todas as salas começarem")
+    parser.add_argument('--modo', default='threading', help="RPG_ASYNC_MODE do servidor")
+    parser.add_argument('--codec', choices=[codec.MSGPACK], help="clientes pedem o codec binário")
+    parser.add_argument('--amostragem', type=float, default=1.0, help="segundos entre amostras de memória")
+    parser.add_argument('--timeout', type=float, default=15.0, help="segundos esperando cada resposta")
+    parser.add_argument('--json', help="grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("aiohttp não instalado (o socketio.AsyncClient precisa dele): pip install aiohttp")
+        sys.exit(1)
+    if args.codec and codec.msgpack is None:
+        print("msgpack não instalado: pip install msgpack")
+        sys.exit(1)
+    if BACKEND not in sys.path:
+        sys.path.insert(0, BACKEND)
+
+    # Cada participante é uma conexão (um arquivo aberto) neste processo.
+    try:
+        import resource
+        atual, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+        conexoes = args.salas * (args.jogadores + 1)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(maximo, max(atual, conexoes * 2 + 256)), maximo))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    pasta = tempfile.mkdtemp(prefix='carga_mesas_')
+    banco, mesas, monstros_ids = _preparar_mesas(pasta, args.salas, args.jogadores, args.monstros)
+    metricas = Metricas()
+    _criar_participantes(mesas, metricas, args)
+    porta = _porta_livre()
+    log = open(os.path.join(pasta, 'servidor.log'), 'w')
+    extra = {'RPG_CODECS': args.codec} if args.codec else {}
+    print(f"{args.modo}: subindo o servidor e abrindo {args.salas * (args.jogadores + 1)} conexões "
+          f"({args.salas} salas)...")
+    processo = _subir_servidor(args.modo, banco, porta, log, **extra)
+    try:
+        duracao, amostras = asyncio.run(_rodar(f"http://127.0.0.1:{porta}", mesas, monstros_ids,
+                                               args, metricas, processo.pid))
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+        log.close()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    acoes = sum(len(v) for v in metricas.latencias.values())
+    resultado = {
+        'modo': args.modo, 'codec': args.codec, 'salas': args.salas, 'jogadores_por_sala': args.jogadores,
+        'duracao_s': round(duracao, 1), 'acoes': acoes, 'acoes_por_s': round(acoes / duracao, 1) if duracao else 0,
+        'latencias': metricas.tabela(),
+        'erros_servidor': dict(metricas.erros_servidor),
+        'exemplos_erro': {k: str(v)[:120] for k, v in metricas.exemplos.items()},
+        'memoria': amostras,
+    }
+    _imprimir(resultado)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
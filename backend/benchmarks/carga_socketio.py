@@ -0,0 +1,330 @@
+# benchmarks/carga_socketio.py
+"""
+Teste de carga do Socket.IO em cada modo de execução (RPG_ASYNC_MODE, ver servidor/execucao.py).
+
+Para cada modo: copia o banco para uma pasta temporária (RPG_DB_PATH), cria um mestre,
+um jogador, uma ficha e as salas do teste, sobe `python -m backend.servidor` numa porta
+livre e abre N conexões Socket.IO ao mesmo tempo. Cada cliente entra numa sala
+(join_room) e depois manda mensagens de chat (send_message) em sequência, esperando o
+eco de cada uma antes da próxima. Mede:
+  - conexões simultâneas que conseguiram entrar e o tempo de conexão/entrada;
+  - eventos por segundo, entregas por segundo (cada mensagem vai para a sala inteira)
+    e latência (p50/p95/p99) entre enviar e receber o próprio eco;
+  - memória e threads do processo do servidor (Linux, via /proc).
+
+O cliente fala o protocolo Engine.IO 4 / Socket.IO 5 direto sobre o simple-websocket
+(já instalado com o Flask-SocketIO), então não precisa de nenhum pacote a mais.
+Modos cujo pacote (eventlet/gevent) não estiver instalado são pulados.
+
+Execute a partir da raiz do projeto:
+    python -m backend.benchmarks.carga_socketio
+    python -m backend.benchmarks.carga_socketio --modos threading,eventlet --conexoes 500 --mensagens 50
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import simple_websocket
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND = os.path.join(RAIZ, 'backend')
+BANCO_ORIGINAL = os.path.join(BACKEND, 'database', 'campanhas.db')
+
+
+# --- Cliente Socket.IO mínimo ---
+
+class ClienteSocketIO:
+    """
+    Uma conexão falando Engine.IO 4 / Socket.IO 5 (só o necessário para o teste).
+
+    Abre como o socket.io-client do navegador: primeiro um GET de polling (recebe o sid)
+    e depois o upgrade para WebSocket ('2probe' / '3probe' / '5'). Além de ser o caminho
+    real do frontend, evita que o pacote de abertura chegue junto com a resposta do
+    handshake do WebSocket (o simple-websocket só o leria no próximo ping, 25 s depois).
+    """
+
+    def __init__(self, endereco, timeout):
+        self.timeout = timeout
+        with urllib.request.urlopen(f"http://{endereco}/socket.io/?EIO=4&transport=polling", timeout=timeout) as r:
+            abertura = r.read().decode()
+        if not abertura.startswith('0'):
+            raise ConnectionError(f"Abertura Engine.IO inesperada: {abertura!r}")
+        sid = json.loads(abertura[1:])['sid']
+        self.ws = simple_websocket.Client(f"ws://{endereco}/socket.io/?EIO=4&transport=websocket&sid={sid}")
+        self.ws.send('2probe')
+        self.esperar(lambda pacote: pacote == '3probe', cru=True)
+        self.ws.send('5')
+        self.ws.send('40')
+        self.esperar(lambda pacote: pacote.startswith('40'), cru=True)
+
+    def emitir(self, evento, dados):
+        self.ws.send('42' + json.dumps([evento, dados], separators=(',', ':')))
+
+    def esperar(self, condicao, cru=False):
+        """Lê pacotes até 'condicao' aceitar um (responde aos pings no caminho)."""
+        limite = time.monotonic() + self.timeout
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise TimeoutError("Tempo esgotado esperando resposta do servidor.")
+            pacote = self.ws.receive(timeout=restante)
+            if pacote is None:
+                continue
+            if pacote == '2':
+                self.ws.send('3')
+                continue
+            if cru:
+                if condicao(pacote):
+                    return pacote
+            elif pacote.startswith('42'):
+                evento, *args = json.loads(pacote[2:])
+                if condicao(evento, args[0] if args else None):
+                    return evento, args[0] if args else None
+
+    def coletar(self, silencio=1.0):
+        """Todos os eventos recebidos até o servidor ficar 'silencio' segundos sem mandar nada."""
+        eventos = []
+        while True:
+            pacote = self.ws.receive(timeout=silencio)
+            if pacote is None:
+                return eventos
+            if pacote == '2':
+                self.ws.send('3')
+            elif pacote.startswith('42'):
+                evento, *args = json.loads(pacote[2:])
+                eventos.append((evento, args[0] if args else None))
+
+    def fechar(self):
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+# --- Preparação do banco e do servidor ---
+
+def _preparar_banco(pasta, salas):
+    """Copia o banco e cria os usuários/salas do teste. Retorna (caminho, jogador_id, ficha_id, [sala_ids])."""
+    destino = os.path.join(pasta, 'campanhas.db')
+    shutil.copyfile(BANCO_ORIGINAL, destino)
+    conn = sqlite3.connect(destino)
+    cur = conn.cursor()
+    cur.execute("INSERT INTO usuarios (nome_usuario, senha_hash, role) VALUES ('bench_mestre', 'x', 'mestre')")
+    mestre_id = cur.lastrowid
+    cur.execute("INSERT INTO usuarios (nome_usuario, senha_hash, role) VALUES ('bench_jogador', 'x', 'player')")
+    jogador_id = cur.lastrowid
+    cur.execute(
+        "INSERT INTO fichas_personagem (usuario_id, nome_personagem, classe, atributos_json) VALUES (?, ?, ?, ?)",
+        (jogador_id, 'Bench', 'Guerreiro', '{}'))
+    ficha_id = cur.lastrowid
+    sala_ids = []
+    for i in range(salas):
+        cur.execute("INSERT INTO salas (nome, mestre_id) VALUES (?, ?)", (f"bench_sala_{i}", mestre_id))
+        sala_ids.append(cur.lastrowid)
+    conn.commit()
+    conn.close()
+    return destino, jogador_id, ficha_id, sala_ids
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _subir_servidor(modo, banco, porta, log, **extra):
+    # backend/ no PYTHONPATH: o db_manager importa 'core.*' de forma absoluta.
+    caminhos = os.pathsep.join(filter(None, [BACKEND, os.environ.get('PYTHONPATH')]))
+    ambiente = dict(os.environ, PYTHONPATH=caminhos, RPG_ASYNC_MODE=modo, RPG_DB_PATH=banco, RPG_PORTA=str(porta),
+                    RPG_HOST='127.0.0.1', RPG_DEBUG='0', RPG_LOG_LEVEL='WARNING', **extra)
+    processo = subprocess.Popen([sys.executable, '-m', 'backend.servidor'], cwd=RAIZ, env=ambiente,
+                                stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{porta}/socket.io/?EIO=4&transport=polling"
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"Servidor ({modo}) terminou ao iniciar; veja {log.name}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resposta:
+                if resposta.status == 200:
+                    return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f"Servidor ({modo}) não respondeu em 60 s; veja {log.name}")
+
+
+def _uso_do_processo(pid):
+    """(memória residente em MB, número de threads) via /proc; (None, None) fora do Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            campos = dict(linha.split(':', 1) for linha in f if ':' in linha)
+        return int(campos['VmRSS'].split()[0]) / 1024, int(campos['Threads'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
+
+
+# --- Um cliente do teste ---
+
+def _cliente(indice, endereco, token, ficha_id, sala_id, mensagens, timeout, largada, resultados):
+    resultado = resultados[indice] = {'ok': False, 'latencias': []}
+    cliente = None
+    try:
+        inicio = time.perf_counter()
+        cliente = ClienteSocketIO(endereco, timeout)
+        resultado['conexao'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        cliente.emitir('join_room', {'token': token, 'sala_id': sala_id, 'ficha_id': ficha_id})
+        evento, dados = cliente.esperar(lambda e, d: e in ('status_mestre', 'join_error'))
+        if evento == 'join_error':
+            raise RuntimeError(f"join_error: {dados}")
+        resultado['entrada'] = time.perf_counter() - inicio
+        resultado['ok'] = True
+
+        largada.wait()  # todos mandam ao mesmo tempo
+        for seq in range(mensagens):
+            marca = f"b{indice}-{seq}"
+            inicio = time.perf_counter()
+            cliente.emitir('send_message', {'sala_id': sala_id, 'message': marca})
+            cliente.esperar(lambda e, d: e == 'message' and isinstance(d, str) and d.endswith(': ' + marca))
+            resultado['latencias'].append(time.perf_counter() - inicio)
+    except Exception as e:
+        resultado['erro'] = f"{type(e).__name__}: {e}"
+        if not resultado['ok']:
+            largada.wait()  # não segura os outros
+    finally:
+        resultado['cliente'] = cliente
+
+
+def medir_modo(modo, conexoes, por_sala, mensagens, timeout):
+    pasta = tempfile.mkdtemp(prefix=f'carga_{modo}_')
+    salas = max(1, -(-conexoes // por_sala))
+    banco, jogador_id, ficha_id, sala_ids = _preparar_banco(pasta, salas)
+    porta = _porta_livre()
+    log = open(os.path.join(pasta, 'servidor.log'), 'w')
+    processo = _subir_servidor(modo, banco, porta, log)
+    try:
+        if BACKEND not in sys.path:
+            sys.path.insert(0, BACKEND)
+        from backend.servidor.servidor_api import app  # só para assinar o token com a mesma chave
+        token = jwt.encode({
+            'sub': str(jogador_id), 'name': 'bench_jogador', 'role': 'player',
+            'exp': datetime.now(timezone.utc) + timedelta(hours=1),
+        }, app.config['SECRET_KEY'], algorithm='HS256')
+
+        endereco = f"127.0.0.1:{porta}"
+        resultados = [None] * conexoes
+        # +1: a thread principal também passa pela largada (depois que todos conectaram)
+        largada = threading.Barrier(conexoes + 1)
+        threads = [threading.Thread(target=_cliente, daemon=True, args=(
+            i, endereco, token, ficha_id, sala_ids[i // por_sala], mensagens, timeout, largada, resultados))
+            for i in range(conexoes)]
+        inicio_conexoes = time.perf_counter()
+        for t in threads:
+            t.start()
+        largada.wait()
+        tempo_conexoes = time.perf_counter() - inicio_conexoes
+        memoria_mb, threads_servidor = _uso_do_processo(processo.pid)
+
+        inicio = time.perf_counter()
+        for t in threads:
+            t.join()
+        duracao = time.perf_counter() - inicio
+
+        conectados = [r for r in resultados if r['ok']]
+        latencias = [l for r in conectados for l in r['latencias']]
+        erros = [r['erro'] for r in resultados if 'erro' in r]
+        for r in resultados:
+            if r.get('cliente'):
+                r['cliente'].fechar()
+        return {
+            'modo': modo,
+            'conexoes_pedidas': conexoes,
+            'conexoes_ok': len(conectados),
+            'tempo_para_conectar_todos_s': round(tempo_conexoes, 3),
+            'conexao_p95_ms': round(_percentil([r['conexao'] for r in conectados], 95) * 1000, 1),
+            'conexao_max_ms': round(_percentil([r['conexao'] for r in conectados], 100) * 1000, 1),
+            'entrada_p95_ms': round(_percentil([r['entrada'] for r in conectados], 95) * 1000, 1),
+            'eventos': len(latencias),
+            'eventos_por_s': round(len(latencias) / duracao, 1) if duracao else 0,
+            'entregas_por_s': round(len(latencias) * min(por_sala, conexoes) / duracao, 1) if duracao else 0,
+            'latencia_p50_ms': round(_percentil(latencias, 50) * 1000, 2),
+            'latencia_p95_ms': round(_percentil(latencias, 95) * 1000, 2),
+            'latencia_p99_ms': round(_percentil(latencias, 99) * 1000, 2),
+            'latencia_media_ms': round(statistics.fmean(latencias) * 1000, 2) if latencias else 0,
+            'servidor_memoria_mb': round(memoria_mb, 1) if memoria_mb else None,
+            'servidor_threads': threads_servidor,
+            'erros': len(erros),
+            'exemplo_erro': erros[0] if erros else None,
+        }
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+        log.close()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de Socket.IO por modo de execução (RPG_ASYNC_MODE).")
+    parser.add_argument('--modos', default='threading,eventlet,gevent')
+    parser.add_argument('--conexoes', type=int, default=200, help="conexões WebSocket simultâneas")
+    parser.add_argument('--por-sala', type=int, default=5, help="clientes por sala (cada mensagem vai para a sala toda)")
+    parser.add_argument('--mensagens', type=int, default=20, help="mensagens de chat por cliente")
+    parser.add_argument('--timeout', type=float, default=30.0, help="segundos esperando cada resposta")
+    parser.add_argument('--json', help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    # O cliente usa muitas threads; garante limite de arquivos suficiente (Linux/macOS).
+    try:
+        import resource
+        atual, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(maximo, max(atual, args.conexoes * 4 + 256)), maximo))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    resultados = []
+    for modo in [m.strip() for m in args.modos.split(',') if m.strip()]:
+        if modo != 'threading' and importlib.util.find_spec(modo) is None:
+            print(f"{modo}: pacote não instalado, pulando.")
+            continue
+        print(f"{modo}: {args.conexoes} conexões, {args.por_sala} por sala, {args.mensagens} mensagens cada...")
+        resultados.append(medir_modo(modo, args.conexoes, args.por_sala, args.mensagens, args.timeout))
+
+    colunas = [k for k in (resultados[0] if resultados else {}) if k not in ('modo', 'exemplo_erro')]
+    print(f"\n{'':30}" + ''.join(f"{r['modo']:>14}" for r in resultados))
+    for coluna in colunas:
+        print(f"{coluna:30}" + ''.join(f"{str(r[coluna]):>14}" for r in resultados))
+    for r in resultados:
+        if r['exemplo_erro']:
+            print(f"\n{r['modo']}: {r['erros']} erro(s), ex: {r['exemplo_erro']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
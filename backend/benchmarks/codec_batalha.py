@@ -0,0 +1,97 @@
+# benchmarks/codec_batalha.py
+"""
+Compara JSON e msgpack (servidor/codec.py) no evento 'batalha_atualizada' de uma batalha
+com 30 combatentes (20 monstros + 10 jogadores, 60 linhas de log): tempo para codificar e
+bytes no fio (o pacote Socket.IO inteiro, como o servidor monta, incluindo o anexo binário).
+
+Requer 'pip install msgpack'. Execute a partir da raiz do projeto:
+    python -m backend.benchmarks.codec_batalha [monstros jogadores]
+"""
+import json
+import sys
+import timeit
+
+from socketio import packet
+
+from backend.core.combatentes import JogadorBatalha, MonstroBatalha
+from backend.servidor import codec
+
+REPETICOES = 500
+RODADAS = 5  # vale a melhor rodada (menos ruído de outros processos)
+
+
+def _batalha(n_monstros, n_jogadores):
+    monstros = [MonstroBatalha(id=f"m_{700 + i}_{i}", db_id=700 + i, nome=f"Goblin Chefe {i}",
+                               tipo='Humanoid', hp_max=45, hp_atual=30 + i, ca=15, iniciativa=i % 20)
+                for i in range(n_monstros)]
+    jogadores = [JogadorBatalha(sid=f"Q-KDwvY76pApdpr{i:05d}", ficha_id=str(100 + i), nome=f"Aventureiro {i}",
+                                hp_atual=12, acoes_restantes=1, acoes_max=2, iniciativa=(i * 7) % 20)
+                 for i in range(n_jogadores)]
+    b = {
+        'fase': 'combate', 'sub_fase': 'aguardando_d20_acerto',
+        'dado_dano_atual': None, 'alvo_dano_atual': None, 'd20_acerto_atual': 14,
+        'monstros': monstros, 'jogadores': jogadores,
+        'turno_ordem': [m.id for m in monstros] + [j.ficha_id for j in jogadores],
+        'turno_atual': 3,
+        'log': [f"⚔️ Goblin Chefe {i % n_monstros} atacou Aventureiro {i % n_jogadores}:  ({i % 9 + 1} dano)"
+                for i in range(60)],
+        'acoes_padrao': 1,
+    }
+    return b
+
+
+def _payload(b):
+    # Mesmo formato do servidor (_batalha_publica / _batalha_mestre)
+    publica = {
+        'fase': b['fase'], 'sub_fase': b['sub_fase'], 'dado_dano_atual': b['dado_dano_atual'],
+        'alvo_dano_atual': b['alvo_dano_atual'], 'd20_acerto_atual': b['d20_acerto_atual'],
+        'monstros': [{'id': m.id, 'nome': m.nome, 'tipo': m.tipo, 'status': m.status, 'ca': m.ca,
+                      'hp_oculto': m.status == 'vivo'} for m in b['monstros']],
+        'jogadores': [j.to_dict() for j in b['jogadores']],
+        'turno_ordem': b['turno_ordem'], 'turno_atual': b['turno_atual'], 'log': b['log'],
+    }
+    mestre = dict(b, monstros=[m.to_dict() for m in b['monstros']], jogadores=[j.to_dict() for j in b['jogadores']])
+    return {'batalha': publica, 'batalha_mestre': mestre}
+
+
+def _bytes_no_fio(payload, seq):
+    codificado = packet.Packet(packet.EVENT, data=['batalha_atualizada', payload, seq]).encode()
+    if isinstance(codificado, list):  # pacote com anexos binários: texto + cada anexo
+        return sum(len(p if isinstance(p, bytes) else p.encode('utf-8')) for p in codificado)
+    return len(codificado.encode('utf-8'))
+
+
+def _medir(funcao, dados):
+    return min(timeit.repeat(lambda: funcao(dados), number=REPETICOES, repeat=RODADAS)) / REPETICOES * 1e6
+
+
+def main():
+    if codec.msgpack is None:
+        print("msgpack não instalado: pip install msgpack")
+        sys.exit(1)
+    n_monstros, n_jogadores = (int(a) for a in sys.argv[1:3]) if len(sys.argv) > 2 else (20, 10)
+    payload = _payload(_batalha(n_monstros, n_jogadores))
+    seq = 1792419678442
+
+    casos = [
+        ("JSON (atual)", lambda d: json.dumps(d, separators=(',', ':'))),
+        ("msgpack, chaves por extenso", lambda d: codec.msgpack.packb(d, use_bin_type=True)),
+        ("msgpack + dicionário (codec.py)", codec.codificar),
+    ]
+    assert codec.decodificar(codec.codificar(payload)) == payload
+
+    print(f"batalha_atualizada com {n_monstros + n_jogadores} combatentes ({n_monstros} monstros, "
+          f"{n_jogadores} jogadores), {len(payload['batalha']['log'])} linhas de log\n")
+    print(f"{'formato':34} {'codificar (µs)':>15} {'payload (B)':>12} {'no fio (B)':>11}")
+    base = None
+    for nome, funcao in casos:
+        tempo = _medir(funcao, payload)
+        saida = funcao(payload)
+        tamanho = len(saida.encode('utf-8') if isinstance(saida, str) else saida)
+        fio = _bytes_no_fio(payload if nome.startswith('JSON') else saida, seq)
+        base = base or fio
+        print(f"{nome:34} {tempo:15.1f} {tamanho:12d} {fio:11d}  ({fio / base:.0%})")
+
+
+if __name__ == '__main__':
+    main()
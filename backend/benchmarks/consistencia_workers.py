@@ -0,0 +1,216 @@
+# benchmarks/consistencia_workers.py
+"""
+Verificação de consistência com vários workers (estado.py + barramento.py).
+
+Sobe 4 processos do servidor (--workers; portas diferentes) compartilhando o estado e o barramento
+num arquivo SQLite temporário (RPG_ESTADO / RPG_MESSAGE_QUEUE). O mestre entra pelo
+worker 0 e três jogadores pelos workers 1 a 3; a batalha começa no worker 0 e, depois,
+quatro conexões do mestre (distribuídas entre os workers) mandam ataques ao mesmo monstro ao mesmo tempo.
+
+Confere que:
+  - todos veem a mesma lista de jogadores, na mesma versão e sem deltas perdidos (presença compartilhada);
+  - a batalha iniciada num worker chega aos jogadores dos outros;
+  - nenhum ataque se perde: HP final = HP inicial - total de dano, e o log tem todos;
+  - cada cliente recebe cada atualização exatamente uma vez e todos terminam no mesmo estado.
+
+Execute a partir da raiz do projeto (sai com código 1 se algo falhar):
+    python -m backend.benchmarks.consistencia_workers
+    python -m backend.benchmarks.consistencia_workers --modo eventlet --ataques 100
+    python -m backend.benchmarks.consistencia_workers --workers 1   # ordem no executor da sala, um processo
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+from .carga_socketio import BACKEND, ClienteSocketIO, _porta_livre, _preparar_banco, _subir_servidor
+
+ATACANTES = 4      # conexões do mestre atacando ao mesmo tempo (distribuídas entre os workers)
+MONSTRO_ID = 723  # Tarrasque (676 de HP): aguenta os ataques sem morrer
+
+
+def _token(segredo, usuario_id, nome, role):
+    return jwt.encode({'sub': str(usuario_id), 'name': nome, 'role': role,
+                       'exp': datetime.now(timezone.utc) + timedelta(hours=1)}, segredo, algorithm='HS256')
+
+
+def _ultimo(eventos, nome):
+    return next((dados for evento, dados in reversed(eventos) if evento == nome), None)
+
+
+def _aplicar_presenca(presenca, eventos):
+    """Aplica presence_snapshot/join/leave/update como a SalaPage. Retorna quantos deltas vieram fora de sequência."""
+    furos = 0
+    for evento, dados in eventos:
+        if evento == 'presence_snapshot':
+            presenca['versao'] = dados['versao']
+            presenca['jogadores'] = {j['sid']: j for j in dados['jogadores']}
+        elif evento in ('presence_join', 'presence_leave', 'presence_update'):
+            # Sem versão: a lista do join_room ainda vai chegar (com vários workers, um delta de
+            # antes da entrada pode chegar pelo barramento depois que o sid já está na sala).
+            if presenca['versao'] is None or dados['versao'] <= presenca['versao']:
+                continue
+            if dados['versao'] != presenca['versao'] + 1:
+                furos += 1
+                continue
+            presenca['versao'] = dados['versao']
+            if evento == 'presence_join':
+                presenca['jogadores'][dados['sid']] = dict(dados['jogador'], sid=dados['sid'])
+            elif evento == 'presence_leave':
+                presenca['jogadores'].pop(dados['sid'], None)
+            elif dados['sid'] in presenca['jogadores']:
+                presenca['jogadores'][dados['sid']].update(dados['campos'])
+    return furos
+
+
+def verificar(modo, ataques_por_conexao, timeout, workers=4):
+    pasta = tempfile.mkdtemp(prefix='workers_')
+    banco, jogador_id, ficha_id, (sala_id,) = _preparar_banco(pasta, 1)
+    with sqlite3.connect(banco) as conn:
+        mestre_id = conn.execute("SELECT id FROM usuarios WHERE nome_usuario='bench_mestre'").fetchone()[0]
+        fichas = [ficha_id] + [conn.execute(
+            "INSERT INTO fichas_personagem (usuario_id, nome_personagem, classe, atributos_json) VALUES (?, ?, ?, ?)",
+            (jogador_id, f'Bench {i}', 'Guerreiro', '{}')).lastrowid for i in (2, 3)]
+        hp_inicial = conn.execute("SELECT vida_maxima FROM monstros_base WHERE id=?", (MONSTRO_ID,)).fetchone()[0]
+
+    url_estado = 'sqlite:///' + os.path.join(pasta, 'estado.db')
+    portas = [_porta_livre() for _ in range(workers)]
+    logs = [open(os.path.join(pasta, f'worker{i}.log'), 'w') for i in range(workers)]
+    processos = []
+    falhas = []
+    clientes = []
+    try:
+        for porta, log in zip(portas, logs):
+            processos.append(_subir_servidor(modo, banco, porta, log,
+                                             RPG_ESTADO=url_estado, RPG_MESSAGE_QUEUE=url_estado))
+        if BACKEND not in sys.path:
+            sys.path.insert(0, BACKEND)
+        from backend.servidor.servidor_api import app  # só para assinar os tokens com a mesma chave
+        segredo = app.config['SECRET_KEY']
+        token_mestre = _token(segredo, mestre_id, 'bench_mestre', 'mestre')
+        token_jogador = _token(segredo, jogador_id, 'bench_jogador', 'player')
+
+        def conectar(indice_worker):
+            cliente = ClienteSocketIO(f"127.0.0.1:{portas[indice_worker]}", timeout)
+            clientes.append(cliente)
+            return cliente
+
+        # 1. Presença: mestre no worker 0, jogadores nos seguintes
+        mestre = conectar(0)
+        mestre.emitir('join_room', {'token': token_mestre, 'sala_id': sala_id})
+        mestre.esperar(lambda e, d: e == 'status_mestre')
+        jogadores = []
+        for i, ficha in enumerate(fichas, start=1):
+            jogador = conectar(i % workers)
+            jogador.emitir('join_room', {'token': token_jogador, 'sala_id': sala_id, 'ficha_id': ficha})
+            jogador.esperar(lambda e, d: e == 'status_mestre')
+            jogadores.append(jogador)
+        sala = [mestre] + jogadores
+        versoes = set()
+        for i, cliente in enumerate(sala):
+            presenca = {'versao': None, 'jogadores': {}}
+            furos = _aplicar_presenca(presenca, cliente.coletar())
+            versoes.add(presenca['versao'])
+            if len(presenca['jogadores']) != 1 + len(fichas):
+                falhas.append(f"cliente {i}: presença com {len(presenca['jogadores'])} em vez de {1 + len(fichas)}")
+            if furos:
+                falhas.append(f"cliente {i}: {furos} deltas de presença fora de sequência")
+        if len(versoes) != 1:
+            falhas.append(f"clientes com versões de presença diferentes: {sorted(versoes, key=str)}")
+
+        # 2. Batalha iniciada no worker 0 chega a todos
+        mestre.emitir('batalha_iniciar', {'token': token_mestre, 'sala_id': sala_id, 'monstros_ids': [MONSTRO_ID]})
+        for i, cliente in enumerate(sala):
+            evento, dados = cliente.esperar(lambda e, d: e == 'batalha_iniciada')
+            if len(dados['batalha']['jogadores']) != len(fichas):
+                falhas.append(f"cliente {i}: batalha com {len(dados['batalha']['jogadores'])} jogadores")
+        monstro = f"m_{MONSTRO_ID}_0"
+        for jogador, valor in zip(jogadores, (15, 12, 9)):
+            jogador.emitir('batalha_player_iniciativa', {'token': token_jogador, 'sala_id': sala_id, 'valor': valor})
+        mestre.emitir('batalha_set_iniciativa', {'token': token_mestre, 'sala_id': sala_id, 'pid': monstro, 'valor': 5})
+        mestre.emitir('batalha_comecar_combate', {'token': token_mestre, 'sala_id': sala_id})
+        for cliente in sala:
+            cliente.coletar()
+
+        # 3. Ataques simultâneos por todos os workers (conexões do mestre que não entraram na sala)
+        atacantes = [conectar(i % workers) for i in range(ATACANTES)]
+        largada = threading.Barrier(ATACANTES)
+
+        def atacar(cliente):
+            largada.wait()
+            for _ in range(ataques_por_conexao):
+                cliente.emitir('batalha_atacar', {'token': token_mestre, 'sala_id': sala_id,
+                                                  'atacante_id': fichas[0], 'alvo_id': monstro, 'dano': 1})
+
+        threads = [threading.Thread(target=atacar, args=(c,)) for c in atacantes]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        total = ATACANTES * ataques_por_conexao
+        recebidos = [cliente.coletar(silencio=3.0) for cliente in sala]
+        finais = []
+        for i, eventos in enumerate(recebidos):
+            atualizacoes = [d for e, d in eventos if e == 'batalha_atualizada']
+            if len(atualizacoes) != total:
+                falhas.append(f"cliente {i}: {len(atualizacoes)} atualizações em vez de {total}")
+            if atualizacoes:
+                finais.append(atualizacoes[-1]['batalha'])
+        mestre_final = _ultimo(recebidos[0], 'batalha_atualizada')
+        if mestre_final:
+            hp = next(m['hp_atual'] for m in mestre_final['batalha_mestre']['monstros'] if m['id'] == monstro)
+            ataques_no_log = sum(1 for linha in mestre_final['batalha']['log'] if linha.startswith('⚔️ ') and 'atacou' in linha)
+            if hp != hp_inicial - total:
+                falhas.append(f"HP final {hp}, esperado {hp_inicial - total} (ataques perdidos)")
+            if ataques_no_log != total:
+                falhas.append(f"log com {ataques_no_log} ataques, esperado {total}")
+            print(f"HP do monstro: {hp_inicial} -> {hp} ({total} ataques de 1 de dano por {workers} workers)")
+        else:
+            falhas.append("mestre não recebeu nenhuma atualização dos ataques")
+        if any(final != finais[0] for final in finais):
+            falhas.append("clientes terminaram com estados de batalha diferentes")
+    finally:
+        for cliente in clientes:
+            cliente.fechar()
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            try:
+                processo.wait(timeout=10)
+            except Exception:
+                processo.kill()
+        for log in logs:
+            log.close()
+        if not falhas:
+            shutil.rmtree(pasta, ignore_errors=True)
+        else:
+            print(f"Logs dos workers em {pasta}")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consistência de presença e batalha com vários workers.")
+    parser.add_argument('--modo', default='threading', help="RPG_ASYNC_MODE dos workers")
+    parser.add_argument('--ataques', type=int, default=50, help="ataques enviados por conexão atacante")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    falhas = verificar(args.modo, args.ataques, args.timeout, args.workers)
+    if falhas:
+        print("FALHOU:")
+        for falha in falhas:
+            print(f"  - {falha}")
+        sys.exit(1)
+    print(f"OK: {args.workers} workers consistentes ({args.modo}).")
+
+
+if __name__ == '__main__':
+    main()
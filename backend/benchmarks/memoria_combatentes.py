@@ -0,0 +1,96 @@
+# benchmarks/memoria_combatentes.py
+"""
+Compara a memória ocupada por combatentes de batalha em dois formatos:
+dicionários soltos (formato antigo) e as dataclasses com slots de core/combatentes.py.
+Também compara core.Monstro e core.Personagem com e sem __slots__.
+
+Execute a partir da raiz do projeto:
+    python -m backend.benchmarks.memoria_combatentes [quantidade]
+"""
+import sys
+import tracemalloc
+
+from backend.core.combatentes import JogadorBatalha, MonstroBatalha
+from backend.core.monstro import Monstro
+from backend.core.personagem import Personagem
+
+QUANTIDADE_PADRAO = 10_000
+
+
+def _monstros_dict(n):
+    return [{
+        'id': f"m_{i}_{i}", 'db_id': i, 'nome': f"Goblin {i}", 'tipo': 'humanoid',
+        'hp_max': 7, 'hp_atual': 7, 'ca': 15, 'status': 'vivo', 'iniciativa': 0,
+    } for i in range(n)]
+
+
+def _monstros_slots(n):
+    return [MonstroBatalha(id=f"m_{i}_{i}", db_id=i, nome=f"Goblin {i}", tipo='humanoid',
+                           hp_max=7, hp_atual=7, ca=15) for i in range(n)]
+
+
+def _jogadores_dict(n):
+    return [{
+        'sid': f"sid{i}", 'ficha_id': str(i), 'nome': f"Heroi {i}", 'status': 'vivo',
+        'hp_atual': 10, 'acoes_restantes': 1, 'acoes_max': 1, 'iniciativa': 0,
+    } for i in range(n)]
+
+
+def _jogadores_slots(n):
+    return [JogadorBatalha(sid=f"sid{i}", ficha_id=str(i), nome=f"Heroi {i}") for i in range(n)]
+
+
+# "Antes": mesmas classes sem __slots__ (o __init__ é o mesmo, então cada instância ganha um __dict__).
+class _MonstroSemSlots:
+    __init__ = Monstro.__init__
+
+
+class _PersonagemSemSlots:
+    __init__ = Personagem.__init__
+
+
+def _monstros_core_dict(n):
+    return [_MonstroSemSlots(f"Goblin {i}", 7, 4, "1d6", 15, 50, 3) for i in range(n)]
+
+
+def _monstros_core(n):
+    return [Monstro(f"Goblin {i}", 7, 4, "1d6", 15, 50, 3) for i in range(n)]
+
+
+def _personagens_core_dict(n):
+    return [_PersonagemSemSlots(f"Heroi {i}", "Guerreiro") for i in range(n)]
+
+
+def _personagens_core(n):
+    return [Personagem(f"Heroi {i}", "Guerreiro") for i in range(n)]
+
+
+def medir(fabrica, n):
+    """Retorna os bytes alocados (e ainda vivos) ao construir 'n' objetos com a fábrica."""
+    tracemalloc.start()
+    inicio, _ = tracemalloc.get_traced_memory()
+    objetos = fabrica(n)
+    fim, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objetos
+    return fim - inicio
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else QUANTIDADE_PADRAO
+    casos = [
+        ("MonstroBatalha", _monstros_dict, _monstros_slots),
+        ("JogadorBatalha", _jogadores_dict, _jogadores_slots),
+        ("core.Monstro", _monstros_core_dict, _monstros_core),
+        ("core.Personagem", _personagens_core_dict, _personagens_core),
+    ]
+    print(f"--- Memória de {n} combatentes (tracemalloc) ---")
+    for nome, antes, depois in casos:
+        bytes_dict = medir(antes, n)
+        bytes_slots = medir(depois, n)
+        economia = 100 * (1 - bytes_slots / bytes_dict)
+        print(f"{nome:16} dict: {bytes_dict / 1024:9.1f} KiB | slots: {bytes_slots / 1024:9.1f} KiB | economia: {economia:5.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,18 +8,34 @@ import time
 from backend.core.rolador_de_dados import rolar_dados
 from backend.core.personagem import Personagem
 from backend.core.monstro import Monstro
-from backend.database.db_manager import buscar_detalhes_itens, buscar_detalhes_habilidades
+from backend.core.efeitos import aplicar_efeitos, processar_efeitos_ativos
 
 def calcular_modificador(valor_atributo: int) -> int:
     """Calcula o modificador de um atributo seguindo a regra do D&D 5e."""
     # A fórmula é (valor do atributo - 10) / 2, arredondado para baixo.
     return (valor_atributo - 10) // 2
 
-def turno_do_jogador(jogador: Personagem, monstro: Monstro):
+def _alvos_do_turno(jogador: Personagem, monstro: Monstro):
+    """Mapeia os alvos da linguagem de efeitos para os combatentes deste duelo."""
+    return {'proprio': [jogador], 'aliado': [jogador], 'inimigo': [monstro]}
+
+def _executar_efeitos(efeitos, jogador: Personagem, monstro: Monstro, efeitos_ativos):
+    """Aplica efeitos já compilados e guarda os que têm duração para as próximas rodadas."""
+    mensagens, ativos = aplicar_efeitos(efeitos, _alvos_do_turno(jogador, monstro))
+    for mensagem in mensagens:
+        print(mensagem)
+    if efeitos_ativos is not None:
+        efeitos_ativos.extend(ativos)
+
+def turno_do_jogador(jogador: Personagem, monstro: Monstro, efeitos_ativos=None):
     """
     Encapsula toda a lógica do turno do jogador, apresentando um menu de escolhas táticas.
+    'efeitos_ativos' (opcional) recebe os efeitos com duração iniciados neste turno.
     """
     while True:
+        # Detalhes de itens e habilidades vêm do cache do personagem (sem consultas ao banco por turno).
+        equipamento = jogador.equipamento_resolvido()
+
         # Apresenta o menu de ações possíveis para o jogador.
         print("\n--- SEU TURNO ---")
         print("1. Atacar com Arma")
@@ -30,12 +46,7 @@ def turno_do_jogador(jogador: Personagem, monstro: Monstro):
         # --- AÇÃO: ATACAR ---
         if escolha == '1':
             # -- Lógica de Equipamento Automático --
-            dado_dano_arma, bonus_ataque_arma, melhor_arma_nome = "1d2", 0, "Punhos"
-            itens_no_inventario = buscar_detalhes_itens(jogador.inventario)
-            armas = [item for item in itens_no_inventario if item[2].lower() == 'arma']
-            if armas:
-                melhor_arma = max(armas, key=lambda item: item[6])
-                melhor_arma_nome, dado_dano_arma, bonus_ataque_arma = melhor_arma[1], melhor_arma[5], melhor_arma[6]
+            melhor_arma_nome, dado_dano_arma, bonus_ataque_arma = equipamento["arma"]
             
             print(f"Você ataca com {melhor_arma_nome}!")
             
@@ -62,7 +73,7 @@ def turno_do_jogador(jogador: Personagem, monstro: Monstro):
         # --- AÇÃO: USAR ITEM ---
         elif escolha == '2':
             # Filtra o inventário para encontrar apenas itens com um efeito utilizável.
-            itens_utilizaveis = [item for item in buscar_detalhes_itens(jogador.inventario) if item[7] is not None]
+            itens_utilizaveis = equipamento["consumiveis"]
             
             if not itens_utilizaveis:
                 print("Você não tem itens utilizáveis em combate.")
@@ -70,21 +81,17 @@ def turno_do_jogador(jogador: Personagem, monstro: Monstro):
 
             print("\nQual item você quer usar?")
             for i, item in enumerate(itens_utilizaveis):
-                print(f"{i + 1}. {item[1]}") # item[1] é o nome
+                print(f"{i + 1}. {item[0]}") # item[0] é o nome
 
             try:
                 escolha_item = int(input("> ")) - 1
                 if 0 <= escolha_item < len(itens_utilizaveis):
-                    item_usado = itens_utilizaveis[escolha_item]
-                    nome_item, efeito_item = item_usado[1], item_usado[7]
-
-                    # Processa o efeito (ex: "cura:10").
-                    tipo_efeito, valor_efeito = efeito_item.split(':')
-                    if tipo_efeito.lower() == 'cura':
-                        jogador.curar(int(valor_efeito))
-                    
-                    jogador.remover_item(nome_item)
+                    nome_item, efeitos_item = itens_utilizaveis[escolha_item]
                     print(f"Você usou '{nome_item}'.")
+
+                    # Os efeitos já estão compilados (ex: "cura:10"); aqui só são executados.
+                    _executar_efeitos(efeitos_item, jogador, monstro, efeitos_ativos)
+                    jogador.remover_item(nome_item)
                     return # Encerra o turno.
                 else:
                     print("Escolha inválida.")
@@ -98,33 +105,23 @@ def turno_do_jogador(jogador: Personagem, monstro: Monstro):
                 continue
 
             print("\nQual habilidade você quer usar?")
-            habilidades_conhecidas = buscar_detalhes_habilidades(jogador.habilidades)
+            habilidades_conhecidas = equipamento["habilidades"]
             
             for i, hab in enumerate(habilidades_conhecidas):
-                print(f"{i + 1}. {hab[1]} (Custo: {hab[4]} Mana)")
+                print(f"{i + 1}. {hab[0]} (Custo: {hab[1]} Mana)")
 
             try:
                 escolha_hab = int(input("> ")) - 1
                 if 0 <= escolha_hab < len(habilidades_conhecidas):
-                    hab_usada = habilidades_conhecidas[escolha_hab]
-                    nome_hab, efeito_hab, custo_mana = hab_usada[1], hab_usada[3], hab_usada[4]
+                    nome_hab, custo_mana, efeitos_hab = habilidades_conhecidas[escolha_hab]
 
                     if jogador.mana_atual >= custo_mana:
                         jogador.mana_atual -= custo_mana
                         print(f"\nVocê usa '{nome_hab}'!")
-                        
-                        # Processa o efeito da habilidade.
-                        partes_efeito = efeito_hab.split(':')
-                        tipo_efeito = partes_efeito[0].lower()
-                        valor_efeito = partes_efeito[1]
-
-                        if tipo_efeito == 'dano':
-                            dano, _ = rolar_dados(valor_efeito)
-                            monstro.vida_atual -= dano
-                            print(f"A magia causa {dano} de dano ao {monstro.nome}!")
-                        elif tipo_efeito == 'cura':
-                            jogador.curar(int(valor_efeito))
-                        
+
+                        # Executa os efeitos compilados da habilidade (dano, cura, mana...).
+                        _executar_efeitos(efeitos_hab, jogador, monstro, efeitos_ativos)
+
                         return # Encerra o turno.
                     else:
                         print("Mana insuficiente!")
@@ -153,13 +150,20 @@ def turno_do_monstro(jogador: Personagem, monstro: Monstro):
 def iniciar_combate(jogador: Personagem, monstro: Monstro):
     """Executa o loop de combate principal, gerenciando os turnos e o fim da batalha."""
     print(f"\n--- UM {monstro.nome.upper()} SELVAGEM APARECE! ---")
+    # Efeitos com duração (ex: veneno, regeneração) que continuam agindo a cada rodada.
+    efeitos_ativos = []
     
     # O loop principal da batalha: continua enquanto ambos os combatentes estiverem vivos.
     while jogador.vida_atual > 0 and monstro.vida_atual > 0:
         # Exibe o status da batalha no início de cada rodada.
         print(f"\nSua Vida: {jogador.vida_atual}/{jogador.vida_maxima} | Vida do {monstro.nome}: {monstro.vida_atual}/{monstro.vida_maxima}")
         
-        turno_do_jogador(jogador, monstro)
+        for mensagem in processar_efeitos_ativos(efeitos_ativos):
+            print(mensagem)
+        if jogador.vida_atual <= 0 or monstro.vida_atual <= 0:
+            break
+
+        turno_do_jogador(jogador, monstro, efeitos_ativos)
         time.sleep(1)
 
         # Após o turno do jogador, verifica se o monstro ainda está vivo.
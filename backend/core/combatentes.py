@@ -0,0 +1,57 @@
+# core/combatentes.py
+
+# Modelos compactos dos participantes de uma batalha em tempo real (sistema de batalha via socket).
+# Antes cada combatente era um dicionário solto, repetindo as mesmas chaves em cada objeto.
+# Com dataclasses 'slots=True' cada instância guarda só os valores, e a conversão para o
+# formato enviado ao frontend (to_dict/from_dict) continua idêntica à dos dicionários antigos.
+from dataclasses import dataclass, fields
+
+
+@dataclass(slots=True)
+class JogadorBatalha:
+    """Um jogador (ficha) participando de uma batalha."""
+    sid: str                  # SID do socket do jogador (para mensagens privadas).
+    ficha_id: str             # ID da ficha, sempre como string (é assim que o frontend compara).
+    nome: str
+    status: str = 'vivo'      # vivo | caido | morto
+    hp_atual: int = 10
+    acoes_restantes: int = 1
+    acoes_max: int = 1
+    iniciativa: int = 0
+
+    def to_dict(self) -> dict:
+        """Converte para o dicionário enviado pelo socket."""
+        return {campo: getattr(self, campo) for campo in _CAMPOS_JOGADOR}
+
+    @classmethod
+    def from_dict(cls, dados: dict) -> 'JogadorBatalha':
+        """Cria a partir de um dicionário, ignorando chaves desconhecidas."""
+        return cls(**{campo: dados[campo] for campo in _CAMPOS_JOGADOR if campo in dados})
+
+
+@dataclass(slots=True)
+class MonstroBatalha:
+    """Uma instância de monstro do bestiário dentro de uma batalha."""
+    id: str                   # ID único na batalha (ex: "m_12_0"), já que o mesmo monstro pode aparecer várias vezes.
+    db_id: int                # ID do monstro em monstros_base.
+    nome: str
+    tipo: str = ''
+    hp_max: int = 10
+    hp_atual: int = 10
+    ca: int = 10
+    status: str = 'vivo'      # vivo | derrotado | fugiu
+    iniciativa: int = 0
+
+    def to_dict(self) -> dict:
+        """Converte para o dicionário enviado pelo socket (visão do mestre, com HP)."""
+        return {campo: getattr(self, campo) for campo in _CAMPOS_MONSTRO}
+
+    @classmethod
+    def from_dict(cls, dados: dict) -> 'MonstroBatalha':
+        """Cria a partir de um dicionário, ignorando chaves desconhecidas."""
+        return cls(**{campo: dados[campo] for campo in _CAMPOS_MONSTRO if campo in dados})
+
+
+# Nomes dos campos calculados uma única vez (evita chamar fields() a cada conversão).
+_CAMPOS_JOGADOR = tuple(f.name for f in fields(JogadorBatalha))
+_CAMPOS_MONSTRO = tuple(f.name for f in fields(MonstroBatalha))
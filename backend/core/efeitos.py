@@ -0,0 +1,156 @@
+# core/efeitos.py
+
+# Mini-linguagem de efeitos para itens e habilidades.
+#
+# O texto salvo em 'itens_base.efeito' e 'habilidades_base.efeito' é compilado UMA vez
+# (ao carregar o compêndio) em objetos imutáveis. Durante o combate só executamos esses
+# objetos: nenhum split() ou int() de string acontece a cada turno.
+#
+# Formato: um ou mais efeitos separados por ';'
+#     tipo:valor[:alvo[:duracao]]
+#
+#   tipo    -> dano | cura | mana
+#   valor   -> número fixo ("10") ou dados ("2d6", "d8+2", "1d4-1")
+#   alvo    -> proprio | inimigo | aliado   (padrão: 'inimigo' para dano, 'proprio' para o resto)
+#   duracao -> em rodadas; 1 (padrão) é instantâneo, 3 aplica agora e nas 2 rodadas seguintes
+#
+# Exemplos: "cura:10", "dano:2d6", "dano:1d4:inimigo:3; cura:2:proprio"
+import random
+import re
+from dataclasses import dataclass
+
+TIPOS_EFEITO = ('dano', 'cura', 'mana')
+ALVOS_EFEITO = ('proprio', 'inimigo', 'aliado')
+ALVO_PADRAO = {'dano': 'inimigo', 'cura': 'proprio', 'mana': 'proprio'}
+# Limites de sanidade para evitar efeitos absurdos vindos da API.
+MAX_DADOS, MAX_FACES, MAX_DURACAO = 100, 1000, 100
+
+_REGEX_VALOR = re.compile(r'^(?:(\d*)d(\d+)([+-]\d+)?|(\d+))$')
+
+
+class EfeitoInvalido(ValueError):
+    """Texto de efeito fora do formato aceito (a mensagem explica o motivo)."""
+
+
+@dataclass(frozen=True, slots=True)
+class Dado:
+    """Expressão de dados já convertida: quantidade d faces + modificador (quantidade 0 = valor fixo)."""
+    quantidade: int
+    faces: int
+    modificador: int = 0
+
+    def rolar(self) -> int:
+        total = self.modificador
+        for _ in range(self.quantidade):
+            total += random.randint(1, self.faces)
+        return max(0, total)
+
+    def __str__(self):
+        if not self.quantidade:
+            return str(self.modificador)
+        mod = f"{self.modificador:+d}" if self.modificador else ""
+        return f"{self.quantidade}d{self.faces}{mod}"
+
+
+@dataclass(frozen=True, slots=True)
+class Efeito:
+    """Um efeito compilado, pronto para ser aplicado."""
+    tipo: str
+    valor: Dado
+    alvo: str
+    duracao: int = 1
+
+
+@dataclass(slots=True)
+class EfeitoAtivo:
+    """Efeito com duração que continua agindo nas próximas rodadas."""
+    efeito: Efeito
+    alvos: list
+    rodadas_restantes: int
+
+
+def _compilar_valor(texto: str) -> Dado:
+    encontrado = _REGEX_VALOR.match(texto.replace(' ', '').lower())
+    if not encontrado:
+        raise EfeitoInvalido(f"Valor '{texto}' inválido (use um número ou dados, ex: 2d6+1).")
+    qtd, faces, mod, fixo = encontrado.groups()
+    if fixo is not None:
+        return Dado(0, 0, int(fixo))
+    qtd = int(qtd) if qtd else 1
+    faces = int(faces)
+    if not (1 <= qtd <= MAX_DADOS) or not (2 <= faces <= MAX_FACES):
+        raise EfeitoInvalido(f"Dados '{texto}' fora dos limites ({MAX_DADOS} dados de até {MAX_FACES} faces).")
+    return Dado(qtd, faces, int(mod) if mod else 0)
+
+
+def _compilar_um(texto: str) -> Efeito:
+    partes = [p.strip() for p in texto.split(':')]
+    if len(partes) < 2 or len(partes) > 4:
+        raise EfeitoInvalido(f"Efeito '{texto}' inválido (formato: tipo:valor[:alvo[:duracao]]).")
+    tipo = partes[0].lower()
+    if tipo not in TIPOS_EFEITO:
+        raise EfeitoInvalido(f"Tipo de efeito '{partes[0]}' desconhecido (use: {', '.join(TIPOS_EFEITO)}).")
+    valor = _compilar_valor(partes[1])
+    alvo = partes[2].lower() if len(partes) > 2 and partes[2] else ALVO_PADRAO[tipo]
+    if alvo not in ALVOS_EFEITO:
+        raise EfeitoInvalido(f"Alvo '{partes[2]}' desconhecido (use: {', '.join(ALVOS_EFEITO)}).")
+    duracao = 1
+    if len(partes) > 3 and partes[3]:
+        if not partes[3].isdigit() or not (1 <= int(partes[3]) <= MAX_DURACAO):
+            raise EfeitoInvalido(f"Duração '{partes[3]}' inválida (use 1 a {MAX_DURACAO} rodadas).")
+        duracao = int(partes[3])
+    return Efeito(tipo, valor, alvo, duracao)
+
+
+def compilar_efeitos(texto) -> tuple:
+    """
+    Compila o texto de efeito em uma tupla de 'Efeito'. Texto vazio/None vira tupla vazia.
+    Lança EfeitoInvalido se o texto estiver mal formatado.
+    """
+    if texto is None or not str(texto).strip():
+        return ()
+    return tuple(_compilar_um(parte) for parte in str(texto).split(';') if parte.strip())
+
+
+def _aplicar_em(efeito: Efeito, criatura, valor: int) -> str:
+    """Aplica o valor de um efeito em uma criatura (Personagem ou Monstro) e descreve o resultado."""
+    if efeito.tipo == 'dano':
+        criatura.vida_atual -= valor
+        return f"{criatura.nome} sofre {valor} de dano!"
+    if efeito.tipo == 'cura':
+        criatura.vida_atual = min(criatura.vida_maxima, criatura.vida_atual + valor)
+        return f"{criatura.nome} recupera {valor} de vida ({criatura.vida_atual}/{criatura.vida_maxima})."
+    # 'mana': criaturas sem mana (ex: Monstro) simplesmente ignoram.
+    if not hasattr(criatura, 'mana_atual'):
+        return f"{criatura.nome} não possui mana."
+    criatura.mana_atual = min(criatura.mana_maxima, criatura.mana_atual + valor)
+    return f"{criatura.nome} recupera {valor} de mana ({criatura.mana_atual}/{criatura.mana_maxima})."
+
+
+def aplicar_efeitos(efeitos: tuple, alvos: dict):
+    """
+    Aplica efeitos compilados. 'alvos' mapeia o nome do alvo para a lista de criaturas,
+    ex: {'proprio': [jogador], 'inimigo': [monstro]}.
+    Retorna (mensagens, ativos), onde 'ativos' são os efeitos que continuam nas próximas rodadas.
+    """
+    mensagens, ativos = [], []
+    for efeito in efeitos:
+        criaturas = alvos.get(efeito.alvo) or []
+        for criatura in criaturas:
+            mensagens.append(_aplicar_em(efeito, criatura, efeito.valor.rolar()))
+        if efeito.duracao > 1 and criaturas:
+            ativos.append(EfeitoAtivo(efeito, list(criaturas), efeito.duracao - 1))
+    return mensagens, ativos
+
+
+def processar_efeitos_ativos(ativos: list) -> list:
+    """Aplica mais uma rodada dos efeitos contínuos e remove da lista os que terminaram."""
+    mensagens = []
+    for ativo in list(ativos):
+        for criatura in ativo.alvos:
+            if criatura.vida_atual > 0:
+                mensagens.append(_aplicar_em(ativo.efeito, criatura, ativo.efeito.valor.rolar()))
+        ativo.rodadas_restantes -= 1
+        if ativo.rodadas_restantes <= 0:
+            ativos.remove(ativo)
+    return mensagens
@@ -1,11 +1,18 @@
 # core/monstro.py
 
+# Campos do monstro na ordem do __init__ (mais 'vida_atual', que muda durante o combate).
+# Com __slots__ não há __dict__ para copiar: to_dict/from_dict percorrem esta tupla.
+CAMPOS_MONSTRO = ("nome", "vida_maxima", "vida_atual", "ataque_bonus", "dano_dado", "defesa", "xp_oferecido", "ouro_drop")
+
 # A classe Monstro é o "molde" para criar qualquer inimigo no jogo.
 class Monstro:
     """
     Uma classe para representar os inimigos no jogo. Ela armazena os atributos
     de combate de uma criatura.
     """
+    # __slots__ fixa os atributos e dispensa o __dict__ de cada instância (menos memória por monstro).
+    __slots__ = CAMPOS_MONSTRO
+
     # O método __init__ é o construtor, chamado ao criar um novo monstro.
     # Ele recebe todos os status que definem a criatura.
     def __init__(self, nome: str, vida_maxima: int, ataque_bonus: int, dano_dado: str, defesa: int, xp_oferecido: int, ouro_drop: int):
@@ -30,4 +37,17 @@ class Monstro:
         # A quantidade de pontos de experiência que o monstro concede ao ser derrotado.
         self.xp_oferecido = xp_oferecido
         # A quantidade de ouro que o monstro deixa cair ao ser derrotado.
-        self.ouro_drop = ouro_drop
\ No newline at end of file
+        self.ouro_drop = ouro_drop
+
+    def to_dict(self) -> dict:
+        """Converte o monstro para um dicionário simples (inclui a vida atual)."""
+        return {campo: getattr(self, campo) for campo in CAMPOS_MONSTRO}
+
+    @classmethod
+    def from_dict(cls, dados: dict) -> 'Monstro':
+        """Recria o monstro a partir de to_dict(). Sem 'vida_atual', ele volta com a vida cheia."""
+        monstro = cls(dados["nome"], dados["vida_maxima"], dados["ataque_bonus"], dados["dano_dado"],
+                      dados["defesa"], dados["xp_oferecido"], dados["ouro_drop"])
+        if "vida_atual" in dados:
+            monstro.vida_atual = dados["vida_atual"]
+        return monstro
@@ -1,8 +1,23 @@
 # core/personagem.py
 
+# Campos salvos da ficha (na ordem do save). '_equipamento' é só cache e fica de fora.
+# Com __slots__ não há __dict__ para copiar: to_dict/from_dict percorrem esta tupla.
+CAMPOS_SALVOS = (
+    "nome", "classe", "nivel", "atributos", "vida_atual", "vida_maxima", "inventario", "ouro",
+    "xp_atual", "xp_proximo_nivel", "mana_atual", "mana_maxima", "habilidades",
+)
+
 # A classe Personagem é o "molde" ou a "planta" para criar qualquer personagem jogável.
 # Ela centraliza todos os dados e ações que um personagem pode ter.
 class Personagem:
+    # __slots__ fixa os atributos da instância e dispensa o __dict__ de cada objeto,
+    # o que economiza memória quando muitos personagens existem ao mesmo tempo (ex: simulações).
+    __slots__ = (
+        "nome", "classe", "nivel", "ouro", "xp_atual", "xp_proximo_nivel", "atributos",
+        "vida_atual", "vida_maxima", "mana_atual", "mana_maxima", "inventario", "habilidades",
+        "_equipamento",
+    )
+
     # O método __init__ é o "construtor" da classe. Ele é chamado sempre que um novo personagem é criado.
     # Ele recebe todos os dados iniciais do personagem. Parâmetros com '=' têm um valor padrão.
     def __init__(self, nome, classe, nivel=1, atributos=None, vida_atual=None, vida_maxima=None, 
@@ -59,6 +74,20 @@ class Personagem:
         self.inventario = inventario if inventario is not None else []
         # Se as habilidades não forem fornecidas, começa com uma lista vazia.
         self.habilidades = habilidades if habilidades is not None else []
+        # Cache da visão "resolvida" do equipamento (melhor arma, consumíveis e habilidades).
+        # Fica vazio (None) até ser pedido e é descartado sempre que o inventário ou as habilidades mudam.
+        self._equipamento = None
+
+    # --- Conversão (saves e API) ---
+
+    def to_dict(self):
+        """Converte a ficha para um dicionário simples (formato dos saves em JSON)."""
+        return {campo: getattr(self, campo) for campo in CAMPOS_SALVOS}
+
+    @classmethod
+    def from_dict(cls, dados):
+        """Recria o personagem a partir de to_dict(). Chaves ausentes usam os padrões do __init__."""
+        return cls(**{campo: dados[campo] for campo in CAMPOS_SALVOS if campo in dados})
 
     # --- Métodos de Ação e Gerenciamento ---
 
@@ -145,6 +174,8 @@ class Personagem:
         if nome_habilidade not in self.habilidades:
             # Adiciona o nome da habilidade à lista do personagem.
             self.habilidades.append(nome_habilidade)
+            # A lista de habilidades mudou, então o cache de equipamento precisa ser refeito.
+            self.invalidar_equipamento()
             # Imprime uma mensagem empolgante para o jogador.
             print(f"Você aprendeu uma nova habilidade: {nome_habilidade}!")
 
@@ -152,6 +183,7 @@ class Personagem:
         """Adiciona um item (string) à lista de inventário."""
         # Adiciona o item ao final da lista de inventário.
         self.inventario.append(item)
+        self.invalidar_equipamento()
 
     def remover_item(self, item):
         """Remove um item do inventário, se ele existir."""
@@ -159,10 +191,54 @@ class Personagem:
         if item in self.inventario:
             # Remove a primeira ocorrência do item encontrado na lista.
             self.inventario.remove(item)
+            self.invalidar_equipamento()
         else:
             # Informa no console caso o item não seja encontrado (ajuda a depurar erros).
             print(f"AVISO: Tentativa de remover item não existente: {item}")
     
+    def invalidar_equipamento(self):
+        """Descarta o cache de equipamento. Chame após alterar 'inventario' ou 'habilidades' diretamente."""
+        self._equipamento = None
+
+    def equipamento_resolvido(self):
+        """
+        Retorna um dicionário com a melhor arma, os itens utilizáveis e as habilidades conhecidas.
+        Itens e habilidades já vêm com os efeitos compilados pelo compêndio (core/efeitos.py).
+        As consultas ao banco só acontecem quando o cache está vazio; nos turnos seguintes
+        o resultado é reaproveitado até que o inventário ou as habilidades mudem.
+        """
+        if self._equipamento is None:
+            # Importação tardia: evita que 'core' dependa do banco só para ser importado.
+            from backend.database.db_manager import buscar_detalhes_itens, buscar_detalhes_habilidades
+            from backend.database import compendio
+
+            itens = buscar_detalhes_itens(self.inventario)
+            # Colunas de itens_base: id, nome, tipo, descricao, preco_ouro, dano_dado, bonus_ataque, efeito...
+            armas = [item for item in itens if (item[2] or '').lower() == 'arma']
+            # Sem arma no inventário, o personagem luta com os punhos.
+            arma = ("Punhos", "1d2", 0)
+            if armas:
+                melhor_arma = max(armas, key=lambda item: item[6] or 0)
+                arma = (melhor_arma[1], melhor_arma[5], melhor_arma[6] or 0)
+
+            # Consumíveis: (nome, efeitos) só para itens que têm algum efeito.
+            consumiveis = []
+            for item in itens:
+                efeitos = compendio.efeitos_item(item[1])
+                if efeitos:
+                    consumiveis.append((item[1], efeitos))
+
+            # Habilidades: (nome, custo_mana, efeitos). Colunas: id, nome, descricao, efeito, custo_mana.
+            habilidades = [(hab[1], hab[4] or 0, compendio.efeitos_habilidade(hab[1]))
+                           for hab in buscar_detalhes_habilidades(self.habilidades)]
+
+            self._equipamento = {
+                "arma": arma,
+                "consumiveis": consumiveis,
+                "habilidades": habilidades,
+            }
+        return self._equipamento
+
     def curar(self, quantidade):
         """Aumenta a vida atual do personagem, sem ultrapassar a vida máxima."""
         # Adiciona a quantidade de cura à vida atual.
@@ -0,0 +1,347 @@
+# core/simulador_encontro.py
+
+# Estimador de dificuldade de encontros pelo método de Monte Carlo.
+# O Mestre escolhe monstros do bestiário e as fichas do grupo; simulamos o combate
+# milhares de vezes (em paralelo, usando vários processos) e resumimos os resultados.
+#
+# Nos modos eventlet/gevent o pool de processos ficaria nas mãos de threads e pipes "verdes"
+# (monkey patch) e o cálculo pararia o loop: o servidor chama 'delegar_bloqueantes()' e os
+# lotes rodam um a um numa thread de verdade (execucao.executor_bloqueante), sem o pool.
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+# Limite de rodadas por simulação (evita loops infinitos em encontros "impossíveis").
+LIMITE_RODADAS = 100
+# Quantidade de simulações executadas por cada tarefa enviada ao pool de processos.
+TAMANHO_LOTE = 200
+# Valor z para um intervalo de confiança de 95%.
+Z_95 = 1.96
+
+_REGEX_DADO = re.compile(r'\s*(\d*)d(\d+)\s*([+-]\s*\d+)?\s*')
+
+# Pool de processos reaproveitado entre requisições (criar processos é caro).
+_executor = None
+_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# executar(funcao, *args) dos modos cooperativos; None = pool de processos.
+_executar = None
+
+
+def delegar_bloqueantes(executar):
+    """Passa a rodar os lotes por 'executar(funcao, *args)', sem pool (None volta ao pool)."""
+    global _executar
+    _executar = executar
+
+
+def _modificador(valor):
+    """Modificador de atributo no padrão D&D 5e."""
+    return (int(valor) - 10) // 2
+
+
+def _bonus_proficiencia(nivel):
+    """Bônus de proficiência por nível (ou CR) no padrão D&D 5e."""
+    return 2 + max(0, int(nivel) - 1) // 4
+
+
+def _parse_dado(texto, padrao=(1, 6, 0)):
+    """Converte 'NdX+M' em uma tupla (qtd, faces, mod). Feito UMA vez, fora do loop de simulação."""
+    match = _REGEX_DADO.fullmatch(texto or '')
+    if not match:
+        return padrao
+    qtd = int(match.group(1)) if match.group(1) else 1
+    mod = int(match.group(3).replace(' ', '')) if match.group(3) else 0
+    return (qtd, int(match.group(2)), mod)
+
+
+def _parse_cr(cr):
+    """O bestiário guarda o CR como texto ('0.25', '5.0', 'VARIES'...)."""
+    try:
+        return float(cr)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+# --- Conversão dos dados do banco para combatentes "crus" (dicionários simples e picláveis) ---
+
+def combatente_de_monstro(monstro):
+    """Monta o combatente a partir de uma linha de 'monstros_base'."""
+    mod_fisico = max(_modificador(monstro.get('for_attr') or 10), _modificador(monstro.get('des_attr') or 10))
+    ataque = monstro.get('ataque_bonus') or 0
+    if not ataque:
+        # Boa parte do bestiário não tem bônus de ataque cadastrado: estimamos pelo CR.
+        ataque = _bonus_proficiencia(max(1, math.ceil(_parse_cr(monstro.get('cr'))))) + mod_fisico
+    qtd, faces, mod = _parse_dado(monstro.get('dano_dado'))
+    return {
+        'nome': monstro['nome'],
+        'hp': max(1, int(monstro.get('vida_maxima') or 1)),
+        'ca': int(monstro.get('ca') or monstro.get('defesa') or 10),
+        'ataque': int(ataque),
+        'dano': (qtd, faces, mod + mod_fisico),
+        'iniciativa': _modificador(monstro.get('des_attr') or 10),
+    }
+
+
+def combatente_de_ficha(ficha):
+    """Monta o combatente a partir de uma linha de 'fichas_personagem'."""
+    atributos = ficha.get('atributos') or json.loads(ficha.get('atributos_json') or '{}')
+    nivel = int(ficha.get('nivel') or 1)
+    mod_con = _modificador(atributos.get('Constituição', 10))
+    mod_des = _modificador(atributos.get('Destreza', 10))
+    mod_ataque = max(_modificador(atributos.get('Força', 10)), mod_des)
+    return {
+        'ficha_id': ficha.get('id'),
+        'nome': ficha.get('nome_personagem', 'Aventureiro'),
+        # Vida: máximo do d10 no 1º nível + média (6) por nível seguinte.
+        'hp': max(1, 10 + mod_con + (nivel - 1) * (6 + mod_con)),
+        # Mesma regra de defesa usada em core/combate.py.
+        'ca': 10 + mod_des,
+        'ataque': _bonus_proficiencia(nivel) + mod_ataque,
+        'dano': (1, 8, mod_ataque),
+        'iniciativa': mod_des,
+    }
+
+
+# --- Núcleo da simulação (roda dentro dos processos do pool) ---
+
+def _rolar(rng, dano, critico):
+    qtd, faces, mod = dano
+    if critico:
+        qtd *= 2
+    return max(1, sum(rng.randint(1, faces) for _ in range(qtd)) + mod)
+
+
+def _simular_uma(rng, grupo, monstros):
+    """Simula um único combate. Retorna (vitoria_do_grupo, rodadas, hp_perdido_por_pc)."""
+    hp_grupo = [c['hp'] for c in grupo]
+    hp_monstros = [c['hp'] for c in monstros]
+
+    # Ordem de iniciativa: (total, lado, índice). Lado 0 = grupo, 1 = monstros.
+    ordem = [(rng.randint(1, 20) + c['iniciativa'], 0, i) for i, c in enumerate(grupo)]
+    ordem += [(rng.randint(1, 20) + c['iniciativa'], 1, i) for i, c in enumerate(monstros)]
+    ordem.sort(reverse=True)
+
+    rodadas = 0
+    while rodadas < LIMITE_RODADAS:
+        rodadas += 1
+        for _, lado, i in ordem:
+            if lado == 0:
+                if hp_grupo[i] <= 0:
+                    continue
+                vivos = [j for j, hp in enumerate(hp_monstros) if hp > 0]
+                if not vivos:
+                    break
+                # Tática simples do grupo: focar o monstro mais ferido.
+                alvo = min(vivos, key=hp_monstros.__getitem__)
+                atacante, defensor, hp_alvo = grupo[i], monstros[alvo], hp_monstros
+            else:
+                if hp_monstros[i] <= 0:
+                    continue
+                vivos = [j for j, hp in enumerate(hp_grupo) if hp > 0]
+                if not vivos:
+                    break
+                # Monstros escolhem um alvo aleatório.
+                alvo = rng.choice(vivos)
+                atacante, defensor, hp_alvo = monstros[i], grupo[alvo], hp_grupo
+
+            d20 = rng.randint(1, 20)
+            if d20 == 20 or (d20 != 1 and d20 + atacante['ataque'] >= defensor['ca']):
+                hp_alvo[alvo] -= _rolar(rng, atacante['dano'], d20 == 20)
+
+        grupo_de_pe = any(hp > 0 for hp in hp_grupo)
+        monstros_de_pe = any(hp > 0 for hp in hp_monstros)
+        if not grupo_de_pe or not monstros_de_pe:
+            break
+
+    vitoria = not any(hp > 0 for hp in hp_monstros) and any(hp > 0 for hp in hp_grupo)
+    hp_perdido = [c['hp'] - max(0, hp) for c, hp in zip(grupo, hp_grupo)]
+    return vitoria, rodadas, hp_perdido
+
+
+def simular_lote(grupo, monstros, quantidade, semente, prazo=None):
+    """
+    Executa 'quantidade' simulações e devolve apenas as somas necessárias para
+    calcular médias e variâncias (assim o retorno entre processos é pequeno).
+    'prazo' (time.time()) encerra o lote antes: um futuro já em execução não pode ser
+    cancelado, então é o próprio lote que para quando o orçamento de tempo acaba.
+    """
+    rng = random.Random(semente)
+    vitorias = soma_rodadas = soma_rodadas2 = 0
+    soma_hp = [0] * len(grupo)
+    soma_hp2 = [0] * len(grupo)
+    feitas = 0
+    for feitas in range(1, quantidade + 1):
+        if prazo is not None and feitas % 16 == 0 and time.time() >= prazo:
+            feitas -= 1
+            break
+        vitoria, rodadas, hp_perdido = _simular_uma(rng, grupo, monstros)
+        vitorias += vitoria
+        soma_rodadas += rodadas
+        soma_rodadas2 += rodadas * rodadas
+        for i, perdido in enumerate(hp_perdido):
+            soma_hp[i] += perdido
+            soma_hp2[i] += perdido * perdido
+    return {
+        'n': feitas, 'vitorias': vitorias,
+        'soma_rodadas': soma_rodadas, 'soma_rodadas2': soma_rodadas2,
+        'soma_hp': soma_hp, 'soma_hp2': soma_hp2,
+    }
+
+
+# --- Agregação e estatísticas ---
+
+def _somar(total, parcial):
+    if total is None:
+        return parcial
+    total['n'] += parcial['n']
+    total['vitorias'] += parcial['vitorias']
+    total['soma_rodadas'] += parcial['soma_rodadas']
+    total['soma_rodadas2'] += parcial['soma_rodadas2']
+    total['soma_hp'] = [a + b for a, b in zip(total['soma_hp'], parcial['soma_hp'])]
+    total['soma_hp2'] = [a + b for a, b in zip(total['soma_hp2'], parcial['soma_hp2'])]
+    return total
+
+
+def _media_variancia(soma, soma2, n):
+    media = soma / n
+    variancia = max(0.0, (soma2 - n * media * media) / (n - 1)) if n > 1 else 0.0
+    return media, variancia
+
+
+def intervalo_wilson(vitorias, n, z=Z_95):
+    """Intervalo de confiança de Wilson para a probabilidade de vitória."""
+    if n == 0:
+        return 0.0, 1.0
+    p = vitorias / n
+    denominador = 1 + z * z / n
+    centro = (p + z * z / (2 * n)) / denominador
+    margem = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominador
+    return max(0.0, centro - margem), min(1.0, centro + margem)
+
+
+def _obter_executor():
+    global _executor
+    if _executor is None:
+        # 'spawn' evita herdar via fork o estado das threads do servidor Socket.IO.
+        _executor = ProcessPoolExecutor(
+            max_workers=_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def _descartar_executor():
+    """Pool quebrado (processo morto, sem permissão...): a próxima chamada tenta criar outro."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def estimar_dificuldade(grupo, monstros, max_simulacoes=2000, tempo_max_s=3.0, margem=0.02, semente=None):
+    """
+    Simula o encontro até 'max_simulacoes' vezes em paralelo.
+    Para antes se o tempo acabar ou se a meia-largura do intervalo de confiança
+    da probabilidade de vitória ficar menor ou igual a 'margem'.
+    'grupo' e 'monstros' são listas de combatentes (ver combatente_de_ficha/monstro).
+    """
+    inicio = time.monotonic()
+    prazo = time.time() + tempo_max_s
+    rng_sementes = random.Random(semente)
+    total = None
+    enviadas = 0
+    motivo_parada = 'limite'
+
+    def _proximo_lote():
+        nonlocal enviadas
+        quantidade = min(TAMANHO_LOTE, max_simulacoes - enviadas)
+        enviadas += quantidade
+        return quantidade, rng_sementes.getrandbits(32)
+
+    def _no_processo():
+        # Um lote por vez, aqui (fallback) ou numa thread de verdade (modos cooperativos).
+        nonlocal total, motivo_parada
+        while enviadas < max_simulacoes and time.monotonic() - inicio < tempo_max_s:
+            quantidade, semente_lote = _proximo_lote()
+            if _executar is None:
+                parcial = simular_lote(grupo, monstros, quantidade, semente_lote, prazo)
+            else:
+                parcial = _executar(simular_lote, grupo, monstros, quantidade, semente_lote, prazo)
+            total = _somar(total, parcial)
+            baixo, alto = intervalo_wilson(total['vitorias'], total['n'])
+            if total['n'] >= TAMANHO_LOTE and (alto - baixo) / 2 <= margem:
+                motivo_parada = 'precisao'
+                return
+        if enviadas < max_simulacoes:
+            motivo_parada = 'tempo'
+
+    if _executar is not None:
+        _no_processo()
+        return _resumir(total, grupo, motivo_parada, time.monotonic() - inicio)
+
+    try:
+        executor = _obter_executor()
+        pendentes = set()
+        # Mantém cerca de dois lotes por worker em andamento.
+        while enviadas < max_simulacoes and len(pendentes) < _WORKERS * 2:
+            quantidade, semente_lote = _proximo_lote()
+            pendentes.add(executor.submit(simular_lote, grupo, monstros, quantidade, semente_lote, prazo))
+
+        while pendentes:
+            restante = tempo_max_s - (time.monotonic() - inicio)
+            if restante <= 0:
+                motivo_parada = 'tempo'
+                break
+            concluidos, pendentes = wait(pendentes, timeout=restante, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                total = _somar(total, futuro.result())
+            if total and total['n'] >= TAMANHO_LOTE:
+                baixo, alto = intervalo_wilson(total['vitorias'], total['n'])
+                if (alto - baixo) / 2 <= margem:
+                    motivo_parada = 'precisao'
+                    break
+            while enviadas < max_simulacoes and len(pendentes) < _WORKERS * 2:
+                quantidade, semente_lote = _proximo_lote()
+                pendentes.add(executor.submit(simular_lote, grupo, monstros, quantidade, semente_lote, prazo))
+
+        # Os que ainda estão na fila saem dela; os em execução param sozinhos no prazo.
+        for futuro in pendentes:
+            futuro.cancel()
+    except (BrokenProcessPool, OSError, PermissionError) as e:
+        # Ambientes sem suporte a multiprocessing: roda no próprio processo, respeitando o tempo.
+        print(f"AVISO: pool de processos indisponível ({e}). Simulando no processo atual.")
+        _descartar_executor()
+        enviadas = total['n'] if total else 0  # refaz aqui os lotes que se perderam no pool
+        _no_processo()
+
+    return _resumir(total, grupo, motivo_parada, time.monotonic() - inicio)
+
+
+def _resumir(total, grupo, motivo_parada, duracao):
+    if not total or total['n'] == 0:
+        return {'simulacoes': 0, 'parada': 'tempo', 'tempo_s': round(duracao, 3)}
+    n = total['n']
+    baixo, alto = intervalo_wilson(total['vitorias'], n)
+    rodadas_media, rodadas_var = _media_variancia(total['soma_rodadas'], total['soma_rodadas2'], n)
+    hp_perdido = []
+    for c, soma, soma2 in zip(grupo, total['soma_hp'], total['soma_hp2']):
+        media, variancia = _media_variancia(soma, soma2, n)
+        hp_perdido.append({
+            'ficha_id': c.get('ficha_id'), 'nome': c['nome'], 'hp_max': c['hp'],
+            'media': round(media, 2), 'variancia': round(variancia, 2),
+        })
+    return {
+        'simulacoes': n,
+        'probabilidade_vitoria': round(total['vitorias'] / n, 4),
+        'intervalo_confianca': [round(baixo, 4), round(alto, 4)],
+        'rodadas_media': round(rodadas_media, 2),
+        'rodadas_variancia': round(rodadas_var, 2),
+        'hp_perdido': hp_perdido,
+        'parada': motivo_parada,
+        'tempo_s': round(duracao, 3),
+    }
@@ -0,0 +1,180 @@
+# database/blobs.py
+
+# Armazenamento de arquivos (imagens de mapas) endereçado por conteúdo.
+#
+# Cada arquivo é salvo uma única vez com o nome igual ao SHA-256 dos bytes
+# (blobs/ab/abcdef...), então dois uploads da mesma imagem viram um arquivo só.
+# O banco guarda apenas o hash e as dimensões; a rota /api/blobs/<hash> serve os bytes
+# (com suporte a Range e cache "immutable", já que o conteúdo de um hash nunca muda).
+#
+# Pasta configurável por RPG_BLOBS_DIR (padrão: database/blobs).
+#
+# Modelo de acesso: /api/blobs/<hash> não pede token. O hash funciona como uma URL de
+# capacidade: é o SHA-256 do conteúdo (não dá para adivinhar nem listar) e só chega a quem
+# pode ver o mapa (o mestre; jogadores só recebem mapas com visivel=1). Quem já recebeu o
+# hash continua podendo baixar a imagem, mesmo que o mapa volte a ficar oculto; para
+# "revogar", envie a imagem de novo com outro conteúdo. As respostas saem com cache
+# 'private' (navegador sim, proxies/CDNs compartilhados não).
+#
+# Coleta de lixo: apagar ou trocar a imagem de um mapa não apaga o arquivo (outro mapa pode
+# usar o mesmo hash). 'coletar_lixo(referenciados)' remove os arquivos que nenhuma linha do
+# banco usa mais; rode com 'python migrar_mapas_blobs.py --coletar'.
+import base64
+import binascii
+import hashlib
+import os
+import re
+import struct
+import tempfile
+import time
+
+PASTA_BLOBS = os.environ.get('RPG_BLOBS_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'blobs')
+
+_REGEX_HASH = re.compile(r'^[0-9a-f]{64}$')
+_REGEX_DATA_URL = re.compile(r'^data:([\w.+-]+/[\w.+-]+)?(;[^,]*)?,', re.IGNORECASE)
+
+
+class BlobInvalido(ValueError):
+    """Conteúdo que não pode ser guardado (ex: data URL mal formada)."""
+
+
+def hash_valido(valor) -> bool:
+    return isinstance(valor, str) and bool(_REGEX_HASH.match(valor))
+
+
+def caminho_blob(hash_hex):
+    """Caminho do arquivo de um hash, ou None se o hash for inválido ou não existir."""
+    if not hash_valido(hash_hex):
+        return None
+    caminho = os.path.join(PASTA_BLOBS, hash_hex[:2], hash_hex)
+    return caminho if os.path.isfile(caminho) else None
+
+
+def salvar_blob(dados: bytes) -> str:
+    """Guarda os bytes (se ainda não existirem) e retorna o hash SHA-256 em hexadecimal."""
+    hash_hex = hashlib.sha256(dados).hexdigest()
+    pasta = os.path.join(PASTA_BLOBS, hash_hex[:2])
+    destino = os.path.join(pasta, hash_hex)
+    if os.path.isfile(destino):
+        # Deduplicado. Renova a data do arquivo para a coleta de lixo não apagá-lo antes de o
+        # novo mapa ser gravado no banco (ver coletar_lixo).
+        os.utime(destino)
+        return hash_hex
+    os.makedirs(pasta, exist_ok=True)
+    # Escreve num temporário e renomeia: quem ler nunca vê um arquivo pela metade.
+    descritor, temporario = tempfile.mkstemp(dir=pasta, prefix='.tmp-')
+    try:
+        with os.fdopen(descritor, 'wb') as f:
+            f.write(dados)
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+    return hash_hex
+
+
+def ler_data_url(texto: str) -> bytes:
+    """Decodifica 'data:image/png;base64,....' (formato gerado pelo FileReader do navegador)."""
+    encontrado = _REGEX_DATA_URL.match(texto or '')
+    if not encontrado or ';base64' not in (encontrado.group(2) or '').lower():
+        raise BlobInvalido("Imagem deve ser uma data URL em base64.")
+    try:
+        return base64.b64decode(texto[encontrado.end():], validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise BlobInvalido(f"Base64 inválido: {e}")
+
+
+def tipo_imagem(dados: bytes):
+    """MIME da imagem pelos primeiros bytes (png, jpeg, gif, webp), ou None."""
+    if dados.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if dados.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if dados[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if dados[:4] == b'RIFF' and dados[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def dimensoes_imagem(dados: bytes):
+    """(largura, altura) lidas do cabeçalho da imagem, sem decodificá-la. (None, None) se desconhecido."""
+    try:
+        tipo = tipo_imagem(dados)
+        if tipo == 'image/png':
+            return struct.unpack('>II', dados[16:24])
+        if tipo == 'image/gif':
+            return struct.unpack('<HH', dados[6:10])
+        if tipo == 'image/webp':
+            bloco = dados[12:16]
+            if bloco == b'VP8X':
+                return (int.from_bytes(dados[24:27], 'little') + 1, int.from_bytes(dados[27:30], 'little') + 1)
+            if bloco == b'VP8L':
+                bits = int.from_bytes(dados[21:25], 'little')
+                return ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+            if bloco == b'VP8 ':
+                largura, altura = struct.unpack('<HH', dados[26:30])
+                return (largura & 0x3FFF, altura & 0x3FFF)
+        if tipo == 'image/jpeg':
+            i = 2
+            while i + 9 < len(dados):
+                if dados[i] != 0xFF:
+                    i += 1
+                    continue
+                marcador = dados[i + 1]
+                # SOF0..SOF15, exceto DHT (C4), JPG (C8) e DAC (CC)
+                if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):
+                    altura, largura = struct.unpack('>HH', dados[i + 5:i + 9])
+                    return (largura, altura)
+                if marcador in (0xD8, 0x01) or 0xD0 <= marcador <= 0xD7:
+                    i += 2
+                    continue
+                i += 2 + struct.unpack('>H', dados[i + 2:i + 4])[0]
+    except struct.error:
+        pass
+    return (None, None)
+
+
+def salvar_imagem_data_url(texto: str) -> dict:
+    """Guarda a imagem de uma data URL e retorna {'imagem_hash', 'imagem_largura', 'imagem_altura'}."""
+    dados = ler_data_url(texto)
+    if tipo_imagem(dados) is None:
+        raise BlobInvalido("Formato de imagem não suportado (use PNG, JPEG, GIF ou WebP).")
+    largura, altura = dimensoes_imagem(dados)
+    return {'imagem_hash': salvar_blob(dados), 'imagem_largura': largura, 'imagem_altura': altura}
+
+
+def coletar_lixo(referenciados, carencia_s=3600, simular=False):
+    """
+    Apaga os blobs cujo hash não está em 'referenciados' e que não foram gravados (ou
+    reaproveitados) nos últimos 'carencia_s' segundos: um upload novo só vira referência
+    quando o mapa é salvo no banco. Também limpa temporários esquecidos.
+    Retorna (arquivos, bytes) removidos (ou que seriam, com 'simular').
+    """
+    referenciados = set(referenciados)
+    limite = time.time() - carencia_s
+    removidos = liberados = 0
+    if not os.path.isdir(PASTA_BLOBS):
+        return 0, 0
+    for prefixo in os.listdir(PASTA_BLOBS):
+        pasta = os.path.join(PASTA_BLOBS, prefixo)
+        if len(prefixo) != 2 or not os.path.isdir(pasta):
+            continue  # miniaturas/ e outras pastas ficam com quem as criou
+        for nome in os.listdir(pasta):
+            caminho = os.path.join(pasta, nome)
+            lixo = nome.startswith('.tmp-') or (hash_valido(nome) and nome not in referenciados)
+            try:
+                info = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            if not lixo or info.st_mtime > limite:
+                continue
+            if not simular:
+                try:
+                    os.unlink(caminho)
+                except FileNotFoundError:
+                    continue
+            removidos += 1
+            liberados += info.st_size
+    return removidos, liberados
@@ -0,0 +1,148 @@
+# database/compendio.py
+
+# Cache em memória do compêndio (itens e habilidades) com os efeitos JÁ compilados.
+#
+# - Os efeitos de 'itens_base' e 'habilidades_base' são compilados uma única vez, na primeira
+#   consulta, e reaproveitados por todo o motor de combate.
+# - A versão do compêndio vem do BANCO: gatilhos em monstros_base/itens_base/habilidades_base
+#   incrementam 'compendio_versao' a cada INSERT/UPDATE/DELETE, inclusive os feitos por outro
+#   worker ou por scripts fora do servidor (editor_mestre, scripts da raiz). A leitura é
+#   guardada por RPG_COMPENDIO_VERSAO_TTL_S (padrão: 1 s); uma mudança na versão de uma tabela
+#   marca seus efeitos para recarga.
+# - A tabela e os gatilhos vêm do db_setup.py (ou de criar_tabela_compendio_versao.py na raiz,
+#   para bancos existentes); aqui só há SELECT. Sem a tabela, a versão volta a ser só deste
+#   processo (contada em notificar_alteracao), com um aviso.
+# - Toda alteração feita por este processo (CRUD em db_manager) chama 'notificar_alteracao',
+#   que relê a versão na hora, marca a tabela para recarga e avisa os "ouvintes" registrados
+#   (ex: caches e sorteios).
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from ..core.efeitos import compilar_efeitos, EfeitoInvalido
+except ImportError:
+    # app.py (legado) importa 'database' como pacote de topo; ver db_manager.
+    from core.efeitos import compilar_efeitos, EfeitoInvalido
+from .instrumentacao import conectar
+
+# Tabelas cujos efeitos ficam em cache aqui.
+TABELAS_COM_EFEITO = ('itens_base', 'habilidades_base')
+# Tabelas cuja versão é contada no banco.
+TABELAS_VERSIONADAS = ('monstros_base',) + TABELAS_COM_EFEITO
+TTL_VERSAO_S = float(os.environ.get('RPG_COMPENDIO_VERSAO_TTL_S', '1'))
+
+_trava = threading.RLock()
+_versoes = {}          # { tabela: versão no banco } da última leitura
+_versoes_lidas_em = None
+_alteracoes_locais = {}  # { tabela: n } usado só se o banco não tiver 'compendio_versao'
+_avisou_sem_tabela = False
+_efeitos = {}          # { tabela: { nome: (Efeito, ...) } }
+_sujas = set(TABELAS_COM_EFEITO)  # tabelas que precisam ser (re)carregadas
+_ouvintes = []
+
+
+def _ler_versoes() -> dict:
+    """Versões gravadas pelos gatilhos, ou None se o banco ainda não tem a tabela 'compendio_versao'."""
+    global _avisou_sem_tabela
+    from .db_manager import NOME_DB  # importação tardia: db_manager também importa este módulo
+    try:
+        with conectar(NOME_DB) as conexao:
+            return dict(conexao.execute("SELECT tabela, versao FROM compendio_versao"))
+    except sqlite3.OperationalError as e:
+        if 'no such table' not in str(e):
+            raise
+        if not _avisou_sem_tabela:
+            _avisou_sem_tabela = True
+            print("AVISO: tabela 'compendio_versao' não existe (rode criar_tabela_compendio_versao.py); "
+                  "a versão do compêndio só verá as alterações deste processo.")
+        return None
+
+
+def versoes(fresca: bool = False) -> dict:
+    """Versão de cada tabela do compêndio no banco; relida se 'fresca' ou depois do TTL."""
+    global _versoes, _versoes_lidas_em
+    agora = time.monotonic()
+    if not fresca and _versoes_lidas_em is not None and agora - _versoes_lidas_em < TTL_VERSAO_S:
+        return _versoes
+    try:
+        novas = _ler_versoes()
+        if novas is None:
+            novas = {tabela: _alteracoes_locais.get(tabela, 0) for tabela in TABELAS_VERSIONADAS}
+    except sqlite3.Error as e:
+        print(f"Erro ao ler a versão do compêndio: {e}")
+        _versoes_lidas_em = agora  # tenta de novo só depois do TTL
+        return _versoes
+    with _trava:
+        for tabela in TABELAS_COM_EFEITO:
+            if tabela in _versoes and novas.get(tabela) != _versoes[tabela]:
+                _sujas.add(tabela)
+        _versoes, _versoes_lidas_em = novas, agora
+    return novas
+
+
+def versao() -> int:
+    """Número que muda a cada alteração do compêndio, igual em todos os processos (útil para ETags)."""
+    return sum(versoes().values())
+
+
+def registrar_ouvinte(funcao):
+    """Registra funcao(tabela, registro_id), chamada após cada alteração do compêndio."""
+    with _trava:
+        if funcao not in _ouvintes:
+            _ouvintes.append(funcao)
+    return funcao
+
+
+def notificar_alteracao(tabela: str, registro_id=None):
+    """Chamado pelo db_manager após criar/atualizar/apagar algo em uma tabela do compêndio."""
+    with _trava:
+        _alteracoes_locais[tabela] = _alteracoes_locais.get(tabela, 0) + 1
+    versoes(fresca=True)
+    with _trava:
+        if tabela in TABELAS_COM_EFEITO:
+            _sujas.add(tabela)
+        ouvintes = list(_ouvintes)
+    for funcao in ouvintes:
+        try:
+            funcao(tabela, registro_id)
+        except Exception as e:
+            print(f"Erro em ouvinte do compêndio ({tabela}): {e}")
+
+
+def _carregar_tabela(tabela: str) -> dict:
+    """Lê 'nome, efeito' de uma tabela e compila os efeitos. Efeitos inválidos antigos viram tupla vazia."""
+    from .db_manager import NOME_DB  # importação tardia: db_manager também importa este módulo
+    compilados = {}
+    try:
+        with conectar(NOME_DB) as conexao:
+            for nome, texto in conexao.execute(f"SELECT nome, efeito FROM {tabela}"):
+                try:
+                    compilados[nome] = compilar_efeitos(texto)
+                except EfeitoInvalido as e:
+                    print(f"AVISO: efeito inválido em {tabela} '{nome}': {e}")
+                    compilados[nome] = ()
+    except sqlite3.Error as e:
+        print(f"Erro ao carregar compêndio ({tabela}): {e}")
+    return compilados
+
+
+def _tabela(tabela: str) -> dict:
+    versoes()  # dentro do TTL não custa nada; depois dele detecta alterações de fora
+    if tabela in _sujas:
+        with _trava:
+            if tabela in _sujas:
+                _efeitos[tabela] = _carregar_tabela(tabela)
+                _sujas.discard(tabela)
+    return _efeitos[tabela]
+
+
+def efeitos_item(nome: str) -> tuple:
+    """Efeitos compilados do item com esse nome (tupla vazia se não houver)."""
+    return _tabela('itens_base').get(nome, ())
+
+
+def efeitos_habilidade(nome: str) -> tuple:
+    """Efeitos compilados da habilidade com esse nome (tupla vazia se não houver)."""
+    return _tabela('habilidades_base').get(nome, ())
@@ -5,24 +5,43 @@ import sqlite3
 import os
 import json
 import bcrypt
-# Importação relativa robusta para acessar o módulo 'monstro'
-from core.monstro import Monstro
+# Importação relativa: o mesmo módulo core.* que o combate usa (backend.core), sem uma segunda cópia.
+try:
+    from ..core.monstro import Monstro
+    from ..core.efeitos import compilar_efeitos
+except ImportError:
+    # app.py (legado) roda de dentro de backend/ e importa 'database' como pacote de topo.
+    from core.monstro import Monstro
+    from core.efeitos import compilar_efeitos
+# Cache do compêndio: é avisado a cada alteração em monstros, itens e habilidades.
+from . import compendio
+# Tabelas de sorteio O(1) para encontros e loot (atualizadas pelo compêndio).
+from . import sorteio
+from .instrumentacao import conectar
+# Lista branca de colunas para ?fields= (projeção feita no próprio SELECT).
+from . import projecao
 
 # --- LÓGICA DE CAMINHO ABSOLUTO E ROBUSTO ---
 # Garante que o caminho para o banco de dados seja sempre encontrado corretamente.
+# RPG_DB_PATH aponta para outro arquivo (ex: uma cópia usada pelos benchmarks de carga).
 script_dir = os.path.dirname(os.path.abspath(__file__))
-NOME_DB = os.path.join(script_dir, 'campanhas.db')
+NOME_DB = os.environ.get('RPG_DB_PATH') or os.path.join(script_dir, 'campanhas.db')
 
 # --- Funções de Busca ---
 
-def buscar_monstro_aleatorio():
-    """Conecta ao DB, busca um monstro aleatório e retorna um objeto Monstro."""
+def buscar_monstro_aleatorio(tipo=None, faixa_cr=None, oficial=None):
+    """
+    Sorteia um monstro (com filtros opcionais) e retorna um objeto Monstro.
+    O sorteio usa as tabelas de alias de 'sorteio' (O(1)); o banco só é lido pela chave primária.
+    """
+    monstro_id = sorteio.sortear_monstro_id(tipo=tipo, faixa_cr=faixa_cr, oficial=oficial)
+    if monstro_id is None:
+        return None # Nenhum monstro atende aos filtros (ou a tabela está vazia)
     try:
         # 'with' garante que a conexão será fechada automaticamente
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
-            # SQL para selecionar um registro aleatório da tabela
-            cursor.execute("SELECT * FROM monstros_base ORDER BY RANDOM() LIMIT 1")
+            cursor.execute("SELECT * FROM monstros_base WHERE id = ?", (monstro_id,))
             dados_monstro = cursor.fetchone()
         
         if dados_monstro:
@@ -38,13 +57,14 @@ def buscar_monstro_aleatorio():
         print(f"Erro ao buscar monstro no banco de dados: {e}")
         return None
 
-def buscar_todos_os_itens(nome=None, categoria=None, oficial=None, criador_id=None):
-    """Busca itens com filtros opcionais."""
+def buscar_todos_os_itens(nome=None, categoria=None, oficial=None, criador_id=None, campos=None):
+    """Busca itens com filtros opcionais. 'campos' limita as colunas (lança projecao.CampoInvalido)."""
+    colunas = projecao.colunas('itens_base', campos)
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
-            query = "SELECT * FROM itens_base WHERE 1=1"
+            query = f"SELECT {colunas} FROM itens_base WHERE 1=1"
             params = []
             if nome:
                 query += " AND nome LIKE ?"
@@ -68,7 +88,7 @@ def buscar_todos_os_itens(nome=None, categoria=None, oficial=None, criador_id=No
 def buscar_item_por_id(item_id):
     """Busca um item completo por ID."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             cursor.execute("SELECT * FROM itens_base WHERE id = ?", (item_id,))
@@ -80,7 +100,7 @@ def buscar_item_por_id(item_id):
 def buscar_categorias_itens():
     """Retorna lista de categorias únicas para filtro."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute("SELECT DISTINCT categoria FROM itens_base WHERE categoria IS NOT NULL ORDER BY categoria")
             return [r[0] for r in cursor.fetchall() if r[0]]
@@ -91,7 +111,7 @@ def buscar_detalhes_itens(nomes_dos_itens: list):
     """Busca os detalhes de uma lista específica de nomes de itens."""
     if not nomes_dos_itens: return [] # Retorna lista vazia se a entrada for vazia
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             # Cria os 'placeholders' (?) dinamicamente para a consulta 'IN'
             placeholders = ', '.join('?' for _ in nomes_dos_itens)
@@ -106,7 +126,7 @@ def buscar_detalhes_habilidades(nomes_das_habilidades: list):
     """Busca os detalhes de uma lista específica de nomes de habilidades."""
     if not nomes_das_habilidades: return []
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             placeholders = ', '.join('?' for _ in nomes_das_habilidades)
             query = f"SELECT * FROM habilidades_base WHERE nome IN ({placeholders})"
@@ -116,13 +136,15 @@ def buscar_detalhes_habilidades(nomes_das_habilidades: list):
         print(f"Erro ao buscar detalhes de habilidades: {e}")
         return []
 
-def buscar_todos_os_monstros(nome=None, oficial=None, tipo=None, criador_id=None):
-    """Busca monstros com filtros opcionais: nome, oficial (0/1), tipo."""
+def buscar_todos_os_monstros(nome=None, oficial=None, tipo=None, criador_id=None, campos=None):
+    """Busca monstros com filtros opcionais: nome, oficial (0/1), tipo. 'campos' limita as colunas."""
+    projecao.colunas('monstros_base', campos)  # valida antes de abrir a conexão
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
+            colunas = projecao.colunas('monstros_base', campos, conexao=conexao)
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
-            query = "SELECT * FROM monstros_base WHERE 1=1"
+            query = f"SELECT {colunas} FROM monstros_base WHERE 1=1"
             params = []
             if nome:
                 query += " AND nome LIKE ?"
@@ -146,7 +168,7 @@ def buscar_todos_os_monstros(nome=None, oficial=None, tipo=None, criador_id=None
 def buscar_monstro_por_id(monstro_id):
     """Busca um monstro completo por ID."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             cursor.execute("SELECT * FROM monstros_base WHERE id = ?", (monstro_id,))
@@ -159,7 +181,7 @@ def buscar_monstro_por_id(monstro_id):
 def buscar_tipos_monstros():
     """Retorna lista de tipos únicos de monstros para filtro."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute("SELECT DISTINCT tipo FROM monstros_base WHERE tipo IS NOT NULL ORDER BY tipo")
             return [row[0] for row in cursor.fetchall() if row[0]]
@@ -175,7 +197,7 @@ def criar_novo_monstro(dados):
     Retorna o novo monstro como um dicionário em caso de sucesso, ou None.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row 
             cursor = conexao.cursor()
             cursor.execute(
@@ -207,8 +229,10 @@ def criar_novo_monstro(dados):
             )
             novo_id = cursor.lastrowid
             cursor.execute("SELECT * FROM monstros_base WHERE id = ?", (novo_id,))
-            novo_monstro_db = cursor.fetchone()
-            return dict(novo_monstro_db)
+            novo_monstro_db = dict(cursor.fetchone())
+        # Avisa o compêndio só depois do commit (saída do 'with').
+        compendio.notificar_alteracao('monstros_base', novo_id)
+        return novo_monstro_db
     except sqlite3.IntegrityError:
         print(f"Erro de integridade: Monstro com nome '{dados['nome']}' já existe.")
         return None
@@ -221,7 +245,7 @@ def atualizar_monstro_existente(monstro_id, dados):
     (UPDATE) Atualiza um monstro existente na tabela 'monstros_base'.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             cursor.execute(
@@ -238,8 +262,9 @@ def atualizar_monstro_existente(monstro_id, dados):
                 print(f"Erro ao atualizar: Monstro ID {monstro_id} não encontrado.")
                 return None 
             cursor.execute("SELECT * FROM monstros_base WHERE id = ?", (monstro_id,))
-            monstro_atualizado_db = cursor.fetchone()
-            return dict(monstro_atualizado_db)
+            monstro_atualizado_db = dict(cursor.fetchone())
+        compendio.notificar_alteracao('monstros_base', monstro_id)
+        return monstro_atualizado_db
     except sqlite3.IntegrityError:
         print(f"Erro de integridade: Nome '{dados['nome']}' já está em uso por outro monstro.")
         return None
@@ -252,13 +277,14 @@ def apagar_monstro_base(monstro_id):
     (DELETE) Apaga um monstro da tabela 'monstros_base'.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute("DELETE FROM monstros_base WHERE id = ?", (monstro_id,))
             if cursor.rowcount == 0:
                 print(f"Erro ao apagar: Monstro ID {monstro_id} não encontrado.")
                 return False 
-            return True
+        compendio.notificar_alteracao('monstros_base', monstro_id)
+        return True
     except Exception as e:
         print(f"Erro ao apagar monstro: {e}")
         return False
@@ -273,9 +299,12 @@ def criar_novo_item(dados):
     (CREATE) Insere um novo item na tabela 'itens_base'.
     'dados' é um dicionário vindo da API.
     Retorna o novo item como um dicionário em caso de sucesso, ou None.
+    Lança EfeitoInvalido (ValueError) se o texto de 'efeito' não puder ser compilado.
     """
+    # Valida o efeito ANTES de tocar no banco; o erro sobe para a rota responder 400.
+    compilar_efeitos(dados.get('efeito'))
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row 
             cursor = conexao.cursor()
             
@@ -305,10 +334,11 @@ def criar_novo_item(dados):
             
             # Busca o item recém-criado no banco
             cursor.execute("SELECT * FROM itens_base WHERE id = ?", (novo_id,))
-            novo_item_db = cursor.fetchone()
-            
-            # Retorna o novo item como um dicionário
-            return dict(novo_item_db)
+            novo_item_db = dict(cursor.fetchone())
+
+        # Avisa o compêndio (após o commit) e retorna o novo item como um dicionário
+        compendio.notificar_alteracao('itens_base', novo_id)
+        return novo_item_db
             
     except sqlite3.IntegrityError:
         # Este erro acontece se o 'nome' do item já existir (devido ao UNIQUE)
@@ -321,9 +351,11 @@ def criar_novo_item(dados):
 def atualizar_item_existente(item_id, dados):
     """
     (UPDATE) Atualiza um item existente na tabela 'itens_base'.
+    Lança EfeitoInvalido (ValueError) se o texto de 'efeito' não puder ser compilado.
     """
+    compilar_efeitos(dados.get('efeito'))
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             
@@ -350,10 +382,11 @@ def atualizar_item_existente(item_id, dados):
 
             # Busca o item que acabamos de atualizar
             cursor.execute("SELECT * FROM itens_base WHERE id = ?", (item_id,))
-            item_atualizado_db = cursor.fetchone()
-            
-            # Retorna o item atualizado como um dicionário
-            return dict(item_atualizado_db)
+            item_atualizado_db = dict(cursor.fetchone())
+
+        # Avisa o compêndio e retorna o item atualizado como um dicionário
+        compendio.notificar_alteracao('itens_base', item_id)
+        return item_atualizado_db
 
     except sqlite3.IntegrityError:
         # Ocorre se o Mestre tentar renomear para um nome que já existe
@@ -368,7 +401,7 @@ def apagar_item_base(item_id):
     (DELETE) Apaga um item da tabela 'itens_base'.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             
             # Executa o comando DELETE para o ID específico
@@ -378,8 +411,9 @@ def apagar_item_base(item_id):
             if cursor.rowcount == 0:
                 print(f"Erro ao apagar: Item ID {item_id} não encontrado.")
                 return False # Item não encontrado
-                
-            return True
+
+        compendio.notificar_alteracao('itens_base', item_id)
+        return True
             
     except Exception as e:
         print(f"Erro ao apagar item: {e}")
@@ -393,9 +427,11 @@ def apagar_item_base(item_id):
 def criar_nova_habilidade(dados):
     """
     (CREATE) Insere uma nova habilidade na tabela 'habilidades_base'.
+    Lança EfeitoInvalido (ValueError) se o texto de 'efeito' não puder ser compilado.
     """
+    compilar_efeitos(dados.get('efeito'))
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row 
             cursor = conexao.cursor()
             
@@ -413,8 +449,9 @@ def criar_nova_habilidade(dados):
             
             novo_id = cursor.lastrowid
             cursor.execute("SELECT * FROM habilidades_base WHERE id = ?", (novo_id,))
-            nova_habilidade_db = cursor.fetchone()
-            return dict(nova_habilidade_db)
+            nova_habilidade_db = dict(cursor.fetchone())
+        compendio.notificar_alteracao('habilidades_base', novo_id)
+        return nova_habilidade_db
             
     except sqlite3.IntegrityError:
         print(f"Erro de integridade: Habilidade com nome '{dados['nome']}' já existe.")
@@ -426,9 +463,11 @@ def criar_nova_habilidade(dados):
 def atualizar_habilidade_existente(habilidade_id, dados):
     """
     (UPDATE) Atualiza uma habilidade existente na 'habilidades_base'.
+    Lança EfeitoInvalido (ValueError) se o texto de 'efeito' não puder ser compilado.
     """
+    compilar_efeitos(dados.get('efeito'))
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             
@@ -450,8 +489,9 @@ def atualizar_habilidade_existente(habilidade_id, dados):
                 return None
 
             cursor.execute("SELECT * FROM habilidades_base WHERE id = ?", (habilidade_id,))
-            habilidade_atualizada_db = cursor.fetchone()
-            return dict(habilidade_atualizada_db)
+            habilidade_atualizada_db = dict(cursor.fetchone())
+        compendio.notificar_alteracao('habilidades_base', habilidade_id)
+        return habilidade_atualizada_db
 
     except sqlite3.IntegrityError:
         print(f"Erro de integridade: Nome '{dados['nome']}' já está em uso por outra habilidade.")
@@ -465,13 +505,14 @@ def apagar_habilidade_base(habilidade_id):
     (DELETE) Apaga uma habilidade da tabela 'habilidades_base'.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute("DELETE FROM habilidades_base WHERE id = ?", (habilidade_id,))
             if cursor.rowcount == 0:
                 print(f"Erro ao apagar: Habilidade ID {habilidade_id} não encontrada.")
                 return False 
-            return True
+        compendio.notificar_alteracao('habilidades_base', habilidade_id)
+        return True
     except Exception as e:
         print(f"Erro ao apagar habilidade: {e}")
         return False
@@ -479,16 +520,17 @@ def apagar_habilidade_base(habilidade_id):
 # --- FIM - CRUD DE HABILIDADES ---
 
 
-def buscar_fichas_por_usuario(usuario_id):
+def buscar_fichas_por_usuario(usuario_id, campos=None):
     """Busca todas as fichas de personagem que pertencem a um ID de usuário específico."""
+    # Sem 'campos', só os dados da "lista" de fichas.
+    colunas = projecao.colunas('fichas_personagem', campos, padrao="id, nome_personagem, classe, nivel")
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             # sqlite3.Row permite acessar os resultados por nome da coluna (como um dict)
             conexao.row_factory = sqlite3.Row 
             cursor = conexao.cursor()
             cursor.execute(
-                # Seleciona apenas os dados para a "lista" de fichas
-                "SELECT id, nome_personagem, classe, nivel FROM fichas_personagem WHERE usuario_id = ?",
+                f"SELECT {colunas} FROM fichas_personagem WHERE usuario_id = ?",
                 (usuario_id,)
             )
             # Converte os resultados de 'Row' para dicionários Python
@@ -501,7 +543,7 @@ def buscar_fichas_por_usuario(usuario_id):
 def buscar_ficha_por_id(ficha_id, usuario_id):
     """Busca os detalhes completos de uma única ficha, verificando a posse."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             # A consulta 'WHERE' verifica o ID da ficha E o ID do dono
@@ -520,7 +562,7 @@ def buscar_ficha_por_id(ficha_id, usuario_id):
 def buscar_dados_essenciais_ficha(ficha_id, usuario_id):
     """Busca o nome e a classe de uma ficha específica, verificando a posse."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             # Verificação de segurança: O usuário (token) é dono desta ficha?
@@ -536,6 +578,30 @@ def buscar_dados_essenciais_ficha(ficha_id, usuario_id):
         print(f"Erro ao buscar dados essenciais da ficha: {e}")
         return None
 
+def buscar_fichas_para_simulacao(fichas_ids: list, usuario_id: int, outras_permitidas=()):
+    """
+    Busca os dados de combate (nível e atributos) de uma lista de fichas.
+    Só volta ficha do próprio usuário ou das 'outras_permitidas' (ex: jogadores da campanha);
+    o resto é ignorado, e quem chama compara a quantidade para recusar o pedido.
+    """
+    if not fichas_ids: return []
+    permitidas = list(outras_permitidas)
+    try:
+        with conectar(NOME_DB) as conexao:
+            conexao.row_factory = sqlite3.Row
+            cursor = conexao.cursor()
+            placeholders = ', '.join('?' for _ in fichas_ids)
+            extras = f" OR id IN ({', '.join('?' for _ in permitidas)})" if permitidas else ""
+            cursor.execute(
+                f"SELECT id, nome_personagem, classe, nivel, atributos_json FROM fichas_personagem "
+                f"WHERE id IN ({placeholders}) AND (usuario_id = ?{extras})",
+                [*fichas_ids, usuario_id, *permitidas]
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Erro ao buscar fichas para simulação: {e}")
+        return []
+
 # --- Funções de Autenticação e Usuário ---
 
 def registrar_novo_usuario(nome_usuario, senha_texto_puro):
@@ -546,7 +612,7 @@ def registrar_novo_usuario(nome_usuario, senha_texto_puro):
         # Gera o 'salt' e cria o hash da senha
         senha_hash = bcrypt.hashpw(senha_bytes, bcrypt.gensalt())
         
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             # Insere o novo usuário (o 'role' será 'player' por padrão, como definido no db_setup.py)
             cursor.execute(
@@ -566,7 +632,7 @@ def verificar_login(nome_usuario, senha_texto_puro):
     Verifica o login. Retorna um dicionário com ID e Papel em caso de sucesso, ou None.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             # ATUALIZAÇÃO: Agora buscamos o 'id', 'senha_hash' E o 'role'.
             cursor.execute(
@@ -602,7 +668,7 @@ def criar_nova_ficha(usuario_id, nome_personagem, classe, raca, antecedente, atr
         atributos_str_json = json.dumps(atributos)
         pericias_str_json = json.dumps(pericias)
         
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 # Insere a ficha (XP e Nível já têm valores DEFAULT na tabela)
@@ -621,7 +687,7 @@ def atualizar_ficha(ficha_id, usuario_id, novos_dados):
         atributos_str_json = json.dumps(novos_dados['atributos'])
         pericias_str_json = json.dumps(novos_dados['pericias'])
         
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute("""
                 UPDATE fichas_personagem 
@@ -645,7 +711,7 @@ def atualizar_ficha(ficha_id, usuario_id, novos_dados):
 def apagar_ficha(ficha_id, usuario_id):
     """Apaga uma ficha do banco de dados, verificando se pertence ao usuário correto."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             # O 'WHERE' garante que um usuário só pode apagar a própria ficha
             cursor.execute(
@@ -668,7 +734,7 @@ def adicionar_xp_e_upar(ficha_id, quantidade_xp):
     conexao = None
     try:
         # Precisamos de uma conexão que não use 'with' para gerenciar o 'commit'
-        conexao = sqlite3.connect(NOME_DB)
+        conexao = conectar(NOME_DB)
         conexao.row_factory = sqlite3.Row
         cursor = conexao.cursor()
         
@@ -734,7 +800,7 @@ def criar_nova_sala(nome_sala, senha, mestre_id):
             senha_bytes = senha.encode('utf-8')
             senha_hash = bcrypt.hashpw(senha_bytes, bcrypt.gensalt())
             
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 # 'mestre_id' vem do token do usuário que criou a sala
@@ -751,7 +817,7 @@ def criar_nova_sala(nome_sala, senha, mestre_id):
 def listar_salas_disponiveis():
     """Busca todas as salas e o nome do Mestre de cada uma."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             # SQL 'JOIN' para pegar o nome do mestre (da tabela 'usuarios')
@@ -771,7 +837,7 @@ def listar_salas_disponiveis():
 def banir_usuario_sala(sala_id, usuario_id):
     """Adiciona um usuário à lista de banidos de uma sala."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 "INSERT OR IGNORE INTO banidos_sala (sala_id, usuario_id) VALUES (?, ?)",
@@ -786,7 +852,7 @@ def banir_usuario_sala(sala_id, usuario_id):
 def verificar_banido(sala_id, usuario_id):
     """Retorna True se o usuário estiver banido da sala."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 "SELECT id FROM banidos_sala WHERE sala_id = ? AND usuario_id = ?",
@@ -800,7 +866,7 @@ def verificar_banido(sala_id, usuario_id):
 def apagar_sala(sala_id, mestre_id):
     """Apaga uma sala do banco, apenas se o usuário for o Mestre dela."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             # Verifica se a sala existe e pertence ao mestre
             cursor.execute("SELECT id FROM salas WHERE id = ? AND mestre_id = ?", (sala_id, mestre_id))
@@ -816,7 +882,7 @@ def apagar_sala(sala_id, mestre_id):
 def verificar_senha_da_sala(sala_id, senha_texto_puro):
     """Verifica se a senha fornecida para uma sala corresponde ao hash no DB."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 "SELECT senha_hash FROM salas WHERE id = ?",
@@ -843,7 +909,7 @@ def verificar_senha_da_sala(sala_id, senha_texto_puro):
 def buscar_mestre_da_sala(sala_id):
     """Busca o ID do usuário que é o Mestre de uma sala específica."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 "SELECT mestre_id FROM salas WHERE id = ?",
@@ -861,7 +927,7 @@ def buscar_jogadores_na_sala(sala_id):
     Busca todas as fichas ativas em uma sala.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             # ATENÇÃO: Esta query é uma simplificação.
@@ -875,7 +941,7 @@ def buscar_jogadores_na_sala(sala_id):
 def buscar_anotacoes(usuario_id, sala_id):
     """Busca as anotações de um jogador para uma sala específica."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 "SELECT notas FROM anotacoes_jogador WHERE usuario_id = ? AND sala_id = ?",
@@ -890,7 +956,7 @@ def buscar_anotacoes(usuario_id, sala_id):
 def salvar_anotacoes(usuario_id, sala_id, notas):
     """Salva ou atualiza as anotações de um jogador para uma sala."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             # 'INSERT OR REPLACE' (UPSERT) é perfeito aqui:
             # Cria se não existe, atualiza se existe (baseado na UNIQUE key (usuario_id, sala_id))
@@ -907,7 +973,7 @@ def salvar_anotacoes(usuario_id, sala_id, notas):
 def buscar_inventario_sala(ficha_id, sala_id):
     """Busca o inventário de um personagem específico em uma sala específica."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             cursor.execute(
@@ -920,16 +986,17 @@ def buscar_inventario_sala(ficha_id, sala_id):
         print(f"Erro ao buscar inventário da sala: {e}")
         return []
     
-def buscar_todas_as_habilidades():
-    #Busca todas as habilidades da tabela 'habilidades_base'.
+def buscar_todas_as_habilidades(campos=None):
+    #Busca todas as habilidades da tabela 'habilidades_base' ('campos' limita as colunas).
+    colunas = projecao.colunas('habilidades_base', campos)
     try:
         # Conecta ao banco de dados
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             # Configura para retornar resultados como dicionários (opcional, mas bom para API)
             conexao.row_factory = sqlite3.Row 
             cursor = conexao.cursor()
             # Executa a query para selecionar todas as habilidades, ordenadas por nome
-            cursor.execute("SELECT * FROM habilidades_base ORDER BY nome")
+            cursor.execute(f"SELECT {colunas} FROM habilidades_base ORDER BY nome")
             # Converte o resultado em uma lista de dicionários
             habilidades = [dict(row) for row in cursor.fetchall()]
             # Retorna a lista
@@ -942,7 +1009,7 @@ def buscar_todas_as_habilidades():
 def adicionar_item_sala(ficha_id, sala_id, nome_item, descricao):
     """Adiciona um novo item ao inventário de um personagem na sala."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 "INSERT INTO inventario_sala (ficha_id, sala_id, nome_item, descricao) VALUES (?, ?, ?, ?)",
@@ -957,7 +1024,7 @@ def adicionar_item_sala(ficha_id, sala_id, nome_item, descricao):
 def transferir_mestre_sala(sala_id, novo_mestre_id):
     """Atualiza o mestre_id de uma sala para o novo mestre."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 "UPDATE salas SET mestre_id = ? WHERE id = ?",
@@ -972,7 +1039,7 @@ def transferir_mestre_sala(sala_id, novo_mestre_id):
 def apagar_item_sala(item_id, ficha_id):
     """Apaga um item do inventário da sala, verificando a posse."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             # O 'WHERE' garante que só o dono da ficha (ficha_id) pode apagar o item
             cursor.execute(
@@ -990,7 +1057,7 @@ def apagar_item_sala(item_id, ficha_id):
 def salvar_mensagem_chat(sala_id, remetente, mensagem):
     """Salva uma nova mensagem no histórico da sala."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute(
                 "INSERT INTO historico_chat (sala_id, remetente, mensagem) VALUES (?, ?, ?)",
@@ -1001,10 +1068,24 @@ def salvar_mensagem_chat(sala_id, remetente, mensagem):
         print(f"Erro ao salvar mensagem do chat: {e}")
         return False
 
+def arquivar_batalha(sala_id, estado_json, motivo):
+    """Guarda o estado final de uma batalha que saiu da memória (ex: abandonada). Retorna o id ou None."""
+    try:
+        with conectar(NOME_DB) as conexao:
+            cursor = conexao.cursor()
+            cursor.execute(
+                "INSERT INTO batalhas_arquivadas (sala_id, estado_json, motivo) VALUES (?, ?, ?)",
+                (sala_id, estado_json, motivo)
+            )
+            return cursor.lastrowid
+    except Exception as e:
+        print(f"Erro ao arquivar batalha da sala {sala_id}: {e}")
+        return None
+
 def buscar_historico_chat(sala_id):
     """Busca todas as mensagens do histórico de uma sala."""
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             # Busca as mensagens em ordem de 'timestamp' (padrão)
             cursor.execute(
@@ -1028,7 +1109,7 @@ def buscar_dados_cantigas(usuario_id):
     - Quantidade de salas visitadas (histórico único)
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             
@@ -1062,7 +1143,7 @@ def buscar_historico_salas(usuario_id):
     Retorna: Nome da Sala, Nome da Ficha usada, Data de Acesso.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             conexao.row_factory = sqlite3.Row
             cursor = conexao.cursor()
             
@@ -1092,7 +1173,7 @@ def registrar_acesso_sala(usuario_id, sala_id, ficha_id=None):
     Atualiza o timestamp se já existir registro recente (opcional, aqui vamos sempre inserir novo para histórico).
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             cursor.execute("""
                 INSERT INTO historico_salas (usuario_id, sala_id, ficha_id)
@@ -1108,7 +1189,7 @@ def atualizar_credenciais_usuario(usuario_id, novo_nome, nova_senha):
     Atualiza o nome de usuário e/ou senha.
     """
     try:
-        with sqlite3.connect(NOME_DB) as conexao:
+        with conectar(NOME_DB) as conexao:
             cursor = conexao.cursor()
             
             updates = []
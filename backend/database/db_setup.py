@@ -157,6 +157,9 @@ CREATE TABLE campanha_mapas (
     nome TEXT,
     descricao TEXT,
     imagem_data TEXT,
+    imagem_hash TEXT,
+    imagem_largura INTEGER,
+    imagem_altura INTEGER,
     visivel INTEGER DEFAULT 0,
     ordem INTEGER DEFAULT 0,
     FOREIGN KEY (campanha_id) REFERENCES campanhas_mestre (id) ON DELETE CASCADE
@@ -234,6 +237,34 @@ CREATE TABLE sala_campanha (
 """)
 print("Tabela 'sala_campanha' criada com sucesso!")
 
+cursor.execute("""
+CREATE TABLE batalhas_arquivadas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sala_id INTEGER NOT NULL,
+    estado_json TEXT NOT NULL, -- Estado completo da batalha (combatentes, turno, log)
+    motivo TEXT NOT NULL,      -- Ex: 'ociosa' (arquivada pela varredura)
+    arquivada_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (sala_id) REFERENCES salas (id) ON DELETE CASCADE
+);
+""")
+print("Tabela 'batalhas_arquivadas' criada com sucesso!")
+
+# Versão do compêndio (ver database/compendio.py): gatilhos contam cada alteração nas tabelas base.
+cursor.execute("""
+CREATE TABLE compendio_versao (
+    tabela TEXT PRIMARY KEY,
+    versao INTEGER NOT NULL DEFAULT 0
+);
+""")
+for tabela in ('monstros_base', 'itens_base', 'habilidades_base'):
+    cursor.execute("INSERT INTO compendio_versao (tabela, versao) VALUES (?, 0)", (tabela,))
+    for operacao in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f"""
+        CREATE TRIGGER trg_versao_{tabela}_{operacao.lower()} AFTER {operacao} ON {tabela}
+        BEGIN UPDATE compendio_versao SET versao = versao + 1 WHERE tabela = '{tabela}'; END;
+        """)
+print("Tabela 'compendio_versao' e gatilhos criados com sucesso!")
+
 # Salva permanentemente todas as alterações no arquivo do banco de dados.
 conexao.commit()
 # Encerra a conexão.
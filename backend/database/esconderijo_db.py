@@ -5,12 +5,34 @@ Adicione ao db_manager.py ou importe separadamente.
 """
 import sqlite3, os
 
-NOME_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'campanhas.db')
+from .instrumentacao import conectar
+from . import projecao
+from . import blobs
+from . import miniaturas
+
+NOME_DB = os.environ.get('RPG_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'campanhas.db')
+
+# Colunas da imagem do mapa no blob store (ver blobs.py e migrar_mapas_blobs.py).
+COLUNAS_IMAGEM_MAPA = (('imagem_hash', 'TEXT'), ('imagem_largura', 'INTEGER'), ('imagem_altura', 'INTEGER'))
+_esquema_verificado = False
+
+def _garantir_colunas_mapa(conn):
+    """Adiciona as colunas de imagem em bancos antigos (uma vez por processo)."""
+    global _esquema_verificado
+    existentes = {r[1] for r in conn.execute("PRAGMA table_info(campanha_mapas)")}
+    if existentes:
+        for nome, tipo in COLUNAS_IMAGEM_MAPA:
+            if nome not in existentes:
+                conn.execute(f"ALTER TABLE campanha_mapas ADD COLUMN {nome} {tipo}")
+        conn.commit()
+    _esquema_verificado = True
 
 def _db():
-    conn = sqlite3.connect(NOME_DB)
+    conn = conectar(NOME_DB)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    if not _esquema_verificado:
+        _garantir_colunas_mapa(conn)
     return conn
 
 # ─── CAMPANHAS ────────────────────────────────────────────────────────────────
@@ -66,9 +88,10 @@ def deletar_campanha(campanha_id, criador_id):
         return r.rowcount > 0
 
 # ─── GENÉRICO para sub-recursos ───────────────────────────────────────────────
-def _listar(tabela, campanha_id):
+def _listar(tabela, campanha_id, campos=None):
+    colunas = projecao.colunas(tabela, campos)
     with _db() as c:
-        rows = c.execute(f"SELECT * FROM {tabela} WHERE campanha_id=? ORDER BY id", (campanha_id,)).fetchall()
+        rows = c.execute(f"SELECT {colunas} FROM {tabela} WHERE campanha_id=? ORDER BY id", (campanha_id,)).fetchall()
         return [dict(r) for r in rows]
 
 def _buscar(tabela, item_id):
@@ -87,22 +110,46 @@ def _toggle_visivel(tabela, item_id, visivel):
     return _buscar(tabela, item_id)
 
 # ─── MAPAS ───────────────────────────────────────────────────────────────────
-def listar_mapas(campanha_id):       return _listar('campanha_mapas', campanha_id)
-def buscar_mapa(mapa_id):            return _buscar('campanha_mapas', mapa_id)
+# A imagem fica no blob store; a linha guarda só hash e dimensões.
+# 'imagem_url' aponta para /api/blobs/<hash> e 'miniatura_url' para a versão reduzida usada nas listas
+# (mapas antigos ainda não migrados mantêm 'imagem_data').
+def _com_url(mapa):
+    if mapa and mapa.get('imagem_hash'):
+        mapa['imagem_url'] = f"/api/blobs/{mapa['imagem_hash']}"
+        mapa['miniatura_url'] = f"/api/blobs/{mapa['imagem_hash']}/miniatura/m"
+    return mapa
+
+def listar_mapas(campanha_id, campos=None): return [_com_url(m) for m in _listar('campanha_mapas', campanha_id, campos)]
+def buscar_mapa(mapa_id):            return _com_url(_buscar('campanha_mapas', mapa_id))
 def deletar_mapa(mapa_id, cid):      return _deletar('campanha_mapas', mapa_id, cid)
-def toggle_mapa(mapa_id, v):         return _toggle_visivel('campanha_mapas', mapa_id, v)
+def toggle_mapa(mapa_id, v):         return _com_url(_toggle_visivel('campanha_mapas', mapa_id, v))
+
+def _imagem_para_blob(dados):
+    """Troca 'imagem_data' (data URL) pelas colunas do blob store. Lança blobs.BlobInvalido."""
+    dados = dict(dados)
+    imagem = dados.pop('imagem_data', None)
+    if imagem:
+        dados.update(blobs.salvar_imagem_data_url(imagem))
+        dados['imagem_data'] = None
+        miniaturas.pre_gerar(dados['imagem_hash'])  # em segundo plano
+    return dados
 
 def criar_mapa(campanha_id, dados):
+    dados = _imagem_para_blob(dados)
     with _db() as c:
         cur = c.execute(
-            "INSERT INTO campanha_mapas (campanha_id,nome,descricao,imagem_data,visivel,ordem) VALUES (?,?,?,?,?,?)",
+            "INSERT INTO campanha_mapas (campanha_id,nome,descricao,imagem_hash,imagem_largura,imagem_altura,visivel,ordem) "
+            "VALUES (?,?,?,?,?,?,?,?)",
             (campanha_id, dados.get('nome','Mapa'), dados.get('descricao',''),
-             dados.get('imagem_data',''), 0, dados.get('ordem',0))
+             dados.get('imagem_hash'), dados.get('imagem_largura'), dados.get('imagem_altura'),
+             0, dados.get('ordem',0))
         )
-        return buscar_mapa(cur.lastrowid)
+    return buscar_mapa(cur.lastrowid)  # fora do 'with': só depois do commit a nova conexão enxerga a linha
 
 def atualizar_mapa(mapa_id, dados):
-    campos = ['nome','descricao','imagem_data','visivel','ordem']
+    # 'imagem_data' vazio/ausente mantém a imagem atual.
+    dados  = _imagem_para_blob(dados)
+    campos = ['nome','descricao','imagem_data','imagem_hash','imagem_largura','imagem_altura','visivel','ordem']
     sets   = ', '.join(f"{c}=?" for c in campos if c in dados)
     vals   = [dados[c] for c in campos if c in dados] + [mapa_id]
     if not sets: return None
@@ -111,7 +158,7 @@ def atualizar_mapa(mapa_id, dados):
     return buscar_mapa(mapa_id)
 
 # ─── EVENTOS ─────────────────────────────────────────────────────────────────
-def listar_eventos(campanha_id):     return _listar('campanha_eventos', campanha_id)
+def listar_eventos(campanha_id, campos=None): return _listar('campanha_eventos', campanha_id, campos)
 def buscar_evento(eid):              return _buscar('campanha_eventos', eid)
 def deletar_evento(eid, cid):        return _deletar('campanha_eventos', eid, cid)
 def toggle_evento(eid, v):           return _toggle_visivel('campanha_eventos', eid, v)
@@ -135,7 +182,7 @@ def atualizar_evento(eid, dados):
     return buscar_evento(eid)
 
 # ─── NPCS ───────────────────────────────────────────────────────────────────
-def listar_npcs(campanha_id):        return _listar('campanha_npcs', campanha_id)
+def listar_npcs(campanha_id, campos=None): return _listar('campanha_npcs', campanha_id, campos)
 def buscar_npc(nid):                 return _buscar('campanha_npcs', nid)
 def deletar_npc(nid, cid):           return _deletar('campanha_npcs', nid, cid)
 def toggle_npc(nid, v):              return _toggle_visivel('campanha_npcs', nid, v)
@@ -160,7 +207,7 @@ def atualizar_npc(nid, dados):
     return buscar_npc(nid)
 
 # ─── QUESTS ─────────────────────────────────────────────────────────────────
-def listar_quests(campanha_id):      return _listar('campanha_quests', campanha_id)
+def listar_quests(campanha_id, campos=None): return _listar('campanha_quests', campanha_id, campos)
 def buscar_quest(qid):               return _buscar('campanha_quests', qid)
 def deletar_quest(qid, cid):         return _deletar('campanha_quests', qid, cid)
 def toggle_quest(qid, v):            return _toggle_visivel('campanha_quests', qid, v)
@@ -188,7 +235,7 @@ def atualizar_quest(qid, dados):
     return buscar_quest(qid)
 
 # ─── ANOTAÇÕES ───────────────────────────────────────────────────────────────
-def listar_anotacoes(campanha_id):   return _listar('campanha_anotacoes', campanha_id)
+def listar_anotacoes(campanha_id, campos=None): return _listar('campanha_anotacoes', campanha_id, campos)
 def buscar_anotacao(aid):            return _buscar('campanha_anotacoes', aid)
 def deletar_anotacao(aid, cid):      return _deletar('campanha_anotacoes', aid, cid)
 def toggle_anotacao(aid, v):         return _toggle_visivel('campanha_anotacoes', aid, v)
@@ -210,6 +257,64 @@ def atualizar_anotacao(aid, dados):
         c.execute(f"UPDATE campanha_anotacoes SET {sets} WHERE id=?", vals)
     return buscar_anotacao(aid)
 
+# ─── CAMPANHA COMPLETA (uma leitura só) ──────────────────────────────────────
+# recurso da API -> tabela
+SUBRECURSOS = {
+    'mapas':     'campanha_mapas',
+    'eventos':   'campanha_eventos',
+    'npcs':      'campanha_npcs',
+    'quests':    'campanha_quests',
+    'anotacoes': 'campanha_anotacoes',
+}
+# Colunas que só o mestre vê (removidas na visão de jogador).
+CAMPOS_PRIVADOS = {'descricao_priv', 'detalhes_priv', 'recompensa_priv', 'local_priv'}
+# Sem 'imagem_data' (pesado): só indica se o mapa tem imagem.
+_COLUNAS_MAPA_LEVES = ("id, campanha_id, nome, descricao, visivel, ordem, imagem_hash, imagem_largura, imagem_altura, "
+                       "(imagem_hash IS NOT NULL OR (imagem_data IS NOT NULL AND imagem_data != '')) AS tem_imagem")
+
+def buscar_campanha_completa(campanha_id, criador_id, campos=None, incluir_imagens=False, visao_jogador=False,
+                             membro=False):
+    """
+    Campanha + mapas, eventos, npcs, quests e anotações em UMA conexão e UMA transação de leitura
+    (todas as listas vêm do mesmo instante do banco).
+    campos:          { recurso: (colunas,...) } para projeção (?fields.npcs=nome,papel)
+    incluir_imagens: inclui 'imagem_data' dos mapas (por padrão vem só 'tem_imagem')
+    visao_jogador:   só itens visíveis e sem as colunas privadas do mestre
+    membro:          quem pede joga na campanha; com visao_jogador dispensa ser o criador
+    Retorna None se a campanha não existe e False se ela é de outro usuário (e não vale 'membro').
+    Lança projecao.CampoInvalido para campos fora da lista branca.
+    """
+    campos = campos or {}
+    consultas = {}
+    for recurso, tabela in SUBRECURSOS.items():
+        padrao = '*' if incluir_imagens or recurso != 'mapas' else _COLUNAS_MAPA_LEVES
+        consulta = f"SELECT {projecao.colunas(tabela, campos.get(recurso), padrao)} FROM {tabela} WHERE campanha_id=?"
+        if visao_jogador:
+            consulta += " AND visivel=1"
+        consultas[recurso] = consulta + " ORDER BY id"
+    c = _db()
+    try:
+        c.execute("BEGIN")
+        r = c.execute("SELECT * FROM campanhas_mestre WHERE id=?", (campanha_id,)).fetchone()
+        if not r:
+            return None
+        if r['criador_id'] != criador_id and not (visao_jogador and membro):
+            return False
+        resultado = {'campanha': dict(r)}
+        for recurso, consulta in consultas.items():
+            linhas = [dict(l) for l in c.execute(consulta, (campanha_id,)).fetchall()]
+            if visao_jogador:
+                for linha in linhas:
+                    for privado in CAMPOS_PRIVADOS.intersection(linha):
+                        del linha[privado]
+            if recurso == 'mapas':
+                linhas = [_com_url(l) for l in linhas]
+            resultado[recurso] = linhas
+        return resultado
+    finally:
+        c.rollback()  # só leitura: encerra a transação
+        c.close()
+
 # ─── VÍNCULO SALA <-> CAMPANHA ────────────────────────────────────────────────
 def vincular_sala_campanha(sala_id, campanha_id):
     with _db() as c:
@@ -219,6 +324,10 @@ def vincular_sala_campanha(sala_id, campanha_id):
         )
     return True
 
+def listar_salas_da_campanha(campanha_id):
+    with _db() as c:
+        return [r[0] for r in c.execute("SELECT sala_id FROM sala_campanha WHERE campanha_id=?", (campanha_id,))]
+
 def buscar_campanha_da_sala(sala_id):
     with _db() as c:
         r = c.execute(
@@ -0,0 +1,307 @@
+# database/instrumentacao.py
+
+# Instrumentação das consultas SQLite.
+#
+# 'conectar()' substitui 'sqlite3.connect()' e devolve uma conexão cujos cursores medem
+# cada comando. Guardamos, por "forma" do comando (o SQL com literais trocados por '?'
+# e listas IN (...) colapsadas): execuções, tempo total/médio/máximo e linhas retornadas.
+# Também somamos o tempo por função chamadora (ex: db_manager.buscar_todos_os_monstros).
+#
+# Comandos acima de RPG_SQL_LENTO_MS (padrão: 100 ms) vão para o log junto com o
+# EXPLAIN QUERY PLAN. RPG_SQL_INSTRUMENTAR=0 desliga tudo (conexões sqlite3 puras).
+#
+# Nos modos eventlet/gevent (servidor/execucao.py), 'delegar_bloqueantes()' faz execute,
+# fetch* e commit rodarem numa thread de verdade: o sqlite3 é código C e, chamado direto,
+# pararia todas as green threads enquanto espera o disco ou a trava do banco.
+# Nesse modo as escritas também passam por uma trava (de green thread) do primeiro comando
+# de escrita até o commit/rollback: o SQLite só aceita um escritor por vez e, sem ela, as
+# threads do pool ficariam presas na espera do banco enquanto o commit de quem tem a trava
+# do arquivo aguarda na fila do mesmo pool. Pelo mesmo motivo o banco passa para o modo WAL
+# (leitores não esperam o commit de quem escreve); a mudança fica gravada no arquivo.
+import functools
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+INSTRUMENTAR = os.environ.get('RPG_SQL_INSTRUMENTAR', '1') != '0'
+LIMITE_LENTO_MS = float(os.environ.get('RPG_SQL_LENTO_MS', '100'))
+
+logger = logging.getLogger('rpg_mesa.sql')
+
+_trava = threading.Lock()
+_por_forma = {}   # { forma: [execucoes, tempo_total, tempo_max, linhas] }
+_por_funcao = {}  # { 'modulo.funcao': [execucoes, tempo_total] }
+
+# executar(funcao, *args) dos modos cooperativos; None = chama direto (modo threading).
+_executar = None
+_trava_escrita = threading.RLock()  # só usada nos modos cooperativos (ver ConexaoInstrumentada)
+_bancos_em_wal = set()
+_COMANDOS_ESCRITA = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER',
+                     'BEGIN IMMEDIATE', 'BEGIN EXCLUSIVE')
+
+_REGEX_STRING = re.compile(r"'(?:[^']|'')*'")
+_REGEX_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_REGEX_LISTA_IN = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_REGEX_ESPACOS = re.compile(r"\s+")
+# Arquivos cujos frames não contam como "função chamadora".
+_ARQUIVOS_INTERNOS = (os.path.abspath(__file__), sqlite3.__file__)
+
+
+@functools.lru_cache(maxsize=1024)
+def forma_do_comando(sql: str) -> str:
+    """Normaliza o SQL para agrupar comandos iguais com parâmetros diferentes."""
+    forma = _REGEX_STRING.sub('?', sql)
+    forma = _REGEX_NUMERO.sub('?', forma)
+    forma = _REGEX_LISTA_IN.sub('(...)', forma)
+    return _REGEX_ESPACOS.sub(' ', forma).strip()
+
+
+def _funcao_chamadora() -> str:
+    """'modulo.funcao' do primeiro frame fora deste arquivo (ex: 'db_manager.buscar_monstro_por_id')."""
+    frame = sys._getframe(2)
+    while frame and frame.f_code.co_filename in _ARQUIVOS_INTERNOS:
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    modulo = frame.f_globals.get('__name__', '?').rsplit('.', 1)[-1]
+    return f"{modulo}.{frame.f_code.co_name}"
+
+
+def delegar_bloqueantes(executar):
+    """Passa a rodar as chamadas ao SQLite por 'executar(funcao, *args)' (None volta ao normal)."""
+    global _executar
+    _executar = executar
+
+
+def _chamar(funcao, *args):
+    if _executar is None:
+        return funcao(*args)
+    return _executar(funcao, *args)
+
+
+def _registrar(forma, duracao, linhas, funcao=None):
+    with _trava:
+        estado = _por_forma.get(forma)
+        if estado is None:
+            estado = _por_forma[forma] = [0, 0.0, 0.0, 0]
+        estado[0] += 1
+        estado[1] += duracao
+        estado[2] = max(estado[2], duracao)
+        estado[3] += linhas
+        if funcao:
+            por_funcao = _por_funcao.get(funcao)
+            if por_funcao is None:
+                por_funcao = _por_funcao[funcao] = [0, 0.0]
+            por_funcao[0] += 1
+            por_funcao[1] += duracao
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mede execute/executemany e as leituras (fetch*) do último comando."""
+
+    def _medir(self, metodo, sql, parametros):
+        if _executar is not None:
+            self.connection._reservar_escrita(sql)
+        inicio = time.perf_counter()
+        try:
+            return _chamar(metodo, sql, parametros)
+        finally:
+            if _executar is not None and not self.connection.in_transaction:
+                self.connection._liberar_escrita()  # rodou em autocommit (ex: CREATE): nada a proteger
+            duracao = time.perf_counter() - inicio
+            self._forma = forma_do_comando(sql)
+            self._funcao = _funcao_chamadora()
+            linhas = max(self.rowcount, 0)  # rowcount vale para INSERT/UPDATE/DELETE
+            _registrar(self._forma, duracao, linhas, self._funcao)
+            if duracao * 1000 >= LIMITE_LENTO_MS:
+                self._logar_lento(sql, parametros, duracao)
+
+    def execute(self, sql, parametros=()):
+        return self._medir(super().execute, sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self._medir(super().executemany, sql, parametros)
+
+    def _ler(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = _chamar(metodo, *args)
+        forma = getattr(self, '_forma', None)
+        if forma is not None:
+            if isinstance(resultado, list):
+                linhas = len(resultado)
+            else:
+                linhas = 0 if resultado is None else 1
+            # Tempo de leitura entra no total; não conta como nova execução.
+            duracao = time.perf_counter() - inicio
+            with _trava:
+                estado = _por_forma[forma]
+                estado[1] += duracao
+                estado[3] += linhas
+                _por_funcao[self._funcao][1] += duracao
+        return resultado
+
+    def fetchone(self):
+        return self._ler(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._ler(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._ler(super().fetchall)
+
+    def __next__(self):
+        linha = super().__next__()
+        forma = getattr(self, '_forma', None)
+        if forma is not None:
+            with _trava:
+                _por_forma[forma][3] += 1
+        return linha
+
+    def _logar_lento(self, sql, parametros, duracao):
+        plano = ''
+        try:
+            # Cursor puro (sqlite3.Cursor): o EXPLAIN não entra nas estatísticas.
+            cursor = sqlite3.Cursor(self.connection)
+            if sql.lstrip().upper().startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')):
+                if isinstance(parametros, (list, tuple, dict)):
+                    linhas = cursor.execute("EXPLAIN QUERY PLAN " + sql, parametros).fetchall()
+                else:
+                    linhas = cursor.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+                plano = ' | '.join(str(linha[-1]) for linha in linhas)
+        except sqlite3.Error as e:
+            plano = f"(EXPLAIN falhou: {e})"
+        logger.warning("[SQL LENTO] %.1f ms | %s | plano: %s", duracao * 1000, forma_do_comando(sql), plano)
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os criados por conexao.execute) são instrumentados."""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    _escrevendo = False
+
+    def _reservar_escrita(self, sql):
+        """Pega a trava de escrita antes do primeiro comando que escreve (modos cooperativos)."""
+        if not self._escrevendo and sql.lstrip()[:15].upper().startswith(_COMANDOS_ESCRITA):
+            _trava_escrita.acquire()
+            self._escrevendo = True
+
+    def _liberar_escrita(self):
+        if self._escrevendo:
+            self._escrevendo = False
+            _trava_escrita.release()
+
+    def commit(self):
+        try:
+            return _chamar(super().commit)
+        finally:
+            self._liberar_escrita()
+
+    def rollback(self):
+        try:
+            return _chamar(super().rollback)
+        finally:
+            self._liberar_escrita()
+
+    def close(self):
+        try:
+            return super().close()  # sem commit, o SQLite desfaz a transação aberta
+        finally:
+            self._liberar_escrita()
+
+    def __exit__(self, tipo, valor, traceback):
+        # Mesmo comportamento do sqlite3 ('with conexao:'), mas passando pelo commit/rollback acima.
+        if tipo is None:
+            try:
+                self.commit()
+            except BaseException:
+                self.rollback()
+                raise
+        else:
+            self.rollback()
+        return False
+
+
+def conectar(caminho, **kwargs):
+    """Substituto de sqlite3.connect() com instrumentação (se habilitada)."""
+    if _executar is not None:
+        # Modo cooperativo: a conexão é usada pelas threads do pool, não só pela que a criou.
+        # (Aqui a classe instrumentada é necessária mesmo com RPG_SQL_INSTRUMENTAR=0.)
+        kwargs.setdefault('check_same_thread', False)
+        conexao = sqlite3.connect(caminho, factory=ConexaoInstrumentada, **kwargs)
+        if caminho not in _bancos_em_wal:
+            try:
+                _chamar(sqlite3.Connection.execute, conexao, "PRAGMA journal_mode=WAL")
+                _bancos_em_wal.add(caminho)
+            except sqlite3.Error as e:
+                print(f"Aviso: não foi possível ativar WAL em {caminho}: {e}")
+        return conexao
+    if not INSTRUMENTAR:
+        return sqlite3.connect(caminho, **kwargs)
+    return sqlite3.connect(caminho, factory=ConexaoInstrumentada, **kwargs)
+
+
+def resumo(limite=None):
+    """Tabela agregada por forma de comando, ordenada pelo tempo total (maior primeiro)."""
+    with _trava:
+        itens = [(forma, list(estado)) for forma, estado in _por_forma.items()]
+    itens.sort(key=lambda item: -item[1][1])
+    return [{
+        'comando': forma,
+        'execucoes': n,
+        'tempo_total_ms': round(total * 1000, 3),
+        'tempo_medio_ms': round(total * 1000 / n, 3) if n else 0,
+        'tempo_max_ms': round(maximo * 1000, 3),
+        'linhas': linhas,
+    } for forma, (n, total, maximo, linhas) in itens[:limite]]
+
+
+def resumo_por_funcao():
+    """Tempo de banco por função chamadora, ordenado pelo total."""
+    with _trava:
+        itens = sorted(_por_funcao.items(), key=lambda item: -item[1][1])
+    return [{'funcao': funcao, 'execucoes': n, 'tempo_total_ms': round(total * 1000, 3)}
+            for funcao, (n, total) in itens]
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def linhas_prometheus():
+    """Exporta os agregados no formato Prometheus (usado como coletor em servidor/metricas.py)."""
+    with _trava:
+        formas = sorted(_por_forma.items())
+        funcoes = sorted(_por_funcao.items())
+    linhas = [
+        "# HELP rpg_sql_execucoes_total Execuções por forma de comando SQL.",
+        "# TYPE rpg_sql_execucoes_total counter",
+    ]
+    linhas += [f'rpg_sql_execucoes_total{{comando="{_rotulo(f)}"}} {e[0]}' for f, e in formas]
+    linhas += ["# HELP rpg_sql_tempo_segundos_total Tempo total (execução + leitura) por forma de comando.",
+               "# TYPE rpg_sql_tempo_segundos_total counter"]
+    linhas += [f'rpg_sql_tempo_segundos_total{{comando="{_rotulo(f)}"}} {e[1]!r}' for f, e in formas]
+    linhas += ["# HELP rpg_sql_tempo_max_segundos Maior tempo de execução por forma de comando.",
+               "# TYPE rpg_sql_tempo_max_segundos gauge"]
+    linhas += [f'rpg_sql_tempo_max_segundos{{comando="{_rotulo(f)}"}} {e[2]!r}' for f, e in formas]
+    linhas += ["# HELP rpg_sql_linhas_total Linhas retornadas/afetadas por forma de comando.",
+               "# TYPE rpg_sql_linhas_total counter"]
+    linhas += [f'rpg_sql_linhas_total{{comando="{_rotulo(f)}"}} {e[3]}' for f, e in formas]
+    linhas += ["# HELP rpg_sql_funcao_tempo_segundos_total Tempo de banco por função chamadora.",
+               "# TYPE rpg_sql_funcao_tempo_segundos_total counter"]
+    linhas += [f'rpg_sql_funcao_tempo_segundos_total{{funcao="{_rotulo(f)}"}} {e[1]!r}' for f, e in funcoes]
+    linhas += ["# HELP rpg_sql_funcao_execucoes_total Comandos SQL por função chamadora.",
+               "# TYPE rpg_sql_funcao_execucoes_total counter"]
+    linhas += [f'rpg_sql_funcao_execucoes_total{{funcao="{_rotulo(f)}"}} {e[0]}' for f, e in funcoes]
+    return linhas
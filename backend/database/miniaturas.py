@@ -0,0 +1,158 @@
+# database/miniaturas.py
+
+# Miniaturas das imagens do blob store (mapas e artes de monstros).
+#
+# Telas de listagem não precisam da imagem original: pedem /api/blobs/<hash>/miniatura/<tamanho>,
+# que devolve a imagem reduzida (lado maior limitado pelo tamanho) em WebP (se o navegador
+# aceitar) ou JPEG. As miniaturas são geradas uma vez, num pool de threads, e ficam em disco
+# ao lado dos blobs (blobs/miniaturas/<hash>_<tamanho>.<formato>).
+#
+# Depende do Pillow (opcional). Sem ele, 'disponivel()' é False e a rota serve a original.
+#
+# Nos modos eventlet/gevent o ThreadPoolExecutor vira um pool de green threads e o Pillow
+# (código C) pararia o loop durante o redimensionamento: o servidor chama
+# 'delegar_bloqueantes()' e cada geração roda numa thread de verdade (execucao.executor_bloqueante).
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import blobs
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+# nome -> lado maior em pixels
+TAMANHOS = {'p': 160, 'm': 480, 'g': 1024}
+FORMATOS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+QUALIDADE = 80
+WORKERS = int(os.environ.get('RPG_MINIATURAS_WORKERS', '2'))
+
+_pool = None
+_executar = None    # executar(funcao, *args) dos modos cooperativos; None = chama direto
+_trava = threading.RLock()  # RLock: add_done_callback roda na hora se o futuro já terminou
+_em_andamento = {}  # { (hash, tamanho, formato): Future } — evita gerar a mesma miniatura duas vezes
+
+
+def delegar_bloqueantes(executar):
+    """Passa a gerar as miniaturas por 'executar(funcao, *args)' (None volta ao normal)."""
+    global _executar
+    _executar = executar
+
+
+def _gerar_fora_do_loop(hash_hex, tamanho, formato):
+    if _executar is None:
+        return _gerar(hash_hex, tamanho, formato)
+    return _executar(_gerar, hash_hex, tamanho, formato)
+
+
+def disponivel() -> bool:
+    return Image is not None
+
+
+def formato_suporta_webp() -> bool:
+    return Image is not None and features.check('webp')
+
+
+def _pasta():
+    return os.path.join(blobs.PASTA_BLOBS, 'miniaturas')
+
+
+def caminho_miniatura(hash_hex, tamanho, formato):
+    return os.path.join(_pasta(), f"{hash_hex}_{tamanho}.{formato}")
+
+
+def _gerar(hash_hex, tamanho, formato):
+    destino = caminho_miniatura(hash_hex, tamanho, formato)
+    if os.path.isfile(destino):
+        return destino
+    origem = blobs.caminho_blob(hash_hex)
+    if origem is None:
+        return None
+    with Image.open(origem) as imagem:
+        imagem = ImageOps.exif_transpose(imagem)
+        imagem.thumbnail((TAMANHOS[tamanho], TAMANHOS[tamanho]))  # mantém proporção; não amplia
+        if formato == 'jpeg' and imagem.mode not in ('RGB', 'L'):
+            fundo = Image.new('RGB', imagem.size, (0, 0, 0))
+            fundo.paste(imagem.convert('RGBA'), mask=imagem.convert('RGBA').split()[-1])
+            imagem = fundo
+        saida = io.BytesIO()
+        imagem.save(saida, FORMATOS[formato][0], quality=QUALIDADE)
+    os.makedirs(_pasta(), exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=_pasta(), prefix='.tmp-')
+    with os.fdopen(descritor, 'wb') as f:
+        f.write(saida.getvalue())
+    os.replace(temporario, destino)
+    return destino
+
+
+def _agendar(hash_hex, tamanho, formato):
+    global _pool
+    chave = (hash_hex, tamanho, formato)
+    with _trava:
+        futuro = _em_andamento.get(chave)
+        if futuro is None:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='miniaturas')
+            futuro = _pool.submit(_gerar_fora_do_loop, hash_hex, tamanho, formato)
+            _em_andamento[chave] = futuro
+            futuro.add_done_callback(lambda _f: _descartar(chave))
+    return futuro
+
+
+def _descartar(chave):
+    with _trava:
+        _em_andamento.pop(chave, None)
+
+
+def obter_miniatura(hash_hex, tamanho, formato, timeout=15):
+    """
+    Caminho da miniatura (gera e espera, se ainda não existir). None se o blob não existir,
+    se o Pillow não estiver instalado ou se a imagem não puder ser lida.
+    """
+    if Image is None or tamanho not in TAMANHOS or formato not in FORMATOS or not blobs.hash_valido(hash_hex):
+        return None
+    destino = caminho_miniatura(hash_hex, tamanho, formato)
+    if os.path.isfile(destino):
+        return destino
+    try:
+        return _agendar(hash_hex, tamanho, formato).result(timeout=timeout)
+    except Exception as e:
+        print(f"Erro ao gerar miniatura {hash_hex[:12]} ({tamanho}/{formato}): {e}")
+        return None
+
+
+def pre_gerar(hash_hex):
+    """Agenda (sem esperar) todas as miniaturas de um blob recém-enviado."""
+    if Image is None or not hash_hex:
+        return
+    formatos = ('webp', 'jpeg') if formato_suporta_webp() else ('jpeg',)
+    for tamanho in TAMANHOS:
+        for formato in formatos:
+            if not os.path.isfile(caminho_miniatura(hash_hex, tamanho, formato)):
+                _agendar(hash_hex, tamanho, formato)
+
+
+def coletar_lixo(simular=False):
+    """Apaga as miniaturas cujo blob original não existe mais (rode depois de blobs.coletar_lixo)."""
+    removidos = liberados = 0
+    pasta = _pasta()
+    if not os.path.isdir(pasta):
+        return 0, 0
+    for nome in os.listdir(pasta):
+        hash_hex = nome.split('_', 1)[0]
+        if not blobs.hash_valido(hash_hex) or blobs.caminho_blob(hash_hex) is not None:
+            continue
+        caminho = os.path.join(pasta, nome)
+        try:
+            tamanho = os.path.getsize(caminho)
+            if not simular:
+                os.unlink(caminho)
+        except FileNotFoundError:
+            continue
+        removidos += 1
+        liberados += tamanho
+    return removidos, liberados
@@ -0,0 +1,82 @@
+# database/projecao.py
+
+# Projeção de colunas (?fields=) para as listagens da API.
+#
+# O cliente pede só os campos que usa (ex: o Bestiário quer nome, tipo e CR) e a lista
+# vira a própria lista de colunas do SELECT: o banco lê menos e o JSON fica menor.
+# Só entram colunas desta lista branca; 'id' vem sempre (o frontend usa como chave).
+CAMPOS_PERMITIDOS = {
+    'monstros_base': (
+        'id', 'nome', 'vida_maxima', 'ataque_bonus', 'dano_dado', 'defesa', 'xp_oferecido', 'ouro_drop',
+        'tamanho', 'tipo', 'alinhamento', 'ca', 'deslocamento', 'for_attr', 'des_attr', 'con_attr',
+        'intel_attr', 'sab_attr', 'car_attr', 'saving_throws', 'skills', 'resistencias', 'sentidos',
+        'idiomas', 'cr', 'habilidades', 'fonte', 'oficial', 'criador_id', 'imagem_url',
+    ),
+    'itens_base': (
+        'id', 'nome', 'tipo', 'descricao', 'preco_ouro', 'dano_dado', 'bonus_ataque', 'efeito',
+        'categoria', 'subcategoria', 'peso', 'fonte', 'oficial', 'criador_id',
+    ),
+    'habilidades_base': ('id', 'nome', 'descricao', 'efeito', 'custo_mana'),
+    # 'usuario_id' fica de fora: a rota já filtra pelo dono.
+    'fichas_personagem': (
+        'id', 'nome_personagem', 'classe', 'raca', 'antecedente', 'nivel', 'xp_atual',
+        'xp_proximo_nivel', 'atributos_json', 'pericias_json',
+    ),
+    'campanha_mapas': (
+        'id', 'campanha_id', 'nome', 'descricao', 'imagem_data', 'imagem_hash', 'imagem_largura',
+        'imagem_altura', 'visivel', 'ordem',
+    ),
+    'campanha_eventos': ('id', 'campanha_id', 'titulo', 'descricao_pub', 'descricao_priv', 'status', 'visivel', 'ordem'),
+    'campanha_npcs': (
+        'id', 'campanha_id', 'nome', 'papel', 'descricao_pub', 'descricao_priv', 'alinhamento', 'local', 'visivel',
+    ),
+    'campanha_quests': (
+        'id', 'campanha_id', 'titulo', 'objetivo_pub', 'detalhes_priv', 'recompensa_pub',
+        'recompensa_priv', 'local_priv', 'status', 'visivel',
+    ),
+    'campanha_anotacoes': ('id', 'campanha_id', 'titulo', 'conteudo', 'visivel'),
+}
+
+
+# Colunas criadas por scripts de migração da raiz (add_imagem_url.py): podem não existir no
+# banco. Pedidas num banco sem a coluna, voltam como null em vez de derrubar o SELECT.
+CAMPOS_DE_MIGRACAO = {
+    'monstros_base': ('imagem_url',),
+}
+
+
+class CampoInvalido(ValueError):
+    """Campo pedido em ?fields= que não existe (ou não é permitido) para o recurso."""
+
+
+def ler_campos(texto):
+    """Converte 'nome,tipo, cr' em ('nome', 'tipo', 'cr'). Vazio/None -> None (todas as colunas)."""
+    if not texto:
+        return None
+    campos = tuple(dict.fromkeys(c.strip() for c in texto.split(',') if c.strip()))
+    return campos or None
+
+
+def _existentes(conexao, tabela):
+    return {linha[1] for linha in conexao.execute(f"PRAGMA table_info({tabela})")}
+
+
+def colunas(tabela, campos=None, padrao='*', conexao=None):
+    """
+    Lista de colunas para o SELECT. Sem 'campos' devolve 'padrao'.
+    Lança CampoInvalido se algum campo estiver fora da lista branca da tabela.
+    Com 'conexao', campos de CAMPOS_DE_MIGRACAO ausentes no banco viram 'NULL AS campo'.
+    """
+    if not campos:
+        return padrao
+    permitidos = CAMPOS_PERMITIDOS[tabela]
+    invalidos = [c for c in campos if c not in permitidos]
+    if invalidos:
+        raise CampoInvalido(f"Campo(s) inválido(s): {', '.join(invalidos)}. Permitidos: {', '.join(permitidos)}.")
+    # Os nomes vêm da lista branca, então podem ir direto para o SQL.
+    selecionados = ('id',) + tuple(c for c in campos if c != 'id')
+    opcionais = [c for c in selecionados if c in CAMPOS_DE_MIGRACAO.get(tabela, ())]
+    if opcionais and conexao is not None:
+        existentes = _existentes(conexao, tabela)
+        selecionados = tuple(c if c in existentes or c not in opcionais else f"NULL AS {c}" for c in selecionados)
+    return ', '.join(selecionados)
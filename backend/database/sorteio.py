@@ -0,0 +1,214 @@
+# database/sorteio.py
+
+# Sorteio de monstros (encontros aleatórios) e itens (loot) em tempo constante.
+#
+# Em vez de 'ORDER BY RANDOM() LIMIT 1' (que ordena a tabela inteira a cada chamada),
+# mantemos em memória uma "tabela de alias" (método de Walker/Vose) para cada combinação
+# de filtros. Cada sorteio custa O(1): um número aleatório escolhe a coluna e outro decide
+# entre o valor da coluna e seu "alias".
+#
+# As tabelas são montadas sob demanda. Quando o compêndio muda (db_manager -> compendio),
+# só o registro alterado é relido, e só as combinações de filtro afetadas são remontadas
+# (e apenas no próximo sorteio que as usar). Cada índice guarda a versão da tabela no
+# banco (compendio.versoes()) de quando foi montado: se ela mudou por outro caminho
+# (outro worker, script fora do servidor), o índice é relido inteiro no próximo sorteio.
+import math
+import random
+import sqlite3
+import threading
+
+from . import compendio
+from .instrumentacao import conectar
+
+# Faixas de nível de desafio (CR) usadas como filtro: (nome, cr_maximo).
+# Um CR entra na primeira faixa cujo máximo ele não ultrapassa (ex: 1.5 cai em '2-4').
+FAIXAS_CR = (
+    ('0-1', 1),
+    ('2-4', 4),
+    ('5-10', 10),
+    ('11-16', 16),
+    ('17+', math.inf),
+)
+# Modos de peso para loot: 'raridade' favorece itens baratos (itens caros são raros),
+# 'preco' favorece itens caros e 'uniforme' dá a mesma chance a todos.
+MODOS_PESO_ITEM = ('raridade', 'preco', 'uniforme')
+
+
+def faixa_do_cr(cr):
+    """Converte o CR do banco (texto como '0.25', '5.0', 'VARIES') no nome da faixa, ou None."""
+    try:
+        valor = float(cr)
+    except (TypeError, ValueError):
+        return None
+    for nome, maximo in FAIXAS_CR:
+        if valor <= maximo:
+            return nome
+    return None
+
+
+class TabelaAlias:
+    """Tabela de alias de Vose: montagem O(n), sorteio O(1)."""
+    __slots__ = ('ids', 'prob', 'alias')
+
+    def __init__(self, pesos: dict):
+        self.ids = list(pesos)
+        n = len(self.ids)
+        total = sum(pesos.values())
+        # Probabilidades escaladas para média 1.
+        escalado = [pesos[i] * n / total for i in self.ids]
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        pequenos = [i for i, p in enumerate(escalado) if p < 1.0]
+        grandes = [i for i, p in enumerate(escalado) if p >= 1.0]
+        while pequenos and grandes:
+            p, g = pequenos.pop(), grandes.pop()
+            self.prob[p] = escalado[p]
+            self.alias[p] = g
+            escalado[g] -= 1.0 - escalado[p]
+            (pequenos if escalado[g] < 1.0 else grandes).append(g)
+        # O que sobrar (por arredondamento) tem probabilidade 1.
+        for i in pequenos + grandes:
+            self.prob[i] = 1.0
+
+    def sortear(self, rng=random):
+        coluna = rng.randrange(len(self.ids))
+        if rng.random() < self.prob[coluna]:
+            return self.ids[coluna]
+        return self.ids[self.alias[coluna]]
+
+
+class _Indice:
+    """Mantém, para uma tabela do banco, os pesos por combinação de filtros e as tabelas de alias."""
+
+    def __init__(self, tabela, colunas, pares_de):
+        self.tabela = tabela
+        self.colunas = colunas
+        self.pares_de = pares_de      # função(linha) -> [(chave, peso), ...]
+        self._trava = threading.RLock()
+        self._carregado = False
+        self._versao = None           # versão da tabela no banco refletida pelo índice
+        self._membros = {}            # { chave: { id: peso } }
+        self._registros = {}          # { id: [chaves] } — para remover um registro rapidamente
+        self._tabelas = {}            # { chave: TabelaAlias }
+        self._sujas = set()           # chaves cuja tabela de alias precisa ser remontada
+
+    def _conectar(self):
+        from .db_manager import NOME_DB  # importação tardia: db_manager importa este módulo
+        return conectar(NOME_DB)
+
+    def _adicionar(self, linha):
+        chaves = []
+        for chave, peso in self.pares_de(linha):
+            if peso > 0:
+                self._membros.setdefault(chave, {})[linha[0]] = peso
+                self._sujas.add(chave)
+                chaves.append(chave)
+        self._registros[linha[0]] = chaves
+
+    def _remover(self, registro_id):
+        for chave in self._registros.pop(registro_id, []):
+            self._membros[chave].pop(registro_id, None)
+            self._sujas.add(chave)
+
+    def _carregar(self):
+        self._membros.clear(); self._registros.clear(); self._tabelas.clear(); self._sujas.clear()
+        # Lida ANTES das linhas: uma escrita no meio do caminho só causa uma recarga a mais.
+        self._versao = compendio.versoes(fresca=True).get(self.tabela)
+        try:
+            with self._conectar() as conexao:
+                for linha in conexao.execute(f"SELECT {self.colunas} FROM {self.tabela}"):
+                    self._adicionar(linha)
+            self._carregado = True
+        except sqlite3.Error as e:
+            print(f"Erro ao carregar tabela de sorteio ({self.tabela}): {e}")
+
+    def atualizar(self, registro_id=None):
+        """Relê um registro alterado (ou tudo, se registro_id for None) na próxima oportunidade."""
+        with self._trava:
+            if not self._carregado:
+                return  # ainda não foi montado; a primeira consulta já lerá o estado novo
+            # A versão já foi relida por notificar_alteracao: só dá para aplicar a alteração
+            # sozinha se ela for a única desde a montagem; senão relê tudo.
+            nova = compendio.versoes().get(self.tabela)
+            if registro_id is None or self._versao is None or nova != self._versao + 1:
+                self._carregado = False
+                return
+            self._versao = nova
+            self._remover(registro_id)
+            try:
+                with self._conectar() as conexao:
+                    linha = conexao.execute(
+                        f"SELECT {self.colunas} FROM {self.tabela} WHERE id = ?", (registro_id,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Erro ao atualizar tabela de sorteio ({self.tabela}): {e}")
+                self._carregado = False
+                return
+            if linha:
+                self._adicionar(linha)
+
+    def sortear(self, chave, rng=random):
+        with self._trava:
+            if self._carregado and compendio.versoes().get(self.tabela) != self._versao:
+                self._carregado = False
+            if not self._carregado:
+                self._carregar()
+            if chave in self._sujas:
+                membros = self._membros.get(chave)
+                if membros:
+                    self._tabelas[chave] = TabelaAlias(membros)
+                else:
+                    self._tabelas.pop(chave, None)
+                    self._membros.pop(chave, None)
+                self._sujas.discard(chave)
+            tabela = self._tabelas.get(chave)
+        return tabela.sortear(rng) if tabela else None
+
+
+def _normalizar(texto):
+    return texto.strip().lower() if isinstance(texto, str) and texto.strip() else None
+
+
+def _pares_monstro(linha):
+    # linha: id, tipo, cr, oficial. Cada monstro entra em todas as combinações (filtro ou "qualquer").
+    _, tipo, cr, oficial = linha
+    chaves = {(t, f, o)
+              for t in (_normalizar(tipo), None)
+              for f in (faixa_do_cr(cr), None)
+              for o in (int(oficial or 0), None)}
+    return [(chave, 1.0) for chave in chaves]
+
+
+def _pares_item(linha):
+    # linha: id, categoria, preco_ouro, oficial.
+    _, categoria, preco, oficial = linha
+    preco = max(0.0, float(preco or 0))
+    pesos = {'raridade': 1.0 / (1.0 + preco), 'preco': preco, 'uniforme': 1.0}
+    chaves = {(c, o) for c in (_normalizar(categoria), None) for o in (int(oficial or 0), None)}
+    return [((modo,) + chave, pesos[modo]) for modo in MODOS_PESO_ITEM for chave in chaves]
+
+
+_monstros = _Indice('monstros_base', 'id, tipo, cr, oficial', _pares_monstro)
+_itens = _Indice('itens_base', 'id, categoria, preco_ouro, oficial', _pares_item)
+
+
+@compendio.registrar_ouvinte
+def _ao_alterar_compendio(tabela, registro_id):
+    if tabela == 'monstros_base':
+        _monstros.atualizar(registro_id)
+    elif tabela == 'itens_base':
+        _itens.atualizar(registro_id)
+
+
+def sortear_monstro_id(tipo=None, faixa_cr=None, oficial=None, rng=random):
+    """Sorteia o ID de um monstro (chance igual para todos) que atenda aos filtros. None se não houver."""
+    oficial = None if oficial is None else int(oficial)
+    return _monstros.sortear((_normalizar(tipo), faixa_cr, oficial), rng)
+
+
+def sortear_item_id(categoria=None, oficial=None, peso='raridade', rng=random):
+    """Sorteia o ID de um item ponderado por 'peso' (ver MODOS_PESO_ITEM). None se não houver."""
+    if peso not in MODOS_PESO_ITEM:
+        raise ValueError(f"Modo de peso '{peso}' inválido (use: {', '.join(MODOS_PESO_ITEM)}).")
+    oficial = None if oficial is None else int(oficial)
+    return _itens.sortear((peso, _normalizar(categoria), oficial), rng)
@@ -4,11 +4,30 @@ Sistema de Logging Centralizado para a Plataforma RPG
 - Salva logs em arquivo com rotação automática por tamanho
 - Limite: 5MB por arquivo, máximo 5 backups
 - Formato: [TIMESTAMP] [LEVEL] [MODULE] [USER_ID] Message
+- Não bloqueante: o logger só coloca o registro numa fila (QueueHandler); a escrita
+  em arquivo/console acontece numa thread separada (QueueListener)
+
+Variáveis de ambiente:
+- RPG_LOG_LEVEL: nível mínimo do logger (padrão: DEBUG)
+- RPG_LOG_QUEUE_SIZE: tamanho máximo da fila (padrão: 10000)
+- RPG_LOG_DROP_POLICY: o que fazer com a fila cheia:
+    'descartar_novo' (padrão) descarta o registro que chegou,
+    'descartar_antigo' descarta o registro mais antigo da fila,
+    'bloquear' espera por espaço (nunca perde logs, mas pode atrasar o evento)
+- RPG_LOG_JSON: '1' liga o log estruturado de eventos em logs/eventos.jsonl (uma linha JSON por evento)
+- RPG_LOG_AMOSTRAGEM: taxas por evento para o log JSON, ex: "send_message=0.05,roll_dice=0.2"
+  (eventos sem taxa são sempre gravados; erros são SEMPRE gravados)
 """
 
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import threading
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime
 
 # Diretório de logs
@@ -16,16 +35,143 @@ LOGS_DIR = os.path.join(os.path.dirname(__file__), 'logs')
 os.makedirs(LOGS_DIR, exist_ok=True)
 
 LOG_FILE = os.path.join(LOGS_DIR, 'app.log')
+EVENTOS_FILE = os.path.join(LOGS_DIR, 'eventos.jsonl')
+
+LOG_LEVEL = os.environ.get('RPG_LOG_LEVEL', 'DEBUG').upper()
+TAMANHO_FILA = int(os.environ.get('RPG_LOG_QUEUE_SIZE', '10000'))
+POLITICAS_DESCARTE = ('descartar_novo', 'descartar_antigo', 'bloquear')
+POLITICA_DESCARTE = os.environ.get('RPG_LOG_DROP_POLICY', 'descartar_novo')
+if POLITICA_DESCARTE not in POLITICAS_DESCARTE:
+    POLITICA_DESCARTE = 'descartar_novo'
+
+LOG_JSON_ATIVO = os.environ.get('RPG_LOG_JSON', '0') == '1'
+# Eventos de alto volume (chat e dados) são amostrados por padrão.
+TAXAS_AMOSTRAGEM_PADRAO = {'send_message': 0.1, 'roll_dice': 0.25}
+
+
+def _ler_taxas_amostragem(texto):
+    """Converte "evento=taxa,evento=taxa" em dicionário, ignorando entradas mal formadas."""
+    taxas = dict(TAXAS_AMOSTRAGEM_PADRAO)
+    for parte in (texto or '').split(','):
+        evento, _, taxa = parte.partition('=')
+        try:
+            taxas[evento.strip()] = min(1.0, max(0.0, float(taxa)))
+        except ValueError:
+            continue
+    return taxas
+
+
+TAXAS_AMOSTRAGEM = _ler_taxas_amostragem(os.environ.get('RPG_LOG_AMOSTRAGEM'))
+
+
+class FilaLogHandler(QueueHandler):
+    """
+    QueueHandler com fila limitada e política de descarte.
+    O registro é formatado no prepare() (como no QueueHandler padrão) antes de entrar na
+    fila: msg % args vira texto na hora, e a thread do QueueListener não enxerga objetos
+    que o handler do evento ainda pode alterar (listas da batalha, dicts da sala).
+    """
+
+    def __init__(self, fila, politica=POLITICA_DESCARTE):
+        super().__init__(fila)
+        self.politica = politica
+        self.descartados = 0
+        self._trava_contador = threading.Lock()
+
+    def prepare(self, record):
+        mensagem = self.format(record)
+        record = copy.copy(record)
+        record.message = mensagem
+        record.msg = mensagem
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
+
+    def _contar_descarte(self):
+        with self._trava_contador:
+            self.descartados += 1
+
+    def enqueue(self, record):
+        if self.politica == 'bloquear':
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.politica == 'descartar_antigo':
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    self.queue.put_nowait(record)
+                except queue.Full:
+                    pass
+            self._contar_descarte()
+
+
+def tamanho_payload(data):
+    """Tamanho aproximado (em bytes) de um payload de evento."""
+    if data is None:
+        return 0
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    try:
+        return len(json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8'))
+    except (TypeError, ValueError):
+        return None
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro, com os campos estáveis guardados em record.evento_json."""
+
+    def format(self, record):
+        dados = {'ts': round(record.created, 3), 'nivel': record.levelname}
+        dados.update(getattr(record, 'evento_json', None) or {'mensagem': record.getMessage()})
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+_listener = None
+_fila_handler = None
+_listener_eventos = None
+_fila_eventos = None
+logger_eventos = logging.getLogger('rpg_mesa.eventos')
+
+
+def registros_descartados():
+    """Quantos registros foram descartados por fila cheia desde o início do processo."""
+    return _fila_handler.descartados if _fila_handler else 0
+
+
+def _parar_listener():
+    """Esvazia a fila e para a thread de escrita (chamado na saída do processo)."""
+    if _listener_eventos:
+        _listener_eventos.stop()
+    if _listener:
+        _listener.stop()
+        if registros_descartados():
+            for handler in _listener.handlers:
+                handler.handle(logging.makeLogRecord({
+                    'name': 'rpg_mesa', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': 'Registros de log descartados por fila cheia: %d',
+                    'args': (registros_descartados(),), 'funcName': '_parar_listener',
+                }))
+
 
 def setup_logging():
-    """Configura o logger com rotação de arquivos."""
+    """Configura o logger com rotação de arquivos, escrevendo por meio de uma fila."""
+    global _listener, _fila_handler
     logger = logging.getLogger('rpg_mesa')
     
     # Evita duplicação de handlers
     if logger.hasHandlers():
         return logger
     
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(getattr(logging, LOG_LEVEL, logging.DEBUG))
     
     # Formato detalhado
     formatter = logging.Formatter(
@@ -49,52 +195,157 @@ def setup_logging():
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
     
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Os handlers "lentos" (arquivo e console) ficam atrás da fila; o logger só enfileira.
+    _fila_handler = FilaLogHandler(queue.Queue(maxsize=TAMANHO_FILA))
+    _listener = QueueListener(_fila_handler.queue, file_handler, console_handler,
+                              respect_handler_level=True)
+    _listener.start()
+    atexit.register(_parar_listener)
+    logger.addHandler(_fila_handler)
+    _setup_eventos_json()
     
     logger.info('=' * 80)
-    logger.info(f'Logger inicializado em {datetime.now()}')
-    logger.info(f'Arquivo de logs: {LOG_FILE}')
+    logger.info('Logger inicializado em %s', datetime.now())
+    logger.info('Arquivo de logs: %s', LOG_FILE)
+    logger.info('Fila de logs: %d registros, política: %s', TAMANHO_FILA, POLITICA_DESCARTE)
     logger.info('=' * 80)
     
     return logger
 
+def _setup_eventos_json():
+    """Liga o sink JSON-lines (logs/eventos.jsonl), também atrás de uma fila própria."""
+    global _listener_eventos, _fila_eventos
+    # O logger de eventos não propaga para 'rpg_mesa': as linhas JSON não vão para o app.log.
+    logger_eventos.propagate = False
+    if not LOG_JSON_ATIVO or logger_eventos.handlers:
+        return
+    logger_eventos.setLevel(logging.INFO)
+    json_handler = RotatingFileHandler(EVENTOS_FILE, maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8')
+    json_handler.setFormatter(FormatadorJSON())
+    _fila_eventos = FilaLogHandler(queue.Queue(maxsize=TAMANHO_FILA))
+    _listener_eventos = QueueListener(_fila_eventos.queue, json_handler)
+    _listener_eventos.start()
+    logger_eventos.addHandler(_fila_eventos)
+
+
 # Criar logger global
 logger = setup_logging()
 
+
+# --- Log estruturado de eventos (JSON-lines) ---
+
+def sortear_amostragem(evento, erro=False):
+    """
+    Decide se este evento entra no log JSON. Retorna a taxa usada (para o analisador
+    reponderar as contagens) ou None se o evento foi descartado pela amostragem.
+    """
+    if not LOG_JSON_ATIVO:
+        return None
+    if erro:
+        return 1.0
+    taxa = TAXAS_AMOSTRAGEM.get(evento, 1.0)
+    if taxa >= 1.0 or random.random() < taxa:
+        return taxa
+    return None
+
+
+_SEM_PAYLOAD = object()
+
+
+def registrar_evento(evento, sala_id=None, user_id=None, latency_ms=None, payload_bytes=None,
+                     taxa_amostragem=None, erro=None, payload=_SEM_PAYLOAD):
+    """
+    Grava um evento com campos estáveis no eventos.jsonl.
+    Se 'taxa_amostragem' não vier (já sorteada por quem chamou), a amostragem é feita aqui.
+    'payload' (no lugar de 'payload_bytes'): o tamanho é medido aqui, só para eventos sorteados,
+    ainda na thread de quem chamou (a do listener nunca vê o objeto do handler).
+    """
+    if taxa_amostragem is None:
+        taxa_amostragem = sortear_amostragem(evento, erro is not None)
+        if taxa_amostragem is None:
+            return
+    if payload is not _SEM_PAYLOAD:
+        payload_bytes = tamanho_payload(payload)
+    logger_eventos.log(logging.ERROR if erro is not None else logging.INFO, evento, extra={'evento_json': {
+        'event': evento,
+        'sala_id': sala_id,
+        'user_id': user_id,
+        'latency_ms': latency_ms,
+        'payload_bytes': payload_bytes,
+        'taxa_amostragem': taxa_amostragem,
+        'erro': erro,
+    }})
+
+# Os helpers abaixo verificam o nível ANTES de montar qualquer texto e passam os valores
+# como argumentos (%s): a mensagem só é montada se o registro passar do nível, no prepare().
+# 'detalhes'/'payload_resumo' também aceitam argumentos, para quem chama não montar f-strings.
+# stacklevel=2 faz o funcName/lineno do log apontar para quem chamou o helper.
+
 def log_conexao(evento, user_id=None, sala_id=None, sid=None, info_extra=None):
     """Log de eventos de conexão."""
-    ctx = f"[User:{user_id}] [Sala:{sala_id}] [SID:{sid}]" if any([user_id, sala_id, sid]) else ""
-    msg = f"{evento} {ctx}".strip()
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if any([user_id, sala_id, sid]):
+        msg, args = "%s [User:%s] [Sala:%s] [SID:%s]", [evento, user_id, sala_id, sid]
+    else:
+        msg, args = "%s", [evento]
     if info_extra:
-        msg += f" | {info_extra}"
-    logger.info(msg)
+        msg += " | %s"
+        args.append(info_extra)
+    logger.info(msg, *args, stacklevel=2)
 
-def log_evento_socket(evento, sala_id, user_id=None, payload_resumo=None):
-    """Log de eventos do Socket.IO."""
-    ctx = f"[Evento:{evento}] [Sala:{sala_id}] [User:{user_id}]"
-    if payload_resumo:
-        ctx += f" | {payload_resumo}"
-    logger.info(ctx)
+def log_evento_socket(evento, sala_id, user_id=None, payload_resumo=None, resumo_args=()):
+    """Log de eventos do Socket.IO. Com 'resumo_args', 'payload_resumo' é um formato %s."""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if payload_resumo and resumo_args:
+        logger.info("[Evento:%s] [Sala:%s] [User:%s] | " + payload_resumo, evento, sala_id, user_id,
+                    *resumo_args, stacklevel=2)
+    elif payload_resumo:
+        logger.info("[Evento:%s] [Sala:%s] [User:%s] | %s", evento, sala_id, user_id, payload_resumo, stacklevel=2)
+    else:
+        logger.info("[Evento:%s] [Sala:%s] [User:%s]", evento, sala_id, user_id, stacklevel=2)
 
-def log_batalha(fase, sala_id, detalhes):
-    """Log de eventos de batalha."""
-    logger.info(f"[BATALHA] [Sala:{sala_id}] [Fase:{fase}] | {detalhes}")
+def log_batalha(fase, sala_id, detalhes, *args):
+    """Log de eventos de batalha. Com 'args', 'detalhes' é um formato %s."""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if args:
+        logger.info("[BATALHA] [Sala:%s] [Fase:%s] | " + detalhes, sala_id, fase, *args, stacklevel=2)
+    else:
+        logger.info("[BATALHA] [Sala:%s] [Fase:%s] | %s", sala_id, fase, detalhes, stacklevel=2)
 
 def log_erro(modulo, user_id=None, sala_id=None, erro_msg=None):
     """Log de erros."""
-    ctx = f"[ERRO] [{modulo}]"
+    msg, args = "[ERRO] [%s]", [modulo]
     if user_id:
-        ctx += f" [User:{user_id}]"
+        msg += " [User:%s]"
+        args.append(user_id)
     if sala_id:
-        ctx += f" [Sala:{sala_id}]"
-    logger.error(f"{ctx} | {erro_msg if erro_msg else 'Erro desconhecido'}")
+        msg += " [Sala:%s]"
+        args.append(sala_id)
+    msg += " | %s"
+    args.append(erro_msg if erro_msg else 'Erro desconhecido')
+    logger.error(msg, *args, stacklevel=2)
+    if LOG_JSON_ATIVO:
+        # Erros nunca são amostrados.
+        registrar_evento(f"erro:{modulo}", sala_id, user_id, erro=str(erro_msg or 'Erro desconhecido'))
 
-def log_debug(modulo, msg):
-    """Log de debug."""
-    logger.debug(f"[{modulo}] {msg}")
+def log_debug(modulo, msg, *args):
+    """
+    Log de debug. Use argumentos no estilo %s em vez de f-string, ex:
+    log_debug('batalha', 'data recebido: %s', data) — assim nada é formatado com DEBUG desligado.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        if not args:
+            msg = msg.replace('%', '%%')  # mensagem já pronta: '%' é literal
+        logger.debug("[%s] " + msg, modulo, *args, stacklevel=2)
 
 def log_warning(modulo, msg, user_id=None):
     """Log de warning."""
-    ctx = f"[{modulo}]" + (f" [User:{user_id}]" if user_id else "")
-    logger.warning(f"{ctx} {msg}")
+    if not logger.isEnabledFor(logging.WARNING):
+        return
+    if user_id:
+        logger.warning("[%s] [User:%s] %s", modulo, user_id, msg, stacklevel=2)
+    else:
+        logger.warning("[%s] %s", modulo, msg, stacklevel=2)
@@ -4,6 +4,7 @@
 import sqlite3
 # Importa a biblioteca 'os' para nos ajudar a manipular caminhos de arquivos de forma inteligente.
 import os
+import sys
 
 # --- LÓGICA DE CAMINHO ABSOLUTO E ROBUSTO ---
 # Descobre o caminho do diretório onde este script (editor_mestre.py) está.
@@ -13,6 +14,13 @@ backend_dir = os.path.join(script_dir, '..')
 # Constrói o caminho final e absoluto para o arquivo do banco de dados.
 NOME_DB = os.path.join(backend_dir, 'database', 'campanhas.db')
 
+# As inclusões passam pelas mesmas funções da API (db_manager.criar_*): o efeito é validado
+# antes de gravar e o compêndio fica sabendo da alteração. Para importar o pacote 'backend',
+# a raiz do projeto (um nível acima do backend) precisa estar no sys.path.
+sys.path.insert(0, os.path.abspath(os.path.join(backend_dir, '..')))
+from backend.core.efeitos import EfeitoInvalido
+from backend.database.db_manager import criar_novo_monstro, criar_novo_item, criar_nova_habilidade
+
 # --- Funções de Gerenciamento de Monstros ---
 
 def adicionar_monstro():
@@ -27,23 +35,19 @@ def adicionar_monstro():
         xp_oferecido = int(input("XP Oferecido: "))
         ouro_drop = int(input("Ouro Descoberto: "))
         
-        # O bloco 'with' gerencia a conexão automaticamente. Ele abre a conexão
-        # e garante que ela seja fechada no final, mesmo se ocorrerem erros.
-        # Ele também faz o 'commit' automaticamente se o bloco for concluído com sucesso.
-        with sqlite3.connect(NOME_DB) as conexao:
-            cursor = conexao.cursor()
-            cursor.execute(
-                "INSERT INTO monstros_base (nome, vida_maxima, ataque_bonus, dano_dado, defesa, xp_oferecido, ouro_drop) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (nome, vida_maxima, ataque_bonus, dano_dado, defesa, xp_oferecido, ouro_drop)
-            )
-        print(f"\nMonstro '{nome}' adicionado à biblioteca com sucesso!")
     except ValueError:
         print("\nErro: Por favor, insira um número válido para os atributos numéricos.")
-    except sqlite3.IntegrityError:
-        print(f"\nErro: Já existe um monstro com o nome '{nome}' na biblioteca.")
-    except sqlite3.Error as e:
-        # Captura qualquer outro erro genérico do banco de dados.
-        print(f"\nOcorreu um erro no banco de dados: {e}")
+        return
+
+    # criar_novo_monstro devolve None (e explica no console) se o nome já existir ou o banco falhar.
+    novo = criar_novo_monstro({
+        'nome': nome, 'vida_maxima': vida_maxima, 'ataque_bonus': ataque_bonus, 'dano_dado': dano_dado,
+        'defesa': defesa, 'ca': defesa, 'xp_oferecido': xp_oferecido, 'ouro_drop': ouro_drop,
+    })
+    if novo:
+        print(f"\nMonstro '{nome}' adicionado à biblioteca com sucesso!")
+    else:
+        print(f"\nErro: não foi possível adicionar o monstro '{nome}' (nome repetido?).")
 
 def listar_monstros():
     """Consulta e exibe todos os monstros da tabela 'monstros_base'."""
@@ -77,27 +81,29 @@ def adicionar_item():
         descricao = input("Descrição: ").strip()
         preco_ouro = int(input("Preço em Ouro: "))
 
-        dano_dado, bonus_ataque, efeito = None, 0, None
+        dados = {'nome': nome, 'tipo': tipo, 'descricao': descricao, 'preco_ouro': preco_ouro}
         
         if tipo.lower() == 'arma':
-            dano_dado = input("Dado de Dano da Arma (ex: 1d8): ").strip()
-            bonus_ataque = int(input("Bônus de Ataque da Arma (ex: 0, 1): "))
+            dados['dano_dado'] = input("Dado de Dano da Arma (ex: 1d8): ").strip()
+            dados['bonus_ataque'] = int(input("Bônus de Ataque da Arma (ex: 0, 1): "))
         elif tipo.lower() == 'poção':
-            efeito = input("Efeito do Item (ex: cura:10): ").strip()
-
-        with sqlite3.connect(NOME_DB) as conexao:
-            cursor = conexao.cursor()
-            cursor.execute(
-                "INSERT INTO itens_base (nome, tipo, descricao, preco_ouro, dano_dado, bonus_ataque, efeito) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (nome, tipo, descricao, preco_ouro, dano_dado, bonus_ataque, efeito)
-            )
-        print(f"\nItem '{nome}' adicionado à biblioteca com sucesso!")
+            dados['efeito'] = input("Efeito do Item (ex: cura:10): ").strip()
     except ValueError:
         print("\nErro: Por favor, insira um número válido para preço ou bônus de ataque.")
-    except sqlite3.IntegrityError:
-        print(f"\nErro: Já existe um item com o nome '{nome}' na biblioteca.")
+        return
+
+    try:
+        novo = criar_novo_item(dados)
+    except EfeitoInvalido as e:
+        print(f"\nErro: efeito inválido: {e}")
+        return
     except sqlite3.Error as e:
         print(f"\nOcorreu um erro no banco de dados: {e}")
+        return
+    if novo:
+        print(f"\nItem '{nome}' adicionado à biblioteca com sucesso!")
+    else:
+        print(f"\nErro: Já existe um item com o nome '{nome}' na biblioteca.")
 
 def listar_itens():
     """Consulta e exibe todos os itens da tabela 'itens_base'."""
@@ -130,20 +136,19 @@ def adicionar_habilidade():
         descricao = input("Descrição: ").strip()
         efeito = input("Efeito (ex: dano:2d6:fogo, cura:15): ").strip()
         custo_mana = int(input("Custo de Mana: "))
-        
-        with sqlite3.connect(NOME_DB) as conexao:
-            cursor = conexao.cursor()
-            cursor.execute(
-                "INSERT INTO habilidades_base (nome, descricao, efeito, custo_mana) VALUES (?, ?, ?, ?)",
-                (nome, descricao, efeito, custo_mana)
-            )
-        print(f"\nHabilidade '{nome}' adicionada à biblioteca com sucesso!")
     except ValueError:
         print("\nErro: Custo de Mana deve ser um número.")
-    except sqlite3.IntegrityError:
+        return
+
+    try:
+        nova = criar_nova_habilidade({'nome': nome, 'descricao': descricao, 'efeito': efeito, 'custo_mana': custo_mana})
+    except EfeitoInvalido as e:
+        print(f"\nErro: efeito inválido: {e}")
+        return
+    if nova:
+        print(f"\nHabilidade '{nome}' adicionada à biblioteca com sucesso!")
+    else:
         print(f"\nErro: Já existe uma habilidade com o nome '{nome}'.")
-    except sqlite3.Error as e:
-        print(f"\nOcorreu um erro no banco de dados: {e}")
 
 def listar_habilidades():
     """Consulta e exibe todas as habilidades da tabela 'habilidades_base'."""
@@ -26,22 +26,8 @@ def salvar_personagem(personagem: Personagem):
         # Se não existir, o comando 'os.makedirs()' a cria.
         os.makedirs(PASTA_SAVES)
 
-    # Cria um dicionário Python contendo todos os atributos do objeto personagem que queremos salvar.
-    dados_para_salvar = {
-        "nome": personagem.nome,
-        "classe": personagem.classe,
-        "nivel": personagem.nivel,
-        "atributos": personagem.atributos,
-        "vida_atual": personagem.vida_atual,
-        "vida_maxima": personagem.vida_maxima,
-        "inventario": personagem.inventario,
-        "ouro": personagem.ouro,
-        "xp_atual": personagem.xp_atual,
-        "xp_proximo_nivel": personagem.xp_proximo_nivel,
-        "mana_atual": personagem.mana_atual,
-        "mana_maxima": personagem.mana_maxima,
-        "habilidades": personagem.habilidades,
-    }
+    # Cria um dicionário Python com todos os atributos salvos do personagem (ver Personagem.to_dict).
+    dados_para_salvar = personagem.to_dict()
 
     # Monta o nome do arquivo de save usando o nome do personagem (ex: "Aragorn.json").
     caminho_arquivo = os.path.join(PASTA_SAVES, f"{personagem.nome}.json")
@@ -75,23 +61,11 @@ def carregar_personagem(nome_personagem: str):
         dados_carregados = json.load(f)
 
     # Desserialização: recria o objeto Personagem a partir do dicionário.
-    personagem_carregado = Personagem(
-        nome=dados_carregados["nome"],
-        classe=dados_carregados["classe"],
-        nivel=dados_carregados["nivel"],
-        atributos=dados_carregados["atributos"],
-        vida_atual=dados_carregados["vida_atual"],
-        vida_maxima=dados_carregados["vida_maxima"],
-        # O método .get(chave, valor_padrao) é usado para retrocompatibilidade.
-        # Se um save antigo não tiver a chave 'inventario', ele usa uma lista vazia '[]' como padrão.
-        inventario=dados_carregados.get("inventario", []),
-        ouro=dados_carregados.get("ouro", 0),
-        xp_atual=dados_carregados.get("xp_atual", 0),
-        xp_proximo_nivel=dados_carregados.get("xp_proximo_nivel", 100),
-        mana_atual=dados_carregados.get("mana_atual", 10),
-        mana_maxima=dados_carregados.get("mana_maxima", 10),
-        habilidades=dados_carregados.get("habilidades", [])
-    )
+    # Retrocompatibilidade: chaves que um save antigo não tiver (ex: 'inventario') usam os padrões do construtor,
+    # menos a mana: saves sem 'mana_atual'/'mana_maxima' sempre carregaram com 10/10 (e não pela Inteligência).
+    dados_carregados.setdefault("mana_atual", 10)
+    dados_carregados.setdefault("mana_maxima", 10)
+    personagem_carregado = Personagem.from_dict(dados_carregados)
     
     print(f"Personagem {personagem_carregado.nome} carregado com sucesso!")
     # Retorna o objeto Personagem recém-criado, pronto para ser usado no jogo.
@@ -1,10 +1,12 @@
 # servidor/__main__.py
 """
 Este arquivo permite que o pacote 'servidor' seja executável.
-Executar `python -m servidor` na pasta `backend` irá rodar este script.
+Executar `python -m backend.servidor` na raiz do projeto irá rodar este script.
+O modo (threading, eventlet ou gevent) vem de RPG_ASYNC_MODE; ver servidor/execucao.py.
 """
+from . import execucao
 from . import servidor_api
 
 if __name__ == "__main__":
     # Inicia o servidor Flask/SocketIO definido em servidor_api.py
-    servidor_api.socketio.run(servidor_api.app, debug=True, port=5003, host='0.0.0.0')
\ No newline at end of file
+    execucao.rodar(servidor_api.socketio, servidor_api.app)
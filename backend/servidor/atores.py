@@ -0,0 +1,144 @@
+# servidor/atores.py
+"""
+Um "ator" por sala: fila de comandos com um único executor.
+
+Os eventos que alteram a sala (presença, batalha) não rodam na thread/greenlet que
+recebeu o evento: entram na fila da sala e são aplicados em ordem de chegada por um
+executor só daquela sala. Salas diferentes rodam em paralelo; dentro de uma sala não há
+duas mutações ao mesmo tempo, sem trava global.
+
+- O executor nasce no primeiro comando da sala e termina depois de RPG_ATOR_OCIOSO_S
+  (padrão 30 s) sem comandos; a sala some das métricas junto com ele.
+- Quem envia o comando espera o resultado (o retorno vira o ack do Socket.IO e as
+  exceções sobem normalmente). Um comando que chama outro da mesma sala roda direto.
+- 'envolver(sala_id)' (opcional) envolve cada comando; o servidor passa a trava do estado
+  compartilhado (estado.py), que só custa algo quando há vários workers.
+- No máximo RPG_ATORES_MAX (padrão 1000) executores vivos. Acima disso o comando de uma
+  sala nova roda direto na thread que o recebeu, dentro de 'envolver' (a trava da sala
+  continua serializando as mutações); conta em rpg_salas_atores_excedentes_total.
+- Usa threading/queue, então vira green thread sob eventlet/gevent (monkey patch de execucao.py).
+
+Métricas (coletor para metricas.registrar_coletor): profundidade atual e máxima da fila
+por sala, comandos processados, executores ativos e o histograma de espera na fila.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from . import metricas
+
+OCIOSO_S = float(os.environ.get('RPG_ATOR_OCIOSO_S', '30'))
+MAX_ATORES = int(os.environ.get('RPG_ATORES_MAX', '1000'))
+
+espera_fila = metricas.histograma('rpg_sala_fila_espera_segundos',
+                                  'Tempo de um comando na fila da sala até começar a rodar.')
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+class _Ator:
+    def __init__(self, sala_id):
+        self.sala_id = sala_id
+        self.fila = queue.Queue()
+        self.pendentes = 0      # na fila + rodando
+        self.maior_fila = 0
+        self.processados = 0
+
+
+class Atores:
+    """Registro dos atores por sala."""
+
+    def __init__(self, envolver=None, ocioso_s=OCIOSO_S, max_atores=MAX_ATORES):
+        self._envolver = envolver
+        self._ocioso_s = ocioso_s
+        self._max_atores = max_atores
+        self.excedentes = 0               # comandos rodados fora de ator por causa do limite
+        self._atores = {}                 # { sala_id: _Ator }
+        self._trava = threading.Lock()
+        self._local = threading.local()   # sala do executor que está rodando nesta thread
+
+    def executar(self, sala_id, funcao, *args):
+        """Enfileira funcao(*args) no ator da sala, espera e devolve o resultado."""
+        if getattr(self._local, 'sala_id', None) == sala_id:
+            return funcao(*args)
+        futuro = Future()
+        with self._trava:
+            ator = self._atores.get(sala_id)
+            if ator is None and len(self._atores) >= self._max_atores:
+                self.excedentes += 1
+            else:
+                if ator is None:
+                    ator = self._atores[sala_id] = _Ator(sala_id)
+                    threading.Thread(target=self._rodar, args=(ator,), name=f'ator-sala-{sala_id}', daemon=True).start()
+                ator.pendentes += 1
+                ator.maior_fila = max(ator.maior_fila, ator.pendentes)
+                ator.fila.put((time.perf_counter(), funcao, args, futuro))
+        if ator is None:
+            return self._direto(sala_id, funcao, args)
+        return futuro.result()
+
+    def _direto(self, sala_id, funcao, args):
+        if self._envolver is None:
+            return funcao(*args)
+        with self._envolver(sala_id):
+            return funcao(*args)
+
+    def _rodar(self, ator):
+        self._local.sala_id = ator.sala_id
+        while True:
+            try:
+                enfileirado, funcao, args, futuro = ator.fila.get(timeout=self._ocioso_s)
+            except queue.Empty:
+                with self._trava:
+                    # 'executar' enfileira com a trava: fila vazia aqui = ninguém mais vai usar este ator
+                    if ator.fila.empty():
+                        del self._atores[ator.sala_id]
+                        return
+                continue
+            espera_fila.observar(time.perf_counter() - enfileirado)
+            try:
+                if self._envolver is None:
+                    resultado = funcao(*args)
+                else:
+                    with self._envolver(ator.sala_id):
+                        resultado = funcao(*args)
+            except BaseException as e:
+                # Nada pode derrubar o executor: a sala ficaria com um ator morto registrado.
+                futuro.set_exception(e)
+            else:
+                futuro.set_result(resultado)
+            finally:
+                with self._trava:
+                    ator.pendentes -= 1
+                    ator.processados += 1
+
+    def profundidade(self, sala_id):
+        """Comandos da sala na fila ou rodando (0 se a sala não tem ator ativo)."""
+        ator = self._atores.get(sala_id)
+        return ator.pendentes if ator else 0
+
+    def linhas_prometheus(self):
+        with self._trava:
+            atores = sorted(self._atores.values(), key=lambda a: a.sala_id)
+            dados = [(_rotulo(a.sala_id), a.pendentes, a.maior_fila, a.processados) for a in atores]
+            excedentes = self.excedentes
+        linhas = ["# HELP rpg_salas_atores_ativos Salas com executor ativo.",
+                  "# TYPE rpg_salas_atores_ativos gauge",
+                  f"rpg_salas_atores_ativos {len(dados)}",
+                  "# HELP rpg_salas_atores_excedentes_total Comandos rodados fora de ator por causa de RPG_ATORES_MAX.",
+                  "# TYPE rpg_salas_atores_excedentes_total counter",
+                  f"rpg_salas_atores_excedentes_total {excedentes}",
+                  "# HELP rpg_sala_fila_profundidade Comandos na fila da sala (incluindo o que está rodando).",
+                  "# TYPE rpg_sala_fila_profundidade gauge"]
+        linhas += [f'rpg_sala_fila_profundidade{{sala="{s}"}} {p}' for s, p, _, _ in dados]
+        linhas += ["# HELP rpg_sala_fila_profundidade_max Maior profundidade da fila desde que o executor da sala subiu.",
+                   "# TYPE rpg_sala_fila_profundidade_max gauge"]
+        linhas += [f'rpg_sala_fila_profundidade_max{{sala="{s}"}} {m}' for s, _, m, _ in dados]
+        linhas += ["# HELP rpg_sala_comandos_total Comandos aplicados pelo executor da sala.",
+                   "# TYPE rpg_sala_comandos_total counter"]
+        linhas += [f'rpg_sala_comandos_total{{sala="{s}"}} {n}' for s, _, _, n in dados]
+        return linhas
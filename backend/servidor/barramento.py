@@ -0,0 +1,105 @@
+# servidor/barramento.py
+
+# Barramento de mensagens do Socket.IO entre workers (RPG_MESSAGE_QUEUE).
+#
+# Com vários processos, cada worker só conhece os clientes conectados nele. Um emit para
+# uma sala precisa chegar aos outros workers, que entregam aos seus clientes; é isso que
+# os "client managers" pub/sub do python-socketio fazem. Opções:
+#
+#   (vazio, padrão)          sem barramento: um worker só
+#   sqlite                   tabela no arquivo database/estado_compartilhado.db (mesma máquina, offline)
+#   sqlite:////caminho.db    idem, em outro arquivo
+#   redis://host:6379/0      RedisManager do python-socketio (requer 'pip install redis')
+#   amqp://...               KombuManager (RabbitMQ; requer 'pip install kombu')
+#
+# O backend SQLite grava cada mensagem (em JSON) numa tabela e cada worker lê as novas a
+# cada RPG_BARRAMENTO_INTERVALO_MS (padrão 20 ms). Mensagens com mais de um minuto são apagadas.
+# Emits com vários argumentos (dados em tupla, como os eventos numerados da sala) levam uma
+# marca, porque o JSON transforma a tupla em lista e o outro worker mandaria um argumento só.
+# Payloads binários (codec.py) vão em base64.
+import base64
+import json
+import os
+import time
+from contextlib import closing
+
+import socketio
+
+from ..database import instrumentacao
+from .estado import caminho_sqlite
+
+INTERVALO_S = float(os.environ.get('RPG_BARRAMENTO_INTERVALO_MS', '20')) / 1000
+RETENCAO_S = 60
+LOTE = 500
+
+
+def _bytes_para_json(valor):
+    if isinstance(valor, bytes):
+        return {'__bytes__': base64.b64encode(valor).decode('ascii')}
+    raise TypeError(f"{type(valor).__name__} não serializável no barramento")
+
+
+def _json_para_bytes(obj):
+    return base64.b64decode(obj['__bytes__']) if len(obj) == 1 and '__bytes__' in obj else obj
+
+
+class GerenciadorSQLite(socketio.PubSubManager):
+    """Client manager pub/sub do python-socketio sobre uma tabela SQLite."""
+
+    name = 'sqlite'
+
+    def __init__(self, url='sqlite', channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.caminho = os.path.abspath(caminho_sqlite(url))
+        with closing(self._conectar()) as c, c:
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS barramento_socketio (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    canal TEXT NOT NULL, dados TEXT NOT NULL, criado REAL NOT NULL)""")
+            # Começa do fim: mensagens antigas (de antes deste worker subir) não interessam.
+            self._ultimo_id = c.execute("SELECT COALESCE(MAX(id), 0) FROM barramento_socketio").fetchone()[0]
+
+    def _conectar(self):
+        return instrumentacao.conectar(self.caminho, timeout=30)
+
+    def _publish(self, data):
+        if isinstance(data.get('data'), tuple):
+            data = dict(data, data=list(data['data']), argumentos=True)
+        with closing(self._conectar()) as c, c:
+            c.execute("INSERT INTO barramento_socketio (canal, dados, criado) VALUES (?, ?, ?)",
+                      (self.channel, json.dumps(data, ensure_ascii=False, default=_bytes_para_json), time.time()))
+
+    def _listen(self):
+        proxima_limpeza = time.time() + RETENCAO_S
+        while True:
+            with closing(self._conectar()) as c:
+                linhas = c.execute(
+                    "SELECT id, dados FROM barramento_socketio WHERE canal=? AND id>? ORDER BY id LIMIT ?",
+                    (self.channel, self._ultimo_id, LOTE)).fetchall()
+                if time.time() >= proxima_limpeza:
+                    with c:
+                        c.execute("DELETE FROM barramento_socketio WHERE criado < ?", (time.time() - RETENCAO_S,))
+                    proxima_limpeza = time.time() + RETENCAO_S
+            for id_mensagem, dados in linhas:
+                self._ultimo_id = id_mensagem
+                mensagem = json.loads(dados, object_hook=_json_para_bytes)
+                if mensagem.pop('argumentos', False):
+                    mensagem['data'] = tuple(mensagem['data'])
+                yield mensagem
+            if len(linhas) < LOTE:
+                time.sleep(INTERVALO_S)
+
+
+def criar_gerenciador(url=None):
+    """Client manager para o SocketIO(client_manager=...) a partir de RPG_MESSAGE_QUEUE (None = um worker só)."""
+    url = (url if url is not None else os.environ.get('RPG_MESSAGE_QUEUE', '')).strip()
+    if not url:
+        return None
+    if url.startswith('sqlite'):
+        return GerenciadorSQLite(url)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return socketio.RedisManager(url)
+    if url.startswith(('amqp://', 'amqps://')):
+        return socketio.KombuManager(url)
+    raise ValueError(f"RPG_MESSAGE_QUEUE inválido: '{url}' (use sqlite, sqlite:///<arquivo>, redis://... ou amqp://...)")
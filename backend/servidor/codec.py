@@ -0,0 +1,139 @@
+# servidor/codec.py
+"""
+Codificação binária opcional (MessagePack) dos eventos Socket.IO, negociada por cliente.
+
+O JSON dos eventos grandes (batalha_atualizada manda o estado inteiro duas vezes, presença,
+histórico) repete as mesmas chaves longas em cada combatente. Com o codec:
+
+- As chaves conhecidas (CHAVES: esquema da batalha, dos combatentes e da presença) viram o
+  índice delas na tupla; o resto do payload vai igual. A tupla é mandada ao cliente no evento
+  'codec' quando ele entra na sala, então servidor e cliente usam sempre o mesmo dicionário.
+- O payload vira um único anexo binário do Socket.IO (msgpack) em vez de texto JSON.
+
+É opt-in dos dois lados: o servidor só oferece com RPG_CODECS=msgpack e o pacote 'msgpack'
+instalado ('pip install msgpack'); o cliente pede com 'codec': 'msgpack' no join_room/resume.
+Clientes que não pedem continuam recebendo JSON. Com o codec ligado, cada evento da sala é
+mandado duas vezes (JSON para a sala, msgpack para sala(sala_id)), então só vale a pena ligar
+quando os clientes usam.
+
+A escolha de cada sid fica na memória do worker (como os baldes do limitador): os eventos de
+um sid sempre chegam ao mesmo worker (sticky sessions).
+"""
+import os
+import threading
+
+try:
+    import msgpack  # opcional
+except ImportError:
+    msgpack = None
+
+MSGPACK = 'msgpack'
+VERSAO_CHAVES = 1
+CHAVES = (
+    # envelope dos eventos da sala / presença
+    'sala_id', 'versao', 'sid', 'jogador', 'jogadores', 'campos', 'historico', 'seq',
+    'user_id', 'ficha_id', 'nome_personagem', 'role', 'desconectado',
+    # batalha
+    'batalha', 'batalha_mestre', 'fase', 'sub_fase', 'dado_dano_atual', 'alvo_dano_atual',
+    'd20_acerto_atual', 'monstros', 'turno_ordem', 'turno_atual', 'log', 'acoes_padrao',
+    # combatentes (JogadorBatalha / MonstroBatalha)
+    'id', 'db_id', 'nome', 'tipo', 'hp_max', 'hp_atual', 'ca', 'status', 'iniciativa',
+    'acoes_restantes', 'acoes_max', 'hp_oculto',
+    # batalha_encerrada
+    'motivo', 'texto', 'emoji',
+)
+_INDICE = {chave: i for i, chave in enumerate(CHAVES)}
+
+
+def _ler_oferecidos(texto):
+    oferecidos = {c.strip() for c in texto.split(',') if c.strip()}
+    if MSGPACK in oferecidos and msgpack is None:
+        print("AVISO: RPG_CODECS pede msgpack, mas o pacote não está instalado; usando só JSON")
+        oferecidos.discard(MSGPACK)
+    return oferecidos
+
+
+def sala(sala_id):
+    """Sala do Socket.IO onde ficam os clientes msgpack de 'sala_id' (os JSON ficam em 'sala_id')."""
+    return f"{sala_id}#{MSGPACK}"
+
+
+class _Indice(dict):
+    """Chave -> índice em CHAVES; chave desconhecida fica como está (em texto, como no JSON)."""
+
+    def __missing__(self, chave):
+        return chave if isinstance(chave, str) else str(chave)
+
+
+_INDICE = _Indice(_INDICE)
+_CONTEINERES = (dict, list, tuple)
+
+
+def compactar(obj):
+    """Troca as chaves conhecidas dos dicts pelo índice em CHAVES (recursivo)."""
+    # Escalares não passam por chamada: a maior parte do payload são eles (e o log, texto).
+    if type(obj) is dict:
+        return {_INDICE[k]: compactar(v) if type(v) in _CONTEINERES else v for k, v in obj.items()}
+    if type(obj) in _CONTEINERES:
+        return [compactar(v) if type(v) in _CONTEINERES else v for v in obj]
+    return obj
+
+
+def expandir(obj):
+    """Inverso de compactar (o cliente faz o mesmo ao decodificar)."""
+    if isinstance(obj, dict):
+        return {CHAVES[k] if isinstance(k, int) else k: expandir(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [expandir(v) for v in obj]
+    return obj
+
+
+def codificar(dados):
+    """Payload -> bytes msgpack com as chaves compactadas."""
+    return msgpack.packb(compactar(dados), use_bin_type=True)
+
+
+def decodificar(binario):
+    return expandir(msgpack.unpackb(binario, raw=False, strict_map_key=False))
+
+
+class Codecs:
+    """Codec escolhido por cada sid neste worker."""
+
+    def __init__(self, oferecidos=None):
+        self.oferecidos = oferecidos if oferecidos is not None else _ler_oferecidos(os.environ.get('RPG_CODECS', ''))
+        self._trava = threading.Lock()
+        self._por_sid = {}  # { sid: 'msgpack' } (ausente = JSON)
+
+    @property
+    def ativo(self):
+        """Algum codec binário oferecido (os eventos da sala também vão para sala(sala_id))."""
+        return MSGPACK in self.oferecidos
+
+    def negociar(self, sid, pedido):
+        """Registra o codec do sid: o pedido, se o servidor oferece; senão JSON. Retorna o escolhido (None = JSON)."""
+        escolhido = pedido if pedido in self.oferecidos else None
+        with self._trava:
+            if escolhido:
+                self._por_sid[sid] = escolhido
+            else:
+                self._por_sid.pop(sid, None)
+        return escolhido
+
+    def de(self, sid):
+        return self._por_sid.get(sid)
+
+    def esquecer(self, sid):
+        with self._trava:
+            self._por_sid.pop(sid, None)
+
+    def mensagem_negociacao(self):
+        """Payload do evento 'codec' (vai em JSON, antes de qualquer evento binário)."""
+        return {'codec': MSGPACK, 'versao': VERSAO_CHAVES, 'chaves': list(CHAVES)}
+
+    def linhas_prometheus(self):
+        with self._trava:
+            binarios = len(self._por_sid)
+        return ["# HELP rpg_codec_clientes Conexões deste worker recebendo eventos em msgpack.",
+                "# TYPE rpg_codec_clientes gauge",
+                f"rpg_codec_clientes {binarios}"]
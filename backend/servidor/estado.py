@@ -0,0 +1,633 @@
+# servidor/estado.py
+
+# Estado compartilhado das salas: presença (quem está em cada sala) e batalhas em andamento.
+#
+# Antes isso eram dois dicionários globais no servidor_api.py, o que prendia o servidor a
+# um processo só. Agora o servidor fala com um "backend" de estado, escolhido por RPG_ESTADO:
+#
+#   memoria (padrão)         dicionários no próprio processo (um worker; o mais rápido)
+#   sqlite                   arquivo database/estado_compartilhado.db (vários workers na mesma máquina)
+#   sqlite:////caminho.db    idem, em outro arquivo
+#   redis://host:6379/0      Redis (vários workers/máquinas; requer 'pip install redis')
+#
+# Todos têm a mesma interface. As mudanças numa sala acontecem dentro de 'trava(sala_id)'
+# (ou 'batalha(sala_id)', que trava, carrega, entrega a batalha e salva ao sair), então
+# dois workers nunca aplicam eventos da mesma sala ao mesmo tempo. No SQLite a trava é
+# uma "concessão" com prazo numa tabela (a mesma ideia do SET NX PX do Redis).
+#
+# A presença de cada sala tem uma versão, que muda a cada entrada/saída/alteração: o servidor
+# manda só o delta (presence_join/leave/update) com a versão nova, e quem perdeu algum
+# pede a lista inteira. A versão começa no relógio (ms) quando a sala ganha o primeiro
+# jogador, então uma sala que esvaziou e voltou não repete versões antigas.
+#
+# Os eventos mandados para a sala inteira ganham um número de sequência da sala e ficam num
+# buffer curto (os últimos RPG_REPLAY_EVENTOS): quem cai e volta com 'resume' recebe só o que
+# perdeu desde a última sequência que viu. Sequência e buffer nascem com a presença da sala
+# (a sequência também começa no relógio) e somem quando ela esvazia.
+#
+# Cada presença guarda quando o cliente deu sinal de vida pela última vez ('tocar', o heartbeat)
+# e cada batalha, quando foi salva pela última vez; a varredura (varredura.py) usa isso para
+# despejar sids mortos e arquivar batalhas abandonadas.
+#
+# Para vários workers, use também um barramento de mensagens do Socket.IO (barramento.py).
+import json
+import os
+from collections import deque
+import threading
+import time
+import uuid
+import weakref
+from contextlib import closing, contextmanager
+
+from ..core.combatentes import JogadorBatalha, MonstroBatalha
+from ..database import instrumentacao
+
+CAMINHO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'estado_compartilhado.db')
+# Prazo da trava de sala entre processos: se um worker morrer segurando a trava, ela expira.
+PRAZO_TRAVA_S = float(os.environ.get('RPG_ESTADO_TRAVA_S', '10'))
+# Eventos da sala guardados para a retomada ('resume') de quem caiu.
+REPLAY_EVENTOS = int(os.environ.get('RPG_REPLAY_EVENTOS', '100'))
+
+
+def _versao_inicial():
+    return int(time.time() * 1000)
+
+
+def _cobertos(ultimo, primeiro, seq):
+    """O buffer (do 'primeiro' ao 'ultimo') tem tudo o que veio depois de 'seq'?"""
+    return ultimo is not None and primeiro - 1 <= seq <= ultimo
+
+
+def caminho_sqlite(url):
+    """'sqlite' -> arquivo padrão; 'sqlite:////tmp/x.db' -> '/tmp/x.db' (mesma convenção do SQLAlchemy)."""
+    if url in ('sqlite', 'sqlite://', 'sqlite:///'):
+        return CAMINHO_PADRAO
+    return url[len('sqlite:///'):]
+
+
+# --- Serialização da batalha (combatentes são dataclasses; o resto já é JSON) ---
+
+def batalha_para_json(b):
+    estado = dict(b)
+    estado['monstros'] = [m.to_dict() for m in b['monstros']]
+    estado['jogadores'] = [j.to_dict() for j in b['jogadores']]
+    return json.dumps(estado, ensure_ascii=False)
+
+
+def batalha_de_json(texto):
+    estado = json.loads(texto)
+    estado['monstros'] = [MonstroBatalha.from_dict(m) for m in estado['monstros']]
+    estado['jogadores'] = [JogadorBatalha.from_dict(j) for j in estado['jogadores']]
+    return estado
+
+
+class EstadoMemoria:
+    """Estado no próprio processo (o comportamento original, com uma trava por sala)."""
+
+    nome = 'memoria'
+
+    def __init__(self):
+        self._salas = {}     # { sala_id: { sid: info } }
+        self._vistos = {}    # { (sala_id, sid): último sinal de vida }
+        self._versoes = {}   # { sala_id: versão da presença }
+        self._seqs = {}      # { sala_id: último número de sequência dos eventos da sala }
+        self._eventos = {}   # { sala_id: deque[(seq, evento, dados)] }
+        self._batalhas = {}  # { sala_id: estado_da_batalha }
+        self._batalhas_em = {}  # { sala_id: último salvamento }
+        # Trava só existe enquanto alguém a usa: salas que somem não deixam travas para trás.
+        self._travas = weakref.WeakValueDictionary()  # { sala_id: RLock }
+        self._trava_travas = threading.Lock()
+
+    def _trava_local(self, sala_id):
+        with self._trava_travas:
+            trava = self._travas.get(sala_id)
+            if trava is None:
+                trava = self._travas[sala_id] = threading.RLock()
+            return trava
+
+    @contextmanager
+    def trava(self, sala_id):
+        """Exclusão mútua dos eventos de uma sala (reentrante)."""
+        with self._trava_local(sala_id):
+            yield
+
+    # --- Presença ---
+
+    def jogadores(self, sala_id):
+        """{ sid: info } da sala, na ordem de entrada (cópia)."""
+        return {sid: dict(info) for sid, info in self._salas.get(sala_id, {}).items()}
+
+    def jogador(self, sala_id, sid):
+        info = self._salas.get(sala_id, {}).get(sid)
+        return dict(info) if info is not None else None
+
+    def tem_sala(self, sala_id):
+        return sala_id in self._salas
+
+    def versao_presenca(self, sala_id):
+        """Versão atual da presença da sala (0 se a sala está vazia)."""
+        return self._versoes.get(sala_id, 0)
+
+    def _presenca_mudou(self, sala_id):
+        if sala_id in self._salas:
+            self._versoes[sala_id] = self._versoes.get(sala_id, _versao_inicial() - 1) + 1
+            self._seqs.setdefault(sala_id, _versao_inicial() - 1)
+        else:
+            self._versoes.pop(sala_id, None)
+            self._seqs.pop(sala_id, None)
+            self._eventos.pop(sala_id, None)
+
+    def entrar(self, sala_id, sid, info):
+        self._salas.setdefault(sala_id, {})[sid] = dict(info)
+        self._vistos[(sala_id, sid)] = time.time()
+        self._presenca_mudou(sala_id)
+
+    def tocar(self, sala_id, sid, quando=None):
+        """
+        Heartbeat: marca o sid como vivo (agora, ou em 'quando'). Retorna False se ele não está
+        (mais) na sala.
+        """
+        if sid not in self._salas.get(sala_id, {}):
+            return False
+        self._vistos[(sala_id, sid)] = time.time() if quando is None else quando
+        return True
+
+    def expirados(self, antes_de):
+        """[(sala_id, sid)] sem sinal de vida desde 'antes_de' (timestamp)."""
+        return [chave for chave, visto in list(self._vistos.items()) if visto < antes_de]
+
+    def atualizar_jogador(self, sala_id, sid, **campos):
+        info = self._salas.get(sala_id, {}).get(sid)
+        if info is not None:
+            info.update(campos)
+            self._presenca_mudou(sala_id)
+
+    def remover_jogador(self, sala_id, sid):
+        """Tira o sid da sala (e a sala, se ficar vazia). Retorna a info removida ou None."""
+        jogadores = self._salas.get(sala_id)
+        if not jogadores or sid not in jogadores:
+            return None
+        info = jogadores.pop(sid)
+        self._vistos.pop((sala_id, sid), None)
+        if not jogadores:
+            self._salas.pop(sala_id, None)
+        self._presenca_mudou(sala_id)
+        return info
+
+    def sala_do_sid(self, sid):
+        """Sala em que o sid está (ou None)."""
+        for sala_id, jogadores in list(self._salas.items()):
+            if sid in jogadores:
+                return sala_id
+        return None
+
+    # --- Eventos da sala (retomada) ---
+
+    def registrar_evento(self, sala_id, evento, dados):
+        """Numera e guarda um evento mandado à sala. Retorna a sequência (None se a sala está vazia)."""
+        if sala_id not in self._seqs:
+            return None
+        seq = self._seqs[sala_id] = self._seqs[sala_id] + 1
+        buffer = self._eventos.get(sala_id)
+        if buffer is None:
+            buffer = self._eventos[sala_id] = deque(maxlen=REPLAY_EVENTOS)
+        # Guarda o JSON, como os outros backends: o payload divide listas com a batalha viva
+        # (log, turno_ordem), e o replay tem que mostrar o que foi mandado naquele momento.
+        buffer.append((seq, evento, json.dumps(dados, ensure_ascii=False)))
+        return seq
+
+    def ultimo_seq(self, sala_id):
+        """Sequência do último evento da sala (None se a sala está vazia)."""
+        return self._seqs.get(sala_id)
+
+    def eventos_desde(self, sala_id, seq):
+        """
+        [(seq, evento, dados)] mandados à sala depois de 'seq', em ordem; None se o buffer já
+        não cobre esse intervalo (ou a sequência é de outra "vida" da sala).
+        """
+        ultimo = self._seqs.get(sala_id)
+        buffer = list(self._eventos.get(sala_id, ()))
+        if not _cobertos(ultimo, buffer[0][0] if buffer else (ultimo or 0) + 1, seq):
+            return None
+        return [(s, evento, json.loads(dados)) for s, evento, dados in buffer if s > seq]
+
+    # --- Batalhas ---
+
+    def ler_batalha(self, sala_id):
+        return self._batalhas.get(sala_id)
+
+    def tem_batalha(self, sala_id):
+        return sala_id in self._batalhas
+
+    def salvar_batalha(self, sala_id, b):
+        self._batalhas[sala_id] = b
+        self._batalhas_em[sala_id] = time.time()
+
+    def remover_batalha(self, sala_id):
+        self._batalhas.pop(sala_id, None)
+        self._batalhas_em.pop(sala_id, None)
+
+    def batalhas_ociosas(self, antes_de):
+        """Salas cuja batalha não é salva desde 'antes_de' (timestamp)."""
+        return [sala_id for sala_id, em in list(self._batalhas_em.items()) if em < antes_de]
+
+    def contagens(self):
+        """{'salas', 'presencas', 'batalhas'} ativas agora (para as métricas)."""
+        return {'salas': len(self._salas), 'presencas': len(self._vistos), 'batalhas': len(self._batalhas)}
+
+    @contextmanager
+    def batalha(self, sala_id):
+        """Trava a sala e entrega a batalha (ou None). Aqui o objeto é o próprio estado."""
+        with self.trava(sala_id):
+            yield self._batalhas.get(sala_id)
+
+
+class _EstadoExterno(EstadoMemoria):
+    """Base dos backends fora do processo: trava local + trava remota, batalha salva ao sair."""
+
+    def __init__(self):
+        super().__init__()
+        self._profundidade = threading.local()  # travas remotas já seguradas por esta thread
+        self._dono = f"{uuid.uuid4().hex[:8]}:{os.getpid()}"
+
+    @contextmanager
+    def trava(self, sala_id):
+        with self._trava_local(sala_id):
+            seguradas = getattr(self._profundidade, 'salas', None)
+            if seguradas is None:
+                seguradas = self._profundidade.salas = {}
+            if seguradas.get(sala_id):
+                seguradas[sala_id] += 1
+                try:
+                    yield
+                finally:
+                    seguradas[sala_id] -= 1
+                return
+            ficha = self._travar_remoto(sala_id)
+            seguradas[sala_id] = 1
+            try:
+                yield
+            finally:
+                seguradas.pop(sala_id, None)
+                self._destravar_remoto(sala_id, ficha)
+
+    @contextmanager
+    def batalha(self, sala_id):
+        with self.trava(sala_id):
+            b = self.ler_batalha(sala_id)
+            yield b
+            if b is not None and self.tem_batalha(sala_id):
+                self.salvar_batalha(sala_id, b)
+
+    def _travar_remoto(self, sala_id):
+        raise NotImplementedError
+
+    def _destravar_remoto(self, sala_id, ficha):
+        raise NotImplementedError
+
+
+class EstadoSQLite(_EstadoExterno):
+    """Estado num arquivo SQLite compartilhado pelos workers da mesma máquina."""
+
+    nome = 'sqlite'
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        super().__init__()
+        self.caminho = os.path.abspath(caminho)
+        with closing(self._conectar()) as c:
+            c.execute("PRAGMA journal_mode=WAL")  # leitores não esperam quem escreve
+            c.executescript("""
+                CREATE TABLE IF NOT EXISTS estado_presenca (
+                    sala_id TEXT NOT NULL, sid TEXT NOT NULL, info TEXT NOT NULL, visto REAL,
+                    PRIMARY KEY (sala_id, sid));
+                CREATE INDEX IF NOT EXISTS idx_estado_presenca_sid ON estado_presenca (sid);
+                CREATE TABLE IF NOT EXISTS estado_presenca_versao (
+                    sala_id TEXT PRIMARY KEY, versao INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS estado_eventos_seq (
+                    sala_id TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS estado_eventos (
+                    sala_id TEXT NOT NULL, seq INTEGER NOT NULL, evento TEXT NOT NULL, dados TEXT NOT NULL,
+                    PRIMARY KEY (sala_id, seq));
+                CREATE TABLE IF NOT EXISTS estado_batalhas (
+                    sala_id TEXT PRIMARY KEY, estado TEXT NOT NULL, versao INTEGER NOT NULL DEFAULT 1,
+                    atualizada REAL);
+                CREATE TABLE IF NOT EXISTS estado_travas (
+                    sala_id TEXT PRIMARY KEY, dono TEXT NOT NULL, expira REAL NOT NULL);
+            """)
+            # Arquivos criados antes do heartbeat/varredura não têm as colunas de tempo.
+            for tabela, coluna in (('estado_presenca', 'visto'), ('estado_batalhas', 'atualizada')):
+                if coluna not in [r[1] for r in c.execute(f"PRAGMA table_info({tabela})")]:
+                    c.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} REAL")
+
+    def _conectar(self):
+        return instrumentacao.conectar(self.caminho, timeout=30)
+
+    def _ler(self, sql, parametros=()):
+        with closing(self._conectar()) as c:
+            return c.execute(sql, parametros).fetchall()
+
+    def _escrever(self, sql, parametros=()):
+        with closing(self._conectar()) as c, c:
+            return c.execute(sql, parametros).rowcount
+
+    # --- Trava entre processos ---
+
+    def _travar_remoto(self, sala_id):
+        ficha = f"{self._dono}:{threading.get_ident()}"
+        espera = 0.002
+        while True:
+            agora = time.time()
+            # Pega a trava se estiver livre ou vencida (dono antigo morreu ou demorou demais).
+            pegou = self._escrever(
+                "INSERT INTO estado_travas (sala_id, dono, expira) VALUES (?, ?, ?) "
+                "ON CONFLICT(sala_id) DO UPDATE SET dono=excluded.dono, expira=excluded.expira "
+                "WHERE estado_travas.expira < ?",
+                (sala_id, ficha, agora + PRAZO_TRAVA_S, agora))
+            if pegou:
+                return ficha
+            time.sleep(espera)
+            espera = min(espera * 2, 0.05)
+
+    def _destravar_remoto(self, sala_id, ficha):
+        self._escrever("DELETE FROM estado_travas WHERE sala_id=? AND dono=?", (sala_id, ficha))
+
+    # --- Presença ---
+
+    def jogadores(self, sala_id):
+        linhas = self._ler("SELECT sid, info FROM estado_presenca WHERE sala_id=? ORDER BY rowid", (sala_id,))
+        return {sid: json.loads(info) for sid, info in linhas}
+
+    def jogador(self, sala_id, sid):
+        linhas = self._ler("SELECT info FROM estado_presenca WHERE sala_id=? AND sid=?", (sala_id, sid))
+        return json.loads(linhas[0][0]) if linhas else None
+
+    def tem_sala(self, sala_id):
+        return bool(self._ler("SELECT 1 FROM estado_presenca WHERE sala_id=? LIMIT 1", (sala_id,)))
+
+    def versao_presenca(self, sala_id):
+        linhas = self._ler("SELECT versao FROM estado_presenca_versao WHERE sala_id=?", (sala_id,))
+        return linhas[0][0] if linhas else 0
+
+    @staticmethod
+    def _presenca_mudou(c, sala_id):
+        # Na mesma transação da alteração; sala vazia perde a versão (e a próxima recomeça do relógio).
+        if c.execute("SELECT 1 FROM estado_presenca WHERE sala_id=? LIMIT 1", (sala_id,)).fetchone():
+            c.execute("INSERT INTO estado_presenca_versao (sala_id, versao) VALUES (?, ?) "
+                      "ON CONFLICT(sala_id) DO UPDATE SET versao=versao+1", (sala_id, _versao_inicial()))
+            c.execute("INSERT OR IGNORE INTO estado_eventos_seq (sala_id, seq) VALUES (?, ?)",
+                      (sala_id, _versao_inicial() - 1))
+        else:
+            c.execute("DELETE FROM estado_presenca_versao WHERE sala_id=?", (sala_id,))
+            c.execute("DELETE FROM estado_eventos_seq WHERE sala_id=?", (sala_id,))
+            c.execute("DELETE FROM estado_eventos WHERE sala_id=?", (sala_id,))
+
+    def entrar(self, sala_id, sid, info):
+        with closing(self._conectar()) as c, c:
+            # ON CONFLICT (e não REPLACE): quem reentra mantém o lugar na ordem da lista.
+            c.execute(
+                "INSERT INTO estado_presenca (sala_id, sid, info, visto) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(sala_id, sid) DO UPDATE SET info=excluded.info, visto=excluded.visto",
+                (sala_id, sid, json.dumps(info, ensure_ascii=False), time.time()))
+            self._presenca_mudou(c, sala_id)
+
+    def tocar(self, sala_id, sid, quando=None):
+        return self._escrever("UPDATE estado_presenca SET visto=? WHERE sala_id=? AND sid=?",
+                              (time.time() if quando is None else quando, sala_id, sid)) > 0
+
+    def expirados(self, antes_de):
+        return [tuple(linha) for linha in self._ler(
+            "SELECT sala_id, sid FROM estado_presenca WHERE COALESCE(visto, 0) < ?", (antes_de,))]
+
+    def atualizar_jogador(self, sala_id, sid, **campos):
+        with self.trava(sala_id):
+            info = self.jogador(sala_id, sid)
+            if info is not None:
+                info.update(campos)
+                with closing(self._conectar()) as c, c:
+                    c.execute("UPDATE estado_presenca SET info=? WHERE sala_id=? AND sid=?",
+                              (json.dumps(info, ensure_ascii=False), sala_id, sid))
+                    self._presenca_mudou(c, sala_id)
+
+    def remover_jogador(self, sala_id, sid):
+        with closing(self._conectar()) as c, c:
+            linha = c.execute("SELECT info FROM estado_presenca WHERE sala_id=? AND sid=?", (sala_id, sid)).fetchone()
+            if linha is None:
+                return None
+            c.execute("DELETE FROM estado_presenca WHERE sala_id=? AND sid=?", (sala_id, sid))
+            self._presenca_mudou(c, sala_id)
+            return json.loads(linha[0])
+
+    def sala_do_sid(self, sid):
+        linhas = self._ler("SELECT sala_id FROM estado_presenca WHERE sid=? LIMIT 1", (sid,))
+        return linhas[0][0] if linhas else None
+
+    def registrar_evento(self, sala_id, evento, dados):
+        with closing(self._conectar()) as c, c:
+            if not c.execute("UPDATE estado_eventos_seq SET seq=seq+1 WHERE sala_id=?", (sala_id,)).rowcount:
+                return None
+            seq = c.execute("SELECT seq FROM estado_eventos_seq WHERE sala_id=?", (sala_id,)).fetchone()[0]
+            c.execute("INSERT INTO estado_eventos (sala_id, seq, evento, dados) VALUES (?, ?, ?, ?)",
+                      (sala_id, seq, evento, json.dumps(dados, ensure_ascii=False)))
+            c.execute("DELETE FROM estado_eventos WHERE sala_id=? AND seq<=?", (sala_id, seq - REPLAY_EVENTOS))
+            return seq
+
+    def ultimo_seq(self, sala_id):
+        linhas = self._ler("SELECT seq FROM estado_eventos_seq WHERE sala_id=?", (sala_id,))
+        return linhas[0][0] if linhas else None
+
+    def eventos_desde(self, sala_id, seq):
+        with closing(self._conectar()) as c:
+            linha = c.execute("SELECT seq FROM estado_eventos_seq WHERE sala_id=?", (sala_id,)).fetchone()
+            ultimo = linha[0] if linha else None
+            primeiro = c.execute("SELECT MIN(seq) FROM estado_eventos WHERE sala_id=?", (sala_id,)).fetchone()[0]
+            if not _cobertos(ultimo, primeiro if primeiro is not None else (ultimo or 0) + 1, seq):
+                return None
+            linhas = c.execute("SELECT seq, evento, dados FROM estado_eventos WHERE sala_id=? AND seq>? ORDER BY seq",
+                               (sala_id, seq)).fetchall()
+        return [(s, evento, json.loads(dados)) for s, evento, dados in linhas]
+
+    # --- Batalhas ---
+
+    def ler_batalha(self, sala_id):
+        linhas = self._ler("SELECT estado FROM estado_batalhas WHERE sala_id=?", (sala_id,))
+        return batalha_de_json(linhas[0][0]) if linhas else None
+
+    def tem_batalha(self, sala_id):
+        return bool(self._ler("SELECT 1 FROM estado_batalhas WHERE sala_id=?", (sala_id,)))
+
+    def salvar_batalha(self, sala_id, b):
+        self._escrever(
+            "INSERT INTO estado_batalhas (sala_id, estado, atualizada) VALUES (?, ?, ?) "
+            "ON CONFLICT(sala_id) DO UPDATE SET estado=excluded.estado, atualizada=excluded.atualizada, "
+            "versao=versao+1",
+            (sala_id, batalha_para_json(b), time.time()))
+
+    def remover_batalha(self, sala_id):
+        self._escrever("DELETE FROM estado_batalhas WHERE sala_id=?", (sala_id,))
+
+    def batalhas_ociosas(self, antes_de):
+        return [linha[0] for linha in self._ler(
+            "SELECT sala_id FROM estado_batalhas WHERE COALESCE(atualizada, 0) < ?", (antes_de,))]
+
+    def contagens(self):
+        with closing(self._conectar()) as c:
+            salas, presencas = c.execute("SELECT COUNT(DISTINCT sala_id), COUNT(*) FROM estado_presenca").fetchone()
+            batalhas = c.execute("SELECT COUNT(*) FROM estado_batalhas").fetchone()[0]
+        return {'salas': salas, 'presencas': presencas, 'batalhas': batalhas}
+
+
+class EstadoRedis(_EstadoExterno):
+    """Estado no Redis (vários workers, inclusive em máquinas diferentes)."""
+
+    nome = 'redis'
+
+    def __init__(self, url):
+        super().__init__()
+        import redis  # opcional: só quem usa RPG_ESTADO=redis://... precisa instalar
+        self._r = redis.Redis.from_url(url, decode_responses=True)
+
+    # Chaves: rpg:sala:<id> (hash sid -> info), rpg:ordem:<id> (zset sid -> chegada),
+    # rpg:sid:<sid> (sala do sid), rpg:batalha:<id> (JSON), rpg:trava:<id> (trava),
+    # rpg:salas (set das salas com alguém), rpg:vistos (zset "<sala> <sid>" -> último sinal de vida),
+    # rpg:batalhas (zset sala -> último salvamento da batalha), rpg:pversao:<id> (versão da presença),
+    # rpg:eseq:<id> (sequência dos eventos da sala), rpg:eventos:<id> (lista JSON [seq, evento, dados]).
+
+    def _travar_remoto(self, sala_id):
+        trava = self._r.lock(f"rpg:trava:{sala_id}", timeout=PRAZO_TRAVA_S, sleep=0.005)
+        trava.acquire()
+        return trava
+
+    def _destravar_remoto(self, sala_id, ficha):
+        try:
+            ficha.release()
+        except Exception as e:  # trava expirou enquanto era usada
+            print(f"Aviso: trava da sala {sala_id} já tinha expirado: {e}")
+
+    def jogadores(self, sala_id):
+        ordem = self._r.zrange(f"rpg:ordem:{sala_id}", 0, -1)
+        infos = self._r.hgetall(f"rpg:sala:{sala_id}")
+        return {sid: json.loads(infos[sid]) for sid in ordem if sid in infos}
+
+    def jogador(self, sala_id, sid):
+        info = self._r.hget(f"rpg:sala:{sala_id}", sid)
+        return json.loads(info) if info is not None else None
+
+    def tem_sala(self, sala_id):
+        return bool(self._r.exists(f"rpg:sala:{sala_id}"))
+
+    def versao_presenca(self, sala_id):
+        return int(self._r.get(f"rpg:pversao:{sala_id}") or 0)
+
+    def entrar(self, sala_id, sid, info):
+        pipe = self._r.pipeline()
+        pipe.set(f"rpg:pversao:{sala_id}", _versao_inicial() - 1, nx=True)
+        pipe.incr(f"rpg:pversao:{sala_id}")
+        pipe.set(f"rpg:eseq:{sala_id}", _versao_inicial() - 1, nx=True)
+        pipe.hset(f"rpg:sala:{sala_id}", sid, json.dumps(info, ensure_ascii=False))
+        pipe.zadd(f"rpg:ordem:{sala_id}", {sid: time.time()}, nx=True)
+        pipe.set(f"rpg:sid:{sid}", sala_id)
+        pipe.sadd("rpg:salas", sala_id)
+        pipe.zadd("rpg:vistos", {f"{sala_id} {sid}": time.time()})
+        pipe.execute()
+
+    def tocar(self, sala_id, sid, quando=None):
+        if not self._r.hexists(f"rpg:sala:{sala_id}", sid):
+            return False
+        self._r.zadd("rpg:vistos", {f"{sala_id} {sid}": time.time() if quando is None else quando})
+        return True
+
+    def expirados(self, antes_de):
+        return [tuple(m.rsplit(' ', 1)) for m in self._r.zrangebyscore("rpg:vistos", '-inf', f"({antes_de}")]
+
+    def atualizar_jogador(self, sala_id, sid, **campos):
+        with self.trava(sala_id):
+            info = self.jogador(sala_id, sid)
+            if info is not None:
+                info.update(campos)
+                pipe = self._r.pipeline()
+                pipe.hset(f"rpg:sala:{sala_id}", sid, json.dumps(info, ensure_ascii=False))
+                pipe.incr(f"rpg:pversao:{sala_id}")
+                pipe.execute()
+
+    def remover_jogador(self, sala_id, sid):
+        info = self.jogador(sala_id, sid)
+        if info is None:
+            return None
+        pipe = self._r.pipeline()
+        pipe.hdel(f"rpg:sala:{sala_id}", sid)
+        pipe.zrem(f"rpg:ordem:{sala_id}", sid)
+        pipe.delete(f"rpg:sid:{sid}")
+        pipe.zrem("rpg:vistos", f"{sala_id} {sid}")
+        pipe.execute()
+        if self._r.exists(f"rpg:sala:{sala_id}"):
+            self._r.incr(f"rpg:pversao:{sala_id}")
+        else:
+            self._r.srem("rpg:salas", sala_id)
+            self._r.delete(f"rpg:pversao:{sala_id}", f"rpg:eseq:{sala_id}", f"rpg:eventos:{sala_id}")
+        return info
+
+    def sala_do_sid(self, sid):
+        return self._r.get(f"rpg:sid:{sid}")
+
+    def registrar_evento(self, sala_id, evento, dados):
+        if not self._r.exists(f"rpg:eseq:{sala_id}"):
+            return None
+        seq = self._r.incr(f"rpg:eseq:{sala_id}")
+        pipe = self._r.pipeline()
+        pipe.rpush(f"rpg:eventos:{sala_id}", json.dumps([seq, evento, dados], ensure_ascii=False))
+        pipe.ltrim(f"rpg:eventos:{sala_id}", -REPLAY_EVENTOS, -1)
+        pipe.execute()
+        return seq
+
+    def ultimo_seq(self, sala_id):
+        seq = self._r.get(f"rpg:eseq:{sala_id}")
+        return int(seq) if seq is not None else None
+
+    def eventos_desde(self, sala_id, seq):
+        ultimo = self.ultimo_seq(sala_id)
+        buffer = [tuple(json.loads(e)) for e in self._r.lrange(f"rpg:eventos:{sala_id}", 0, -1)]
+        if not _cobertos(ultimo, buffer[0][0] if buffer else (ultimo or 0) + 1, seq):
+            return None
+        return [e for e in buffer if e[0] > seq]
+
+    def ler_batalha(self, sala_id):
+        texto = self._r.get(f"rpg:batalha:{sala_id}")
+        return batalha_de_json(texto) if texto is not None else None
+
+    def tem_batalha(self, sala_id):
+        return bool(self._r.exists(f"rpg:batalha:{sala_id}"))
+
+    def salvar_batalha(self, sala_id, b):
+        pipe = self._r.pipeline()
+        pipe.set(f"rpg:batalha:{sala_id}", batalha_para_json(b))
+        pipe.zadd("rpg:batalhas", {sala_id: time.time()})
+        pipe.execute()
+
+    def remover_batalha(self, sala_id):
+        pipe = self._r.pipeline()
+        pipe.delete(f"rpg:batalha:{sala_id}")
+        pipe.zrem("rpg:batalhas", sala_id)
+        pipe.execute()
+
+    def batalhas_ociosas(self, antes_de):
+        return self._r.zrangebyscore("rpg:batalhas", '-inf', f"({antes_de}")
+
+    def contagens(self):
+        pipe = self._r.pipeline()
+        pipe.scard("rpg:salas")
+        pipe.zcard("rpg:vistos")
+        pipe.zcard("rpg:batalhas")
+        salas, presencas, batalhas = pipe.execute()
+        return {'salas': salas, 'presencas': presencas, 'batalhas': batalhas}
+
+
+def criar(url=None):
+    """Cria o backend de estado a partir de RPG_ESTADO (ou da url passada)."""
+    url = (url if url is not None else os.environ.get('RPG_ESTADO', '')).strip()
+    if not url or url == 'memoria':
+        return EstadoMemoria()
+    if url.startswith('sqlite'):
+        return EstadoSQLite(caminho_sqlite(url))
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return EstadoRedis(url)
+    raise ValueError(f"RPG_ESTADO inválido: '{url}' (use memoria, sqlite, sqlite:///<arquivo> ou redis://...)")
@@ -0,0 +1,118 @@
+# servidor/execucao.py
+
+# Modo de execução do servidor (threading, eventlet ou gevent), escolhido por RPG_ASYNC_MODE.
+#
+# - threading (padrão): servidor de desenvolvimento do Werkzeug, uma thread por conexão.
+#   Bom para rodar local; cada WebSocket aberto segura uma thread do sistema.
+# - eventlet / gevent: green threads (milhares de conexões num processo só). O módulo
+#   precisa estar instalado; 'preparar()' faz o monkey patch antes do Flask ser importado.
+#   Como o sqlite3 é código C e trava o loop enquanto espera o disco, as chamadas ao banco
+#   rodam num pool de threads de verdade (ver 'executor_bloqueante' e database/instrumentacao.py).
+#
+# Em produção:
+#   RPG_ASYNC_MODE=eventlet python -m backend.servidor
+#   ou: RPG_ASYNC_MODE=eventlet gunicorn -k eventlet -w 1 -b 0.0.0.0:5003 backend.servidor.servidor_api:app
+# (um worker só: salas e batalhas ficam na memória do processo)
+#
+# Outras variáveis: RPG_HOST (padrão 0.0.0.0), RPG_PORTA (padrão 5003) e RPG_DEBUG
+# ('1' liga debug/reloader; padrão '1' no threading e '0' nos outros modos).
+#
+# Este módulo não importa nada do projeto: serve tanto para servidor_api.py quanto para app.py.
+import os
+import sys
+
+MODOS = ('threading', 'eventlet', 'gevent')
+
+_modo = None
+
+
+def _modo_ja_aplicado():
+    """Modo green já ativo no processo (ex: gunicorn -k eventlet fez o monkey patch antes de nós)."""
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('socket'):
+            return 'eventlet'
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('socket'):
+            return 'gevent'
+    return None
+
+
+def preparar():
+    """
+    Define o modo (uma vez por processo) e aplica o monkey patch se for eventlet/gevent.
+    Deve ser chamado antes de importar Flask/SocketIO. Retorna o modo em uso.
+    """
+    global _modo
+    if _modo is not None:
+        return _modo
+
+    pedido = (os.environ.get('RPG_ASYNC_MODE') or _modo_ja_aplicado() or 'threading').strip().lower()
+    if pedido not in MODOS:
+        print(f"AVISO: RPG_ASYNC_MODE='{pedido}' inválido (use {', '.join(MODOS)}). Usando threading.")
+        pedido = 'threading'
+
+    try:
+        if pedido == 'eventlet':
+            import eventlet
+            eventlet.monkey_patch()
+        elif pedido == 'gevent':
+            from gevent import monkey
+            monkey.patch_all()
+    except ImportError:
+        print(f"AVISO: RPG_ASYNC_MODE={pedido}, mas o pacote '{pedido}' não está instalado. Usando threading.")
+        pedido = 'threading'
+
+    _modo = pedido
+    return _modo
+
+
+def modo():
+    return preparar()
+
+
+def cooperativo() -> bool:
+    """True nos modos de green threads (eventlet/gevent)."""
+    return modo() != 'threading'
+
+
+def executor_bloqueante():
+    """
+    Função 'executar(funcao, *args)' que roda uma chamada bloqueante numa thread de verdade,
+    liberando o loop de green threads enquanto espera. None no modo threading (não precisa).
+    """
+    atual = modo()
+    if atual == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute
+    if atual == 'gevent':
+        import gevent
+
+        def executar(funcao, *args):
+            return gevent.get_hub().threadpool.apply(funcao, args)
+        return executar
+    return None
+
+
+def rodar(socketio, app):
+    """Sobe o servidor no modo escolhido (host/porta/debug pelas variáveis de ambiente)."""
+    atual = modo()
+    host = os.environ.get('RPG_HOST', '0.0.0.0')
+    porta = int(os.environ.get('RPG_PORTA', '5003'))
+    debug = os.environ.get('RPG_DEBUG', '1' if atual == 'threading' else '0') == '1'
+
+    if atual == 'threading':
+        # HACK: Força o uso do servidor Werkzeug/threading desabilitando a detecção do eventlet.
+        # O eventlet, quando instalado, é pego automaticamente mas está causando conflitos com o CORS.
+        try:
+            from socketio import server
+            server.eventlet = None
+        except (ImportError, AttributeError):
+            pass
+        print(f"Servidor em modo threading (Werkzeug) em {host}:{porta}.")
+        socketio.run(app, host=host, port=porta, debug=debug, allow_unsafe_werkzeug=True)
+    else:
+        # eventlet.wsgi / gevent.pywsgi: servidores de produção, sem o reloader do Werkzeug.
+        print(f"Servidor em modo {atual} em {host}:{porta}.")
+        socketio.run(app, host=host, port=porta, debug=debug, use_reloader=False)
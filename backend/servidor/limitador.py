@@ -0,0 +1,145 @@
+# servidor/limitador.py
+"""
+Limite de taxa (token bucket) por conexão e por usuário para os eventos Socket.IO.
+
+Cada evento limitado tem um orçamento "capacidade/por_segundo": o balde começa cheio com
+'capacidade' fichas (rajada permitida) e recupera 'por_segundo' fichas por segundo; cada
+evento gasta uma. Há um balde por sid e outro por usuário (com FATOR_USUARIO vezes o
+orçamento, para algumas abas abertas ao mesmo tempo); o evento só passa se os dois tiverem
+ficha. O que passar do limite é descartado — o handler não roda, nada vai ao banco nem à sala.
+
+O aviso ao cliente ('rate_limited') também é agregado: no máximo um por INTERVALO_AVISO_S
+por sid e evento, com quantos eventos foram descartados desde o aviso anterior.
+
+Orçamentos em LIMITES, sobrescritos por RPG_LIMITES (ex: "send_message=8/2,roll_dice=4/1").
+Eventos fora de LIMITES não são limitados. Os baldes ficam na memória do worker: com vários
+workers, um usuário com abas em workers diferentes tem um balde de usuário em cada.
+"""
+import os
+import threading
+import time
+
+from . import metricas
+
+# { evento: (capacidade, fichas por segundo) }
+LIMITES = {
+    'send_message': (8, 2.0),
+    'roll_dice': (4, 1.0),
+}
+FATOR_USUARIO = 2
+INTERVALO_AVISO_S = 1.0
+OCIOSO_S = 600  # baldes de usuário parados há mais que isso são descartados
+
+eventos_limitador = metricas.contador('rpg_limitador_eventos_total',
+                                      'Eventos avaliados pelo limitador de taxa, por resultado e chave que barrou.')
+
+
+def _ler_limites(texto):
+    limites = dict(LIMITES)
+    for item in filter(None, (parte.strip() for parte in texto.split(','))):
+        try:
+            evento, orcamento = item.split('=')
+            capacidade, por_segundo = orcamento.split('/')
+            capacidade, por_segundo = int(capacidade), float(por_segundo)
+            if capacidade < 1 or not por_segundo > 0:  # 'not >' também pega NaN
+                raise ValueError(item)
+            limites[evento.strip()] = (capacidade, por_segundo)
+        except ValueError:
+            print(f"AVISO: RPG_LIMITES ignorando '{item}' (formato: evento=capacidade/por_segundo, capacidade >= 1 e por_segundo > 0)")
+    return limites
+
+
+class _Balde:
+    __slots__ = ('fichas', 'atualizado')
+
+    def __init__(self, capacidade, agora):
+        self.fichas = float(capacidade)
+        self.atualizado = agora
+
+    def encher(self, capacidade, por_segundo, agora):
+        self.fichas = min(capacidade, self.fichas + (agora - self.atualizado) * por_segundo)
+        self.atualizado = agora
+
+
+class Limitador:
+    def __init__(self, limites=None):
+        self.limites = limites if limites is not None else _ler_limites(os.environ.get('RPG_LIMITES', ''))
+        self._trava = threading.Lock()
+        self._por_sid = {}       # { sid: { evento: _Balde } }
+        self._por_usuario = {}   # { (user_id, evento): _Balde }
+        self._usuarios = {}      # { sid: user_id } (preenchido no join_room)
+        self._avisos = {}        # { sid: { evento: [último aviso, descartados desde então] } }
+        self._proxima_limpeza = time.monotonic() + OCIOSO_S
+
+    def associar(self, sid, user_id):
+        """Liga o sid ao usuário, para o balde por usuário valer em todas as abas dele."""
+        with self._trava:
+            self._usuarios[sid] = user_id
+
+    def esquecer(self, sid):
+        """Descarta os baldes da conexão (no disconnect)."""
+        with self._trava:
+            self._usuarios.pop(sid, None)
+            self._por_sid.pop(sid, None)
+            self._avisos.pop(sid, None)
+
+    def verificar(self, evento, sid):
+        """
+        None se o evento pode seguir; senão, o dict do aviso 'rate_limited' a mandar ao sid,
+        ou {} quando o aviso já foi dado há pouco (descarta em silêncio).
+        """
+        limite = self.limites.get(evento)
+        if limite is None:
+            return None
+        capacidade, por_segundo = limite
+        agora = time.monotonic()
+        with self._trava:
+            if agora >= self._proxima_limpeza:
+                self._limpar(agora)
+            baldes = [('sid', self._balde(self._por_sid.setdefault(sid, {}), evento, capacidade, agora), capacidade, por_segundo)]
+            user_id = self._usuarios.get(sid)
+            if user_id is not None:
+                baldes.append(('usuario', self._balde(self._por_usuario, (user_id, evento), capacidade * FATOR_USUARIO, agora),
+                               capacidade * FATOR_USUARIO, por_segundo * FATOR_USUARIO))
+            for _, balde, cap, taxa in baldes:
+                balde.encher(cap, taxa, agora)
+            barrado = next(((chave, balde, taxa) for chave, balde, _, taxa in baldes if balde.fichas < 1), None)
+            if barrado is None:
+                for _, balde, _, _ in baldes:
+                    balde.fichas -= 1
+                aviso = None
+            else:
+                _, balde, taxa = barrado
+                estado = self._avisos.setdefault(sid, {}).setdefault(evento, [float('-inf'), 0])
+                estado[1] += 1
+                aviso = {}
+                if agora - estado[0] >= INTERVALO_AVISO_S:
+                    aviso = {'evento': evento, 'descartados': estado[1],
+                             'tentar_em_ms': int((1 - balde.fichas) / taxa * 1000) + 1}
+                    estado[0], estado[1] = agora, 0
+        if barrado is None:
+            eventos_limitador.inc(evento=evento, resultado='permitido')
+        else:
+            eventos_limitador.inc(evento=evento, resultado='rejeitado', chave=barrado[0])
+        return aviso
+
+    @staticmethod
+    def _balde(baldes, chave, capacidade, agora):
+        balde = baldes.get(chave)
+        if balde is None:
+            balde = baldes[chave] = _Balde(capacidade, agora)
+        return balde
+
+    def _limpar(self, agora):
+        for chave in [c for c, b in self._por_usuario.items() if agora - b.atualizado > OCIOSO_S]:
+            del self._por_usuario[chave]
+        self._proxima_limpeza = agora + OCIOSO_S
+
+    def linhas_prometheus(self):
+        with self._trava:
+            por_sid = sum(len(b) for b in self._por_sid.values())
+            por_usuario = len(self._por_usuario)
+        return ["# HELP rpg_limitador_baldes Baldes do limitador de taxa em memória.",
+                "# TYPE rpg_limitador_baldes gauge",
+                f'rpg_limitador_baldes{{chave="sid"}} {por_sid}',
+                f'rpg_limitador_baldes{{chave="usuario"}} {por_usuario}']
@@ -0,0 +1,184 @@
+# servidor/metricas.py
+"""
+Registro de métricas em memória, exportado no formato texto do Prometheus
+(rota /api/admin/metrics, restrita a administradores).
+
+- Contador:   só cresce (ex: erros, bytes)
+- Medidor:    valor atual (ex: tamanho de fila)
+- Histograma: distribuição em faixas fixas (ex: latência dos handlers)
+
+Os handlers Socket.IO são medidos pelo decorator em telemetria.py, e os bytes
+recebidos/emitidos são contados pelo 'JSONContador' (codec JSON do Socket.IO),
+sem serializar nada a mais.
+"""
+import json
+import threading
+
+# Faixas (em segundos) dos histogramas de latência.
+FAIXAS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_trava = threading.Lock()
+_metricas = {}   # { nome: métrica } — em ordem de registro
+_coletores = []  # funções que devolvem linhas extras (ex: tabela de consultas SQL)
+
+
+def _rotulos_texto(rotulos):
+    if not rotulos:
+        return ''
+    partes = []
+    for chave, valor in rotulos:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{chave}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = 'untyped'
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores = {}   # { tupla de rótulos: valor }
+
+    def cabecalho(self):
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, valor=1, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with _trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos):
+        return self._valores.get(tuple(sorted(rotulos.items())), 0)
+
+    def exportar(self):
+        linhas = self.cabecalho()
+        for chave, valor in sorted(self._valores.items()):
+            linhas.append(f"{self.nome}{_rotulos_texto(chave)} {_numero(valor)}")
+        return linhas
+
+
+class Medidor(Contador):
+    tipo = 'gauge'
+
+    def definir(self, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with _trava:
+            self._valores[chave] = valor
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, faixas=FAIXAS_LATENCIA):
+        super().__init__(nome, ajuda)
+        self.faixas = tuple(faixas)
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with _trava:
+            estado = self._valores.get(chave)
+            if estado is None:
+                # [contagens por faixa..., contagem total, soma]
+                estado = self._valores[chave] = [0] * len(self.faixas) + [0, 0.0]
+            for i, limite in enumerate(self.faixas):
+                if valor <= limite:
+                    estado[i] += 1
+                    break
+            estado[-2] += 1
+            estado[-1] += valor
+
+    def exportar(self):
+        linhas = self.cabecalho()
+        for chave, estado in sorted(self._valores.items()):
+            acumulado = 0
+            for limite, qtd in zip(self.faixas, estado):
+                acumulado += qtd
+                linhas.append(f"{self.nome}_bucket{_rotulos_texto(chave + (('le', limite),))} {acumulado}")
+            linhas.append(f"{self.nome}_bucket{_rotulos_texto(chave + (('le', '+Inf'),))} {estado[-2]}")
+            linhas.append(f"{self.nome}_sum{_rotulos_texto(chave)} {_numero(estado[-1])}")
+            linhas.append(f"{self.nome}_count{_rotulos_texto(chave)} {estado[-2]}")
+        return linhas
+
+
+def _registrar(classe, nome, ajuda, *args):
+    with _trava:
+        if nome not in _metricas:
+            _metricas[nome] = classe(nome, ajuda, *args)
+        return _metricas[nome]
+
+
+def contador(nome, ajuda):
+    """Obtém (ou cria) um contador pelo nome."""
+    return _registrar(Contador, nome, ajuda)
+
+
+def medidor(nome, ajuda):
+    """Obtém (ou cria) um medidor pelo nome."""
+    return _registrar(Medidor, nome, ajuda)
+
+
+def histograma(nome, ajuda, faixas=FAIXAS_LATENCIA):
+    """Obtém (ou cria) um histograma pelo nome."""
+    return _registrar(Histograma, nome, ajuda, faixas)
+
+
+def registrar_coletor(funcao):
+    """Registra funcao() -> lista de linhas no formato Prometheus, chamada a cada exportação."""
+    if funcao not in _coletores:
+        _coletores.append(funcao)
+    return funcao
+
+
+def exportar_prometheus():
+    """Texto completo no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+    linhas = []
+    with _trava:
+        metricas = list(_metricas.values())
+    for metrica in metricas:
+        with _trava:
+            linhas.extend(metrica.exportar())
+    for coletor in list(_coletores):
+        try:
+            linhas.extend(coletor())
+        except Exception as e:
+            linhas.append(f"# erro no coletor {getattr(coletor, '__name__', coletor)}: {e}")
+    return '\n'.join(linhas) + '\n'
+
+
+# --- Métricas dos eventos Socket.IO ---
+latencia_handler = histograma('rpg_socket_handler_latencia_segundos', 'Tempo de execução de cada handler Socket.IO.')
+erros_handler = contador('rpg_socket_handler_erros_total', 'Erros em handlers Socket.IO (exceções lançadas ou marcadas com telemetria.marcar_erro).')
+bytes_recebidos = contador('rpg_socket_recebido_bytes_total', 'Bytes de payload JSON recebidos por evento.')
+bytes_emitidos = contador('rpg_socket_emitido_bytes_total', 'Bytes de payload JSON serializados por evento emitido (uma vez por emit).')
+mensagens_emitidas = contador('rpg_socket_emitido_mensagens_total', 'Quantidade de emits por evento.')
+
+
+class JSONContador:
+    """
+    Codec JSON para o Socket.IO (SocketIO(..., json=JSONContador)) que, além de (de)serializar,
+    conta os bytes por nome de evento. Pacotes de evento são listas [nome, *args].
+    """
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        texto = json.dumps(obj, *args, **kwargs)
+        if isinstance(obj, list) and obj and isinstance(obj[0], str):
+            bytes_emitidos.inc(len(texto), evento=obj[0])
+            mensagens_emitidas.inc(evento=obj[0])
+        return texto
+
+    @staticmethod
+    def loads(texto, *args, **kwargs):
+        obj = json.loads(texto, *args, **kwargs)
+        if isinstance(obj, list) and obj and isinstance(obj[0], str):
+            bytes_recebidos.inc(len(texto), evento=obj[0])
+        return obj
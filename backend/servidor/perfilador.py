@@ -0,0 +1,266 @@
+# servidor/perfilador.py
+"""
+Perfilador sob demanda para tráfego real (sem reiniciar o servidor).
+
+Um administrador "arma" o perfilador (POST /api/admin/perfil) com um padrão
+(fnmatch, ex: 'batalha_*' ou '/api/campanhas/*') e uma quantidade N. As próximas
+N requisições HTTP e/ou eventos Socket.IO cujo nome casar com o padrão são medidos:
+
+- modo 'amostragem' (padrão): uma thread auxiliar lê a pilha da thread do handler
+  (sys._current_frames) a cada 'intervalo_ms' e conta as pilhas. Custo baixo, mas
+  handlers mais rápidos que o intervalo podem não gerar nenhuma amostra.
+- modo 'cprofile': perfil determinístico (cProfile), mais preciso para handlers curtos.
+
+Nos modos eventlet/gevent (execucao.cooperativo()) a amostragem não funciona: a thread
+auxiliar vira green thread e só roda quando o handler cede o loop, e sys._current_frames
+só enxerga as threads do sistema. Nesses modos o padrão é 'cprofile' e pedir 'amostragem'
+é recusado.
+
+Ao fim das N execuções (ou ao desarmar) o resultado vai para logs/perfis/:
+- amostragem -> '<data>_<padrao>.folded' (pilhas colapsadas 'a;b;c contagem',
+  prontas para flamegraph.pl / speedscope);
+- cprofile   -> '<data>_<padrao>.prof' (pstats; abra com snakeviz ou flameprof).
+
+Quando nada está armado, 'iniciar' custa uma única comparação.
+"""
+import cProfile
+import fnmatch
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from . import execucao
+
+PASTA_PERFIS = os.path.join(os.path.dirname(__file__), '..', 'logs', 'perfis')
+ALVOS = ('http', 'evento', 'qualquer')
+MODOS = ('amostragem', 'cprofile')
+MAX_EXECUCOES = 1000
+PROFUNDIDADE_MAXIMA = 128
+
+_trava = threading.Lock()
+_armadilha = None  # só uma por vez; None = desarmado (caminho rápido)
+
+
+class Armadilha:
+    """Configuração armada + resultados acumulados das execuções já perfiladas."""
+
+    def __init__(self, padrao, quantidade, alvo='qualquer', modo=None, intervalo_ms=1.0):
+        if modo is None:
+            modo = 'cprofile' if execucao.cooperativo() else 'amostragem'
+        if alvo not in ALVOS:
+            raise ValueError(f"Alvo '{alvo}' inválido (use: {', '.join(ALVOS)}).")
+        if modo not in MODOS:
+            raise ValueError(f"Modo '{modo}' inválido (use: {', '.join(MODOS)}).")
+        if modo == 'amostragem' and execucao.cooperativo():
+            raise ValueError(f"O modo 'amostragem' não gera amostras com green threads ({execucao.modo()}); use 'cprofile'.")
+        if not padrao:
+            raise ValueError("Informe um padrão (ex: 'batalha_*' ou '/api/monstros*').")
+        if not (1 <= int(quantidade) <= MAX_EXECUCOES):
+            raise ValueError(f"Quantidade deve estar entre 1 e {MAX_EXECUCOES}.")
+        if not (0.1 <= float(intervalo_ms) <= 100):
+            raise ValueError("intervalo_ms deve estar entre 0.1 e 100.")
+        self.padrao = padrao
+        self.alvo = alvo
+        self.modo = modo
+        self.intervalo = float(intervalo_ms) / 1000
+        self.quantidade = int(quantidade)
+        self.restantes = int(quantidade)
+        self.em_andamento = 0
+        self.concluidas = []          # (nome, duracao_ms)
+        self.pilhas = Counter()       # modo amostragem
+        self.estatisticas = None      # modo cprofile (pstats.Stats)
+        self.criada_em = datetime.now()
+
+    def casa(self, alvo, nome):
+        return (self.alvo == 'qualquer' or self.alvo == alvo) and fnmatch.fnmatchcase(nome, self.padrao)
+
+    def resumo(self):
+        return {
+            'padrao': self.padrao, 'alvo': self.alvo, 'modo': self.modo,
+            'intervalo_ms': self.intervalo * 1000,
+            'quantidade': self.quantidade, 'restantes': self.restantes,
+            'em_andamento': self.em_andamento,
+            'execucoes': [{'nome': n, 'duracao_ms': d} for n, d in self.concluidas],
+            'amostras': sum(self.pilhas.values()),
+        }
+
+
+def _descrever_frame(frame):
+    codigo = frame.f_code
+    modulo = frame.f_globals.get('__name__', os.path.basename(codigo.co_filename))
+    return f"{modulo}:{codigo.co_name}"
+
+
+class _Amostrador(threading.Thread):
+    """Lê periodicamente a pilha de uma thread-alvo até ser parado."""
+
+    def __init__(self, thread_id, intervalo):
+        super().__init__(daemon=True, name='perfilador-amostrador')
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            pilha = []
+            while frame is not None and len(pilha) < PROFUNDIDADE_MAXIMA:
+                pilha.append(_descrever_frame(frame))
+                frame = frame.f_back
+            self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+        return self.pilhas
+
+
+class Sessao:
+    """Uma execução sendo perfilada (criada por iniciar(), encerrada por finalizar())."""
+    __slots__ = ('armadilha', 'nome', 'inicio', '_amostrador', '_perfil')
+
+    def __init__(self, armadilha, nome):
+        self.armadilha = armadilha
+        self.nome = nome
+        self._amostrador = None
+        self._perfil = None
+        if armadilha.modo == 'cprofile':
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+        else:
+            self._amostrador = _Amostrador(threading.get_ident(), armadilha.intervalo)
+            self._amostrador.start()
+        self.inicio = time.perf_counter()
+
+
+def iniciar(alvo, nome):
+    """Chamado no início de um handler. Retorna uma Sessao se ele deve ser perfilado, senão None."""
+    if _armadilha is None:
+        return None
+    with _trava:
+        armadilha = _armadilha
+        if armadilha is None or armadilha.restantes <= 0 or not armadilha.casa(alvo, nome):
+            return None
+        armadilha.restantes -= 1
+        armadilha.em_andamento += 1
+    try:
+        return Sessao(armadilha, nome)
+    except Exception as e:
+        # cProfile não permite dois perfis ativos na mesma thread, por exemplo.
+        print(f"Perfilador: não foi possível perfilar '{nome}': {e}")
+        with _trava:
+            armadilha.em_andamento -= 1
+        return None
+
+
+def finalizar(sessao):
+    """Chamado no fim do handler (mesmo com erro). Aceita None para simplificar os ganchos."""
+    global _armadilha
+    if sessao is None:
+        return
+    duracao_ms = round((time.perf_counter() - sessao.inicio) * 1000, 3)
+    armadilha = sessao.armadilha
+    if sessao._perfil is not None:
+        sessao._perfil.disable()
+    pilhas = sessao._amostrador.parar() if sessao._amostrador is not None else None
+    with _trava:
+        if pilhas is not None:
+            armadilha.pilhas.update(pilhas)
+        else:
+            if armadilha.estatisticas is None:
+                armadilha.estatisticas = pstats.Stats(sessao._perfil)
+            else:
+                armadilha.estatisticas.add(sessao._perfil)
+        armadilha.concluidas.append((sessao.nome, duracao_ms))
+        armadilha.em_andamento -= 1
+        # Só salva quem desarma: depois de desarmar(), sessões atrasadas não gravam de novo.
+        terminou = armadilha.restantes <= 0 and armadilha.em_andamento == 0 and _armadilha is armadilha
+        if terminou:
+            _armadilha = None
+    if terminou:
+        _salvar(armadilha)
+
+
+def _salvar(armadilha):
+    """Grava o resultado acumulado em logs/perfis e retorna o nome do arquivo (ou None)."""
+    # Cópia sob a trava: sessões ainda em andamento (desarmar) continuam somando em finalizar().
+    with _trava:
+        pilhas = dict(armadilha.pilhas)
+        estatisticas = None
+        if armadilha.estatisticas is not None:
+            estatisticas = pstats.Stats()
+            estatisticas.add(armadilha.estatisticas)
+        execucoes = len(armadilha.concluidas)
+    os.makedirs(PASTA_PERFIS, exist_ok=True)
+    base = armadilha.criada_em.strftime('%Y%m%d_%H%M%S') + '_' + re.sub(r'[^A-Za-z0-9_.-]+', '_', armadilha.padrao).strip('_')
+    try:
+        if armadilha.modo == 'cprofile':
+            if estatisticas is None:
+                return None
+            arquivo = base + '.prof'
+            estatisticas.dump_stats(os.path.join(PASTA_PERFIS, arquivo))
+        else:
+            if not pilhas:
+                return None
+            arquivo = base + '.folded'
+            with open(os.path.join(PASTA_PERFIS, arquivo), 'w', encoding='utf-8') as f:
+                for pilha, contagem in sorted(pilhas.items()):
+                    f.write(f"{pilha} {contagem}\n")
+    except OSError as e:
+        print(f"Perfilador: erro ao salvar perfil: {e}")
+        return None
+    print(f"Perfilador: perfil salvo em logs/perfis/{arquivo} ({execucoes} execuções).")
+    return arquivo
+
+
+def armar(padrao, quantidade, alvo='qualquer', modo=None, intervalo_ms=1.0):
+    """Arma o perfilador (substitui uma armadilha anterior ainda sem execuções). Lança ValueError."""
+    global _armadilha
+    nova = Armadilha(padrao, quantidade, alvo, modo, intervalo_ms)
+    with _trava:
+        atual = _armadilha
+        if atual is not None and (atual.em_andamento or atual.concluidas):
+            raise ValueError("Já existe um perfil em andamento; desarme-o antes (DELETE /api/admin/perfil).")
+        _armadilha = nova
+    return nova.resumo()
+
+
+def desarmar():
+    """Desarma e salva o que já foi coletado. Retorna o nome do arquivo gerado (ou None)."""
+    global _armadilha
+    with _trava:
+        armadilha, _armadilha = _armadilha, None
+        if armadilha is not None:
+            armadilha.restantes = 0
+    if armadilha is None:
+        return None
+    return _salvar(armadilha)
+
+
+def status():
+    """Estado atual (ou None) e a lista de perfis salvos."""
+    with _trava:
+        armadilha = _armadilha
+        atual = armadilha.resumo() if armadilha else None
+    return {'armado': atual, 'arquivos': listar_perfis()}
+
+
+def listar_perfis():
+    if not os.path.isdir(PASTA_PERFIS):
+        return []
+    return sorted((n for n in os.listdir(PASTA_PERFIS) if n.endswith(('.folded', '.prof'))), reverse=True)
+
+
+def caminho_perfil(arquivo):
+    """Caminho de um perfil salvo, ou None se o nome não for um perfil existente (evita path traversal)."""
+    if arquivo not in listar_perfis():
+        return None
+    return os.path.join(PASTA_PERFIS, arquivo)
@@ -0,0 +1,198 @@
+# servidor/respostas.py
+"""
+Respostas HTTP mais leves para as rotas de catálogo (/api/monstros, /api/itens, /api/habilidades).
+
+- ProvedorJSONRapido: provider JSON do Flask que usa orjson quando instalado
+  (RPG_JSON_RAPIDO=0 força o json da biblioteca padrão).
+- Compressão gzip/brotli negociada pelo Accept-Encoding, só acima de
+  RPG_COMPRESSAO_MIN_BYTES (padrão: 1024). Brotli só se o pacote 'brotli' existir.
+- @cache_compendio: guarda o corpo (e suas versões comprimidas) das listagens do
+  compêndio, com ETag derivado de compendio.versao(). A versão vem do banco (gatilhos
+  do compêndio), então é a mesma em todos os workers e também muda com escritas feitas
+  fora do servidor; elas aparecem em até RPG_COMPENDIO_VERSAO_TTL_S. Qualquer alteração
+  muda a versão, e a próxima requisição monta a resposta de novo. 'If-None-Match' -> 304.
+
+Uso: respostas.configurar(app) logo após criar o Flask.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+from ..database import compendio
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_RAPIDO = orjson is not None and os.environ.get('RPG_JSON_RAPIDO', '1') != '0'
+COMPRESSAO_MIN_BYTES = int(os.environ.get('RPG_COMPRESSAO_MIN_BYTES', '1024'))
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+MAX_CACHE = 256
+TIPOS_COMPRIMIVEIS = ('application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript')
+
+
+class ProvedorJSONRapido(DefaultJSONProvider):
+    """Mesmo comportamento do provider padrão do Flask (chaves ordenadas, datas, etc.), serializado pelo orjson."""
+
+    _OPCOES = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+               | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+
+    def _bytes(self, obj, indentar=False):
+        opcoes = self._OPCOES | (orjson.OPT_INDENT_2 if indentar else 0)
+        if not self.sort_keys:
+            opcoes &= ~orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=opcoes)
+
+    def dumps(self, obj, **kwargs):
+        # Argumentos que o orjson não entende (cls, ensure_ascii=False...) caem no json padrão.
+        if set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._bytes(obj, bool(kwargs.get('indent'))).decode('utf-8')
+        except TypeError:  # orjson.JSONEncodeError (ex: inteiro maior que 64 bits)
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            corpo = self._bytes(obj, indentar) + b"\n"
+        except TypeError:
+            return super().response(obj)
+        return self._app.response_class(corpo, mimetype=self.mimetype)
+
+
+def _codificacao_aceita(cabecalho):
+    """Escolhe 'br' ou 'gzip' a partir do Accept-Encoding (respeitando q=0). None se nenhuma."""
+    aceitas = {}
+    for parte in (cabecalho or '').split(','):
+        nome, _, parametros = parte.strip().partition(';')
+        q = 1.0
+        if parametros.strip().startswith('q='):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        aceitas[nome.strip().lower()] = q
+    if brotli is not None and aceitas.get('br', 0) > 0:
+        return 'br'
+    if aceitas.get('gzip', aceitas.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+
+def comprimir(corpo: bytes, codificacao: str) -> bytes:
+    if codificacao == 'br':
+        return brotli.compress(corpo, quality=QUALIDADE_BROTLI)
+    return gzip.compress(corpo, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def _aplicar_codificacao(resposta, corpo_comprimido, codificacao):
+    resposta.set_data(corpo_comprimido)
+    resposta.headers['Content-Encoding'] = codificacao
+    resposta.vary.add('Accept-Encoding')
+
+
+def _comprimir_resposta(resposta):
+    """after_request: comprime respostas grandes de tipos textuais, se o cliente aceitar."""
+    if (resposta.direct_passthrough or resposta.is_streamed or resposta.status_code != 200
+            or 'Content-Encoding' in resposta.headers or resposta.mimetype not in TIPOS_COMPRIMIVEIS):
+        return resposta
+    resposta.vary.add('Accept-Encoding')
+    corpo = resposta.get_data()
+    if len(corpo) < COMPRESSAO_MIN_BYTES:
+        return resposta
+    codificacao = _codificacao_aceita(request.headers.get('Accept-Encoding'))
+    if codificacao:
+        _aplicar_codificacao(resposta, comprimir(corpo, codificacao), codificacao)
+    return resposta
+
+
+class _EntradaCache:
+    __slots__ = ('versao', 'etag', 'corpo', 'mimetype', 'comprimidos')
+
+    def __init__(self, versao, corpo, mimetype):
+        self.versao = versao
+        self.corpo = corpo
+        self.mimetype = mimetype
+        self.etag = f"c{versao}-{hashlib.blake2b(corpo, digest_size=8).hexdigest()}"
+        self.comprimidos = {}  # { 'gzip' | 'br': bytes }
+
+
+_trava = threading.Lock()
+_cache = OrderedDict()  # { (rota, args): _EntradaCache } — LRU limitado a MAX_CACHE
+
+
+def _chave():
+    return request.path, tuple(sorted(request.args.items(multi=True)))
+
+
+def cache_compendio(rota):
+    """Decorator para GETs de catálogo cujo resultado só muda quando o compêndio muda."""
+    @wraps(rota)
+    def envoltorio(*args, **kwargs):
+        chave = _chave()
+        versao = compendio.versao()
+        with _trava:
+            entrada = _cache.get(chave)
+            if entrada is not None and entrada.versao == versao:
+                _cache.move_to_end(chave)
+            else:
+                entrada = None
+        if entrada is None:
+            resposta = rota(*args, **kwargs)
+            if isinstance(resposta, tuple) or resposta.status_code != 200 or resposta.is_streamed:
+                return resposta
+            entrada = _EntradaCache(versao, resposta.get_data(), resposta.mimetype)
+            with _trava:
+                _cache[chave] = entrada
+                while len(_cache) > MAX_CACHE:
+                    _cache.popitem(last=False)
+        return _responder_do_cache(entrada)
+    return envoltorio
+
+
+def _responder_do_cache(entrada):
+    resposta = current_app.response_class(status=200, mimetype=entrada.mimetype)
+    resposta.set_etag(entrada.etag)
+    resposta.headers['Cache-Control'] = 'no-cache'  # sempre revalidar; o 304 sai barato
+    resposta.vary.add('Accept-Encoding')
+    if request.if_none_match.contains(entrada.etag):
+        resposta.status_code = 304
+        return resposta
+    codificacao = None
+    if len(entrada.corpo) >= COMPRESSAO_MIN_BYTES:
+        codificacao = _codificacao_aceita(request.headers.get('Accept-Encoding'))
+    if codificacao is None:
+        resposta.set_data(entrada.corpo)
+        return resposta
+    comprimido = entrada.comprimidos.get(codificacao)
+    if comprimido is None:
+        comprimido = entrada.comprimidos[codificacao] = comprimir(entrada.corpo, codificacao)
+    _aplicar_codificacao(resposta, comprimido, codificacao)
+    return resposta
+
+
+def configurar(app):
+    """Instala o provider JSON rápido (se disponível) e a compressão automática."""
+    if JSON_RAPIDO:
+        app.json = ProvedorJSONRapido(app)
+    app.after_request(_comprimir_resposta)
@@ -2,9 +2,14 @@
 
 print("--- LOADING servidor_api.py - VERSION 3 ---")
 
+# --- MODO DE EXECUÇÃO (threading/eventlet/gevent) ---
+# Precisa vir antes dos outros imports: no eventlet/gevent faz o monkey patch (ver execucao.py).
+from . import execucao
+execucao.preparar()
+
 # --- IMPORTS PRINCIPAIS ---
-from flask import Flask, jsonify, request, g # Adicionado 'g' para uso futuro potencial
-from flask_socketio import SocketIO, send, join_room, leave_room # Adicionado leave_room
+from flask import Flask, jsonify, request, g, Response, send_file, copy_current_request_context # Adicionado 'g' para uso futuro potencial
+from flask_socketio import SocketIO, join_room, leave_room # Adicionado leave_room
 from flask_cors import CORS 
 from functools import wraps
 import jwt
@@ -45,8 +50,10 @@ from ..database.db_manager import (
     listar_salas_disponiveis,
     verificar_senha_da_sala,    # <- Usada em rota_verificar_senha_sala
     salvar_mensagem_chat,
+    arquivar_batalha,
     buscar_historico_chat,
     buscar_dados_essenciais_ficha,
+    buscar_fichas_para_simulacao,
     buscar_anotacoes,
     salvar_anotacoes,            # <- Usada em put_anotacoes (com 'c')
     buscar_inventario_sala,
@@ -60,16 +67,33 @@ from ..database.db_manager import (
     verificar_banido
 )
 from ..core.rolador_de_dados import rolar_dados
+from ..core import simulador_encontro
+from ..core.combatentes import JogadorBatalha, MonstroBatalha
 from ..database import esconderijo_db
+from ..database import sorteio
+from ..database import instrumentacao
+from ..database import projecao
+from ..database import blobs
+from ..database import miniaturas
+from . import telemetria
+from . import metricas
+from . import perfilador
+from . import respostas
+from . import estado
+from . import barramento
+from . import atores
+from . import limitador
+from . import varredura
+from . import codec
 
 # --- FUNÇÃO AUXILIAR PARA CONEXÃO COM DB (SE NÃO TIVER NO DB_MANAGER) ---
 # Adicionando uma função genérica para obter a conexão, caso precise
 # (Se você já tiver uma similar no db_manager, pode remover esta)
-DATABASE = os.path.join(os.path.dirname(__file__), '..', 'database', 'campanhas.db')
+DATABASE = os.environ.get('RPG_DB_PATH') or os.path.join(os.path.dirname(__file__), '..', 'database', 'campanhas.db')
 
 def get_db_connection():
     """Cria e retorna uma conexão com o banco de dados."""
-    conn = sqlite3.connect(DATABASE)
+    conn = instrumentacao.conectar(DATABASE)
     conn.row_factory = sqlite3.Row # Retorna linhas como objetos tipo dicionário
     return conn
 
@@ -83,7 +107,30 @@ CORS(app,
      resources={r"/api/*": {"origins": ["http://localhost:5173", "http://localhost:5174"]}}, 
      allow_headers=["Content-Type", "x-access-token"],
      supports_credentials=True)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# JSON via orjson (se instalado) e compressão gzip/brotli das respostas grandes (respostas.py).
+respostas.configurar(app)
+# json=JSONContador: o codec do Socket.IO também conta bytes recebidos/emitidos por evento (metricas.py)
+# client_manager: barramento entre workers (RPG_MESSAGE_QUEUE, ver barramento.py); None = um worker só.
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=execucao.modo(), json=metricas.JSONContador,
+                    client_manager=barramento.criar_gerenciador())
+# eventlet/gevent: as chamadas ao SQLite rodam num pool de threads para não travar as green threads.
+instrumentacao.delegar_bloqueantes(execucao.executor_bloqueante())
+# Trabalho de CPU (miniaturas, simulação de encontros) também sai do loop de green threads.
+miniaturas.delegar_bloqueantes(execucao.executor_bloqueante())
+simulador_encontro.delegar_bloqueantes(execucao.executor_bloqueante())
+# Tabela de consultas SQL (por forma de comando e por função do db_manager) entra em /api/admin/metrics.
+metricas.registrar_coletor(instrumentacao.linhas_prometheus)
+
+
+# --- PERFILADOR SOB DEMANDA (armado por /api/admin/perfil) ---
+@app.before_request
+def _perfil_iniciar():
+    g.sessao_perfil = perfilador.iniciar('http', request.path)
+
+
+@app.teardown_request
+def _perfil_finalizar(erro=None):
+    perfilador.finalizar(g.pop('sessao_perfil', None))
 
 # --- DECORATOR DE AUTENTICAÇÃO JWT ---
 def token_required(f):
@@ -112,9 +159,12 @@ def token_required(f):
     return decorated
 
 # --- NOSSO NOVO DECORATOR DE MESTRE ---
+# 'admin' inclui tudo o que o 'mestre' pode (promote_user grava um role só por usuário).
+ROLES_MESTRE = ('mestre', 'admin')
+
 def mestre_required(f):
     """
-    Verifica se o usuário tem o 'role' de 'mestre' no token JWT.
+    Verifica se o usuário tem o 'role' de 'mestre' (ou 'admin') no token JWT.
     IMPORTANTE: Deve ser usado DEPOIS de @token_required.
     Assume que @token_required já decodificou o token e colocou em g.current_user_data_from_token.
     """
@@ -135,7 +185,7 @@ def mestre_required(f):
                 return jsonify({'mensagem': 'Token inválido!'}), 401
 
         # A verificação principal do role
-        if user_data.get('role') != 'mestre':
+        if user_data.get('role') not in ROLES_MESTRE:
             return jsonify({'mensagem': 'Acesso restrito a Mestres!'}), 403 # 403 Forbidden
             
         # Se for mestre, chama a função da rota original, passando o payload COMPLETO do token
@@ -143,27 +193,66 @@ def mestre_required(f):
         return f(user_data, *args, **kwargs) 
     return decorated
 
+# --- DECORATOR DE ADMINISTRADOR ---
+def admin_required(f):
+    """
+    Verifica se o usuário tem o 'role' de 'admin' no token JWT (promova com utils/promote_user.py).
+    Como o mestre_required, deve vir DEPOIS de @token_required e passa o payload completo do token.
+    """
+    @wraps(f)
+    def decorated(current_user_id, *args, **kwargs):
+        user_data = getattr(g, 'current_user_data_from_token', None) or {}
+        if user_data.get('role') != 'admin':
+            return jsonify({'mensagem': 'Acesso restrito a administradores!'}), 403
+        return f(user_data, *args, **kwargs)
+    return decorated
+
 
 # --- ROTAS REST DA API (ORGANIZADAS POR FUNCIONALIDADE) ---
 
+def _campos_pedidos():
+    """Campos pedidos em ?fields=nome,tipo,cr (None = todos). Validados pelo db_manager (projecao.py)."""
+    return projecao.ler_campos(request.args.get('fields'))
+
 # --- Rotas Públicas ---
 @app.route("/api/monstros", methods=['GET'])
+@respostas.cache_compendio
 def get_monstros():
-    """Retorna monstros com filtros opcionais: ?nome=&oficial=&tipo=&criador_id="""
+    """Retorna monstros com filtros opcionais: ?nome=&oficial=&tipo=&criador_id=&fields="""
     nome      = request.args.get('nome', None)
     oficial   = request.args.get('oficial', None)
     tipo      = request.args.get('tipo', None)
     criador_id = request.args.get('criador_id', None)
     if oficial is not None:
         oficial = 1 if oficial == '1' else 0
-    monstros = buscar_todos_os_monstros(nome=nome, oficial=oficial, tipo=tipo, criador_id=criador_id)
+    try:
+        monstros = buscar_todos_os_monstros(nome=nome, oficial=oficial, tipo=tipo, criador_id=criador_id,
+                                            campos=_campos_pedidos())
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     return jsonify(monstros)
 
 @app.route("/api/monstros/tipos", methods=['GET'])
+@respostas.cache_compendio
 def get_tipos_monstros():
     """Retorna lista de tipos únicos para o filtro."""
     return jsonify(buscar_tipos_monstros())
 
+@app.route("/api/monstros/aleatorio", methods=['GET'])
+def get_monstro_aleatorio():
+    """Sorteia um monstro em O(1). Filtros opcionais: ?tipo=&cr=(0-1|2-4|5-10|11-16|17+)&oficial="""
+    faixa_cr = request.args.get('cr', None)
+    if faixa_cr is not None and faixa_cr not in [nome for nome, _ in sorteio.FAIXAS_CR]:
+        return jsonify({'erro': 'Faixa de CR inválida.'}), 400
+    oficial = request.args.get('oficial', None)
+    if oficial is not None:
+        oficial = 1 if oficial == '1' else 0
+    monstro_id = sorteio.sortear_monstro_id(tipo=request.args.get('tipo'), faixa_cr=faixa_cr, oficial=oficial)
+    m = buscar_monstro_por_id(monstro_id) if monstro_id is not None else None
+    if not m:
+        return jsonify({'erro': 'Nenhum monstro encontrado para esses filtros'}), 404
+    return jsonify(m)
+
 @app.route("/api/monstros/<int:monstro_id>", methods=['GET'])
 def get_monstro_detalhe(monstro_id):
     """Retorna um monstro completo por ID."""
@@ -173,21 +262,52 @@ def get_monstro_detalhe(monstro_id):
     return jsonify(m)
 
 @app.route("/api/itens", methods=['GET'])
+@respostas.cache_compendio
 def get_itens():
-    """Retorna itens com filtros: ?nome=&categoria=&oficial="""
+    """Retorna itens com filtros: ?nome=&categoria=&oficial=&fields="""
     nome      = request.args.get('nome', None)
     categoria = request.args.get('categoria', None)
     oficial   = request.args.get('oficial', None)
     criador_id = request.args.get('criador_id', None)
     if oficial is not None:
         oficial = 1 if oficial == '1' else 0
-    itens = buscar_todos_os_itens(nome=nome, categoria=categoria, oficial=oficial, criador_id=criador_id)
+    try:
+        itens = buscar_todos_os_itens(nome=nome, categoria=categoria, oficial=oficial, criador_id=criador_id,
+                                      campos=_campos_pedidos())
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     return jsonify(itens)
 
 @app.route("/api/itens/categorias", methods=['GET'])
+@respostas.cache_compendio
 def get_categorias_itens():
     return jsonify(buscar_categorias_itens())
 
+@app.route("/api/itens/aleatorio", methods=['GET'])
+def get_itens_aleatorios():
+    """Sorteia loot em O(1) por item. Filtros: ?categoria=&oficial=&peso=(raridade|preco|uniforme)&quantidade="""
+    peso = request.args.get('peso', 'raridade')
+    if peso not in sorteio.MODOS_PESO_ITEM:
+        return jsonify({'erro': 'Modo de peso inválido.'}), 400
+    oficial = request.args.get('oficial', None)
+    if oficial is not None:
+        oficial = 1 if oficial == '1' else 0
+    try:
+        quantidade = max(1, min(int(request.args.get('quantidade', 1)), 50))
+    except ValueError:
+        return jsonify({'erro': 'Quantidade inválida.'}), 400
+    itens = []
+    for _ in range(quantidade):
+        item_id = sorteio.sortear_item_id(categoria=request.args.get('categoria'), oficial=oficial, peso=peso)
+        if item_id is None:
+            break
+        item = buscar_item_por_id(item_id)
+        if item:
+            itens.append(item)
+    if not itens:
+        return jsonify({'erro': 'Nenhum item encontrado para esses filtros'}), 404
+    return jsonify(itens)
+
 @app.route("/api/itens/<int:item_id>", methods=['GET'])
 def get_item_detalhe(item_id):
     item = buscar_item_por_id(item_id)
@@ -197,10 +317,14 @@ def get_item_detalhe(item_id):
 
 # --- CORREÇÃO: Definição ÚNICA e Correta da Rota GET /api/habilidades ---
 @app.route("/api/habilidades", methods=['GET'])
+@respostas.cache_compendio
 def get_habilidades():
-    """Retorna a lista de todas as habilidades da biblioteca."""
+    """Retorna a lista de todas as habilidades da biblioteca (?fields= limita as colunas)."""
     # Chama a função correta do db_manager
-    habilidades_db = buscar_todas_as_habilidades() 
+    try:
+        habilidades_db = buscar_todas_as_habilidades(campos=_campos_pedidos())
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     # A função já retorna uma lista de dicts, pode retornar diretamente
     return jsonify(habilidades_db)
 # --- FIM DA CORREÇÃO ---
@@ -264,12 +388,84 @@ def deletar_campanha_route(current_user_data, campanha_id):
         return jsonify({'sucesso': False, 'mensagem': 'Campanha não encontrada.'}), 404
     return jsonify({'sucesso': True, 'mensagem': 'Campanha deletada.'})
 
+@app.route('/api/campanhas/<int:campanha_id>/completo', methods=['GET'])
+@token_required
+def buscar_campanha_completa_route(current_user_id, campanha_id):
+    """
+    Campanha + mapas/eventos/npcs/quests/anotações numa resposta só (uma transação de leitura).
+    ?fields.<recurso>=a,b  projeção por recurso (ex: fields.npcs=nome,papel)
+    ?imagens=1             inclui a imagem dos mapas (por padrão só 'tem_imagem')
+    ?visao=jogador         só itens visíveis, sem as colunas privadas do mestre
+                           (liberada também para quem está numa sala ligada à campanha)
+    """
+    campos = {recurso: projecao.ler_campos(request.args.get(f'fields.{recurso}'))
+              for recurso in esconderijo_db.SUBRECURSOS}
+    visao_jogador = request.args.get('visao') == 'jogador'
+    membro = visao_jogador and int(current_user_id) in _membros_da_campanha(campanha_id)
+    try:
+        dados = esconderijo_db.buscar_campanha_completa(
+            campanha_id, int(current_user_id), campos=campos,
+            incluir_imagens=request.args.get('imagens') == '1',
+            visao_jogador=visao_jogador, membro=membro,
+        )
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'mensagem': str(e)}), 400
+    if dados is None:
+        return jsonify({'sucesso': False, 'mensagem': 'Campanha não encontrada.'}), 404
+    if dados is False:
+        return jsonify({'sucesso': False, 'mensagem': 'Acesso negado.'}), 403
+    return jsonify(dados)
+
+# Arquivos do blob store (imagens de mapas). O hash é o próprio conteúdo, então a resposta
+# pode ficar em cache para sempre; send_file cuida de Range/If-None-Match e envia o arquivo em partes.
+def _cache_privado(resposta):
+    # Sem token: o hash é a credencial (ver database/blobs.py). Cache só no navegador.
+    resposta.cache_control.public = False
+    resposta.cache_control.private = True
+    return resposta
+
+@app.route('/api/blobs/<hash_blob>', methods=['GET'])
+def get_blob(hash_blob):
+    caminho = blobs.caminho_blob(hash_blob)
+    if caminho is None:
+        return jsonify({'mensagem': 'Arquivo não encontrado.'}), 404
+    with open(caminho, 'rb') as f:
+        mimetype = blobs.tipo_imagem(f.read(16)) or 'application/octet-stream'
+    resposta = send_file(caminho, mimetype=mimetype, conditional=True, etag=hash_blob, max_age=31536000)
+    resposta.cache_control.immutable = True
+    return _cache_privado(resposta)
+
+@app.route('/api/blobs/<hash_blob>/miniatura/<tamanho>', methods=['GET'])
+def get_blob_miniatura(hash_blob, tamanho):
+    """Miniatura (p=160px, m=480px, g=1024px no lado maior) em WebP ou JPEG, conforme o Accept."""
+    if tamanho not in miniaturas.TAMANHOS:
+        return jsonify({'mensagem': f"Tamanho inválido (use: {', '.join(miniaturas.TAMANHOS)})."}), 400
+    webp = miniaturas.formato_suporta_webp() and 'image/webp' in request.headers.get('Accept', '')
+    formato = 'webp' if webp else 'jpeg'
+    caminho = miniaturas.obter_miniatura(hash_blob, tamanho, formato)
+    if caminho is None:
+        # Sem Pillow (ou imagem ilegível): entrega a original, com cache curto.
+        if blobs.caminho_blob(hash_blob) is None:
+            return jsonify({'mensagem': 'Arquivo não encontrado.'}), 404
+        resposta = get_blob(hash_blob)
+        resposta.cache_control.immutable = False
+        resposta.cache_control.max_age = 3600
+        return resposta
+    resposta = send_file(caminho, mimetype=miniaturas.FORMATOS[formato][1], conditional=True,
+                         etag=f"{hash_blob}-{tamanho}-{formato}", max_age=31536000)
+    resposta.cache_control.immutable = True
+    resposta.vary.add('Accept')
+    return _cache_privado(resposta)
+
 # Subrecursos genericos
-def _rota_listar(campanha_id, fetch_fn, current_user_data):
-    user_id = int(current_user_data['sub'])
-    _, err = _check_campanha_owner(campanha_id, user_id)
+def _rota_listar(campanha_id, fetch_fn, current_user_id):
+    # token_required passa o ID do usuário (int), não o payload do token.
+    _, err = _check_campanha_owner(campanha_id, int(current_user_id))
     if err: return err
-    return jsonify(fetch_fn(campanha_id))
+    try:
+        return jsonify(fetch_fn(campanha_id, campos=_campos_pedidos()))
+    except ValueError as e:
+        return jsonify({'sucesso': False, 'mensagem': str(e)}), 400
 
 # mapas
 @app.route('/api/campanhas/<int:cid>/mapas', methods=['GET'])
@@ -279,22 +475,26 @@ def listar_mapas_route(current_user_data, cid):
 
 @app.route('/api/campanhas/<int:cid>/mapas', methods=['POST'])
 @token_required
-def criar_mapa_route(current_user_data, cid):
-    user_id = int(current_user_data['sub'])
-    _, err = _check_campanha_owner(cid, user_id)
+def criar_mapa_route(current_user_id, cid):
+    _, err = _check_campanha_owner(cid, int(current_user_id))
     if err: return err
     dados = request.get_json() or {}
-    mapa = esconderijo_db.criar_mapa(cid, dados)
+    try:
+        mapa = esconderijo_db.criar_mapa(cid, dados)
+    except ValueError as e:  # blobs.BlobInvalido
+        return jsonify({'sucesso': False, 'mensagem': str(e)}), 400
     return jsonify({'sucesso': True, 'mapa': mapa}), 201
 
 @app.route('/api/campanhas/<int:cid>/mapas/<int:mid>', methods=['PUT'])
 @token_required
-def atualizar_mapa_route(current_user_data, cid, mid):
-    user_id = int(current_user_data['sub'])
-    _, err = _check_campanha_owner(cid, user_id)
+def atualizar_mapa_route(current_user_id, cid, mid):
+    _, err = _check_campanha_owner(cid, int(current_user_id))
     if err: return err
     dados = request.get_json() or {}
-    mapa = esconderijo_db.atualizar_mapa(mid, dados)
+    try:
+        mapa = esconderijo_db.atualizar_mapa(mid, dados)
+    except ValueError as e:  # blobs.BlobInvalido
+        return jsonify({'sucesso': False, 'mensagem': str(e)}), 400
     if not mapa:
         return jsonify({'sucesso': False, 'mensagem': 'Mapa não encontrado.'}), 404
     return jsonify({'sucesso': True, 'mapa': mapa})
@@ -538,6 +738,73 @@ def vincular_campanha_sala_route(current_user_data, sala_id):
     esconderijo_db.vincular_sala_campanha(sala_id, campanha_id)
     return jsonify({'sucesso': True})
 
+# simulador de encontros (planejamento de campanha)
+LIMITE_MONSTROS_SIMULACAO = 30  # cada ID distinto custa uma consulta ao bestiário
+LIMITE_FICHAS_SIMULACAO = 10
+
+def _membros_da_campanha(campanha_id):
+    """{ user_id: {ficha_ids} } de quem está agora numa sala ligada à campanha (sala_campanha)."""
+    membros = {}
+    for sala_id in esconderijo_db.listar_salas_da_campanha(campanha_id):
+        for info in estado_salas.jogadores(str(sala_id)).values():
+            membros.setdefault(info['user_id'], set()).add(info.get('ficha_id'))
+    return membros
+
+@app.route('/api/campanhas/<int:cid>/simular-encontro', methods=['POST'])
+@token_required
+def simular_encontro_route(current_user_id, cid):
+    """
+    Estima a dificuldade de um encontro por Monte Carlo.
+    Corpo: { monstros_ids: [..], fichas_ids: [..], simulacoes?, tempo_max_s?, margem?, semente? }
+    (IDs de monstros podem se repetir: [3, 3, 7] = dois monstros 3 e um 7.)
+    Fichas aceitas: as do próprio Mestre e as dos jogadores presentes nas salas da campanha.
+    """
+    _, err = _check_campanha_owner(cid, current_user_id)
+    if err: return err
+    dados = request.get_json() or {}
+    monstros_ids = dados.get('monstros_ids') or []
+    fichas_ids = dados.get('fichas_ids') or []
+    if not isinstance(monstros_ids, list) or not isinstance(fichas_ids, list) or not monstros_ids or not fichas_ids:
+        return jsonify({'sucesso': False, 'mensagem': 'Informe monstros_ids e fichas_ids.'}), 400
+    if len(monstros_ids) > LIMITE_MONSTROS_SIMULACAO or len(fichas_ids) > LIMITE_FICHAS_SIMULACAO:
+        return jsonify({'sucesso': False, 'mensagem': f'No máximo {LIMITE_MONSTROS_SIMULACAO} monstros '
+                                                      f'e {LIMITE_FICHAS_SIMULACAO} fichas.'}), 400
+    try:
+        monstros_ids = [int(mid) for mid in monstros_ids]
+        fichas_ids = sorted({int(fid) for fid in fichas_ids})
+        simulacoes = min(int(dados.get('simulacoes', 2000)), 20000)
+        tempo_max_s = min(float(dados.get('tempo_max_s', 3.0)), 30.0)
+        margem = max(float(dados.get('margem', 0.02)), 0.001)
+    except (TypeError, ValueError):
+        return jsonify({'sucesso': False, 'mensagem': 'Parâmetros numéricos inválidos.'}), 400
+    if simulacoes <= 0 or tempo_max_s <= 0:
+        return jsonify({'sucesso': False, 'mensagem': 'simulacoes e tempo_max_s devem ser positivos.'}), 400
+
+    bestiario = {}
+    for mid in set(monstros_ids):
+        m = buscar_monstro_por_id(mid)
+        if not m:
+            return jsonify({'sucesso': False, 'mensagem': f'Monstro {mid} não encontrado.'}), 404
+        bestiario[mid] = simulador_encontro.combatente_de_monstro(m)
+    monstros = [bestiario[mid] for mid in monstros_ids]
+
+    permitidas = {f for fichas in _membros_da_campanha(cid).values() for f in fichas if f is not None}
+    fichas = buscar_fichas_para_simulacao(fichas_ids, current_user_id, permitidas)
+    if len(fichas) != len(fichas_ids):
+        negadas = sorted(set(fichas_ids) - {f['id'] for f in fichas})
+        return jsonify({'sucesso': False, 'mensagem': f'Fichas inexistentes ou fora da campanha: {negadas}.'}), 400
+    grupo = [simulador_encontro.combatente_de_ficha(f) for f in fichas]
+
+    try:
+        resultado = simulador_encontro.estimar_dificuldade(
+            grupo, monstros, max_simulacoes=simulacoes, tempo_max_s=tempo_max_s,
+            margem=margem, semente=dados.get('semente'),
+        )
+    except Exception as e:
+        log_erro('simular_encontro', user_id=current_user_id, erro_msg=str(e))
+        return jsonify({'sucesso': False, 'mensagem': 'Erro interno no servidor.'}), 500
+    return jsonify({'sucesso': True, 'resultado': resultado})
+
 # --- CRUD de Monstros (POST, PUT, DELETE) ---
 @app.route("/api/monstros", methods=['POST'])
 @token_required
@@ -592,7 +859,8 @@ def delete_monstro(current_user_data, monstro_id):
 @token_required
 def post_novo_item(current_user_data):
     """(CREATE) Cria um novo item."""
-    print(f"Mestre (ID: {current_user_data['sub']}) criando item.")
+    # Sem @mestre_required, o token_required entrega apenas o ID (int) do usuário.
+    print(f"Usuário (ID: {current_user_data}) criando item.")
     dados = request.get_json()
     campos_necessarios = ['nome', 'tipo', 'preco_ouro']
     if not all(campo in dados for campo in campos_necessarios):
@@ -601,6 +869,9 @@ def post_novo_item(current_user_data):
         novo_item = criar_novo_item(dados)
         if novo_item: return jsonify({'sucesso': True, 'item': novo_item}), 201
         else: return jsonify({'sucesso': False, 'mensagem': 'Erro ao criar item (nome duplicado?).'}), 409
+    except ValueError as e:
+        # EfeitoInvalido: o texto de 'efeito' não segue o formato tipo:valor[:alvo[:duracao]].
+        return jsonify({'sucesso': False, 'mensagem': f'Efeito inválido: {e}'}), 400
     except Exception as e:
         print(f"Erro em post_novo_item: {e}")
         return jsonify({'sucesso': False, 'mensagem': 'Erro interno no servidor.'}), 500
@@ -617,6 +888,9 @@ def update_item(current_user_data, item_id):
         item_atualizado = atualizar_item_existente(item_id, dados)
         if item_atualizado: return jsonify({'sucesso': True, 'item': item_atualizado})
         else: return jsonify({'sucesso': False, 'mensagem': 'Item não encontrado ou erro.'}), 404
+    except ValueError as e:
+        # EfeitoInvalido: o texto de 'efeito' não segue o formato tipo:valor[:alvo[:duracao]].
+        return jsonify({'sucesso': False, 'mensagem': f'Efeito inválido: {e}'}), 400
     except Exception as e:
         print(f"Erro em update_item: {e}")
         return jsonify({'sucesso': False, 'mensagem': 'Erro interno no servidor.'}), 500
@@ -651,6 +925,9 @@ def post_nova_habilidade(current_user_data):
         nova_habilidade = criar_nova_habilidade(dados)
         if nova_habilidade: return jsonify({'sucesso': True, 'habilidade': nova_habilidade}), 201
         else: return jsonify({'sucesso': False, 'mensagem': 'Erro ao criar habilidade (nome duplicado?).'}), 409
+    except ValueError as e:
+        # EfeitoInvalido: o texto de 'efeito' não segue o formato tipo:valor[:alvo[:duracao]].
+        return jsonify({'sucesso': False, 'mensagem': f'Efeito inválido: {e}'}), 400
     except Exception as e:
         print(f"Erro em post_nova_habilidade: {e}")
         return jsonify({'sucesso': False, 'mensagem': 'Erro interno no servidor.'}), 500
@@ -667,6 +944,9 @@ def update_habilidade(current_user_data, habilidade_id):
         habilidade_atualizada = atualizar_habilidade_existente(habilidade_id, dados)
         if habilidade_atualizada: return jsonify({'sucesso': True, 'habilidade': habilidade_atualizada})
         else: return jsonify({'sucesso': False, 'mensagem': 'Habilidade não encontrada ou erro.'}), 404
+    except ValueError as e:
+        # EfeitoInvalido: o texto de 'efeito' não segue o formato tipo:valor[:alvo[:duracao]].
+        return jsonify({'sucesso': False, 'mensagem': f'Efeito inválido: {e}'}), 400
     except Exception as e:
         print(f"Erro em update_habilidade: {e}")
         return jsonify({'sucesso': False, 'mensagem': 'Erro interno no servidor.'}), 500
@@ -686,6 +966,70 @@ def delete_habilidade(current_user_data, habilidade_id):
         return jsonify({'sucesso': False, 'mensagem': f'Erro interno: {e}'}), 500
 
 
+# --- Rotas de Administração ---
+@app.route("/api/admin/metrics", methods=['GET'])
+@token_required
+@admin_required
+def get_admin_metrics(current_user_data):
+    """Métricas do servidor no formato texto do Prometheus (eventos Socket.IO e consultas SQL)."""
+    return Response(metricas.exportar_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route("/api/admin/perfil", methods=['GET'])
+@token_required
+@admin_required
+def get_admin_perfil(current_user_data):
+    """Estado do perfilador e perfis já salvos em logs/perfis."""
+    return jsonify(perfilador.status())
+
+
+@app.route("/api/admin/perfil", methods=['POST'])
+@token_required
+@admin_required
+def post_admin_perfil(current_user_data):
+    """
+    Arma o perfilador para as próximas N execuções que casarem com o padrão.
+    Corpo: {"padrao": "batalha_*", "quantidade": 20, "alvo": "evento"|"http"|"qualquer",
+            "modo": "amostragem"|"cprofile", "intervalo_ms": 1}
+    Sem 'modo': amostragem no modo threading, cprofile com eventlet/gevent.
+    """
+    dados = request.get_json() or {}
+    try:
+        armado = perfilador.armar(
+            dados.get('padrao'), dados.get('quantidade', 10),
+            alvo=dados.get('alvo', 'qualquer'), modo=dados.get('modo'),
+            intervalo_ms=dados.get('intervalo_ms', 1.0),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'sucesso': False, 'mensagem': str(e)}), 400
+    print(f"Perfilador armado por {current_user_data.get('name')}: {armado}")
+    return jsonify({'sucesso': True, 'armado': armado}), 201
+
+
+@app.route("/api/admin/perfil", methods=['DELETE'])
+@token_required
+@admin_required
+def delete_admin_perfil(current_user_data):
+    """Desarma o perfilador e salva o que já foi coletado."""
+    arquivo = perfilador.desarmar()
+    return jsonify({'sucesso': True, 'arquivo': arquivo})
+
+
+@app.route("/api/admin/perfil/<path:arquivo>", methods=['GET'])
+@token_required
+@admin_required
+def get_admin_perfil_arquivo(current_user_data, arquivo):
+    """Baixa um perfil salvo (.folded para flame graphs, .prof para snakeviz/flameprof)."""
+    caminho = perfilador.caminho_perfil(arquivo)
+    if caminho is None:
+        return jsonify({'mensagem': 'Perfil não encontrado.'}), 404
+    with open(caminho, 'rb') as f:
+        conteudo = f.read()
+    tipo = 'text/plain; charset=utf-8' if arquivo.endswith('.folded') else 'application/octet-stream'
+    return Response(conteudo, mimetype=tipo,
+                    headers={'Content-Disposition': f'attachment; filename="{arquivo}"'})
+
+
 # --- Rotas de Autenticação ---
 @app.route("/api/registrar", methods=['POST'])
 def rota_registrar_usuario():
@@ -728,8 +1072,11 @@ def rota_fazer_login():
 @app.route("/api/fichas", methods=['GET'])
 @token_required
 def get_fichas_usuario(current_user_id):
-    """(READ) Busca as fichas do usuário logado."""
-    fichas = buscar_fichas_por_usuario(current_user_id)
+    """(READ) Busca as fichas do usuário logado (?fields= para outras colunas além da lista)."""
+    try:
+        fichas = buscar_fichas_por_usuario(current_user_id, campos=_campos_pedidos())
+    except ValueError as e:
+        return jsonify({'mensagem': str(e)}), 400
     return jsonify(fichas)
 
 @app.route("/api/fichas", methods=['POST'])
@@ -880,57 +1227,246 @@ def delete_item_sala(current_user_id, item_id):
 
 # --- EVENTOS SOCKET.IO ---
 
-# Dicionário global para rastrear usuários conectados e suas informações por sala
-# Estrutura: { 'sala_id': { 'sid': {'user_id': X, 'ficha_id': Y, 'nome_personagem': Z, 'role': R} } }
-salas_ativas = {}
+# Presença nas salas e batalhas em andamento ficam no estado compartilhado (estado.py),
+# para funcionar com vários workers. Backend escolhido por RPG_ESTADO (padrão: memória).
+# Presença por sala: { 'sid': {'user_id': X, 'ficha_id': Y, 'nome_personagem': Z, 'role': R} }
+estado_salas = estado.criar()
+# Um executor por sala (atores.py): eventos da mesma sala são aplicados em ordem, um de cada vez;
+# salas diferentes rodam em paralelo. A trava do estado serializa a sala entre workers.
+atores_salas = atores.Atores(envolver=estado_salas.trava)
+metricas.registrar_coletor(atores_salas.linhas_prometheus)
+# Limite de taxa por sid e por usuário dos eventos de chat/dados (orçamentos em limitador.LIMITES).
+limites_socket = limitador.Limitador()
+metricas.registrar_coletor(limites_socket.linhas_prometheus)
+# Codec binário opcional (msgpack) por cliente; só oferecido com RPG_CODECS=msgpack (codec.py).
+codecs_socket = codec.Codecs()
+metricas.registrar_coletor(codecs_socket.linhas_prometheus)
+
+def _contexto_evento(data):
+    """(sala_id, user_id) de um evento socket, para o log estruturado (telemetria)."""
+    sala_id = data.get('sala_id') if isinstance(data, dict) else None
+    info = estado_salas.jogador(str(sala_id), request.sid) if sala_id is not None else None
+    return sala_id, (info or {}).get('user_id')
+
+
+def _na_sala(f):
+    """
+    Roda o handler no executor da sala (atores.py), levando junto o contexto do evento
+    (request.sid, emit/send). Fica acima do @telemetria.instrumentar: a latência e o perfil
+    medem o handler, e a espera na fila vai para rpg_sala_fila_espera_segundos.
+
+    O sala_id vem do cliente: só ganha executor a sala em que o sid já está ou que existe
+    no banco. Para as outras o handler roda direto e responde com o erro de sempre
+    (sala não encontrada, acesso negado), sem criar thread para um id inventado.
+    """
+    @wraps(f)
+    def decorado(data, *args):
+        sala_id = data.get('sala_id') if isinstance(data, dict) else None
+        if sala_id is None:
+            return f(data, *args)
+        sala_id = str(sala_id)
+        if estado_salas.jogador(sala_id, request.sid) is None and buscar_mestre_da_sala(sala_id) is None:
+            return f(data, *args)
+        return atores_salas.executar(sala_id, copy_current_request_context(f), data, *args)
+    return decorado
+
+
+def _limitado(evento):
+    """
+    Descarta o evento se a conexão/usuário estourou o orçamento (limitador.py), avisando
+    o cliente com 'rate_limited'. Fica acima do @telemetria.instrumentar: evento descartado
+    não conta como latência de handler (conta em rpg_limitador_eventos_total).
+    """
+    def decorador(f):
+        @wraps(f)
+        def decorado(*args):
+            aviso = limites_socket.verificar(evento, request.sid)
+            if aviso is None:
+                return f(*args)
+            if aviso:
+                socketio.emit('rate_limited', aviso, room=request.sid)
+        return decorado
+    return decorador
+
+
+# --- Eventos da sala numerados (retomada) ---
+# Tudo o que vai para a sala inteira passa por _emitir_sala: o evento ganha o número de
+# sequência seguinte da sala (segundo argumento do evento, que os handlers antigos ignoram)
+# e fica no buffer curto do estado (estado.REPLAY_EVENTOS). Chamado no executor da sala, então
+# sequência e ordem de envio são as mesmas. Quem cai por falha de rede não sai da sala na hora:
+# a presença fica marcada 'desconectado' por varredura.RETOMADA_S, e o cliente que volta manda
+# 'resume' com o sid antigo e a última sequência que viu; recebe só o que perdeu, sem histórico,
+# sem aviso no chat. Se o buffer não cobre mais o buraco, o cliente cai para o join_room normal
+# (que também assume a presença do sid antigo sem anunciar de novo).
+
+retomadas = metricas.contador('rpg_retomadas_total', 'Pedidos de resume, por resultado.')
+eventos_reproduzidos = metricas.contador('rpg_retomada_eventos_total',
+                                         'Eventos da sala reenviados a clientes que retomaram a sessão.')
+
+
+def _emitir_sala(evento, dados, sala_id):
+    seq = estado_salas.registrar_evento(sala_id, evento, dados)
+    destinos = [(sala_id, dados)]
+    if codecs_socket.ativo:  # clientes msgpack ficam numa sala à parte (codec.sala)
+        destinos.append((codec.sala(sala_id), _binario(dados)))
+    for sala_socket, payload in destinos:
+        if seq is None:  # sala vazia: ninguém para retomar
+            socketio.emit(evento, payload, to=sala_socket)
+        else:
+            socketio.emit(evento, (payload, seq), to=sala_socket)  # tupla = vários argumentos do evento
+
+
+def _binario(dados):
+    # Só dicts/listas ganham com o msgpack; texto (mensagens do chat) vai como está.
+    return codec.codificar(dados) if isinstance(dados, (dict, list)) else dados
+
+
+def _emitir_para(evento, dados, sid, seq=None):
+    """Emit para um sid só, no codec que ele negociou."""
+    payload = _binario(dados) if codecs_socket.de(sid) else dados
+    socketio.emit(evento, payload if seq is None else (payload, seq), room=sid)
+
+
+def _negociar_codec(data, sala_id):
+    """
+    Registra o codec que o sid pediu (se o servidor oferece; senão JSON), avisa o cliente com
+    o dicionário de chaves e devolve a sala do Socket.IO em que ele deve entrar.
+    """
+    if codecs_socket.negociar(request.sid, data.get('codec')):
+        socketio.emit('codec', codecs_socket.mensagem_negociacao(), room=request.sid)
+        return codec.sala(sala_id)
+    return sala_id
+
+
+# --- Presença incremental ---
+# Cada mudança na presença de uma sala vai como delta (presence_join / presence_leave /
+# presence_update) com a versão nova da sala (estado_salas.versao_presenca). O cliente aplica
+# o delta se ele for exatamente a versão seguinte à sua; se pulou alguma, pede 'presence_sync'
+# e recebe a lista inteira (presence_snapshot). Chamadas no executor da sala, logo depois da
+# alteração, para a versão lida ser a da própria alteração.
+
+def _presenca_delta(evento, sala_id, sid, **dados):
+    _emitir_sala(evento, {'sala_id': sala_id, 'versao': estado_salas.versao_presenca(sala_id), 'sid': sid, **dados},
+                 sala_id)
+
+
+def _presenca_snapshot(sala_id, destino):
+    jogadores = [{'sid': sid, **info} for sid, info in estado_salas.jogadores(sala_id).items()]
+    _emitir_para('presence_snapshot', {'sala_id': sala_id, 'versao': estado_salas.versao_presenca(sala_id),
+                                       'jogadores': jogadores}, destino)
+
+
+def _saiu_da_sala(sala_id, sid):
+    """Tira o sid que desconectou da sala e avisa quem ficou. Roda no executor da sala."""
+    info = estado_salas.remover_jogador(sala_id, sid)
+    if info is None:
+        return
+    _presenca_delta('presence_leave', sala_id, sid)
+    nome_personagem = info['nome_personagem']
+    mensagem_saida = f"--- {nome_personagem} saiu da taverna. ---"
+    _emitir_sala('message', mensagem_saida, sala_id)  # lida com sala vazia
+    salvar_mensagem_chat(sala_id, 'Sistema', mensagem_saida)
+    print(f"{nome_personagem} removido da sala {sala_id}")
+
+
+def _caiu_da_sala(sala_id, sid):
+    """Conexão perdida sem 'disconnect' do cliente: segura a vaga para o 'resume'. Roda no executor da sala."""
+    if estado_salas.jogador(sala_id, sid) is None:
+        return
+    estado_salas.atualizar_jogador(sala_id, sid, desconectado=True)
+    varredor_salas.aguardar_retomada(sala_id, sid)
+    _presenca_delta('presence_update', sala_id, sid, campos={'desconectado': True})
+    print(f"SID {sid} caiu da sala {sala_id}; aguardando retomada por {varredura.RETOMADA_S:.0f}s")
+
+
+def _assumir_sid(sala_id, sid_antigo, sid_novo):
+    """
+    Passa para 'sid_novo' (que acabou de entrar na presença) o lugar de 'sid_antigo': tira o
+    antigo da presença, troca o sid do jogador na batalha e derruba a conexão antiga se ela
+    ainda existir. Roda no executor da sala.
+    """
+    if estado_salas.remover_jogador(sala_id, sid_antigo) is not None:
+        _presenca_delta('presence_leave', sala_id, sid_antigo)
+    if estado_salas.tem_batalha(sala_id):
+        with estado_salas.batalha(sala_id) as b:
+            for j in b['jogadores']:
+                if j.sid == sid_antigo:
+                    j.sid = sid_novo
+    limites_socket.esquecer(sid_antigo)
+    codecs_socket.esquecer(sid_antigo)
+    socketio.server.disconnect(sid_antigo, namespace='/')
+
+
+def _despejar_sid(sala_id, sid):
+    """Tira da sala um sid sem heartbeat (varredura.py). Roda no executor da sala."""
+    info = estado_salas.remover_jogador(sala_id, sid)
+    if info is None:
+        return False
+    limites_socket.esquecer(sid)
+    # Se a conexão ainda existir (em qualquer worker), derruba: o cliente reconecta e reentra.
+    socketio.server.disconnect(sid, namespace='/')
+    _presenca_delta('presence_leave', sala_id, sid)
+    mensagem = f"--- {info['nome_personagem']} perdeu a conexão com a taverna. ---"
+    _emitir_sala('message', mensagem, sala_id)
+    salvar_mensagem_chat(sala_id, 'Sistema', mensagem)
+    print(f"{info['nome_personagem']} (SID: {sid}) despejado da sala {sala_id} por falta de heartbeat")
+    return True
+
+
+def _arquivar_batalha_ociosa(sala_id, ociosa_antes_de):
+    """Arquiva e remove a batalha se ela continua parada e a sala vazia (varredura.py). Roda no executor da sala."""
+    if estado_salas.tem_sala(sala_id) or sala_id not in estado_salas.batalhas_ociosas(ociosa_antes_de):
+        return False
+    b = estado_salas.ler_batalha(sala_id)
+    if b is None:
+        return False
+    # Sem a tabela (ou com erro no banco) a batalha fica no estado e a próxima varredura tenta de novo.
+    if arquivar_batalha(sala_id, estado.batalha_para_json(b), 'ociosa') is None:
+        return False
+    estado_salas.remover_batalha(sala_id)
+    log_batalha('arquivada', sala_id, 'fase %s, %d entradas no log', b['fase'], len(b['log']))
+    return True
+
+
+varredor_salas = varredura.Varredor(estado_salas, atores_salas.executar, _despejar_sid, _arquivar_batalha_ociosa)
+metricas.registrar_coletor(varredor_salas.linhas_prometheus)
 
 @socketio.on('connect')
-def handle_connect():
+@telemetria.instrumentar('connect')
+def handle_connect(auth=None):
     """Chamado quando um cliente estabelece uma conexão WebSocket."""
+    varredor_salas.iniciar(socketio)  # no primeiro cliente (não sobe tarefa só por importar o módulo)
     print(f"Cliente conectado! SID: {request.sid}")
     log_conexao("Cliente conectado", sid=request.sid)
 
 @socketio.on('disconnect')
-def handle_disconnect():
+@telemetria.instrumentar('disconnect')
+def handle_disconnect(reason=None):
     """Chamado quando um cliente se desconecta."""
-    print(f"Cliente desconectado! SID: {request.sid}")
-    log_conexao("Cliente desconectado", sid=request.sid)
-    
-    sala_para_remover_de = None
-    jogador_removido_info = None
+    print(f"Cliente desconectado! SID: {request.sid} ({reason})")
+    log_conexao("Cliente desconectado", sid=request.sid, info_extra=reason)
+    limites_socket.esquecer(request.sid)
+    codecs_socket.esquecer(request.sid)
     
-    # Encontra e remove o jogador do dicionário 'salas_ativas'
-    for sala_id, jogadores in salas_ativas.items():
-        if request.sid in jogadores:
-            sala_para_remover_de = str(sala_id) # Garante que ID da sala é string
-            jogador_removido_info = jogadores.pop(request.sid) # Remove usando o SID como chave
-            # Se a sala ficar vazia após remover o jogador, remove a sala do dicionário
-            if not jogadores: 
-                del salas_ativas[sala_id]
-            break # Sai do loop assim que encontrar e remover
-            
-    # Se um jogador foi removido de uma sala
-    if sala_para_remover_de and jogador_removido_info:
-        nome_personagem = jogador_removido_info['nome_personagem']
-        
-        # Envia a lista atualizada de jogadores para TODOS que ainda estão na sala
-        # Verifica se a sala ainda existe (pode ter sido removida se ficou vazia)
-        if sala_para_remover_de in salas_ativas:
-             socketio.emit('lista_jogadores_atualizada', list(salas_ativas[sala_para_remover_de].values()), to=sala_para_remover_de)
-        
-        # Envia a mensagem de saída para a sala (se ainda houver alguém)
-        mensagem_saida = f"--- {nome_personagem} saiu da taverna. ---"
-        send(mensagem_saida, to=sala_para_remover_de) # send() lida com sala vazia
-        # Salva a mensagem de saída no histórico do chat
-        salvar_mensagem_chat(sala_para_remover_de, 'Sistema', mensagem_saida)
-        print(f"{nome_personagem} removido da sala {sala_para_remover_de}")
+    # Saída de verdade (cliente fechou o socket, ou o servidor derrubou): tira o jogador da sala
+    # (a sala some se ficar vazia). Queda de rede: segura a vaga para o 'resume'. No executor da sala.
+    sala_id = estado_salas.sala_do_sid(request.sid)
+    if sala_id is None:
+        return
+    if reason in (None, socketio.reason.CLIENT_DISCONNECT, socketio.reason.SERVER_DISCONNECT):
+        atores_salas.executar(sala_id, _saiu_da_sala, sala_id, request.sid)
+    else:
+        atores_salas.executar(sala_id, _caiu_da_sala, sala_id, request.sid)
 
 @socketio.on('join_room')
+@_na_sala
+@telemetria.instrumentar('join_room', contexto=_contexto_evento)
 def handle_join_room(data):
     """Evento disparado pelo frontend quando um usuário tenta entrar numa sala."""
     token = data.get('token')
     sala_id = str(data.get('sala_id')) # Garante que ID da sala é string
     ficha_id = data.get('ficha_id') # Pode ser None se for Mestre
+    presenca_versao = data.get('presenca_versao') # Versão da presença que o cliente já tem (reconexão)
     
     # Validações iniciais
     if not token or not sala_id:
@@ -958,9 +1494,8 @@ def handle_join_room(data):
             return
         is_mestre = (user_id == mestre_id_da_sala)
         
-        # 3. Inicializa o rastreamento da sala se for o primeiro a entrar
-        if sala_id not in salas_ativas:
-            salas_ativas[sala_id] = {}
+        # 3. Jogadores já presentes na sala (o handler roda no executor da sala, ver _na_sala)
+        presentes = estado_salas.jogadores(sala_id)
             
         # 4. Lógica de Mestre vs Jogador
         role = ''
@@ -971,7 +1506,9 @@ def handle_join_room(data):
             role = 'mestre'
             nome_personagem = user_name # Mestre usa o nome de usuário
             # Verifica se já existe um mestre ativo nesta sala
-            mestre_existente_sid = next((sid for sid, info in salas_ativas[sala_id].items() if info['role'] == 'mestre'), None)
+            # (um mestre 'desconectado' é ele mesmo caído, esperando retomada: a vaga é dele)
+            mestre_existente_sid = next((sid for sid, info in presentes.items()
+                                         if info['role'] == 'mestre' and not info.get('desconectado')), None)
             if mestre_existente_sid and mestre_existente_sid != request.sid: # Se existe E não sou eu mesmo reconectando
                 socketio.emit('join_error', {'mensagem': 'Já existe um Mestre ativo nesta sala.'}, room=request.sid)
                 return
@@ -988,43 +1525,125 @@ def handle_join_room(data):
             nome_personagem = ficha_data['nome_personagem'] # Jogador usa nome do personagem
             ficha_id_real = ficha_id
 
-        # 5. Adiciona o usuário à sala do SocketIO
-        join_room(sala_id)
+        # Reconexão que não conseguiu 'resume': assume a vaga do sid antigo que caiu, sem anunciar de novo
+        sid_anterior = next((sid for sid, info in presentes.items()
+                             if sid != request.sid and info.get('desconectado') and info['user_id'] == user_id
+                             and info['role'] == role and info['ficha_id'] == ficha_id_real), None)
+
+        # 5. Adiciona o usuário à sala do SocketIO (a sala do codec dele, se pediu msgpack)
+        join_room(_negociar_codec(data, sala_id))
         
-        # 6. Adiciona/Atualiza informações do jogador no nosso dicionário 'salas_ativas'
-        salas_ativas[sala_id][request.sid] = {
+        # 6. Adiciona/Atualiza informações do jogador na presença da sala
+        versao_anterior = estado_salas.versao_presenca(sala_id)
+        estado_salas.entrar(sala_id, request.sid, {
             'user_id': user_id,
             'ficha_id': ficha_id_real,
             'nome_personagem': nome_personagem,
             'role': role
-        }
+        })
+        limites_socket.associar(request.sid, user_id)
         
         # 7. Envia informações específicas para o cliente que acabou de entrar
         # Informa se ele é mestre (para UI condicional)
         socketio.emit('status_mestre', {'isMestre': is_mestre}, room=request.sid) 
-        # Envia o histórico de chat da sala
+        # Envia o histórico de chat da sala (e a sequência dos eventos da sala até aqui, para o 'resume')
         historico = buscar_historico_chat(sala_id)
-        socketio.emit('chat_history', {'historico': historico}, room=request.sid)
+        _emitir_para('chat_history', {'historico': historico, 'seq': estado_salas.ultimo_seq(sala_id)}, request.sid)
         
         # 8. Envia informações para TODOS na sala
         remetente_formatado = f"Mestre ({nome_personagem})" if is_mestre else nome_personagem
-        mensagem_entrada = f"--- {remetente_formatado} entrou na taverna! ---"
-        # Envia mensagem de entrada para todos na sala
-        send(mensagem_entrada, to=sala_id) 
-        # Salva mensagem de entrada no histórico
-        salvar_mensagem_chat(sala_id, 'Sistema', mensagem_entrada) 
-        # Envia lista atualizada de jogadores para todos na sala
-        socketio.emit('lista_jogadores_atualizada', list(salas_ativas[sala_id].values()), to=sala_id)
+        if sid_anterior is None:
+            mensagem_entrada = f"--- {remetente_formatado} entrou na taverna! ---"
+            # Envia mensagem de entrada para todos na sala
+            _emitir_sala('message', mensagem_entrada, sala_id) 
+            # Salva mensagem de entrada no histórico
+            salvar_mensagem_chat(sala_id, 'Sistema', mensagem_entrada) 
+        # Presença: lista inteira só para quem não tem a versão anterior à sua entrada
+        # (primeira entrada ou perdeu mudanças); todos recebem o delta da entrada.
+        if presenca_versao is None or presenca_versao != versao_anterior:
+            _presenca_snapshot(sala_id, request.sid)
+        _presenca_delta('presence_join', sala_id, request.sid, jogador=estado_salas.jogador(sala_id, request.sid))
+        if sid_anterior is not None:
+            _assumir_sid(sala_id, sid_anterior, request.sid)
         
         print(f"{remetente_formatado} (User ID: {user_id}, SID: {request.sid}) entrou na sala {sala_id}")
         
     except jwt.ExpiredSignatureError:
         socketio.emit('join_error', {'mensagem': 'Token expirado. Faça login novamente.'}, room=request.sid)
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro em handle_join_room: {e}")
         socketio.emit('join_error', {'mensagem': f'Erro ao entrar na sala: {e}'}, room=request.sid)
 
+@socketio.on('presenca_ping')
+@telemetria.instrumentar('presenca_ping', contexto=_contexto_evento)
+def handle_presenca_ping(data):
+    """Heartbeat do cliente na sala (varredura.py). Responde se o sid ainda consta na sala."""
+    sala_id = data.get('sala_id') if isinstance(data, dict) else None
+    if sala_id is None:
+        return {'presente': False}
+    return {'presente': estado_salas.tocar(str(sala_id), request.sid)}
+
+@socketio.on('presence_sync')
+@_na_sala
+@telemetria.instrumentar('presence_sync', contexto=_contexto_evento)
+def handle_presence_sync(data):
+    """Cliente que perdeu algum delta de presença pede a lista inteira (só se a versão dele estiver velha)."""
+    sala_id = str(data.get('sala_id'))
+    if estado_salas.jogador(sala_id, request.sid) is None:
+        return
+    if data.get('versao') != estado_salas.versao_presenca(sala_id):
+        _presenca_snapshot(sala_id, request.sid)
+
+@socketio.on('resume')
+@_na_sala
+@telemetria.instrumentar('resume', contexto=_contexto_evento)
+def handle_resume(data):
+    """
+    Reconexão rápida depois de uma queda: o cliente manda o sid antigo e a última sequência
+    de eventos da sala que viu; recebe só os eventos que perdeu e volta à presença no lugar do
+    sid antigo, sem histórico nem aviso no chat. Ack {'ok': False} = fazer o join_room normal.
+    """
+    sala_id = str(data.get('sala_id'))
+    sid_anterior = data.get('sid_anterior')
+    ultimo_seq = data.get('ultimo_seq')
+    try:
+        user_id = int(jwt.decode(data.get('token') or '', app.config['SECRET_KEY'], algorithms=['HS256'])['sub'])
+    except jwt.InvalidTokenError:
+        retomadas.inc(resultado='token_invalido')
+        return {'ok': False}
+
+    info = estado_salas.jogador(sala_id, sid_anterior) if sid_anterior else None
+    if info is None or info['user_id'] != user_id:
+        retomadas.inc(resultado='sem_vaga')  # despejado, expulso ou a sala esvaziou
+        return {'ok': False}
+    eventos = estado_salas.eventos_desde(sala_id, ultimo_seq) if isinstance(ultimo_seq, int) else None
+    if eventos is None:
+        retomadas.inc(resultado='fora_do_buffer')
+        return {'ok': False}
+
+    # Primeiro o que ele perdeu (só para ele), depois entra na sala e nos próximos eventos
+    sala_socket = _negociar_codec(data, sala_id)
+    for seq, evento, dados in eventos:
+        _emitir_para(evento, dados, request.sid, seq)
+    join_room(sala_socket)
+    info.pop('desconectado', None)
+    estado_salas.entrar(sala_id, request.sid, info)
+    limites_socket.associar(request.sid, user_id)
+    _presenca_delta('presence_join', sala_id, request.sid, jogador=info)
+    _assumir_sid(sala_id, sid_anterior, request.sid)
+
+    retomadas.inc(resultado='ok')
+    if eventos:
+        eventos_reproduzidos.inc(len(eventos))
+    print(f"{info['nome_personagem']} retomou a sala {sala_id} (SID {sid_anterior} -> {request.sid}, "
+          f"{len(eventos)} eventos reenviados)")
+    return {'ok': True, 'reproduzidos': len(eventos)}
+
 @socketio.on('send_message')
+@_limitado('send_message')
+@_na_sala
+@telemetria.instrumentar('send_message', contexto=_contexto_evento)
 def handle_send_message(data):
     """Recebe mensagem de chat, salva no DB e retransmite para a sala."""
     sala_id = str(data.get('sala_id'))
@@ -1032,21 +1651,21 @@ def handle_send_message(data):
     
     # Valida dados e se o remetente está na sala rastreada
     # Bloquear jogador morto
-    if sala_id and str(sala_id) in batalhas_ativas:
-        b = batalhas_ativas[str(sala_id)]
+    b = estado_salas.ler_batalha(sala_id) if sala_id else None
+    if b:
         sid = request.sid
         for j in b['jogadores']:
-            if j.get('sid') == sid and j['status'] == 'morto':
+            if j.sid == sid and j.status == 'morto':
                 socketio.emit('acao_bloqueada', {'motivo': 'Você está morto e não pode agir.'}, room=sid)
                 return
-    if not sala_id or not message_text or sala_id not in salas_ativas or request.sid not in salas_ativas[sala_id]:
+    jogador_info = estado_salas.jogador(sala_id, request.sid) if sala_id else None
+    if not sala_id or not message_text or jogador_info is None:
         print(f"Erro send_message: Dados inválidos ou remetente não encontrado. SID: {request.sid}, Sala: {sala_id}")
         # Poderia enviar um erro de volta para o remetente, mas vamos evitar flood
         return 
         
     try:
-        # Pega informações do remetente do nosso dicionário 'salas_ativas'
-        jogador_info = salas_ativas[sala_id][request.sid]
+        # 'jogador_info' (presença do remetente) já foi lido na validação acima
         nome_personagem = jogador_info['nome_personagem']
         remetente_formatado = f"[Mestre] {nome_personagem}" if jogador_info['role'] == 'mestre' else nome_personagem
         
@@ -1057,25 +1676,29 @@ def handle_send_message(data):
         formatted_message = f"[{remetente_formatado}]: {message_text}"
         
         # Envia a mensagem formatada para TODOS na sala
-        send(formatted_message, to=sala_id)
+        _emitir_sala('message', formatted_message, sala_id)
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro em handle_send_message: {e}")
         # Enviar erro de volta pode ser útil para depuração no cliente
         socketio.emit('chat_error', {'mensagem': 'Erro ao enviar mensagem.'}, room=request.sid)
 
 
 @socketio.on('roll_dice')
+@_limitado('roll_dice')
+@_na_sala
+@telemetria.instrumentar('roll_dice', contexto=_contexto_evento)
 def handle_roll_dice(data):
     """Recebe comando de rolagem, processa, salva no DB e retransmite."""
     sala_id = str(data.get('sala_id'))
     dice_command = data.get('command')
 
-    if not sala_id or not dice_command or sala_id not in salas_ativas or request.sid not in salas_ativas[sala_id]:
+    jogador_info = estado_salas.jogador(sala_id, request.sid) if sala_id else None
+    if not sala_id or not dice_command or jogador_info is None:
         print(f"Erro roll_dice: Dados inválidos ou remetente não encontrado. SID: {request.sid}, Sala: {sala_id}")
         return
 
     try:
-        jogador_info = salas_ativas[sala_id][request.sid]
         nome_personagem = jogador_info['nome_personagem']
         remetente_formatado = f"[Mestre] {nome_personagem}" if jogador_info['role'] == 'mestre' else nome_personagem
         
@@ -1092,12 +1715,15 @@ def handle_roll_dice(data):
         # Salva o log no histórico do chat
         salvar_mensagem_chat(sala_id, 'Sistema', mensagem_log)
         # Envia a mensagem formatada para TODOS na sala
-        send(mensagem_chat, to=sala_id)
+        _emitir_sala('message', mensagem_chat, sala_id)
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro em handle_roll_dice: {e}")
         socketio.emit('chat_error', {'mensagem': 'Erro ao rolar dados.'}, room=request.sid)
 
 @socketio.on('mestre_dar_xp')
+@_na_sala
+@telemetria.instrumentar('mestre_dar_xp', contexto=_contexto_evento)
 def handle_dar_xp(data):
     """Recebe comando do Mestre para dar XP, processa e notifica a sala."""
     sala_id = str(data.get('sala_id'))
@@ -1127,9 +1753,9 @@ def handle_dar_xp(data):
         # 2. Determina as fichas alvo
         if alvo_id_str == 'all':
             # Pega IDs das fichas de todos os JOGADORES ('player') ativos na sala
-            if sala_id in salas_ativas:
+            if estado_salas.tem_sala(sala_id):
                 fichas_para_atualizar_ids = [
-                    info['ficha_id'] for sid, info in salas_ativas[sala_id].items() 
+                    info['ficha_id'] for sid, info in estado_salas.jogadores(sala_id).items() 
                     if info['role'] == 'player' and info['ficha_id'] is not None
                 ]
         else:
@@ -1159,19 +1785,19 @@ def handle_dar_xp(data):
                      # Continua mesmo assim, mas pode dar erro no frontend ao acessar atributos/pericias
                 
                 # 4. Notifica TODOS na sala sobre a atualização da ficha (para barra de XP)
-                socketio.emit('ficha_atualizada', ficha_atualizada, to=sala_id)
+                _emitir_sala('ficha_atualizada', ficha_atualizada, sala_id)
                 
                 # 5. Envia mensagens de feedback para o chat da sala
                 nome_alvo = ficha_atualizada['nome_personagem']
                 mensagem_xp = f"--- {nome_alvo} recebe {quantidade_xp} XP! ---"
                 salvar_mensagem_chat(sala_id, 'Sistema', mensagem_xp)
-                send(mensagem_xp, to=sala_id)
+                _emitir_sala('message', mensagem_xp, sala_id)
 
                 # Se a função retornou que subiu de nível...
                 if ficha_atualizada.get('subiu_de_nivel', False): 
                     mensagem_lvl = f"🎉🎉🎉 PARABÉNS! {nome_alvo} subiu para o nível {ficha_atualizada['nivel']}! 🎉🎉🎉"
                     salvar_mensagem_chat(sala_id, 'Sistema', mensagem_lvl)
-                    send(mensagem_lvl, to=sala_id)
+                    _emitir_sala('message', mensagem_lvl, sala_id)
                     print(f"Ficha {ficha_id} ({nome_alvo}) subiu para o nível {ficha_atualizada['nivel']}")
             else:
                 # Informa o Mestre se falhou em dar XP para uma ficha específica
@@ -1181,11 +1807,14 @@ def handle_dar_xp(data):
     except jwt.ExpiredSignatureError:
          socketio.emit('mestre_error', {'mensagem': 'Token expirado.'}, room=request.sid)
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro em handle_dar_xp: {e}")
         socketio.emit('mestre_error', {'mensagem': f'Erro ao processar XP: {e}'}, room=request.sid)
 
 
 @socketio.on('mestre_passar_coroa')
+@_na_sala
+@telemetria.instrumentar('mestre_passar_coroa', contexto=_contexto_evento)
 def handle_passar_coroa(data):
     """Mestre transfere seu cargo para outro jogador da sala."""
     token = data.get('token')
@@ -1208,12 +1837,11 @@ def handle_passar_coroa(data):
         # Encontrar o SID e user_id do alvo pelo ficha_id
         alvo_info = None
         alvo_sid = None
-        if sala_id in salas_ativas:
-            for sid, info in salas_ativas[sala_id].items():
-                if str(info.get('ficha_id')) == str(alvo_ficha_id):
-                    alvo_info = info
-                    alvo_sid = sid
-                    break
+        for sid, info in estado_salas.jogadores(sala_id).items():
+            if str(info.get('ficha_id')) == str(alvo_ficha_id):
+                alvo_info = info
+                alvo_sid = sid
+                break
 
         if not alvo_info or not alvo_sid:
             socketio.emit('mestre_error', {'mensagem': 'Jogador alvo não encontrado na sala.'}, room=request.sid)
@@ -1221,7 +1849,7 @@ def handle_passar_coroa(data):
 
         novo_mestre_user_id = alvo_info['user_id']
         nome_novo_mestre = alvo_info['nome_personagem']
-        nome_mestre_atual = salas_ativas[sala_id][request.sid]['nome_personagem']
+        nome_mestre_atual = (estado_salas.jogador(sala_id, request.sid) or {}).get('nome_personagem', 'Mestre')
 
         # Atualizar no banco
         sucesso = transferir_mestre_sala(sala_id, novo_mestre_user_id)
@@ -1229,10 +1857,11 @@ def handle_passar_coroa(data):
             socketio.emit('mestre_error', {'mensagem': 'Erro ao transferir no banco.'}, room=request.sid)
             return
 
-        # Atualizar dicionário salas_ativas
-        salas_ativas[sala_id][request.sid]['role'] = 'player'
-        salas_ativas[sala_id][alvo_sid]['role'] = 'mestre'
-        salas_ativas[sala_id][alvo_sid]['ficha_id'] = None
+        # Atualizar a presença da sala
+        estado_salas.atualizar_jogador(sala_id, request.sid, role='player')
+        _presenca_delta('presence_update', sala_id, request.sid, campos={'role': 'player'})
+        estado_salas.atualizar_jogador(sala_id, alvo_sid, role='mestre', ficha_id=None)
+        _presenca_delta('presence_update', sala_id, alvo_sid, campos={'role': 'mestre', 'ficha_id': None})
 
         # Notificar individualmente cada um
         socketio.emit('status_mestre', {'isMestre': False}, room=request.sid)
@@ -1241,17 +1870,17 @@ def handle_passar_coroa(data):
         # Anunciar na sala
         msg = f"--- 👑 {nome_mestre_atual} passou a coroa de Mestre para {nome_novo_mestre}! ---"
         salvar_mensagem_chat(sala_id, 'Sistema', msg)
-        send(msg, to=sala_id)
-
-        # Atualizar lista de jogadores
-        socketio.emit('lista_jogadores_atualizada', list(salas_ativas[sala_id].values()), to=sala_id)
+        _emitir_sala('message', msg, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro em handle_passar_coroa: {e}")
         socketio.emit('mestre_error', {'mensagem': f'Erro: {e}'}, room=request.sid)
 
 
 @socketio.on('mestre_dar_item')
+@_na_sala
+@telemetria.instrumentar('mestre_dar_item', contexto=_contexto_evento)
 def handle_dar_item(data):
     """Mestre dá um item (da Ferraria Arcana) para o inventário de um jogador."""
     token = data.get('token')
@@ -1280,27 +1909,29 @@ def handle_dar_item(data):
 
         # Descobrir nome do personagem alvo
         nome_alvo = 'Jogador'
-        if sala_id in salas_ativas:
-            for sid, info in salas_ativas[sala_id].items():
-                if str(info.get('ficha_id')) == str(alvo_ficha_id):
-                    nome_alvo = info['nome_personagem']
-                    # Notificar o jogador para atualizar inventário
-                    socketio.emit('inventario_atualizado', {}, room=sid)
-                    break
+        for sid, info in estado_salas.jogadores(sala_id).items():
+            if str(info.get('ficha_id')) == str(alvo_ficha_id):
+                nome_alvo = info['nome_personagem']
+                # Notificar o jogador para atualizar inventário
+                socketio.emit('inventario_atualizado', {}, room=sid)
+                break
 
         msg = f"--- 🎁 {nome_alvo} recebeu o item: {nome_item}! ---"
         salvar_mensagem_chat(sala_id, 'Sistema', msg)
-        send(msg, to=sala_id)
+        _emitir_sala('message', msg, sala_id)
 
         socketio.emit('mestre_feedback', {'mensagem': f'Item "{nome_item}" dado com sucesso!'}, room=request.sid)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro em handle_dar_item: {e}")
         socketio.emit('mestre_error', {'mensagem': f'Erro: {e}'}, room=request.sid)
 
 
 
 @socketio.on('mestre_kickar')
+@_na_sala
+@telemetria.instrumentar('mestre_kickar', contexto=_contexto_evento)
 def handle_kickar(data):
     """Mestre expulsa um jogador da sala temporariamente."""
     token = data.get('token')
@@ -1319,12 +1950,11 @@ def handle_kickar(data):
         # Encontrar SID do alvo
         alvo_sid = None
         alvo_nome = 'Jogador'
-        if sala_id in salas_ativas:
-            for sid, info in salas_ativas[sala_id].items():
-                if str(info.get('ficha_id')) == alvo_ficha_id:
-                    alvo_sid = sid
-                    alvo_nome = info['nome_personagem']
-                    break
+        for sid, info in estado_salas.jogadores(sala_id).items():
+            if str(info.get('ficha_id')) == alvo_ficha_id:
+                alvo_sid = sid
+                alvo_nome = info['nome_personagem']
+                break
 
         if not alvo_sid:
             socketio.emit('mestre_error', {'mensagem': 'Jogador não encontrado.'}, room=request.sid)
@@ -1336,21 +1966,23 @@ def handle_kickar(data):
             'mensagem': 'Você foi expulso da sala, comporte-se da próxima vez!'
         }, room=alvo_sid)
 
-        # Remover do dicionário de salas
-        if sala_id in salas_ativas and alvo_sid in salas_ativas[sala_id]:
-            salas_ativas[sala_id].pop(alvo_sid)
+        # Remover da presença da sala
+        estado_salas.remover_jogador(sala_id, alvo_sid)
+        _presenca_delta('presence_leave', sala_id, alvo_sid)
 
         # Anunciar na sala
         msg = f"--- ⚡ {alvo_nome} foi expulso da sala pelo Mestre. ---"
         salvar_mensagem_chat(sala_id, 'Sistema', msg)
-        send(msg, to=sala_id)
-        socketio.emit('lista_jogadores_atualizada', list(salas_ativas[sala_id].values()), to=sala_id)
+        _emitir_sala('message', msg, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro em handle_kickar: {e}")
 
 
 @socketio.on('mestre_banir')
+@_na_sala
+@telemetria.instrumentar('mestre_banir', contexto=_contexto_evento)
 def handle_banir(data):
     """Mestre bane permanentemente um jogador da sala."""
     token = data.get('token')
@@ -1370,13 +2002,12 @@ def handle_banir(data):
         alvo_sid = None
         alvo_nome = 'Jogador'
         alvo_user_id = None
-        if sala_id in salas_ativas:
-            for sid, info in salas_ativas[sala_id].items():
-                if str(info.get('ficha_id')) == alvo_ficha_id:
-                    alvo_sid = sid
-                    alvo_nome = info['nome_personagem']
-                    alvo_user_id = info['user_id']
-                    break
+        for sid, info in estado_salas.jogadores(sala_id).items():
+            if str(info.get('ficha_id')) == alvo_ficha_id:
+                alvo_sid = sid
+                alvo_nome = info['nome_personagem']
+                alvo_user_id = info['user_id']
+                break
 
         if not alvo_sid or not alvo_user_id:
             socketio.emit('mestre_error', {'mensagem': 'Jogador não encontrado.'}, room=request.sid)
@@ -1391,17 +2022,17 @@ def handle_banir(data):
             'mensagem': 'Você foi banido, sua aventura terminou por aqui, inicie uma nova aventura!'
         }, room=alvo_sid)
 
-        # Remover do dicionário
-        if sala_id in salas_ativas and alvo_sid in salas_ativas[sala_id]:
-            salas_ativas[sala_id].pop(alvo_sid)
+        # Remover da presença da sala
+        estado_salas.remover_jogador(sala_id, alvo_sid)
+        _presenca_delta('presence_leave', sala_id, alvo_sid)
 
         # Anunciar
         msg = f"--- 🔨 {alvo_nome} foi banido da sala pelo Mestre. ---"
         salvar_mensagem_chat(sala_id, 'Sistema', msg)
-        send(msg, to=sala_id)
-        socketio.emit('lista_jogadores_atualizada', list(salas_ativas[sala_id].values()), to=sala_id)
+        _emitir_sala('message', msg, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro em handle_banir: {e}")
 
 
@@ -1410,12 +2041,16 @@ def handle_banir(data):
 # ============================================================
 # SISTEMA DE BATALHA
 # ============================================================
-batalhas_ativas = {}  # { sala_id: { estado_da_batalha } }
+# Batalhas: estado_salas.ler_batalha/salvar_batalha (estado.py) — { sala_id: { estado_da_batalha } },
+# combatentes são JogadorBatalha/MonstroBatalha. Cada handler roda no executor da sala (_na_sala)
+# e salva a batalha antes de avisar a sala.
 
 @socketio.on('batalha_iniciar')
+@_na_sala
+@telemetria.instrumentar('batalha_iniciar', contexto=_contexto_evento)
 def handle_batalha_iniciar(data):
     """Mestre inicia uma batalha com monstros selecionados."""
-    log_debug('batalha_iniciar', f'data recebido: {data}')
+    log_debug('batalha_iniciar', 'data recebido: %s', data)
     token   = data.get('token')
     sala_id = str(data.get('sala_id')) if data.get('sala_id') is not None else 'NONE'
     monstros_ids = data.get('monstros_ids', [])  # lista de IDs do bestiário
@@ -1426,7 +2061,8 @@ def handle_batalha_iniciar(data):
         log_erro('batalha_iniciar', sala_id=sala_id, erro_msg=f'acoes_padrao invalid: {e}')
     acoes_individuais = data.get('acoes_individuais', {})  # { ficha_id: n_acoes }
 
-    log_evento_socket('batalha_iniciar', sala_id, payload_resumo=f'monstros={monstros_ids}, acoes_padrao={acoes_padrao}, acoes_individuais={acoes_individuais}')
+    log_evento_socket('batalha_iniciar', sala_id, payload_resumo='monstros=%s, acoes_padrao=%s, acoes_individuais=%s',
+                      resumo_args=(monstros_ids, acoes_padrao, acoes_individuais))
 
     if not token:
         log_erro('batalha_iniciar', sala_id=sala_id, erro_msg='Token ausente no payload')
@@ -1442,39 +2078,33 @@ def handle_batalha_iniciar(data):
         # Montar lista de monstros com HP atual
         monstros = []
         for mid in monstros_ids:
-            m = buscar_monstro_por_id(mid)
-            if m:
-                monstros.append({
-                    'id': f"m_{mid}_{len(monstros)}",
-                    'db_id': mid,
-                    'nome': m['nome'],
-                    'tipo': m.get('tipo',''),
-                    'hp_max': m.get('vida_maxima', 10),
-                    'hp_atual': m.get('vida_maxima', 10),
-                    'ca': m.get('ca', m.get('defesa', 10)),
-                    'status': 'vivo',  # vivo | derrotado | fugiu
-                    'iniciativa': 0,
-                })
+            dados_monstro = buscar_monstro_por_id(mid)
+            if dados_monstro:
+                monstros.append(MonstroBatalha(
+                    id=f"m_{mid}_{len(monstros)}",
+                    db_id=mid,
+                    nome=dados_monstro['nome'],
+                    tipo=dados_monstro.get('tipo',''),
+                    hp_max=dados_monstro.get('vida_maxima', 10),
+                    hp_atual=dados_monstro.get('vida_maxima', 10),
+                    ca=dados_monstro.get('ca', dados_monstro.get('defesa', 10)),
+                ))
 
         # Montar lista de jogadores
         jogadores = []
-        if sala_id in salas_ativas:
-            for sid, info in salas_ativas[sala_id].items():
-                if info['role'] == 'player' and info.get('ficha_id'):
-                    fid = str(info['ficha_id'])
-                    jogadores.append({
-                        'sid': sid,
-                        'ficha_id': fid,
-                        'nome': info['nome_personagem'],
-                        'status': 'vivo',  # vivo | caido | morto
-                        'hp_atual': 10,
-                        'acoes_restantes': acoes_individuais.get(fid, acoes_padrao),
-                        'acoes_max': acoes_individuais.get(fid, acoes_padrao),
-                        'iniciativa': 0,
-                    })
-            # Mestre NÃO participa como combatente
-
-        batalhas_ativas[sala_id] = {
+        for sid, info in estado_salas.jogadores(sala_id).items():
+            if info['role'] == 'player' and info.get('ficha_id'):
+                fid = str(info['ficha_id'])
+                jogadores.append(JogadorBatalha(
+                    sid=sid,
+                    ficha_id=fid,
+                    nome=info['nome_personagem'],
+                    acoes_restantes=acoes_individuais.get(fid, acoes_padrao),
+                    acoes_max=acoes_individuais.get(fid, acoes_padrao),
+                ))
+        # Mestre NÃO participa como combatente
+
+        b = {
             'fase': 'iniciativa',  # iniciativa | combate | encerrada
             'sub_fase': None,      # None | aguardando_d20_acerto | aguardando_dado_dano | aguardando_roll_dano
             'monstros': monstros,
@@ -1484,35 +2114,46 @@ def handle_batalha_iniciar(data):
             'log': [],
             'acoes_padrao': acoes_padrao,
         }
+        estado_salas.salvar_batalha(sala_id, b)
 
         # Notificar toda a sala
-        socketio.emit('batalha_iniciada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': batalhas_ativas[sala_id],
-        }, to=sala_id)
+        _emitir_sala('batalha_iniciada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
         msg = "--- ⚔️ BATALHA INICIADA! Role iniciativa (1d20)! ---"
-        send(msg, to=sala_id)
+        _emitir_sala('message', msg, sala_id)
         salvar_mensagem_chat(sala_id, 'Sistema', msg)
-        log_batalha('iniciativa', sala_id, f'Batalha iniciada por mestre {user_id}, {len(monstros)} monstros, {len(jogadores)} jogadores')
+        log_batalha('iniciativa', sala_id, 'Batalha iniciada por mestre %s, %d monstros, %d jogadores',
+                    user_id, len(monstros), len(jogadores))
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         log_erro('batalha_iniciar', user_id=None, sala_id=sala_id, erro_msg=str(e))
         print(f"Erro batalha_iniciar: {e}")
         socketio.emit('batalha_erro', {'mensagem': str(e)}, room=request.sid)
 
 
-def _batalha_publica(sala_id):
+def _batalha_mestre(b):
+    """Serializa o estado completo da batalha (com HP dos monstros) para o mestre."""
+    if not b: return None
+    estado = dict(b)
+    estado['monstros'] = [m.to_dict() for m in b['monstros']]
+    estado['jogadores'] = [j.to_dict() for j in b['jogadores']]
+    return estado
+
+
+def _batalha_publica(b):
     """Retorna estado da batalha SEM HP dos monstros (para players)."""
-    b = batalhas_ativas.get(sala_id)
     if not b: return None
     monstros_pub = []
     for m in b['monstros']:
         monstros_pub.append({
-            'id': m['id'], 'nome': m['nome'], 'tipo': m['tipo'],
-            'status': m['status'], 'ca': m['ca'],
+            'id': m.id, 'nome': m.nome, 'tipo': m.tipo,
+            'status': m.status, 'ca': m.ca,
             # HP escondido: só mostra se derrotado/fugiu
-            'hp_oculto': m['status'] == 'vivo',
+            'hp_oculto': m.status == 'vivo',
         })
     return {
         'fase': b['fase'],
@@ -1521,7 +2162,7 @@ def _batalha_publica(sala_id):
         'alvo_dano_atual': b.get('alvo_dano_atual'),
         'd20_acerto_atual': b.get('d20_acerto_atual'),
         'monstros': monstros_pub,
-        'jogadores': b['jogadores'],
+        'jogadores': [j.to_dict() for j in b['jogadores']],
         'turno_ordem': b['turno_ordem'],
         'turno_atual': b['turno_atual'],
         'log': b['log'],
@@ -1529,6 +2170,8 @@ def _batalha_publica(sala_id):
 
 
 @socketio.on('batalha_set_iniciativa')
+@_na_sala
+@telemetria.instrumentar('batalha_set_iniciativa', contexto=_contexto_evento)
 def handle_set_iniciativa(data):
     """Mestre registra iniciativa de um participante."""
     token   = data.get('token')
@@ -1539,27 +2182,34 @@ def handle_set_iniciativa(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if user_id != buscar_mestre_da_sala(sala_id) or sala_id not in batalhas_ativas:
+        if user_id != buscar_mestre_da_sala(sala_id):
             return
 
-        b = batalhas_ativas[sala_id]
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
+            return
         for j in b['jogadores']:
-            if j['ficha_id'] == str(pid):
-                j['iniciativa'] = valor
+            if j.ficha_id == str(pid):
+                j.iniciativa = valor
         for m in b['monstros']:
-            if m['id'] == pid:
-                m['iniciativa'] = valor
+            if m.id == pid:
+                m.iniciativa = valor
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro set_iniciativa: {e}")
 
 
 @socketio.on('batalha_comecar_combate')
+@_na_sala
+@telemetria.instrumentar('batalha_comecar_combate', contexto=_contexto_evento)
 def handle_comecar_combate(data):
     """Mestre confirma iniciativas e começa o combate."""
     token   = data.get('token')
@@ -1568,18 +2218,20 @@ def handle_comecar_combate(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if user_id != buscar_mestre_da_sala(sala_id) or sala_id not in batalhas_ativas:
+        if user_id != buscar_mestre_da_sala(sala_id):
             return
 
-        b = batalhas_ativas[sala_id]
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
+            return
 
         # Montar ordem por iniciativa (maior primeiro)
         participantes = []
         for j in b['jogadores']:
-            participantes.append({'id': j['ficha_id'], 'nome': j['nome'], 'tipo': 'jogador', 'iniciativa': j['iniciativa']})
+            participantes.append({'id': j.ficha_id, 'nome': j.nome, 'tipo': 'jogador', 'iniciativa': j.iniciativa})
         for m in b['monstros']:
-            if m['status'] == 'vivo':
-                participantes.append({'id': m['id'], 'nome': m['nome'], 'tipo': 'monstro', 'iniciativa': m['iniciativa']})
+            if m.status == 'vivo':
+                participantes.append({'id': m.id, 'nome': m.nome, 'tipo': 'monstro', 'iniciativa': m.iniciativa})
 
         participantes.sort(key=lambda x: x['iniciativa'], reverse=True)
         b['turno_ordem'] = participantes
@@ -1588,25 +2240,30 @@ def handle_comecar_combate(data):
 
         # Resetar ações
         for j in b['jogadores']:
-            j['acoes_restantes'] = j['acoes_max']
+            j.acoes_restantes = j.acoes_max
 
         log_entry = f"⚔️ Combate iniciado! Ordem: {' → '.join(p['nome'] for p in participantes)}"
         b['log'].append(log_entry)
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
         msg = f"--- {log_entry} ---"
-        send(msg, to=sala_id)
+        _emitir_sala('message', msg, sala_id)
         salvar_mensagem_chat(sala_id, 'Sistema', msg)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro comecar_combate: {e}")
 
 
 @socketio.on('batalha_atacar')
+@_na_sala
+@telemetria.instrumentar('batalha_atacar', contexto=_contexto_evento)
 def handle_atacar(data):
     """Registra um ataque (player ou monstro atacando alvo)."""
     token    = data.get('token')
@@ -1619,10 +2276,9 @@ def handle_atacar(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if sala_id not in batalhas_ativas:
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
             return
-
-        b = batalhas_ativas[sala_id]
         is_mestre = (user_id == buscar_mestre_da_sala(sala_id))
 
         # Encontrar nomes
@@ -1630,40 +2286,45 @@ def handle_atacar(data):
         nome_alvo = alvo_id
 
         for j in b['jogadores']:
-            if j['ficha_id'] == str(atacante_id): nome_atacante = j['nome']
-            if j['ficha_id'] == str(alvo_id):
-                nome_alvo = j['nome']
-                j['hp_atual'] = max(0, j['hp_atual'] - dano)
-                if j['hp_atual'] == 0 and j['status'] == 'vivo':
-                    j['status'] = 'caido'
-                    b['log'].append(f"💀 {j['nome']} caiu em batalha!")
+            if j.ficha_id == str(atacante_id): nome_atacante = j.nome
+            if j.ficha_id == str(alvo_id):
+                nome_alvo = j.nome
+                j.hp_atual = max(0, j.hp_atual - dano)
+                if j.hp_atual == 0 and j.status == 'vivo':
+                    j.status = 'caido'
+                    b['log'].append(f"💀 {j.nome} caiu em batalha!")
 
         for m in b['monstros']:
-            if m['id'] == atacante_id: nome_atacante = m['nome']
-            if m['id'] == alvo_id and is_mestre:
-                nome_alvo = m['nome']
-                m['hp_atual'] = max(0, m['hp_atual'] - dano)
-                if m['hp_atual'] == 0 and m['status'] == 'vivo':
-                    m['status'] = 'derrotado'
-                    b['log'].append(f"💥 {m['nome']} foi derrotado!")
-                    msg = f"--- 💥 {m['nome']} foi derrotado! ---"
-                    send(msg, to=sala_id)
+            if m.id == atacante_id: nome_atacante = m.nome
+            if m.id == alvo_id and is_mestre:
+                nome_alvo = m.nome
+                m.hp_atual = max(0, m.hp_atual - dano)
+                if m.hp_atual == 0 and m.status == 'vivo':
+                    m.status = 'derrotado'
+                    b['log'].append(f"💥 {m.nome} foi derrotado!")
+                    msg = f"--- 💥 {m.nome} foi derrotado! ---"
+                    _emitir_sala('message', msg, sala_id)
                     salvar_mensagem_chat(sala_id, 'Sistema', msg)
 
         log_entry = f"⚔️ {nome_atacante} atacou {nome_alvo}: {rolagem} ({dano} dano)"
         b['log'].append(log_entry)
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
+        estado_salas.salvar_batalha(sala_id, b)
+
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
             'efeito': {'tipo': 'ataque', 'atacante': atacante_id, 'alvo': alvo_id, 'dano': dano},
-        }, to=sala_id)
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro batalha_atacar: {e}")
 
 
 @socketio.on('batalha_proximo_turno')
+@_na_sala
+@telemetria.instrumentar('batalha_proximo_turno', contexto=_contexto_evento)
 def handle_proximo_turno(data):
     """Avança para o próximo turno."""
     token   = data.get('token')
@@ -1672,10 +2333,12 @@ def handle_proximo_turno(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if user_id != buscar_mestre_da_sala(sala_id) or sala_id not in batalhas_ativas:
+        if user_id != buscar_mestre_da_sala(sala_id):
             return
 
-        b = batalhas_ativas[sala_id]
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
+            return
         ativos = [p for p in b['turno_ordem']
                   if not _esta_fora(p['id'], b)]
 
@@ -1687,8 +2350,8 @@ def handle_proximo_turno(data):
         # Resetar ações do participante atual
         atual = ativos[b['turno_atual']]
         for j in b['jogadores']:
-            if j['ficha_id'] == atual['id']:
-                j['acoes_restantes'] = j['acoes_max']
+            if j.ficha_id == atual['id']:
+                j.acoes_restantes = j.acoes_max
 
         b['sub_fase'] = None
         b['d20_acerto_atual'] = None
@@ -1696,26 +2359,31 @@ def handle_proximo_turno(data):
         b['alvo_dano_atual'] = None
         b['log'].append(f"🔄 Turno de {atual['nome']}")
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro proximo_turno: {e}")
 
 
 def _esta_fora(pid, b):
     for j in b['jogadores']:
-        if j['ficha_id'] == str(pid) and j['status'] in ('morto',):
+        if j.ficha_id == str(pid) and j.status in ('morto',):
             return True
     for m in b['monstros']:
-        if m['id'] == pid and m['status'] != 'vivo':
+        if m.id == pid and m.status != 'vivo':
             return True
     return False
 
 
 @socketio.on('batalha_curar')
+@_na_sala
+@telemetria.instrumentar('batalha_curar', contexto=_contexto_evento)
 def handle_curar(data):
     """Mestre cura um jogador."""
     token   = data.get('token')
@@ -1726,30 +2394,37 @@ def handle_curar(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if user_id != buscar_mestre_da_sala(sala_id) or sala_id not in batalhas_ativas:
+        if user_id != buscar_mestre_da_sala(sala_id):
             return
 
-        b = batalhas_ativas[sala_id]
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
+            return
         for j in b['jogadores']:
-            if j['ficha_id'] == alvo_id:
-                if j['status'] == 'caido':
-                    j['status'] = 'vivo'
-                    j['hp_atual'] = max(1, cura)
-                    b['log'].append(f"💚 {j['nome']} foi curado e levantou com {j['hp_atual']} HP!")
+            if j.ficha_id == alvo_id:
+                if j.status == 'caido':
+                    j.status = 'vivo'
+                    j.hp_atual = max(1, cura)
+                    b['log'].append(f"💚 {j.nome} foi curado e levantou com {j.hp_atual} HP!")
                 else:
-                    j['hp_atual'] += cura
-                    b['log'].append(f"💚 {j['nome']} recebeu {cura} de cura (HP: {j['hp_atual']})")
+                    j.hp_atual += cura
+                    b['log'].append(f"💚 {j.nome} recebeu {cura} de cura (HP: {j.hp_atual})")
+
+        estado_salas.salvar_batalha(sala_id, b)
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro batalha_curar: {e}")
 
 
 @socketio.on('batalha_status_jogador')
+@_na_sala
+@telemetria.instrumentar('batalha_status_jogador', contexto=_contexto_evento)
 def handle_status_jogador(data):
     """Mestre muda status de um jogador: caido | morto | vivo."""
     token   = data.get('token')
@@ -1760,34 +2435,41 @@ def handle_status_jogador(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if user_id != buscar_mestre_da_sala(sala_id) or sala_id not in batalhas_ativas:
+        if user_id != buscar_mestre_da_sala(sala_id):
             return
 
-        b = batalhas_ativas[sala_id]
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
+            return
         for j in b['jogadores']:
-            if j['ficha_id'] == alvo_id:
-                j['status'] = novo_status
+            if j.ficha_id == alvo_id:
+                j.status = novo_status
                 if novo_status == 'morto':
-                    b['log'].append(f"☠️ {j['nome']} morreu!")
+                    b['log'].append(f"☠️ {j.nome} morreu!")
                     # Notificar jogador específico que está morto
-                    if j['sid']:
-                        socketio.emit('jogador_morto', {}, room=j['sid'])
+                    if j.sid:
+                        socketio.emit('jogador_morto', {}, room=j.sid)
                 elif novo_status == 'vivo':
-                    j['hp_atual'] = max(1, j['hp_atual'])
-                    b['log'].append(f"✨ {j['nome']} foi ressuscitado!")
-                    if j['sid']:
-                        socketio.emit('jogador_ressuscitado', {}, room=j['sid'])
+                    j.hp_atual = max(1, j.hp_atual)
+                    b['log'].append(f"✨ {j.nome} foi ressuscitado!")
+                    if j.sid:
+                        socketio.emit('jogador_ressuscitado', {}, room=j.sid)
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro status_jogador: {e}")
 
 
 @socketio.on('batalha_status_monstro')
+@_na_sala
+@telemetria.instrumentar('batalha_status_monstro', contexto=_contexto_evento)
 def handle_status_monstro(data):
     """Mestre declara monstro derrotado ou fugido."""
     token    = data.get('token')
@@ -1798,30 +2480,37 @@ def handle_status_monstro(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if user_id != buscar_mestre_da_sala(sala_id) or sala_id not in batalhas_ativas:
+        if user_id != buscar_mestre_da_sala(sala_id):
             return
 
-        b = batalhas_ativas[sala_id]
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
+            return
         for m in b['monstros']:
-            if m['id'] == monstro_id:
-                m['status'] = novo_status
+            if m.id == monstro_id:
+                m.status = novo_status
                 emoji = '💥' if novo_status == 'derrotado' else '💨'
                 texto = 'foi derrotado' if novo_status == 'derrotado' else 'fugiu!'
-                b['log'].append(f"{emoji} {m['nome']} {texto}!")
-                msg = f"--- {emoji} {m['nome']} {texto}! ---"
-                send(msg, to=sala_id)
+                b['log'].append(f"{emoji} {m.nome} {texto}!")
+                msg = f"--- {emoji} {m.nome} {texto}! ---"
+                _emitir_sala('message', msg, sala_id)
                 salvar_mensagem_chat(sala_id, 'Sistema', msg)
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro status_monstro: {e}")
 
 
 @socketio.on('batalha_encerrar')
+@_na_sala
+@telemetria.instrumentar('batalha_encerrar', contexto=_contexto_evento)
 def handle_encerrar_batalha(data):
     """Mestre encerra a batalha."""
     token   = data.get('token')
@@ -1834,29 +2523,31 @@ def handle_encerrar_batalha(data):
         if user_id != buscar_mestre_da_sala(sala_id):
             return
 
-        if sala_id in batalhas_ativas:
-            del batalhas_ativas[sala_id]
+        estado_salas.remover_batalha(sala_id)
 
         emojis = {'vitoria': '🏆', 'derrota': '💀', 'encerrada': '🏳️'}
         textos = {'vitoria': 'VITÓRIA!', 'derrota': 'DERROTA...', 'encerrada': 'Batalha encerrada.'}
         emoji = emojis.get(motivo, '🏳️')
         texto = textos.get(motivo, 'Batalha encerrada.')
 
-        socketio.emit('batalha_encerrada', {
+        _emitir_sala('batalha_encerrada', {
             'motivo': motivo, 'texto': texto, 'emoji': emoji,
-        }, to=sala_id)
+        }, sala_id)
 
         msg = f"--- {emoji} {texto} ---"
-        send(msg, to=sala_id)
+        _emitir_sala('message', msg, sala_id)
         salvar_mensagem_chat(sala_id, 'Sistema', msg)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro encerrar_batalha: {e}")
 
 
 
 
 @socketio.on('batalha_player_iniciativa')
+@_na_sala
+@telemetria.instrumentar('batalha_player_iniciativa', contexto=_contexto_evento)
 def handle_player_iniciativa(data):
     """Player envia sua própria rolagem de iniciativa."""
     token   = data.get('token')
@@ -1866,31 +2557,35 @@ def handle_player_iniciativa(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if sala_id not in batalhas_ativas:
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
             return
-
-        b = batalhas_ativas[sala_id]
         if b['fase'] != 'iniciativa':
             return
 
         # Encontrar o jogador pelo user_id (via sid)
         sid = request.sid
         for j in b['jogadores']:
-            if j['sid'] == sid:
-                j['iniciativa'] = valor
-                b['log'].append(f"🎲 {j['nome']} rolou {valor} de iniciativa!")
+            if j.sid == sid:
+                j.iniciativa = valor
+                b['log'].append(f"🎲 {j.nome} rolou {valor} de iniciativa!")
                 break
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro player_iniciativa: {e}")
 
 
 @socketio.on('batalha_d20_acerto')
+@_na_sala
+@telemetria.instrumentar('batalha_d20_acerto', contexto=_contexto_evento)
 def handle_d20_acerto(data):
     """Player rola D20 para tentar acertar no seu turno."""
     token    = data.get('token')
@@ -1900,10 +2595,9 @@ def handle_d20_acerto(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if sala_id not in batalhas_ativas:
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
             return
-
-        b = batalhas_ativas[sala_id]
         if b['fase'] != 'combate' or b.get('sub_fase') != 'aguardando_d20_acerto':
             socketio.emit('batalha_erro', {'mensagem': 'Não é hora de rolar acerto.'}, room=request.sid)
             return
@@ -1915,26 +2609,30 @@ def handle_d20_acerto(data):
         turno_atual = ativos[b['turno_atual'] % len(ativos)]
 
         sid = request.sid
-        player_no_turno = next((j for j in b['jogadores'] if j['sid'] == sid and j['ficha_id'] == turno_atual['id']), None)
+        player_no_turno = next((j for j in b['jogadores'] if j.sid == sid and j.ficha_id == turno_atual['id']), None)
         if not player_no_turno:
             socketio.emit('batalha_erro', {'mensagem': 'Não é seu turno.'}, room=request.sid)
             return
 
         b['d20_acerto_atual'] = valor
         b['sub_fase'] = 'aguardando_dado_dano'
-        b['log'].append(f"🎲 {player_no_turno['nome']} rolou {valor} para acerto!")
+        b['log'].append(f"🎲 {player_no_turno.nome} rolou {valor} para acerto!")
 
         # Notificar mestre para escolher o dado de dano
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro d20_acerto: {e}")
 
 
 @socketio.on('batalha_mestre_escolhe_dado')
+@_na_sala
+@telemetria.instrumentar('batalha_mestre_escolhe_dado', contexto=_contexto_evento)
 def handle_mestre_escolhe_dado(data):
     """Mestre escolhe qual dado o player vai rolar para dano."""
     token    = data.get('token')
@@ -1945,10 +2643,12 @@ def handle_mestre_escolhe_dado(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if user_id != buscar_mestre_da_sala(sala_id) or sala_id not in batalhas_ativas:
+        if user_id != buscar_mestre_da_sala(sala_id):
             return
 
-        b = batalhas_ativas[sala_id]
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
+            return
         if b.get('sub_fase') != 'aguardando_dado_dano':
             return
 
@@ -1958,16 +2658,20 @@ def handle_mestre_escolhe_dado(data):
         b['log'].append(f"🎲 Mestre escolheu {dado} como dado de dano!")
 
         # Notificar o alvo escolhido também
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro mestre_escolhe_dado: {e}")
 
 
 @socketio.on('batalha_roll_dano')
+@_na_sala
+@telemetria.instrumentar('batalha_roll_dano', contexto=_contexto_evento)
 def handle_roll_dano(data):
     """Player rola o dado de dano escolhido pelo mestre."""
     token    = data.get('token')
@@ -1978,10 +2682,9 @@ def handle_roll_dano(data):
     try:
         user_data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         user_id   = int(user_data['sub'])
-        if sala_id not in batalhas_ativas:
+        b = estado_salas.ler_batalha(sala_id)
+        if b is None:
             return
-
-        b = batalhas_ativas[sala_id]
         if b.get('sub_fase') != 'aguardando_roll_dano':
             socketio.emit('batalha_erro', {'mensagem': 'Não é hora de rolar dano.'}, room=request.sid)
             return
@@ -1992,12 +2695,12 @@ def handle_roll_dano(data):
         turno_atual = ativos[b['turno_atual'] % len(ativos)]
 
         sid = request.sid
-        player_no_turno = next((j for j in b['jogadores'] if j['sid'] == sid and j['ficha_id'] == turno_atual['id']), None)
+        player_no_turno = next((j for j in b['jogadores'] if j.sid == sid and j.ficha_id == turno_atual['id']), None)
         if not player_no_turno:
             socketio.emit('batalha_erro', {'mensagem': 'Não é seu turno.'}, room=request.sid)
             return
 
-        nome_atacante = player_no_turno['nome']
+        nome_atacante = player_no_turno.nome
         alvo_id = b.get('alvo_dano_atual')
         dado    = b.get('dado_dano_atual', '?d?')
         d20     = b.get('d20_acerto_atual', '?')
@@ -2005,23 +2708,23 @@ def handle_roll_dano(data):
         # Aplicar dano no alvo
         nome_alvo = alvo_id
         for m in b['monstros']:
-            if m['id'] == alvo_id:
-                nome_alvo = m['nome']
-                m['hp_atual'] = max(0, m['hp_atual'] - valor)
-                if m['hp_atual'] == 0 and m['status'] == 'vivo':
-                    m['status'] = 'derrotado'
-                    b['log'].append(f"💥 {m['nome']} foi derrotado!")
-                    msg = f"--- 💥 {m['nome']} foi derrotado! ---"
-                    send(msg, to=sala_id)
+            if m.id == alvo_id:
+                nome_alvo = m.nome
+                m.hp_atual = max(0, m.hp_atual - valor)
+                if m.hp_atual == 0 and m.status == 'vivo':
+                    m.status = 'derrotado'
+                    b['log'].append(f"💥 {m.nome} foi derrotado!")
+                    msg = f"--- 💥 {m.nome} foi derrotado! ---"
+                    _emitir_sala('message', msg, sala_id)
                     salvar_mensagem_chat(sala_id, 'Sistema', msg)
 
         for j in b['jogadores']:
-            if j['ficha_id'] == str(alvo_id):
-                nome_alvo = j['nome']
-                j['hp_atual'] = max(0, j['hp_atual'] - valor)
-                if j['hp_atual'] == 0 and j['status'] == 'vivo':
-                    j['status'] = 'caido'
-                    b['log'].append(f"💀 {j['nome']} caiu em batalha!")
+            if j.ficha_id == str(alvo_id):
+                nome_alvo = j.nome
+                j.hp_atual = max(0, j.hp_atual - valor)
+                if j.hp_atual == 0 and j.status == 'vivo':
+                    j.status = 'caido'
+                    b['log'].append(f"💀 {j.nome} caiu em batalha!")
 
         b['log'].append(f"⚔️ {nome_atacante} (D20:{d20}) usou {dado} → {rolagem_str} = {valor} dano em {nome_alvo}!")
 
@@ -2031,25 +2734,20 @@ def handle_roll_dano(data):
         b['dado_dano_atual'] = None
         b['alvo_dano_atual'] = None
 
-        socketio.emit('batalha_atualizada', {
-            'batalha': _batalha_publica(sala_id),
-            'batalha_mestre': b,
-            'efeito': {'tipo': 'ataque', 'atacante': player_no_turno['ficha_id'], 'alvo': alvo_id, 'dano': valor},
-        }, to=sala_id)
+        estado_salas.salvar_batalha(sala_id, b)
+
+        _emitir_sala('batalha_atualizada', {
+            'batalha': _batalha_publica(b),
+            'batalha_mestre': _batalha_mestre(b),
+            'efeito': {'tipo': 'ataque', 'atacante': player_no_turno.ficha_id, 'alvo': alvo_id, 'dano': valor},
+        }, sala_id)
 
     except Exception as e:
+        telemetria.marcar_erro(e)
         print(f"Erro roll_dano: {e}")
 
 
 # --- INICIALIZAÇÃO DO SERVIDOR ---
 if __name__ == '__main__':
-    # HACK: Força o uso do servidor Werkzeug/threading desabilitando a detecção do eventlet.
-    # O eventlet, quando instalado, é pego automaticamente mas está causando conflitos com o CORS.
-    try:
-        from socketio import server
-        server.eventlet = None
-        print("MODO DE COMPATIBILIDADE: Eventlet desabilitado. Iniciando via Threading/Werkzeug...")
-    except (ImportError, AttributeError):
-        print("AVISO: Não foi possível desabilitar o eventlet. Tentando iniciar mesmo assim...")
-
-    socketio.run(app, host='0.0.0.0', port=5003, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    # Modo, host e porta vêm das variáveis RPG_ASYNC_MODE, RPG_HOST e RPG_PORTA (ver execucao.py).
+    execucao.rodar(socketio, app)
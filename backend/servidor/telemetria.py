@@ -0,0 +1,76 @@
+# servidor/telemetria.py
+"""
+Instrumentação dos eventos Socket.IO.
+
+O decorator 'instrumentar' mede a latência de cada handler e:
+- registra SEMPRE latência e erros nas métricas (metricas.py, /api/admin/metrics);
+- se o evento for sorteado pela amostragem do log estruturado (logging_config.sortear_amostragem),
+  grava uma linha em logs/eventos.jsonl com tamanho do payload, sala e usuário;
+- se o perfilador estiver armado para esse evento (perfilador.py), perfila a execução.
+Uso (abaixo de @socketio.on):
+
+    @socketio.on('send_message')
+    @telemetria.instrumentar('send_message', contexto=_contexto_evento)
+    def handle_send_message(data): ...
+
+Os handlers costumam capturar as próprias exceções (avisam o cliente e seguem); nesses casos,
+chame telemetria.marcar_erro(e) no 'except' para o erro contar nas métricas e no log.
+"""
+import threading
+import time
+from functools import wraps
+
+from ..logging_config import sortear_amostragem, registrar_evento
+from . import metricas
+from . import perfilador
+
+# Erro marcado pelo handler em execução (threading.local vira local por greenlet com eventlet/gevent).
+_local = threading.local()
+
+
+def marcar_erro(erro):
+    """Registra que o handler atual falhou, mesmo que ele tenha tratado a exceção."""
+    if getattr(_local, 'ativo', False):
+        _local.erro = erro
+
+
+def instrumentar(evento, contexto=None):
+    """
+    Envolve um handler de evento. 'contexto(data)' (opcional) deve retornar (sala_id, user_id);
+    só é chamado quando o evento de fato vai para o log, assim como o cálculo do payload.
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def envoltorio(*args):
+            sessao = perfilador.iniciar('evento', evento)
+            anterior = (getattr(_local, 'ativo', False), getattr(_local, 'erro', None))
+            _local.ativo, _local.erro = True, None
+            inicio = time.perf_counter()
+            erro = None
+            try:
+                return funcao(*args)
+            except Exception as e:
+                erro = e
+                raise
+            finally:
+                duracao = time.perf_counter() - inicio
+                if erro is None:
+                    erro = _local.erro
+                _local.ativo, _local.erro = anterior
+                perfilador.finalizar(sessao)
+                metricas.latencia_handler.observar(duracao, evento=evento)
+                if erro is not None:
+                    metricas.erros_handler.inc(evento=evento)
+                taxa = sortear_amostragem(evento, erro is not None)
+                if taxa is not None:
+                    data = args[0] if args else None
+                    sala_id, user_id = contexto(data) if contexto else (None, None)
+                    registrar_evento(
+                        evento, sala_id=sala_id, user_id=user_id,
+                        latency_ms=round(duracao * 1000, 3),
+                        payload=data,
+                        taxa_amostragem=taxa,
+                        erro=repr(erro) if erro is not None else None,
+                    )
+        return envoltorio
+    return decorador
@@ -0,0 +1,92 @@
+# servidor/varredura.py
+"""
+Varredura periódica do estado das salas (estado.py), para servidores que ficam no ar por dias.
+
+Sem ela, a presença de um sid só sai da sala num 'disconnect' limpo e uma batalha só sai
+quando o mestre a encerra: quedas de worker, abas congeladas e mesas abandonadas no meio
+do combate ficavam para sempre na memória (ou no estado compartilhado).
+
+- Presença: o cliente manda 'presenca_ping' a cada ~20 s (SalaPage). Quem fica mais de
+  RPG_PRESENCA_EXPIRA_S (padrão 120 s) sem sinal de vida é despejado da sala. Quem cai por
+  falha de rede fica RPG_RETOMADA_S (padrão 30 s) esperando o 'resume' antes de ser despejado.
+- Batalhas: uma batalha sem nenhuma alteração há RPG_BATALHA_OCIOSA_S (padrão 30 min) e
+  numa sala sem ninguém é arquivada no banco (tabela batalhas_arquivadas) e sai do estado.
+- A varredura roda a cada RPG_VARREDURA_S (padrão 30 s) numa tarefa de fundo do Socket.IO.
+  Com vários workers todos varrem; cada despejo/arquivamento roda no executor da sala e
+  confere de novo antes de agir, então o segundo worker não encontra nada a fazer.
+
+O servidor passa as ações ('despejar' e 'arquivar', chamadas no executor da sala) e a
+função que roda algo no executor ('na_sala'); aqui fica só o "quando".
+"""
+import os
+import time
+
+from . import metricas
+
+INTERVALO_S = float(os.environ.get('RPG_VARREDURA_S', '30'))
+PRESENCA_EXPIRA_S = float(os.environ.get('RPG_PRESENCA_EXPIRA_S', '120'))
+RETOMADA_S = float(os.environ.get('RPG_RETOMADA_S', '30'))
+BATALHA_OCIOSA_S = float(os.environ.get('RPG_BATALHA_OCIOSA_S', '1800'))
+
+despejos = metricas.contador('rpg_presenca_despejos_total',
+                             'Sids despejados das salas por falta de heartbeat.')
+arquivamentos = metricas.contador('rpg_batalhas_arquivadas_total',
+                                  'Batalhas abandonadas arquivadas no banco e removidas do estado.')
+
+
+class Varredor:
+    def __init__(self, estado, na_sala, despejar, arquivar):
+        self.estado = estado
+        self._na_sala = na_sala      # na_sala(sala_id, funcao, *args)
+        self._despejar = despejar    # despejar(sala_id, sid) -> True se despejou
+        self._arquivar = arquivar    # arquivar(sala_id, ociosa_antes_de) -> True se arquivou
+        self._iniciado = False
+
+    def iniciar(self, socketio):
+        """Sobe a tarefa de fundo (uma vez por processo)."""
+        if self._iniciado or INTERVALO_S <= 0:
+            return
+        self._iniciado = True
+        socketio.start_background_task(self._laco, socketio)
+
+    def _laco(self, socketio):
+        while True:
+            socketio.sleep(INTERVALO_S)
+            try:
+                self.varrer()
+            except Exception as e:
+                print(f"Erro na varredura das salas: {e}")
+
+    def varrer(self, agora=None):
+        """Uma passada. Retorna (sids despejados, batalhas arquivadas)."""
+        agora = time.time() if agora is None else agora
+        despejados = 0
+        for sala_id, sid in self.estado.expirados(agora - PRESENCA_EXPIRA_S):
+            if self._na_sala(sala_id, self._despejar, sala_id, sid):
+                despejados += 1
+        arquivadas = 0
+        limite = agora - BATALHA_OCIOSA_S
+        for sala_id in self.estado.batalhas_ociosas(limite):
+            if self._na_sala(sala_id, self._arquivar, sala_id, limite):
+                arquivadas += 1
+        if despejados:
+            despejos.inc(despejados)
+        if arquivadas:
+            arquivamentos.inc(arquivadas)
+        return despejados, arquivadas
+
+    def aguardar_retomada(self, sala_id, sid, agora=None):
+        """Marca o sid que caiu para ser despejado RETOMADA_S depois, se não voltar antes."""
+        agora = time.time() if agora is None else agora
+        return self.estado.tocar(sala_id, sid, quando=agora - PRESENCA_EXPIRA_S + RETOMADA_S)
+
+    def linhas_prometheus(self):
+        try:
+            contagens = self.estado.contagens()
+        except Exception as e:  # o estado externo pode estar fora do ar; não derruba /metrics
+            print(f"Erro ao contar o estado das salas: {e}")
+            return []
+        linhas = ["# HELP rpg_estado_ativos Salas com alguém, presenças e batalhas no estado (todos os workers).",
+                  "# TYPE rpg_estado_ativos gauge"]
+        linhas += [f'rpg_estado_ativos{{tipo="{tipo}"}} {qtd}' for tipo, qtd in sorted(contagens.items())]
+        return linhas
@@ -0,0 +1,95 @@
+# Este é um script utilitário para ser executado manualmente no terminal.
+# Ele lê o log estruturado de eventos (logs/eventos.jsonl e seus arquivos rotacionados)
+# e mostra, por evento: contagem estimada, erros, latência p50/p95/p99 e tamanho médio do payload.
+#
+# Uso: python -m utils.analisar_eventos [arquivos...] [--evento NOME]
+
+import argparse
+import glob
+import json
+import math
+import os
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+PADRAO_ARQUIVOS = os.path.join(script_dir, '..', 'logs', 'eventos.jsonl*')
+
+
+def percentil(valores_ordenados, p):
+    """Percentil pelo método do 'rank mais próximo' (valores já ordenados)."""
+    if not valores_ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+
+def ler_eventos(caminhos):
+    """Gera os dicionários de cada linha válida dos arquivos (linhas corrompidas são ignoradas)."""
+    for caminho in caminhos:
+        with open(caminho, encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError:
+                    continue
+
+
+def agregar(eventos, filtro=None):
+    """Agrupa por 'event'. A contagem estimada repondera cada linha por 1/taxa_amostragem."""
+    grupos = {}
+    for ev in eventos:
+        nome = ev.get('event')
+        if not nome or (filtro and nome != filtro):
+            continue
+        g = grupos.setdefault(nome, {'linhas': 0, 'estimado': 0.0, 'erros': 0, 'latencias': [], 'bytes': []})
+        g['linhas'] += 1
+        g['estimado'] += 1.0 / (ev.get('taxa_amostragem') or 1.0)
+        if ev.get('erro') is not None:
+            g['erros'] += 1
+        if ev.get('latency_ms') is not None:
+            g['latencias'].append(ev['latency_ms'])
+        if ev.get('payload_bytes') is not None:
+            g['bytes'].append(ev['payload_bytes'])
+    resumo = {}
+    for nome, g in grupos.items():
+        lat = sorted(g['latencias'])
+        resumo[nome] = {
+            'linhas': g['linhas'],
+            'estimado': round(g['estimado']),
+            'erros': g['erros'],
+            'p50_ms': percentil(lat, 50),
+            'p95_ms': percentil(lat, 95),
+            'p99_ms': percentil(lat, 99),
+            'bytes_medio': round(sum(g['bytes']) / len(g['bytes'])) if g['bytes'] else None,
+        }
+    return resumo
+
+
+def _fmt(valor):
+    return '-' if valor is None else (f"{valor:.2f}" if isinstance(valor, float) else str(valor))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumo de latência por evento a partir do eventos.jsonl")
+    parser.add_argument('arquivos', nargs='*', help="arquivos .jsonl (padrão: logs/eventos.jsonl*)")
+    parser.add_argument('--evento', help="mostra apenas este evento")
+    parser.add_argument('--json', action='store_true', help="imprime o resumo em JSON")
+    args = parser.parse_args()
+
+    caminhos = args.arquivos or sorted(glob.glob(PADRAO_ARQUIVOS))
+    if not caminhos:
+        print("Nenhum arquivo de eventos encontrado (o log JSON está ligado? RPG_LOG_JSON=1).")
+        return
+
+    resumo = agregar(ler_eventos(caminhos), args.evento)
+    if args.json:
+        print(json.dumps(resumo, indent=2, ensure_ascii=False))
+        return
+
+    colunas = ('linhas', 'estimado', 'erros', 'p50_ms', 'p95_ms', 'p99_ms', 'bytes_medio')
+    print(f"{'evento':32}" + ''.join(f"{c:>12}" for c in colunas))
+    for nome in sorted(resumo, key=lambda n: -resumo[n]['estimado']):
+        print(f"{nome[:32]:32}" + ''.join(f"{_fmt(resumo[nome][c]):>12}" for c in colunas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+# Este é um script utilitário para ser executado manualmente no terminal.
+# Ele cria um banco NOVO com dados sintéticos em volume de produção: usuários, fichas, salas,
+# milhões de linhas de historico_chat, campanhas com centenas de NPCs/quests/mapas e
+# bestiários customizados grandes, para medir consultas e o servidor (RPG_DB_PATH=destino.db).
+#
+# O esquema é o do banco modelo (database/campanhas.db) mais o que as migrações da raiz
+# acrescentam e ele ainda não tenha; o compêndio oficial (monstros, itens, habilidades) é
+# copiado do modelo. O resto vem de random.Random(--seed): mesma seed e mesmos volumes geram
+# o mesmo banco, linha por linha (os timestamps partem de uma data fixa, não do relógio; só o
+# sal do bcrypt em senha_hash muda de uma execução para outra).
+# Inserção em lote (executemany, uma transação por tabela, sem journal): o banco é montado num
+# arquivo temporário que só substitui o destino no final.
+#
+# Todos os usuários ficam com a senha --senha (padrão 'senha123'), para logar nos testes.
+#
+# Uso: python -m utils.gerar_dataset destino.db [--seed 42] [--mensagens 2000000] [--forcar]
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+MODELO_PADRAO = os.path.join(script_dir, '..', 'database', 'campanhas.db')
+
+TABELAS_COMPENDIO = ('monstros_base', 'itens_base', 'habilidades_base')
+
+# Migrações da raiz (migrar_mapas_blobs.py, add_imagem_url.py, criar_tabela_batalhas_arquivadas.py,
+# criar_tabela_compendio_versao.py)
+COLUNAS_MIGRADAS = (
+    ('campanha_mapas', 'imagem_hash', 'TEXT'),
+    ('campanha_mapas', 'imagem_largura', 'INTEGER'),
+    ('campanha_mapas', 'imagem_altura', 'INTEGER'),
+    ('monstros_base', 'imagem_url', 'TEXT DEFAULT NULL'),
+)
+SQL_BATALHAS_ARQUIVADAS = """
+CREATE TABLE IF NOT EXISTS batalhas_arquivadas (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    sala_id         INTEGER NOT NULL,
+    estado_json     TEXT NOT NULL,
+    motivo          TEXT NOT NULL,
+    arquivada_em    DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (sala_id) REFERENCES salas (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_batalhas_arquivadas_sala ON batalhas_arquivadas (sala_id);
+"""
+
+
+def _sql_versao_compendio():
+    """compendio_versao e os gatilhos que a incrementam (igual a criar_tabela_compendio_versao.py)."""
+    sql = "CREATE TABLE IF NOT EXISTS compendio_versao (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL DEFAULT 0);\n"
+    for tabela in TABELAS_COMPENDIO:
+        sql += f"INSERT OR IGNORE INTO compendio_versao (tabela, versao) VALUES ('{tabela}', 0);\n"
+        for operacao in ('INSERT', 'UPDATE', 'DELETE'):
+            sql += (f"CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela}_{operacao.lower()} AFTER {operacao} ON {tabela} "
+                    f"BEGIN UPDATE compendio_versao SET versao = versao + 1 WHERE tabela = '{tabela}'; END;\n")
+    return sql
+
+
+SQL_VERSAO_COMPENDIO = _sql_versao_compendio()
+
+INICIO = datetime(2025, 1, 1, tzinfo=timezone.utc)  # relógio dos dados gerados
+LOTE = 50_000                  # linhas por executemany
+
+# --- Vocabulário ---
+NOMES = ('Aldric', 'Brenna', 'Caius', 'Dara', 'Eldrin', 'Fen', 'Gorim', 'Hilda', 'Ilya', 'Joren', 'Kael',
+         'Lyra', 'Maren', 'Nyx', 'Orin', 'Perrin', 'Quenna', 'Rurik', 'Sable', 'Thalia', 'Ulric', 'Vesna',
+         'Wren', 'Xandra', 'Yorick', 'Zora')
+SOBRENOMES = ('Pedraforte', 'Vento-Leste', 'Martelo', 'Corvo', 'Sombraverde', 'Lâminarrubra', 'Dalmar',
+              'Fogoeterno', 'Rocha', 'Espinho', 'Lua-Pálida', 'Trovão')
+CLASSES = ('Bárbaro', 'Bardo', 'Bruxo', 'Clérigo', 'Druida', 'Feiticeiro', 'Guerreiro', 'Ladino', 'Mago',
+           'Monge', 'Paladino', 'Patrulheiro')
+RACAS = ('Humano', 'Elfo', 'Anão', 'Halfling', 'Meio-Elfo', 'Meio-Orc', 'Tiefling', 'Draconato', 'Gnomo')
+ANTECEDENTES = ('Acólito', 'Artesão', 'Charlatão', 'Criminoso', 'Eremita', 'Forasteiro', 'Herói do Povo',
+                'Ladrão', 'Marinheiro', 'Nobre', 'Sábio', 'Soldado')
+ATRIBUTOS = ('Força', 'Destreza', 'Constituição', 'Inteligência', 'Sabedoria', 'Carisma')
+PERICIAS = ('Acrobacia', 'Arcanismo', 'Atletismo', 'Enganação', 'Furtividade', 'História', 'Intimidação',
+            'Intuição', 'Investigação', 'Medicina', 'Natureza', 'Percepção', 'Persuasão', 'Religião')
+LUGARES = ('a taverna', 'a cripta', 'o porto', 'a floresta', 'a torre do mago', 'as minas', 'o castelo',
+           'o pântano', 'a biblioteca', 'o mercado', 'as ruínas', 'a ponte velha')
+FALAS = ('Vamos para {lugar}?', 'Alguém viu o mapa de {lugar}?', 'Eu fico de guarda perto d{lugar}.',
+         'Cuidado, tem algo estranho n{lugar}.', 'Preciso descansar antes d{lugar}.',
+         'Quanto ouro sobrou depois d{lugar}?', 'Acho que o NPC mentiu sobre {lugar}.',
+         'Meu personagem desconfia de todo mundo n{lugar}.', 'Bora, rolem iniciativa!', 'kkkkkk', 'boa!',
+         'Quem ficou com a poção?', 'Vou tentar convencer o guarda.', 'Ataco o mais próximo.')
+NARRACOES = ('Vocês chegam a {lugar} ao anoitecer.', 'Um silêncio pesado toma conta d{lugar}.',
+             'Passos ecoam vindos d{lugar}.', 'O taverneiro aponta para {lugar} sem dizer nada.',
+             'Façam um teste de Percepção.', 'A porta range e se abre sozinha.')
+DADOS = ('1d20', '1d20', '1d20', '2d6', '1d8', '1d12', '4d6', '1d100')
+TIPOS_MONSTRO = ('Aberration', 'Beast', 'Celestial', 'Construct', 'Dragon', 'Elemental', 'Fey', 'Fiend',
+                 'Giant', 'Humanoid', 'Monstrosity', 'Ooze', 'Plant', 'Undead')
+TAMANHOS = ('Tiny', 'Small', 'Medium', 'Medium', 'Large', 'Huge', 'Gargantuan')
+SIGLAS_ALINHAMENTO = ('LG', 'NG', 'CG', 'LN', 'N', 'CN', 'LE', 'NE', 'CE', 'Unaligned')
+CRS = ('0.0', '0.125', '0.25', '0.5', '1.0', '2.0', '3.0', '4.0', '5.0', '6.0', '7.0', '8.0', '9.0', '10.0',
+       '11.0', '12.0', '13.0', '14.0', '15.0', '16.0', '17.0', '18.0', '19.0', '20.0', '21.0', '22.0')
+PREFIXOS_MONSTRO = ('Goblin', 'Lobo', 'Esqueleto', 'Ogro', 'Aranha', 'Cultista', 'Wyrm', 'Golem', 'Espectro',
+                    'Troll', 'Harpia', 'Basilisco', 'Kobold', 'Gnoll', 'Lich', 'Quimera')
+SUFIXOS_MONSTRO = ('das Cinzas', 'Ancião', 'do Pântano', 'Sanguinário', 'de Gelo', 'Corrompido', 'Alfa',
+                   'das Profundezas', 'Sombrio', 'de Ferro')
+TONS = ('Épico', 'Sombrio', 'Humorístico', 'Misterioso', 'Horror', 'Aventura', 'Político')
+ALINHAMENTOS = ('Leal e Bom', 'Neutro e Bom', 'Caótico e Bom', 'Leal e Neutro', 'Neutro', 'Caótico e Neutro',
+                'Leal e Mau', 'Neutro e Mau', 'Caótico e Mau')
+PAPEIS_NPC = ('Aliado', 'Vilão', 'Mercador', 'Informante', 'Guarda', 'Nobre', 'Sacerdote', 'Taverneiro')
+STATUS_EVENTO = ('futuro', 'em_andamento', 'concluido')
+STATUS_QUEST = ('ativa', 'concluida', 'falhou', 'oculta')
+ITENS_INVENTARIO = ('Poção de Cura', 'Corda de Cânhamo', 'Tocha', 'Espada Longa', 'Adaga', 'Mapa Rasgado',
+                    'Chave de Bronze', 'Pergaminho Selado', 'Anel Estranho', 'Ração de Viagem')
+
+
+def _lotes(linhas, tamanho=LOTE):
+    """Quebra um gerador de linhas em listas de até 'tamanho' (executemany sem materializar tudo)."""
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _inserir(conn, tabela, colunas, linhas, valores=None):
+    """executemany em lotes dentro de uma transação. Retorna quantas linhas entraram."""
+    sql = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({valores or ', '.join('?' * len(colunas))})"
+    total = 0
+    with conn:
+        for lote in _lotes(linhas):
+            conn.executemany(sql, lote)
+            total += len(lote)
+    return total
+
+
+def _carimbo(segundos):
+    return (INICIO + timedelta(seconds=segundos)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _nome_pessoa(rng):
+    return f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}"
+
+
+# --- Esquema ---
+
+def criar_esquema(conn, modelo):
+    """Copia tabelas/índices do modelo (sem dados), aplica as migrações pendentes e o compêndio oficial."""
+    origem = sqlite3.connect(f"file:{modelo}?mode=ro", uri=True)
+    comandos = [sql for tipo, nome, sql in origem.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY type = 'index', rowid")
+        if not nome.startswith('sqlite_')]
+    origem.close()
+    for sql in comandos:
+        conn.execute(sql)
+    for tabela, coluna, tipo in COLUNAS_MIGRADAS:
+        existentes = [r[1] for r in conn.execute(f"PRAGMA table_info({tabela})")]
+        if existentes and coluna not in existentes:
+            conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+    conn.executescript(SQL_BATALHAS_ARQUIVADAS)
+    conn.executescript(SQL_VERSAO_COMPENDIO)
+
+    conn.execute("ATTACH DATABASE ? AS modelo", (f"file:{modelo}?mode=ro",))
+    with conn:
+        for tabela in TABELAS_COMPENDIO:
+            colunas = ', '.join(r[1] for r in conn.execute(f"PRAGMA modelo.table_info({tabela})"))
+            # Só o oficial: o customizado do modelo é de usuários que não existem aqui
+            filtro = " WHERE oficial = 1" if 'oficial' in colunas.split(', ') else ""
+            conn.execute(f"INSERT INTO main.{tabela} ({colunas}) SELECT {colunas} FROM modelo.{tabela}{filtro}")
+    conn.execute("DETACH DATABASE modelo")
+
+
+# --- Geradores de cada tabela ---
+
+def gerar_usuarios(conn, jogadores, mestres, senha_hash):
+    """Mestres primeiro (ids 1..mestres), depois jogadores. Retorna (ids_mestres, ids_jogadores)."""
+    linhas = [(f"mestre_{i:05d}", senha_hash, 'mestre') for i in range(mestres)]
+    linhas += [(f"jogador_{i:06d}", senha_hash, 'player') for i in range(jogadores)]
+    _inserir(conn, 'usuarios', ('nome_usuario', 'senha_hash', 'role'), linhas)
+    ids = [r[0] for r in conn.execute("SELECT id FROM usuarios ORDER BY id")]
+    return ids[:mestres], ids[mestres:]
+
+
+def _ficha(rng, usuario_id):
+    nivel = min(20, 1 + int(rng.expovariate(0.35)))
+    atributos = {a: rng.randint(8, 18) for a in ATRIBUTOS}
+    pericias = rng.sample(PERICIAS, rng.randint(2, 5))
+    return (usuario_id, _nome_pessoa(rng), rng.choice(CLASSES), rng.choice(RACAS), rng.choice(ANTECEDENTES),
+            nivel, rng.randrange(300 * nivel), 300 * nivel,
+            json.dumps(atributos), json.dumps(pericias))
+
+
+def gerar_fichas(conn, rng, jogadores, por_jogador):
+    """Retorna [(ficha_id, usuario_id, nome_personagem)]."""
+    _inserir(conn, 'fichas_personagem',
+             ('usuario_id', 'nome_personagem', 'classe', 'raca', 'antecedente', 'nivel', 'xp_atual',
+              'xp_proximo_nivel', 'atributos_json', 'pericias_json'),
+             (_ficha(rng, u) for u in jogadores for _ in range(rng.randint(1, 2 * por_jogador - 1))))
+    return conn.execute("SELECT id, usuario_id, nome_personagem FROM fichas_personagem ORDER BY id").fetchall()
+
+
+def gerar_salas(conn, rng, quantidade, mestres, senha_hash):
+    """Uma parte das salas tem senha. Retorna [(sala_id, mestre_id)]."""
+    _inserir(conn, 'salas', ('nome', 'senha_hash', 'mestre_id'),
+             ((f"Mesa {i:05d}: {rng.choice(LUGARES).split(' ', 1)[1].title()}",
+               senha_hash if rng.random() < 0.2 else None, rng.choice(mestres)) for i in range(quantidade)))
+    return conn.execute("SELECT id, mestre_id FROM salas ORDER BY id").fetchall()
+
+
+def montar_mesas(rng, salas, fichas, jogadores_por_sala, nomes_mestres):
+    """Quem joga em cada sala: {sala_id: (nome do mestre, [(ficha_id, usuario_id, nome)])}."""
+    return {sala_id: (nomes_mestres[mestre_id], rng.sample(fichas, min(len(fichas), rng.randint(
+        max(1, jogadores_por_sala - 2), jogadores_por_sala + 2)))) for sala_id, mestre_id in salas}
+
+
+def _mensagens(rng, mesas, total):
+    """
+    Linhas de historico_chat no formato que o servidor grava (servidor_api: send_message,
+    roll_dice, entrada/saída), com o instante em segundos (o SQL formata). Poucas salas
+    concentram a maior parte do chat (pesos ~1/posição).
+    """
+    # Laço quente (milhões de linhas): textos pré-montados e sorteio por índice (random() * n)
+    # em vez de choice/format/strftime por linha.
+    falas = [f.format(lugar=lugar) for f in FALAS for lugar in LUGARES]
+    narracoes = [n.format(lugar=lugar) for n in NARRACOES for lugar in LUGARES]
+    dados = [(d, *map(int, d.split('d'))) for d in DADOS]
+    presencas = ('--- {} entrou na taverna! ---', '--- {} saiu da taverna. ---')
+    # {sala_id: (remetente do mestre, nome do mestre, [personagens])}
+    quem_fala = {sala_id: (f"[Mestre] {mestre}", mestre, [nome for _, _, nome in jogadores])
+                 for sala_id, (mestre, jogadores) in mesas.items()}
+
+    salas = list(mesas)
+    pesos = [1 / (i + 1) ** 0.8 for i in range(len(salas))]
+    rng.shuffle(salas)
+    escolhidas = rng.choices(salas, weights=pesos, k=total)
+    r = rng.random
+    instante = INICIO.timestamp()
+    passo = 2 * 365 * 86400 / max(total, 1)  # o histórico cobre cerca de um ano
+    for sala_id in escolhidas:
+        instante += r() * passo
+        mestre, nome_mestre, jogadores = quem_fala[sala_id]
+        sorteio = r()
+        if sorteio < 0.55 and jogadores:
+            yield sala_id, jogadores[int(r() * len(jogadores))], falas[int(r() * len(falas))], int(instante)
+        elif sorteio < 0.80:
+            quem = jogadores[int(r() * len(jogadores))] if jogadores else mestre
+            dado, n, faces = dados[int(r() * len(dados))]
+            yield sala_id, 'Sistema', f"[{quem}] rolou {dado}: {n + int(r() * (n * faces - n + 1))}", int(instante)
+        elif sorteio < 0.95:
+            yield sala_id, mestre, narracoes[int(r() * len(narracoes))], int(instante)
+        else:
+            quem = jogadores[int(r() * len(jogadores))] if jogadores else nome_mestre
+            yield sala_id, 'Sistema', presencas[r() < 0.5].format(quem), int(instante)
+
+
+def gerar_chat(conn, rng, mesas, total):
+    return _inserir(conn, 'historico_chat', ('sala_id', 'remetente', 'mensagem', 'timestamp'),
+                    _mensagens(rng, mesas, total), valores="?, ?, ?, datetime(?, 'unixepoch')")
+
+
+def gerar_extras_das_salas(conn, rng, mesas):
+    """Anotações dos jogadores e inventário da sala (alguns itens por ficha)."""
+    _inserir(conn, 'anotacoes_jogador', ('usuario_id', 'sala_id', 'notas'), (
+        (usuario_id, sala_id, f"Lembrar: {rng.choice(NARRACOES).format(lugar=rng.choice(LUGARES))}")
+        for sala_id, (_, jogadores) in mesas.items()
+        for usuario_id in {u for _, u, _ in jogadores} if rng.random() < 0.5))
+    _inserir(conn, 'inventario_sala', ('ficha_id', 'sala_id', 'nome_item', 'descricao'), (
+        (ficha_id, sala_id, rng.choice(ITENS_INVENTARIO), '')
+        for sala_id, (_, jogadores) in mesas.items()
+        for ficha_id, _, _ in jogadores for _ in range(rng.randint(0, 4))))
+
+
+def gerar_bestiario(conn, rng, mestres, quantidade):
+    """Monstros customizados (oficial=0, criador_id = um mestre), nas colunas do compêndio."""
+    def monstro(i):
+        cr = rng.choice(CRS)
+        nivel = float(cr)
+        return (f"{rng.choice(PREFIXOS_MONSTRO)} {rng.choice(SUFIXOS_MONSTRO)} #{i}",
+                max(1, int(rng.gauss(15 + nivel * 15, 5 + nivel * 3))), int(2 + nivel / 2),
+                f"{rng.randint(1, 4)}d{rng.choice((4, 6, 8, 10, 12))}", 10 + int(nivel / 3),
+                int(50 * (nivel + 0.5) ** 1.8), rng.randint(0, int(20 * (nivel + 1))),
+                rng.choice(TAMANHOS), rng.choice(TIPOS_MONSTRO), rng.choice(SIGLAS_ALINHAMENTO),
+                rng.randint(10, 14) + int(nivel / 3), rng.choice(('30', '40', '30, 60 fly', '20, 30 swim')),
+                *(rng.randint(3, 22) for _ in range(6)), cr, 'Custom', 0, rng.choice(mestres))
+    return _inserir(conn, 'monstros_base',
+                    ('nome', 'vida_maxima', 'ataque_bonus', 'dano_dado', 'defesa', 'xp_oferecido', 'ouro_drop',
+                     'tamanho', 'tipo', 'alinhamento', 'ca', 'deslocamento', 'for_attr', 'des_attr', 'con_attr',
+                     'intel_attr', 'sab_attr', 'car_attr', 'cr', 'fonte', 'oficial', 'criador_id'),
+                    (monstro(i) for i in range(quantidade)))
+
+
+def gerar_campanhas(conn, rng, mestres, salas, quantidade, npcs, quests, mapas, eventos, anotacoes):
+    """Campanhas dos mestres com NPCs, quests, mapas (sem imagem), eventos e anotações; liga salas a elas."""
+    _inserir(conn, 'campanhas_mestre',
+             ('criador_id', 'nome', 'descricao', 'historia', 'tom', 'nivel_min', 'nivel_max', 'status',
+              'criado_em', 'atualizado_em'),
+             ((rng.choice(mestres), f"Campanha {i:04d}: {rng.choice(PREFIXOS_MONSTRO)} {rng.choice(SUFIXOS_MONSTRO)}",
+               rng.choice(NARRACOES).format(lugar=rng.choice(LUGARES)),
+               ' '.join(rng.choice(NARRACOES).format(lugar=rng.choice(LUGARES)) for _ in range(20)),
+               rng.choice(TONS), 1, rng.randint(5, 20), rng.choice(('em_preparacao', 'ativa')),
+               _carimbo(i * 3600), _carimbo(i * 3600 + rng.randrange(86400 * 90)))
+              for i in range(quantidade)))
+    campanhas = conn.execute("SELECT id, criador_id FROM campanhas_mestre ORDER BY id").fetchall()
+    ids = [c for c, _ in campanhas]
+
+    def texto():
+        return rng.choice(NARRACOES).format(lugar=rng.choice(LUGARES))
+
+    def visivel():
+        return int(rng.random() < 0.4)
+
+    _inserir(conn, 'campanha_npcs',
+             ('campanha_id', 'nome', 'papel', 'descricao_pub', 'descricao_priv', 'alinhamento', 'local', 'visivel'),
+             ((c, _nome_pessoa(rng), rng.choice(PAPEIS_NPC), texto(), texto(), rng.choice(ALINHAMENTOS),
+               rng.choice(LUGARES), visivel()) for c in ids for _ in range(npcs)))
+    _inserir(conn, 'campanha_quests',
+             ('campanha_id', 'titulo', 'objetivo_pub', 'detalhes_priv', 'recompensa_pub', 'recompensa_priv',
+              'local_priv', 'status', 'visivel'),
+             ((c, f"Missão {n}: {rng.choice(LUGARES)}", texto(), texto(), f"{rng.randint(10, 500)} PO",
+               rng.choice(ITENS_INVENTARIO), rng.choice(LUGARES), rng.choice(STATUS_QUEST), visivel())
+              for c in ids for n in range(quests)))
+    _inserir(conn, 'campanha_mapas', ('campanha_id', 'nome', 'descricao', 'visivel', 'ordem'),
+             ((c, f"Mapa de {rng.choice(LUGARES)}", texto(), visivel(), n) for c in ids for n in range(mapas)))
+    _inserir(conn, 'campanha_eventos',
+             ('campanha_id', 'titulo', 'descricao_pub', 'descricao_priv', 'status', 'visivel', 'ordem'),
+             ((c, f"Capítulo {n + 1}", texto(), texto(), rng.choice(STATUS_EVENTO), visivel(), n)
+              for c in ids for n in range(eventos)))
+    _inserir(conn, 'campanha_anotacoes', ('campanha_id', 'titulo', 'conteudo', 'visivel'),
+             ((c, f"Nota {n + 1}", texto(), visivel()) for c in ids for n in range(anotacoes)))
+
+    # Metade das salas joga uma campanha do próprio mestre (quando ele tem alguma)
+    por_mestre = {}
+    for campanha_id, criador_id in campanhas:
+        por_mestre.setdefault(criador_id, []).append(campanha_id)
+    _inserir(conn, 'sala_campanha', ('sala_id', 'campanha_id'), (
+        (sala_id, rng.choice(por_mestre[mestre_id])) for sala_id, mestre_id in salas
+        if mestre_id in por_mestre and rng.random() < 0.5))
+    return len(ids)
+
+
+def gerar(destino, args):
+    rng = random.Random(args.seed)
+    temporario = f"{destino}.tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    conn = sqlite3.connect(temporario)
+    # Arquivo novo e descartável até o rename: sem journal nem fsync
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    etapas = []
+
+    def etapa(nome, funcao, *a):
+        inicio = time.perf_counter()
+        resultado = funcao(*a)
+        etapas.append((nome, time.perf_counter() - inicio))
+        print(f"  {nome:28} {etapas[-1][1]:6.2f} s")
+        return resultado
+
+    try:
+        etapa('esquema + compêndio', criar_esquema, conn, args.modelo)
+        # Um hash só (bcrypt é lento de propósito): todo mundo com a mesma senha
+        senha_hash = bcrypt.hashpw(args.senha.encode('utf-8'), bcrypt.gensalt(rounds=args.custo_bcrypt))
+        mestres, jogadores = etapa('usuários', gerar_usuarios, conn, args.jogadores, args.mestres, senha_hash)
+        fichas = etapa('fichas', gerar_fichas, conn, rng, jogadores, args.fichas_por_jogador)
+        salas = etapa('salas', gerar_salas, conn, rng, args.salas, mestres, senha_hash)
+        nomes_mestres = dict(conn.execute("SELECT id, nome_usuario FROM usuarios WHERE role = 'mestre'"))
+        mesas = montar_mesas(rng, salas, fichas, args.jogadores_por_sala, nomes_mestres)
+        etapa('anotações + inventário', gerar_extras_das_salas, conn, rng, mesas)
+        etapa('historico_chat', gerar_chat, conn, rng, mesas, args.mensagens)
+        etapa('bestiário customizado', gerar_bestiario, conn, rng, mestres, args.monstros)
+        etapa('campanhas', gerar_campanhas, conn, rng, mestres, salas, args.campanhas,
+              args.npcs, args.quests, args.mapas, args.eventos, args.anotacoes)
+        etapa('ANALYZE', conn.execute, "ANALYZE")
+        conn.execute("PRAGMA journal_mode=DELETE")  # o servidor liga o WAL sozinho quando precisa
+        conn.close()
+    except BaseException:
+        conn.close()
+        os.remove(temporario)
+        raise
+    os.replace(temporario, destino)
+    return sum(t for _, t in etapas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria um banco com dados sintéticos para benchmarks.")
+    parser.add_argument('destino', help="arquivo .db a criar")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--forcar', action='store_true', help="substitui o destino se já existir")
+    parser.add_argument('--modelo', default=MODELO_PADRAO, help="banco de onde vêm o esquema e o compêndio")
+    parser.add_argument('--senha', default='senha123', help="senha de todos os usuários gerados")
+    parser.add_argument('--custo-bcrypt', type=int, default=12, help="rounds do bcrypt (o cadastro usa 12)")
+    parser.add_argument('--jogadores', type=int, default=5000)
+    parser.add_argument('--mestres', type=int, default=300)
+    parser.add_argument('--fichas-por-jogador', type=int, default=2, help="média")
+    parser.add_argument('--salas', type=int, default=1000)
+    parser.add_argument('--jogadores-por-sala', type=int, default=5, help="média (±2)")
+    parser.add_argument('--mensagens', type=int, default=2_000_000, help="linhas de historico_chat")
+    parser.add_argument('--monstros', type=int, default=20_000, help="monstros do bestiário customizado")
+    parser.add_argument('--campanhas', type=int, default=200)
+    parser.add_argument('--npcs', type=int, default=300, help="por campanha")
+    parser.add_argument('--quests', type=int, default=100, help="por campanha")
+    parser.add_argument('--mapas', type=int, default=30, help="por campanha (sem imagem)")
+    parser.add_argument('--eventos', type=int, default=50, help="por campanha")
+    parser.add_argument('--anotacoes', type=int, default=20, help="por campanha")
+    args = parser.parse_args()
+
+    if args.mestres < 1 or args.jogadores < 1:
+        parser.error("é preciso ao menos um mestre e um jogador")
+    destino = os.path.abspath(args.destino)
+    if os.path.abspath(args.modelo) == destino:
+        parser.error("o destino não pode ser o próprio banco modelo")
+    if os.path.exists(destino) and not args.forcar:
+        parser.error(f"'{destino}' já existe (use --forcar para substituir)")
+
+    print(f"Gerando {destino} (seed {args.seed})...")
+    total = gerar(destino, args)
+    conn = sqlite3.connect(destino)
+    contagens = [(t, conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]) for t in (
+        'usuarios', 'fichas_personagem', 'salas', 'historico_chat', 'monstros_base', 'campanhas_mestre',
+        'campanha_npcs', 'campanha_quests', 'campanha_mapas')]
+    conn.close()
+    print(f"\nPronto em {total:.1f} s ({os.path.getsize(destino) / 2**20:.0f} MB):")
+    for tabela, n in contagens:
+        print(f"  {tabela:20} {n:>10,}".replace(',', '.'))
+    print(f"\nUse com: RPG_DB_PATH={destino}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 # Este é um script utilitário para ser executado manualmente no terminal.
-# Ele promove um usuário ao role 'mestre' no banco de dados.
+# Ele promove um usuário ao role 'mestre' (padrão) ou a outro role ('admin', 'player') no banco de dados.
 
 import sqlite3
 import sys
@@ -16,16 +16,22 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 # entra em 'database' -> acessa 'campanhas.db'
 DB_PATH = os.path.join(script_dir, '..', 'database', 'campanhas.db')
 
-def promote_user(username):
+# Roles aceitos. 'admin' libera as rotas /api/admin/* (métricas, profiler) e também as de mestre.
+ROLES_VALIDOS = ('player', 'mestre', 'admin')
+
+def promote_user(username, role='mestre'):
     """
-    Atualiza o 'role' de um usuário para 'mestre' no banco de dados.
+    Atualiza o 'role' de um usuário (padrão: 'mestre') no banco de dados.
     (O parâmetro 'username' aqui é o nome que você digita no terminal)
     """
     
     # Validação inicial: Verifica se o nome de usuário foi fornecido
     if not username:
         print("Erro: Nenhum nome de usuário fornecido.")
-        print("Uso: python -m utils.promote_user <nome_do_usuario>")
+        print("Uso: python -m utils.promote_user <nome_do_usuario> [player|mestre|admin]")
+        return
+    if role not in ROLES_VALIDOS:
+        print(f"Erro: Role '{role}' inválido. Use um de: {', '.join(ROLES_VALIDOS)}.")
         return
 
     conn = None
@@ -42,11 +48,11 @@ def promote_user(username):
         user = cursor.fetchone()
 
         if user:
-            # 3. Se o usuário existir, atualiza o 'role' dele para 'mestre'
+            # 3. Se o usuário existir, atualiza o 'role' dele
             # (Usando 'nome_usuario' aqui também)
-            cursor.execute("UPDATE usuarios SET role = 'mestre' WHERE nome_usuario = ?", (username,))
+            cursor.execute("UPDATE usuarios SET role = ? WHERE nome_usuario = ?", (role, username))
             conn.commit()
-            print(f"Sucesso! O usuário '{username}' foi promovido a Mestre.")
+            print(f"Sucesso! O usuário '{username}' agora tem o role '{role}'.")
         else:
             # 4. Se não existir, informa o erro
             print(f"Erro: Usuário '{username}' não encontrado no banco de dados.")
@@ -64,7 +70,8 @@ def promote_user(username):
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         username_to_promote = sys.argv[1]
-        promote_user(username_to_promote)
+        role_escolhido = sys.argv[2] if len(sys.argv) > 2 else 'mestre'
+        promote_user(username_to_promote, role_escolhido)
     else:
         print("Erro: Forneça o nome de usuário que deseja promover.")
-        print("Uso: python -m utils.promote_user <nome_do_usuario>")
\ No newline at end of file
+        print("Uso: python -m utils.promote_user <nome_do_usuario> [player|mestre|admin]")
\ No newline at end of file
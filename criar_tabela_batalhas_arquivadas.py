@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Cria a tabela batalhas_arquivadas (batalhas abandonadas que a varredura do servidor
+tira da memória, ver backend/servidor/varredura.py) num banco já existente.
+Pode ser executado mais de uma vez:
+  venv\\Scripts\\python.exe criar_tabela_batalhas_arquivadas.py
+"""
+import os, sqlite3
+
+DB = os.environ.get('RPG_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'database', 'campanhas.db')
+
+SQL = """
+CREATE TABLE IF NOT EXISTS batalhas_arquivadas (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    sala_id         INTEGER NOT NULL,
+    estado_json     TEXT NOT NULL,
+    motivo          TEXT NOT NULL,
+    arquivada_em    DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (sala_id) REFERENCES salas (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_batalhas_arquivadas_sala ON batalhas_arquivadas (sala_id);
+"""
+
+conn = sqlite3.connect(DB)
+conn.executescript(SQL)
+conn.commit()
+conn.close()
+print(f"✅ Tabela 'batalhas_arquivadas' pronta em {DB}")
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Cria a tabela compendio_versao e os gatilhos que a incrementam a cada INSERT/UPDATE/DELETE
+em monstros_base, itens_base e habilidades_base (ver backend/database/compendio.py)
+num banco já existente. Pode ser executado mais de uma vez:
+  venv\\Scripts\\python.exe criar_tabela_compendio_versao.py
+"""
+import os, sqlite3
+
+DB = os.environ.get('RPG_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'database', 'campanhas.db')
+
+TABELAS = ('monstros_base', 'itens_base', 'habilidades_base')
+
+SQL = "CREATE TABLE IF NOT EXISTS compendio_versao (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL DEFAULT 0);\n"
+for tabela in TABELAS:
+    SQL += f"INSERT OR IGNORE INTO compendio_versao (tabela, versao) VALUES ('{tabela}', 0);\n"
+    for operacao in ('INSERT', 'UPDATE', 'DELETE'):
+        SQL += (f"CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela}_{operacao.lower()} AFTER {operacao} ON {tabela} "
+                f"BEGIN UPDATE compendio_versao SET versao = versao + 1 WHERE tabela = '{tabela}'; END;\n")
+
+conn = sqlite3.connect(DB)
+conn.executescript(SQL)
+conn.commit()
+conn.close()
+print(f"✅ Tabela 'compendio_versao' e gatilhos prontos em {DB}")
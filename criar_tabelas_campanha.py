@@ -32,6 +32,9 @@ CREATE TABLE IF NOT EXISTS campanha_mapas (
     nome            TEXT NOT NULL,
     descricao       TEXT DEFAULT '',
     imagem_data     TEXT,
+    imagem_hash     TEXT,
+    imagem_largura  INTEGER,
+    imagem_altura   INTEGER,
     visivel         INTEGER DEFAULT 0,
     ordem           INTEGER DEFAULT 0,
     FOREIGN KEY (campanha_id) REFERENCES campanhas_mestre(id) ON DELETE CASCADE
@@ -220,7 +220,7 @@ function GerenciarHabilidades() {
               {/* Campos do formulário: Nome, Descrição, Efeito, Custo Mana */}
               <div className="form-group"> <label>Nome:</label> <input type="text" name="nome" value={formData.nome} onChange={handleInputChange} required /> </div>
               <div className="form-group"> <label>Descrição:</label> <input type="text" name="descricao" value={formData.descricao} onChange={handleInputChange} /> </div>
-              <div className="form-group"> <label>Efeito (Obrigatório):</label> <input type="text" name="efeito" value={formData.efeito} onChange={handleInputChange} required /> </div>
+              <div className="form-group"> <label>Efeito (Obrigatório, tipo:valor[:alvo[:duração]]):</label> <input type="text" name="efeito" value={formData.efeito} onChange={handleInputChange} placeholder="ex: dano:2d6 ou cura:10; mana:2:proprio" required /> </div>
               <div className="form-group"> <label>Custo de Mana:</label> <input type="number" name="custo_mana" value={formData.custo_mana} onChange={handleInputChange} /> </div>
               {/* Botões Salvar e Cancelar */}
               <div className="form-actions"> <button type="submit" className="btn-salvar">Salvar</button> <button type="button" onClick={handleFecharModal} className="btn-cancelar">Cancelar</button> </div>
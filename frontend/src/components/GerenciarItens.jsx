@@ -11,7 +11,7 @@ const ESTADO_INICIAL_FORMULARIO = {
   preco_ouro: 0,
   dano_dado: '',    // (ex: 1d8)
   bonus_ataque: 0,
-  efeito: ''       // (ex: +1 DEF)
+  efeito: ''       // tipo:valor[:alvo[:duracao]] (ex: cura:2d4+2)
 };
 
 function GerenciarItens() {
@@ -232,8 +232,8 @@ function GerenciarItens() {
                   <input type="text" name="dano_dado" value={formData.dano_dado} onChange={handleInputChange} placeholder="ex: 1d8" />
                 </div>
                 <div className="form-group">
-                  <label>Efeito:</label>
-                  <input type="text" name="efeito" value={formData.efeito} onChange={handleInputChange} placeholder="ex: +1 DEF" />
+                  <label>Efeito (tipo:valor[:alvo[:duração]]):</label>
+                  <input type="text" name="efeito" value={formData.efeito} onChange={handleInputChange} placeholder="ex: cura:2d4+2 ou dano:1d6:inimigo:3" />
                 </div>
               </div>
 
@@ -173,9 +173,9 @@ function MestrePanel({ socket, salaId, jogadores }) {
           <div className="mestre-jogadores-inline">
             {players.length === 0
               ? <span className="mestre-sem-jogadores">Nenhum jogador</span>
-              : players.map((j, i) => (
-                  <div key={i} className="mestre-jogador-row">
-                    <span className="mestre-jogador-nome">⚔ {j.nome_personagem}</span>
+              : players.map((j) => (
+                  <div key={j.sid} className="mestre-jogador-row">
+                    <span className="mestre-jogador-nome">⚔ {j.nome_personagem}{j.desconectado && ' (reconectando…)'}</span>
                     <button onClick={() => handleKick(j.ficha_id, j.nome_personagem)} className="mestre-btn-kick" title="Expulsar">⚡</button>
                     <button onClick={() => handleBan(j.ficha_id, j.nome_personagem)} className="mestre-btn-ban" title="Banir">🔨</button>
                   </div>
@@ -17,7 +17,8 @@ function MestreRoute() {
     return <Navigate to="/" replace />;
   }
 
-  if (user.role !== 'mestre') {
+  // 'admin' também passa: no backend o mestre_required aceita os dois roles.
+  if (user.role !== 'mestre' && user.role !== 'admin') {
     console.log(`MestreRoute: BLOQUEADO - Role='${user.role}' não é 'mestre'. Redirecionando para /home`); 
     return <Navigate to="/home" replace />;
   }
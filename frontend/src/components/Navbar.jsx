@@ -14,7 +14,7 @@ function Navbar() {
           <Link to="/salas">Salas</Link>
           <Link to="/cantigas">Cantigas</Link>
 
-          {user.role === 'mestre' && (
+          {(user.role === 'mestre' || user.role === 'admin') && (
             <Link to="/mestre">Esconderijo</Link>
           )}
 
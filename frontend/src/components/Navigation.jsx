@@ -13,7 +13,7 @@ function Navigation() {
       <Link to="/salas">Salas</Link>
       <Link to="/bestiario">Bestiário</Link>
       <Link to="/ferraria-arcana">Ferraria Arcana</Link>
-      {user?.role === 'mestre' && <Link to="/mestre">Esconderijo do Mestre</Link>}
+      {(user?.role === 'mestre' || user?.role === 'admin') && <Link to="/mestre">Esconderijo do Mestre</Link>}
       <button onClick={logout} className="nav-logout-button">Sair</button>
     </nav>
   );
@@ -143,6 +143,18 @@ function ListaSecao({ itens, renderItem, renderForm, onCreate, titulo, btnLabel
   );
 }
 
+// Lista de um sub-recurso: começa com o que veio de /completo e só refaz o GET depois de alterações.
+function useListaCampanha(cid, recurso, fetchWithAuth, inicial, onAtualizada) {
+  const [lista, setLista] = useState(inicial || []);
+  const buscar = () => fetchWithAuth(`${API}/api/campanhas/${cid}/${recurso}`).then(r => r.json())
+    .then(d => { setLista(d); onAtualizada?.(recurso, d); }).catch(() => {});
+  useEffect(() => { if (inicial) setLista(inicial); else buscar(); }, [cid, inicial]);
+  return [lista, buscar];
+}
+
+// Mapas novos/migrados têm imagem_url (/api/blobs/<hash>); os antigos ainda trazem o base64.
+const imagemDoMapa = (m) => m?.imagem_url ? `${API}${m.imagem_url}` : (m?.imagem_data || '');
+
 // ── Mapa ──────────────────────────────────────────────────────────────────────
 function SecaoMapas({ cid, fetchWithAuth }) {
   const [mapas, setMapas] = useState([]);
@@ -161,7 +173,9 @@ function SecaoMapas({ cid, fetchWithAuth }) {
   };
 
   const FormMapa = ({ item, onSalvo, onCancelar }) => {
-    const [f, setF] = useState({ nome: item?.nome || '', descricao: item?.descricao || '', imagem_data: item?.imagem_data || '' });
+    // imagem_data só é enviado quando o usuário escolhe outra imagem (o servidor guarda no blob store).
+    const [f, setF] = useState({ nome: item?.nome || '', descricao: item?.descricao || '', imagem_data: '' });
+    const previa = f.imagem_data || imagemDoMapa(item);
     const set = (k, v) => setF(p => ({ ...p, [k]: v }));
     const handleFile = (e) => {
       const file = e.target.files[0];
@@ -173,7 +187,8 @@ function SecaoMapas({ cid, fetchWithAuth }) {
     const salvar = async () => {
       const url    = item ? `${API}/api/campanhas/${cid}/mapas/${item.id}` : `${API}/api/campanhas/${cid}/mapas`;
       const method = item ? 'PUT' : 'POST';
-      await fetchWithAuth(url, { method, body: JSON.stringify(f) });
+      const { imagem_data, ...resto } = f;
+      await fetchWithAuth(url, { method, body: JSON.stringify(imagem_data ? f : resto) });
       onSalvo();
     };
     return (
@@ -186,7 +201,7 @@ function SecaoMapas({ cid, fetchWithAuth }) {
           <label style={estilo.label}>Imagem do Mapa</label>
           <input ref={fileRef} type="file" accept="image/*" onChange={handleFile} style={{ display: 'none' }} />
           <button onClick={() => fileRef.current?.click()} style={{ ...estilo.btnSecundario, marginBottom: '0.4rem' }}>📁 Escolher imagem</button>
-          {f.imagem_data && <img src={f.imagem_data} alt="preview" style={{ width: '100%', maxHeight: '200px', objectFit: 'contain', borderRadius: '4px', border: '1px solid #5a4520' }} />}
+          {previa && <img src={previa} alt="preview" style={{ width: '100%', maxHeight: '200px', objectFit: 'contain', borderRadius: '4px', border: '1px solid #5a4520' }} />}
         </div>
         <div style={{ display: 'flex', gap: '0.5rem' }}>
           <button onClick={onCancelar} style={estilo.btnSecundario}>Cancelar</button>
@@ -211,7 +226,11 @@ function SecaoMapas({ cid, fetchWithAuth }) {
               <button onClick={() => deletar(m.id)} style={estilo.btnPerigo}>🗑️</button>
             </div>
           </div>
-          {m.imagem_data && <img src={m.imagem_data} alt={m.nome} style={{ width: '100%', maxHeight: '300px', objectFit: 'contain', borderRadius: '6px', border: '1px solid #3a2a10' }} />}
+          {imagemDoMapa(m) && (
+            <a href={imagemDoMapa(m)} target="_blank" rel="noreferrer">
+              <img src={m.miniatura_url ? `${API}${m.miniatura_url}` : imagemDoMapa(m)} alt={m.nome} loading="lazy" style={{ width: '100%', maxHeight: '300px', objectFit: 'contain', borderRadius: '6px', border: '1px solid #3a2a10' }} />
+            </a>
+          )}
         </div>
       )}
       renderForm={(item, onSalvo, onCancelar) => <FormMapa item={item} onSalvo={onSalvo} onCancelar={onCancelar} />}
@@ -220,10 +239,8 @@ function SecaoMapas({ cid, fetchWithAuth }) {
 }
 
 // ── Eventos ───────────────────────────────────────────────────────────────────
-function SecaoEventos({ cid, fetchWithAuth }) {
-  const [eventos, setEventos] = useState([]);
-  const buscar = () => fetchWithAuth(`${API}/api/campanhas/${cid}/eventos`).then(r => r.json()).then(setEventos).catch(() => {});
-  useEffect(() => { buscar(); }, [cid]);
+function SecaoEventos({ cid, fetchWithAuth, inicial, onAtualizada }) {
+  const [eventos, buscar] = useListaCampanha(cid, 'eventos', fetchWithAuth, inicial, onAtualizada);
 
   const toggle = async (id, v) => { await fetchWithAuth(`${API}/api/campanhas/${cid}/eventos/${id}/toggle`, { method: 'PATCH', body: JSON.stringify({ visivel: v }) }); buscar(); };
   const deletar = async (id) => { if (!window.confirm('Deletar evento?')) return; await fetchWithAuth(`${API}/api/campanhas/${cid}/eventos/${id}`, { method: 'DELETE' }); buscar(); };
@@ -284,10 +301,8 @@ function SecaoEventos({ cid, fetchWithAuth }) {
 }
 
 // ── NPCs ──────────────────────────────────────────────────────────────────────
-function SecaoNPCs({ cid, fetchWithAuth }) {
-  const [npcs, setNpcs] = useState([]);
-  const buscar = () => fetchWithAuth(`${API}/api/campanhas/${cid}/npcs`).then(r => r.json()).then(setNpcs).catch(() => {});
-  useEffect(() => { buscar(); }, [cid]);
+function SecaoNPCs({ cid, fetchWithAuth, inicial, onAtualizada }) {
+  const [npcs, buscar] = useListaCampanha(cid, 'npcs', fetchWithAuth, inicial, onAtualizada);
 
   const toggle = async (id, v) => { await fetchWithAuth(`${API}/api/campanhas/${cid}/npcs/${id}/toggle`, { method: 'PATCH', body: JSON.stringify({ visivel: v }) }); buscar(); };
   const deletar = async (id) => { if (!window.confirm('Deletar NPC?')) return; await fetchWithAuth(`${API}/api/campanhas/${cid}/npcs/${id}`, { method: 'DELETE' }); buscar(); };
@@ -350,10 +365,8 @@ function SecaoNPCs({ cid, fetchWithAuth }) {
 }
 
 // ── Quests ────────────────────────────────────────────────────────────────────
-function SecaoQuests({ cid, fetchWithAuth }) {
-  const [quests, setQuests] = useState([]);
-  const buscar = () => fetchWithAuth(`${API}/api/campanhas/${cid}/quests`).then(r => r.json()).then(setQuests).catch(() => {});
-  useEffect(() => { buscar(); }, [cid]);
+function SecaoQuests({ cid, fetchWithAuth, inicial, onAtualizada }) {
+  const [quests, buscar] = useListaCampanha(cid, 'quests', fetchWithAuth, inicial, onAtualizada);
 
   const toggle = async (id, v) => { await fetchWithAuth(`${API}/api/campanhas/${cid}/quests/${id}/toggle`, { method: 'PATCH', body: JSON.stringify({ visivel: v }) }); buscar(); };
   const deletar = async (id) => { if (!window.confirm('Deletar quest?')) return; await fetchWithAuth(`${API}/api/campanhas/${cid}/quests/${id}`, { method: 'DELETE' }); buscar(); };
@@ -424,10 +437,8 @@ function SecaoQuests({ cid, fetchWithAuth }) {
 }
 
 // ── Anotações ────────────────────────────────────────────────────────────────
-function SecaoAnotacoes({ cid, fetchWithAuth }) {
-  const [anotacoes, setAnotacoes] = useState([]);
-  const buscar = () => fetchWithAuth(`${API}/api/campanhas/${cid}/anotacoes`).then(r => r.json()).then(setAnotacoes).catch(() => {});
-  useEffect(() => { buscar(); }, [cid]);
+function SecaoAnotacoes({ cid, fetchWithAuth, inicial, onAtualizada }) {
+  const [anotacoes, buscar] = useListaCampanha(cid, 'anotacoes', fetchWithAuth, inicial, onAtualizada);
 
   const toggle = async (id, v) => { await fetchWithAuth(`${API}/api/campanhas/${cid}/anotacoes/${id}/toggle`, { method: 'PATCH', body: JSON.stringify({ visivel: v }) }); buscar(); };
   const deletar = async (id) => { if (!window.confirm('Deletar anotação?')) return; await fetchWithAuth(`${API}/api/campanhas/${cid}/anotacoes/${id}`, { method: 'DELETE' }); buscar(); };
@@ -490,6 +501,8 @@ export default function EsconderijoPage() {
   const [criandoNova, setCriandoNova] = useState(false);
   const [nomeNova,    setNomeNova]    = useState('');
   const [loading,     setLoading]     = useState(true);
+  // Tudo da campanha ativa numa requisição só (/completo; mapas vêm sem imagem e são buscados na aba).
+  const [completo,    setCompleto]    = useState(null);
 
   useEffect(() => {
     if (backgrounds?.mestre) {
@@ -513,6 +526,14 @@ export default function EsconderijoPage() {
   };
   useEffect(() => { buscarCampanhas(); }, []);
 
+  useEffect(() => {
+    setCompleto(null);
+    if (!campanhaAtiva) return;
+    fetchWithAuth(`${API}/api/campanhas/${campanhaAtiva.id}/completo`)
+      .then(r => r.json()).then(d => { if (d.campanha) setCompleto(d); }).catch(() => {});
+  }, [campanhaAtiva?.id]);
+  const atualizarLista = (recurso, lista) => setCompleto(c => c && { ...c, [recurso]: lista });
+
   const criarCampanha = async () => {
     if (!nomeNova.trim()) return;
     const r = await fetchWithAuth(`${API}/api/campanhas`, { method: 'POST', body: JSON.stringify({ nome: nomeNova }) });
@@ -640,10 +661,10 @@ export default function EsconderijoPage() {
                 <SecaoCampanha campanha={campanhaAtiva} fetchWithAuth={fetchWithAuth} onAtualizado={buscarCampanhas} />
               )}
               {abaAtiva === 'mapas'   && <SecaoMapas    cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} />}
-              {abaAtiva === 'eventos' && <SecaoEventos  cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} />}
-              {abaAtiva === 'npcs'    && <SecaoNPCs     cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} />}
-              {abaAtiva === 'quests'  && <SecaoQuests   cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} />}
-              {abaAtiva === 'notas'   && <SecaoAnotacoes cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} />}
+              {abaAtiva === 'eventos' && <SecaoEventos  cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} inicial={completo?.eventos} onAtualizada={atualizarLista} />}
+              {abaAtiva === 'npcs'    && <SecaoNPCs     cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} inicial={completo?.npcs} onAtualizada={atualizarLista} />}
+              {abaAtiva === 'quests'  && <SecaoQuests   cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} inicial={completo?.quests} onAtualizada={atualizarLista} />}
+              {abaAtiva === 'notas'   && <SecaoAnotacoes cid={campanhaAtiva.id} fetchWithAuth={fetchWithAuth} inicial={completo?.anotacoes} onAtualizada={atualizarLista} />}
             </div>
           </div>
         )}
@@ -285,9 +285,9 @@ function FormCriarItem({ onCriado, fetchWithAuth }) {
           </div>
 
           <div style={{ display:'flex', flexDirection:'column' }}>
-            <label style={lbl}>Efeito / Propriedades</label>
+            <label style={lbl}>Efeito (tipo:valor[:alvo[:duração]], separados por ;)</label>
             <textarea value={form.efeito} onChange={e=>set('efeito',e.target.value)}
-              style={{...f, minHeight:'60px', resize:'vertical'}} placeholder="Ex: Cura 2d4+2 HP ao ser consumido..." />
+              style={{...f, minHeight:'60px', resize:'vertical'}} placeholder="Ex: cura:2d4+2 ou dano:1d6:inimigo:3 (texto livre vai na Descrição)" />
           </div>
 
           <div style={{ display:'flex', flexDirection:'column' }}>
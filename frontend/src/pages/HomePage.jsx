@@ -423,6 +423,8 @@ function HomePage() {
     if (filtroNome)         p.append('nome', filtroNome);
     if (filtroOficial!=='') p.append('oficial', filtroOficial);
     if (filtroTipo)         p.append('tipo', filtroTipo);
+    // Os cards só usam estes campos; a ficha completa vem de /api/monstros/<id>.
+    p.append('fields', 'nome,tipo,tamanho,cr,vida_maxima,oficial,imagem_url');
     fetch(`http://https://plataforma-rpg-mesa.onrender.com/api/monstros?${p}`)
       .then(r=>r.json())
       .then(d=>{ setMonstros(d); setLoading(false); })
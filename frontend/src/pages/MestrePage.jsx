@@ -143,6 +143,9 @@ function ListaSecao({ itens, renderItem, renderForm, onCreate, titulo, btnLabel
   );
 }
 
+// Mapas novos/migrados têm imagem_url (/api/blobs/<hash>); os antigos ainda trazem o base64.
+const imagemDoMapa = (m) => m?.imagem_url ? `${API}${m.imagem_url}` : (m?.imagem_data || '');
+
 // ── Mapa ──────────────────────────────────────────────────────────────────────
 function SecaoMapas({ cid, fetchWithAuth }) {
   const [mapas, setMapas] = useState([]);
@@ -161,7 +164,9 @@ function SecaoMapas({ cid, fetchWithAuth }) {
   };
 
   const FormMapa = ({ item, onSalvo, onCancelar }) => {
-    const [f, setF] = useState({ nome: item?.nome || '', descricao: item?.descricao || '', imagem_data: item?.imagem_data || '' });
+    // imagem_data só é enviado quando o usuário escolhe outra imagem (o servidor guarda no blob store).
+    const [f, setF] = useState({ nome: item?.nome || '', descricao: item?.descricao || '', imagem_data: '' });
+    const previa = f.imagem_data || imagemDoMapa(item);
     const set = (k, v) => setF(p => ({ ...p, [k]: v }));
     const handleFile = (e) => {
       const file = e.target.files[0];
@@ -173,7 +178,8 @@ function SecaoMapas({ cid, fetchWithAuth }) {
     const salvar = async () => {
       const url    = item ? `${API}/api/campanhas/${cid}/mapas/${item.id}` : `${API}/api/campanhas/${cid}/mapas`;
       const method = item ? 'PUT' : 'POST';
-      await fetchWithAuth(url, { method, body: JSON.stringify(f) });
+      const { imagem_data, ...resto } = f;
+      await fetchWithAuth(url, { method, body: JSON.stringify(imagem_data ? f : resto) });
       onSalvo();
     };
     return (
@@ -186,7 +192,7 @@ function SecaoMapas({ cid, fetchWithAuth }) {
           <label style={estilo.label}>Imagem do Mapa</label>
           <input ref={fileRef} type="file" accept="image/*" onChange={handleFile} style={{ display: 'none' }} />
           <button onClick={() => fileRef.current?.click()} style={{ ...estilo.btnSecundario, marginBottom: '0.4rem' }}>📁 Escolher imagem</button>
-          {f.imagem_data && <img src={f.imagem_data} alt="preview" style={{ width: '100%', maxHeight: '200px', objectFit: 'contain', borderRadius: '4px', border: '1px solid #5a4520' }} />}
+          {previa && <img src={previa} alt="preview" style={{ width: '100%', maxHeight: '200px', objectFit: 'contain', borderRadius: '4px', border: '1px solid #5a4520' }} />}
         </div>
         <div style={{ display: 'flex', gap: '0.5rem' }}>
           <button onClick={onCancelar} style={estilo.btnSecundario}>Cancelar</button>
@@ -211,7 +217,11 @@ function SecaoMapas({ cid, fetchWithAuth }) {
               <button onClick={() => deletar(m.id)} style={estilo.btnPerigo}>🗑️</button>
             </div>
           </div>
-          {m.imagem_data && <img src={m.imagem_data} alt={m.nome} style={{ width: '100%', maxHeight: '300px', objectFit: 'contain', borderRadius: '6px', border: '1px solid #3a2a10' }} />}
+          {imagemDoMapa(m) && (
+            <a href={imagemDoMapa(m)} target="_blank" rel="noreferrer">
+              <img src={m.miniatura_url ? `${API}${m.miniatura_url}` : imagemDoMapa(m)} alt={m.nome} loading="lazy" style={{ width: '100%', maxHeight: '300px', objectFit: 'contain', borderRadius: '6px', border: '1px solid #3a2a10' }} />
+            </a>
+          )}
         </div>
       )}
       renderForm={(item, onSalvo, onCancelar) => <FormMapa item={item} onSalvo={onSalvo} onCancelar={onCancelar} />}
@@ -11,6 +11,7 @@ import ChatMessage from '../components/ChatMessage';
 import MestrePanel from '../components/MestrePanel';
 import BatalhaModal from '../components/BatalhaModal';
 import { backgrounds } from '../assets/backgrounds';
+import { CODEC_SOCKET, instalarCodec } from '../services/codecSocket';
 
 function SalaPage() {
   const { id: salaId } = useParams();
@@ -30,6 +31,10 @@ function SalaPage() {
   const [encerradaMensagem, setEncerradaMensagem] = useState(null);
 
   const socketRef    = useRef(null);
+  // Presença da sala: versão + Map sid -> jogador (ordem de entrada), atualizada por deltas
+  const presencaRef  = useRef({ versao: null, jogadores: new Map() });
+  // Sessão na sala para o 'resume': sid da conexão e última sequência de evento da sala recebida
+  const sessaoRef    = useRef({ sid: null, seq: null });
   const chatEndRef   = useRef(null);
   // Flag para impedir que o cleanup do StrictMode desconecte o socket
   const montadoRef   = useRef(false);
@@ -60,21 +65,65 @@ function SalaPage() {
       return;
     }
 
-    const socket = io('http://https://plataforma-rpg-mesa.onrender.com', {
+    const socket = instalarCodec(io('http://https://plataforma-rpg-mesa.onrender.com', {
       transports: ['websocket', 'polling'],
-    });
+    }));
     socketRef.current = socket;
 
+    // Ao (re)entrar manda a versão de presença que já tem: o servidor só reenvia a lista se ela estiver velha
+    const entrarNaSala = () => socket.emit('join_room', {
+      token, sala_id: salaId, ficha_id: fichaId, presenca_versao: presencaRef.current.versao, codec: CODEC_SOCKET,
+    });
+
+    // Reconexão: tenta o 'resume' (só os eventos perdidos, sem recarregar o chat); se o servidor
+    // não tiver mais a vaga ou os eventos, faz o join_room normal.
     socket.on('connect', () => {
       console.log('✅ Conectado ao WebSocket');
-      socket.emit('join_room', { token, sala_id: salaId, ficha_id: fichaId });
+      const { sid, seq } = sessaoRef.current;
+      sessaoRef.current.sid = socket.id;
+      if (!sid || seq === null) { entrarNaSala(); return; }
+      socket.timeout(5000).emit('resume', {
+        token, sala_id: salaId, sid_anterior: sid, ultimo_seq: seq, codec: CODEC_SOCKET,
+      }, (err, resposta) => {
+        if (err || !resposta || !resposta.ok) entrarNaSala();
+      });
+    });
+    // Eventos da sala trazem a sequência como segundo argumento
+    socket.onAny((_evento, _dados, seq) => {
+      if (typeof seq === 'number' && (sessaoRef.current.seq === null || seq > sessaoRef.current.seq)) {
+        sessaoRef.current.seq = seq;
+      }
     });
 
-    socket.on('chat_history',   (data) => setMessages(data.historico || []));
+    socket.on('chat_history',   (data) => {
+      sessaoRef.current.seq = data.seq ?? null;
+      setMessages(data.historico || []);
+    });
     socket.on('message',        (data) => setMessages(prev => [...prev, data]));
     socket.on('status_mestre',  (data) => setIsMestre(data.isMestre));
 
-    socket.on('lista_jogadores_atualizada', (lista) => setJogadores(lista || []));
+    socket.on('presence_snapshot', (data) => {
+      presencaRef.current = { versao: data.versao, jogadores: new Map(data.jogadores.map(j => [j.sid, j])) };
+      setJogadores([...presencaRef.current.jogadores.values()]);
+    });
+    // Deltas: aplica só a versão seguinte à nossa; se pulou alguma, pede a lista inteira
+    const aplicarPresenca = (data, aplicar) => {
+      const presenca = presencaRef.current;
+      if (presenca.versao === null) return;          // a lista inteira do join_room ainda vai chegar
+      if (data.versao <= presenca.versao) return;    // já incluído
+      if (data.versao !== presenca.versao + 1) {
+        socket.emit('presence_sync', { sala_id: salaId, versao: presenca.versao });
+        return;
+      }
+      aplicar(presenca.jogadores);
+      presenca.versao = data.versao;
+      setJogadores([...presenca.jogadores.values()]);
+    };
+    socket.on('presence_join',   (data) => aplicarPresenca(data, (m) => m.set(data.sid, { sid: data.sid, ...data.jogador })));
+    socket.on('presence_leave',  (data) => aplicarPresenca(data, (m) => m.delete(data.sid)));
+    socket.on('presence_update', (data) => aplicarPresenca(data, (m) => {
+      if (m.has(data.sid)) m.set(data.sid, { ...m.get(data.sid), ...data.campos });
+    }));
 
     socket.on('ficha_atualizada', (fichaAtualizada) => {
       setFichaAtiva(prev =>
@@ -94,10 +143,24 @@ function SalaPage() {
     socket.on('jogador_morto',        () => setPlayerMorto(true));
     socket.on('jogador_ressuscitado', () => setPlayerMorto(false));
     socket.on('acao_bloqueada',   (data) => setFeedback(data.motivo));
+    socket.on('rate_limited',     (data) => {
+      setFeedback(`Calma, aventureiro! Aguarde ${Math.ceil((data.tentar_em_ms || 1000) / 1000)}s para enviar de novo.`);
+      setTimeout(() => setFeedback(''), data.tentar_em_ms || 1000);
+    });
+
+    // Heartbeat de presença: sem sinal de vida por ~2 min o servidor tira o jogador da sala.
+    // Se a resposta disser que não estamos mais na sala (despejo, reinício do servidor), reentra.
+    const heartbeat = setInterval(() => {
+      if (!socket.connected) return;
+      socket.emit('presenca_ping', { sala_id: salaId }, (resposta) => {
+        if (resposta && resposta.presente === false) entrarNaSala();
+      });
+    }, 20000);
 
     // Cleanup: só desconecta ao realmente sair da página (não no StrictMode)
     return () => {
       // montadoRef continua true — cleanup real só acontece ao desmontar por navegação
+      clearInterval(heartbeat);
       if (socket && !socket.disconnected) socket.disconnect();
       montadoRef.current = false;
     };
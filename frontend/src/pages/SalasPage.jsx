@@ -180,7 +180,7 @@ function SalasPage() {
                 >
                   Entrar
                 </button>
-                {user?.role === 'mestre' && (
+                {(user?.role === 'mestre' || user?.role === 'admin') && (
                   <button
                     className="delete-button"
                     onClick={() => handleExcluirSala(sala.id)}
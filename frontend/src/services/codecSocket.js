@@ -0,0 +1,89 @@
+// frontend/src/services/codecSocket.js
+// Codec binário opcional dos eventos Socket.IO (ver backend/servidor/codec.py).
+//
+// Com VITE_RPG_CODEC=msgpack o cliente pede 'codec: msgpack' no join_room/resume. Se o
+// servidor aceitar, ele manda o evento 'codec' com o dicionário de chaves e, daí em diante,
+// os payloads grandes chegam como binário msgpack com as chaves trocadas por índices.
+// instalarCodec() decodifica esses argumentos antes de chamar os handlers, então o resto da
+// página (e o BatalhaModal) continua recebendo objetos normais.
+
+export const CODEC_SOCKET = import.meta.env.VITE_RPG_CODEC === 'msgpack' ? 'msgpack' : undefined;
+
+const textos = new TextDecoder();
+
+// Decodificador msgpack mínimo (só os tipos que o servidor manda; sem 'ext').
+function decodificarMsgpack(bytes, chaves) {
+  const dv = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let pos = 0;
+  const texto = (n) => { const s = textos.decode(bytes.subarray(pos, pos + n)); pos += n; return s; };
+  const binario = (n) => { const b = bytes.slice(pos, pos + n); pos += n; return b; };
+  const lista = (n) => { const a = new Array(n); for (let i = 0; i < n; i++) a[i] = ler(); return a; };
+  const mapa = (n) => {
+    const o = {};
+    for (let i = 0; i < n; i++) {
+      const k = ler();
+      o[typeof k === 'number' ? (chaves[k] ?? k) : k] = ler();
+    }
+    return o;
+  };
+  const u8  = () => dv.getUint8(pos++);
+  const u16 = () => { const v = dv.getUint16(pos); pos += 2; return v; };
+  const u32 = () => { const v = dv.getUint32(pos); pos += 4; return v; };
+  function ler() {
+    const t = u8();
+    if (t <= 0x7f) return t;
+    if (t >= 0xe0) return t - 0x100;
+    if ((t & 0xf0) === 0x80) return mapa(t & 0x0f);
+    if ((t & 0xf0) === 0x90) return lista(t & 0x0f);
+    if ((t & 0xe0) === 0xa0) return texto(t & 0x1f);
+    let v;
+    switch (t) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return binario(u8());
+      case 0xc5: return binario(u16());
+      case 0xc6: return binario(u32());
+      case 0xca: v = dv.getFloat32(pos); pos += 4; return v;
+      case 0xcb: v = dv.getFloat64(pos); pos += 8; return v;
+      case 0xcc: return u8();
+      case 0xcd: return u16();
+      case 0xce: return u32();
+      case 0xcf: v = Number(dv.getBigUint64(pos)); pos += 8; return v;
+      case 0xd0: v = dv.getInt8(pos); pos += 1; return v;
+      case 0xd1: v = dv.getInt16(pos); pos += 2; return v;
+      case 0xd2: v = dv.getInt32(pos); pos += 4; return v;
+      case 0xd3: v = Number(dv.getBigInt64(pos)); pos += 8; return v;
+      case 0xd9: return texto(u8());
+      case 0xda: return texto(u16());
+      case 0xdb: return texto(u32());
+      case 0xdc: return lista(u16());
+      case 0xdd: return lista(u32());
+      case 0xde: return mapa(u16());
+      case 0xdf: return mapa(u32());
+      default: throw new Error(`msgpack: tipo 0x${t.toString(16)} não suportado`);
+    }
+  }
+  return ler();
+}
+
+// Embrulha socket.on/off para os handlers receberem os argumentos binários já decodificados.
+export function instalarCodec(socket) {
+  let chaves = null;
+  const embrulhados = new WeakMap();
+  const decodificar = (arg) => {
+    if (!chaves) return arg;
+    if (arg instanceof ArrayBuffer) return decodificarMsgpack(new Uint8Array(arg), chaves);
+    if (ArrayBuffer.isView(arg)) return decodificarMsgpack(new Uint8Array(arg.buffer, arg.byteOffset, arg.byteLength), chaves);
+    return arg;
+  };
+  const on  = socket.on.bind(socket);
+  const off = socket.off.bind(socket);
+  socket.on = (evento, fn) => {
+    if (!embrulhados.has(fn)) embrulhados.set(fn, (...args) => fn(...args.map(decodificar)));
+    return on(evento, embrulhados.get(fn));
+  };
+  socket.off = (evento, fn) => off(evento, fn ? (embrulhados.get(fn) || fn) : undefined);
+  on('codec', (data) => { chaves = data.chaves; });
+  return socket;
+}
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Move as imagens dos mapas (campanha_mapas.imagem_data, base64 dentro do SQLite)
+para o blob store em arquivos (backend/database/blobs, ver backend/database/blobs.py).
+Cada linha passa a guardar só imagem_hash, imagem_largura e imagem_altura.
+
+Pode ser executado mais de uma vez (só migra o que ainda tem imagem_data):
+  venv\\Scripts\\python.exe migrar_mapas_blobs.py            (migra)
+  venv\\Scripts\\python.exe migrar_mapas_blobs.py --vacuum   (migra e compacta o arquivo do banco)
+  venv\\Scripts\\python.exe migrar_mapas_blobs.py --coletar  (migra e apaga os blobs sem mapa)
+  (--simular junto com --coletar só mostra o que seria apagado)
+"""
+import os, sqlite3, sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from backend.database import blobs, miniaturas
+
+DB = os.environ.get('RPG_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'database', 'campanhas.db')
+COLUNAS = (('imagem_hash', 'TEXT'), ('imagem_largura', 'INTEGER'), ('imagem_altura', 'INTEGER'))
+# Colunas do banco que apontam para blobs (tabela, coluna).
+REFERENCIAS_BLOBS = (('campanha_mapas', 'imagem_hash'),)
+
+
+def migrar(vacuum=False):
+    conn = sqlite3.connect(DB)
+    cur = conn.cursor()
+
+    # 1. Colunas novas
+    existentes = [r[1] for r in cur.execute("PRAGMA table_info(campanha_mapas)")]
+    if not existentes:
+        print("Tabela campanha_mapas não existe. Rode criar_tabelas_campanha.py antes.")
+        return
+    for nome, tipo in COLUNAS:
+        if nome not in existentes:
+            cur.execute(f"ALTER TABLE campanha_mapas ADD COLUMN {nome} {tipo}")
+            print(f"✅ Coluna {nome} adicionada.")
+    conn.commit()
+
+    # 2. Dados: um mapa por vez (não carrega todas as imagens na memória)
+    ids = [r[0] for r in cur.execute(
+        "SELECT id FROM campanha_mapas WHERE imagem_data IS NOT NULL AND imagem_data != ''")]
+    print(f"{len(ids)} mapa(s) com imagem em base64.")
+    migrados = bytes_movidos = 0
+    hashes = set()
+    for mapa_id in ids:
+        (texto,) = cur.execute("SELECT imagem_data FROM campanha_mapas WHERE id=?", (mapa_id,)).fetchone()
+        try:
+            info = blobs.salvar_imagem_data_url(texto)
+        except ValueError as e:
+            print(f"⚠️  Mapa {mapa_id} ignorado: {e}")
+            continue
+        cur.execute(
+            "UPDATE campanha_mapas SET imagem_hash=?, imagem_largura=?, imagem_altura=?, imagem_data=NULL WHERE id=?",
+            (info['imagem_hash'], info['imagem_largura'], info['imagem_altura'], mapa_id))
+        conn.commit()  # por linha: se parar no meio, basta rodar de novo
+        migrados += 1
+        bytes_movidos += len(texto)
+        hashes.add(info['imagem_hash'])
+    print(f"✅ {migrados} mapa(s) migrados ({len(hashes)} arquivo(s) distintos, {bytes_movidos / 1e6:.1f} MB de texto removidos).")
+
+    # 3. Opcional: devolve ao disco o espaço das páginas liberadas
+    if vacuum:
+        conn.execute("VACUUM")
+        print("✅ VACUUM concluído.")
+    conn.close()
+
+
+def coletar(simular=False):
+    """Apaga os blobs (e suas miniaturas) que nenhuma linha do banco referencia."""
+    conn = sqlite3.connect(DB)
+    referenciados = set()
+    for tabela, coluna in REFERENCIAS_BLOBS:
+        referenciados.update(h for (h,) in conn.execute(
+            f"SELECT DISTINCT {coluna} FROM {tabela} WHERE {coluna} IS NOT NULL"))
+    conn.close()
+    arquivos, tamanho = blobs.coletar_lixo(referenciados, simular=simular)
+    mini_arquivos, mini_tamanho = miniaturas.coletar_lixo(simular=simular)
+    verbo = 'seriam removidos' if simular else 'removidos'
+    print(f"✅ {arquivos} blob(s) e {mini_arquivos} miniatura(s) sem referência {verbo} "
+          f"({(tamanho + mini_tamanho) / 1e6:.1f} MB; {len(referenciados)} blob(s) em uso).")
+
+
+if __name__ == '__main__':
+    migrar(vacuum='--vacuum' in sys.argv)
+    if '--coletar' in sys.argv:
+        coletar(simular='--simular' in sys.argv)